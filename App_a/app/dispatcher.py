@@ -0,0 +1,515 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import engraving_queue
+from .database import SessionLocal
+from .engraving_queue import EngravingQueueManager
+from .engraving_worker import EngravingWorker
+from .grbl_session import get_session
+from .models import EngravingHistory, EngravingQueue, EngravingStatus
+from .qr_gcode import QR_SCHEME, QR_SIZES_MM, MachineProfile, profile_from_env
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+BUSY = "busy"
+OFFLINE = "offline"
+
+CLAIM_MESSAGE = "Assigned to engraver"
+
+
+class EngravingDevice:
+    """One engraver: where it is connected, what it can engrave, its assigned jobs and its usage."""
+
+    def __init__(self, name: str, port: str, baud_rate: int = 115200, qr_sizes: Optional[Iterable[str]] = None,
+                 profile: Optional[MachineProfile] = None):
+        """
+        Args:
+            name: Unique device name, used in job history and stats
+            port: Serial port, or sim://<name> for a simulated controller
+            baud_rate: Serial speed
+            qr_sizes: QR sizes the device is set up for (default: every size that fits its work area)
+            profile: Machine settings, including the work area (max_travel)
+        """
+        self.name = name
+        self.port = port
+        self.baud_rate = baud_rate
+        self.profile = profile or profile_from_env()
+        self.qr_sizes = set(qr_sizes) if qr_sizes else set(QR_SIZES_MM)
+        unknown = self.qr_sizes - set(QR_SIZES_MM)
+        if unknown:
+            raise ValueError(f"Device {name}: unknown QR sizes {', '.join(sorted(unknown))}")
+
+        self.state = IDLE
+        self.queue: Deque[Tuple[int, str]] = deque()  # claimed (job id, svg_url) waiting for this device
+        self.current_job: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.busy_seconds = 0.0
+        self._online_seconds = 0.0
+        self._online_since: Optional[float] = time.monotonic()
+        self._busy_since: Optional[float] = None
+        self._next_probe = 0.0
+
+    def can_engrave(self, svg_url: str) -> bool:
+        """Whether this device is able to run a job with this G-code source."""
+        if not svg_url.startswith(QR_SCHEME):
+            return True  # prepared G-code: no known requirements
+        qr_size = svg_url[len(QR_SCHEME):]
+        if qr_size not in self.qr_sizes:
+            return False
+        size_mm = QR_SIZES_MM[qr_size]
+        x0, y0 = self.profile.origin
+        return x0 + size_mm <= self.profile.max_travel[0] and y0 + size_mm <= self.profile.max_travel[1]
+
+    @property
+    def load(self) -> int:
+        return len(self.queue) + (1 if self.current_job is not None else 0)
+
+    def online_seconds(self, now: float) -> float:
+        return self._online_seconds + (now - self._online_since if self._online_since is not None else 0.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        busy = self.busy_seconds + (now - self._busy_since if self._busy_since is not None else 0.0)
+        online = self.online_seconds(now)
+        finished = self.jobs_completed + self.jobs_failed
+        return {
+            "name": self.name,
+            "port": self.port,
+            "state": self.state,
+            "current_job": self.current_job,
+            "queued_jobs": [job_id for job_id, _ in self.queue],
+            "qr_sizes": sorted(self.qr_sizes, key=QR_SIZES_MM.get),
+            "max_travel": list(self.profile.max_travel),
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "busy_s": round(busy, 1),
+            "online_s": round(online, 1),
+            "utilisation": round(busy / online, 3) if online > 0 else None,
+            "jobs_per_hour": round(self.jobs_completed * 3600 / online, 2) if online > 0 else None,
+            "mean_job_s": round(self.busy_seconds / finished, 1) if finished else None,
+            "last_error": self.last_error
+        }
+
+
+def devices_from_env() -> List[EngravingDevice]:
+    """Devices from ENGRAVING_DEVICES (JSON list) or ENGRAVING_DEVICES_FILE, else the single SERIAL_PORT.
+
+    Each entry: {"name": "bay-1", "port": "/dev/ttyACM0", "baud_rate": 115200,
+    "qr_sizes": ["50x50", "100x100"], "max_travel": [250, 250], "profile": {"feed_rate": 1000}}
+    """
+    config = os.getenv("ENGRAVING_DEVICES")
+    path = os.getenv("ENGRAVING_DEVICES_FILE")
+    if not config and path:
+        with open(path) as f:
+            config = f.read()
+    if not config:
+        return [EngravingDevice("default", os.getenv("SERIAL_PORT", "/dev/ttyACM0"),
+                                int(os.getenv("SERIAL_BAUD", 115200)))]
+
+    devices = []
+    for entry in json.loads(config):
+        settings = profile_from_env().to_dict()
+        settings.update(entry.get("profile", {}))
+        if "max_travel" in entry:
+            settings["max_travel"] = entry["max_travel"]
+        devices.append(EngravingDevice(
+            name=entry["name"],
+            port=entry["port"],
+            baud_rate=int(entry.get("baud_rate", os.getenv("SERIAL_BAUD", 115200))),
+            qr_sizes=entry.get("qr_sizes"),
+            profile=MachineProfile(**settings)
+        ))
+    names = [device.name for device in devices]
+    if len(set(names)) != len(names):
+        raise ValueError("Engraving device names must be unique")
+    return devices
+
+
+class EngravingDispatcher:
+    """Assigns pending engraving jobs to idle engravers that can run them.
+
+    A dispatcher thread claims the oldest pending `EngravingQueue` rows
+    (atomically, so dispatchers at several depots can share the table) into
+    per-device queues, picking the least loaded capable device. One thread
+    per device runs its jobs with an `EngravingWorker` bound to that port.
+    A device whose connection fails, times out or alarms goes offline; its
+    queued jobs go back to pending for the other devices, and it is probed
+    again every `probe_interval` seconds. A failed job that will be retried
+    is held back for the worker's retry delay.
+
+    Claims are recorded in the job history with the dispatcher's name. On
+    start, claims left by an earlier run of this dispatcher, and claims of
+    any dispatcher untouched for `claim_timeout` seconds, are recovered.
+    """
+
+    def __init__(self, devices: Sequence[EngravingDevice], poll_interval: float = 2.0,
+                 probe_interval: float = 30.0, queue_depth: int = 1,
+                 worker_factory: Optional[Callable[[EngravingDevice], EngravingWorker]] = None,
+                 session_factory: Callable = SessionLocal, name: Optional[str] = None,
+                 claim_timeout: float = 7200.0):
+        """
+        Args:
+            devices: Registered engravers
+            poll_interval: Seconds between looks at the pending queue
+            probe_interval: Seconds between reconnection attempts to an offline device
+            queue_depth: Jobs claimed per device beyond the one it is running
+            worker_factory: Builds the worker that runs a job on a device
+            session_factory: Database session factory
+            name: Identifies this dispatcher's claims (default: ENGRAVING_DISPATCHER_NAME or the host name)
+            claim_timeout: Seconds after which another dispatcher's unfinished claim counts as abandoned
+        """
+        self.devices = {device.name: device for device in devices}
+        self.poll_interval = poll_interval
+        self.probe_interval = probe_interval
+        self.queue_depth = max(0, queue_depth)
+        self.worker_factory = worker_factory or self._default_worker
+        self.session_factory = session_factory
+        self.name = name or os.getenv("ENGRAVING_DISPATCHER_NAME") or socket.gethostname()
+        self.claim_timeout = claim_timeout
+        self.unassignable: Dict[int, str] = {}  # pending job id -> svg_url no device can run
+        self.retry_after: Dict[int, float] = {}  # failed job id -> monotonic time it may run again
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+
+    @staticmethod
+    def _default_worker(device: EngravingDevice) -> EngravingWorker:
+        return EngravingWorker(serial_port=device.port, baud_rate=device.baud_rate, machine_profile=device.profile)
+
+    def start(self):
+        if self._running:
+            return
+        # In rq mode every new job is also enqueued for the RQ workers, which would engrave it a second time
+        if engraving_queue.ENGRAVING_DISPATCH != "dispatcher":
+            raise RuntimeError(
+                f"The engraving dispatcher needs ENGRAVING_DISPATCH=dispatcher "
+                f"(is '{engraving_queue.ENGRAVING_DISPATCH}', jobs go to the RQ workers)"
+            )
+        self.recover_claims()
+        self._running = True
+        self._threads = [threading.Thread(target=self._dispatch_loop, name="engraving-dispatcher", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._device_loop, args=(device,), name=f"engraver-{device.name}", daemon=True)
+            for device in self.devices.values()
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Dispatching engraving jobs to {len(self.devices)} devices: {', '.join(self.devices)}")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop dispatching; jobs claimed but not started go back to pending."""
+        self._running = False
+        self._wake.set()
+        with self._lock:
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        for device in self.devices.values():
+            self._release_queued(device, "Dispatcher stopped")
+
+    def wake(self):
+        """Look at the pending queue now instead of at the next poll."""
+        self._wake.set()
+
+    # -- assignment ---------------------------------------------------------
+
+    def dispatch_once(self) -> int:
+        """Claim pending jobs for devices with free queue slots. Returns the number assigned."""
+        now = time.monotonic()
+        with self._lock:
+            free = {name: device for name, device in self.devices.items()
+                    if device.state != OFFLINE and device.load < 1 + self.queue_depth}
+            self.retry_after = {job_id: at for job_id, at in self.retry_after.items() if at > now}
+            # Waiting for a retry, or failed and still on its device: the worker sets it pending before returning
+            held = set(self.retry_after) | {device.current_job for device in self.devices.values()}
+            held.discard(None)
+        if not free:
+            return 0
+
+        db = self.session_factory()
+        assigned = 0
+        try:
+            manager = EngravingQueueManager(db)
+            if self.unassignable:
+                # Forget jobs that were cancelled or deleted meanwhile; they would only widen the query
+                still_pending = {job_id for job_id, in db.query(EngravingQueue.id).filter(
+                    EngravingQueue.id.in_(list(self.unassignable)),
+                    EngravingQueue.status == EngravingStatus.PENDING
+                )}
+                self.unassignable = {job_id: svg_url for job_id, svg_url in self.unassignable.items()
+                                     if job_id in still_pending}
+            pending = db.query(EngravingQueue.id, EngravingQueue.svg_url).filter(
+                EngravingQueue.status == EngravingStatus.PENDING
+            ).order_by(EngravingQueue.created_at.asc(), EngravingQueue.id.asc()).limit(
+                len(free) * (1 + self.queue_depth) + len(self.unassignable) + len(held)
+            ).all()
+
+            for job_id, svg_url in pending:
+                if not free:
+                    break
+                if job_id in held:
+                    continue
+                capable = [device for device in free.values() if device.can_engrave(svg_url)]
+                if not capable:
+                    if not any(device.can_engrave(svg_url) for device in self.devices.values()):
+                        if job_id not in self.unassignable:
+                            logger.warning(f"Job {job_id} ({svg_url}) fits none of the registered devices")
+                        self.unassignable[job_id] = svg_url
+                    continue
+                self.unassignable.pop(job_id, None)
+                # Least loaded first; among equals the device that has worked least
+                device = min(capable, key=lambda d: (d.load, d.busy_seconds))
+                if not manager.claim_job(job_id, f"{CLAIM_MESSAGE} {device.name} by dispatcher {self.name}"):
+                    continue  # taken by another dispatcher
+                with self._lock:
+                    device.queue.append((job_id, svg_url))
+                    if device.load >= 1 + self.queue_depth:
+                        free.pop(device.name)
+                    self._changed.notify_all()
+                assigned += 1
+        finally:
+            db.close()
+        return assigned
+
+    def _dispatch_loop(self):
+        while self._running:
+            try:
+                self.dispatch_once()
+                self._probe_offline()
+            except Exception as e:
+                logger.error(f"Dispatch error: {str(e)}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # -- devices ------------------------------------------------------------
+
+    def _device_loop(self, device: EngravingDevice):
+        while self._running:
+            with self._lock:
+                job_id = None
+                while self._running and job_id is None:
+                    job_id = self._next_job(device)
+                    if job_id is None:
+                        self._changed.wait(1.0)
+                if not self._running:
+                    return
+                device.current_job = job_id
+                device.state = BUSY
+                device._busy_since = time.monotonic()
+
+            logger.info(f"Engraver {device.name} running job {job_id}")
+            try:
+                result = self.worker_factory(device).process_job(job_id)
+            except Exception as e:
+                result = {"status": "error", "message": str(e), "device_error": False}
+
+            with self._lock:
+                elapsed = time.monotonic() - device._busy_since
+                device.busy_seconds += elapsed
+                device._busy_since = None
+                if result.get("retry_delay") is not None:
+                    self.retry_after[job_id] = time.monotonic() + result["retry_delay"]
+                device.current_job = None
+                if result.get("status") == "success":
+                    device.jobs_completed += 1
+                elif result.get("started", True):
+                    device.jobs_failed += 1
+                device.state = IDLE
+            if result.get("device_error"):
+                self._set_offline(device, result.get("message"))
+            self.wake()
+
+    def _next_job(self, device: EngravingDevice) -> Optional[int]:
+        """Next job for an idle device: its own queue first, else the newest claim it can run
+        from the busiest other device, so one long job does not hold up those behind it."""
+        if device.state == OFFLINE:
+            return None
+        if device.queue:
+            return device.queue.popleft()[0]
+        for other in sorted(self.devices.values(), key=lambda d: -len(d.queue)):
+            for job in reversed(other.queue):
+                if other is not device and device.can_engrave(job[1]):
+                    other.queue.remove(job)
+                    logger.info(f"Engraver {device.name} took job {job[0]} from {other.name}")
+                    return job[0]
+        return None
+
+    def _set_offline(self, device: EngravingDevice, reason: Optional[str]):
+        with self._lock:
+            if device.state == OFFLINE:
+                return
+            now = time.monotonic()
+            device.state = OFFLINE
+            device.last_error = reason
+            device._online_seconds += now - device._online_since
+            device._online_since = None
+            device._next_probe = now + self.probe_interval
+        logger.error(f"Engraver {device.name} offline: {reason}")
+        self._release_queued(device, f"Engraver {device.name} offline, job returned to the queue")
+        self.wake()
+
+    def _release_queued(self, device: EngravingDevice, message: str):
+        with self._lock:
+            queued = [job_id for job_id, _ in device.queue]
+            device.queue.clear()
+        if not queued:
+            return
+        db = self.session_factory()
+        try:
+            manager = EngravingQueueManager(db)
+            for job_id in queued:
+                manager.release_job(job_id, message)
+        finally:
+            db.close()
+
+    def recover_claims(self) -> int:
+        """
+        Take back jobs left IN_PROGRESS by a dispatcher that stopped without releasing them:
+        this dispatcher's own claims (it is starting, so none of them is running) and claims
+        of any dispatcher with no history for claim_timeout seconds. Jobs that were only
+        claimed go back to pending; jobs that had started fail, as the part may be partly
+        engraved. Jobs taken by RQ workers are left alone. Returns the number recovered.
+        """
+        db = self.session_factory()
+        recovered = 0
+        try:
+            manager = EngravingQueueManager(db)
+            now = datetime.now(timezone.utc)
+            in_progress = db.query(EngravingQueue.id).filter(
+                EngravingQueue.status == EngravingStatus.IN_PROGRESS
+            ).all()
+            for job_id, in in_progress:
+                history = db.query(EngravingHistory).filter(
+                    EngravingHistory.engraving_job_id == job_id
+                ).order_by(EngravingHistory.id.desc()).all()
+                claims = [index for index, entry in enumerate(history)
+                          if (entry.message or "").startswith(CLAIM_MESSAGE)]
+                if not claims:
+                    continue
+                claim = history[claims[0]]
+                own = claim.message.endswith(f" by dispatcher {self.name}")
+                idle_seconds = (now - _as_utc(history[0].created_at)).total_seconds()
+                if not own and idle_seconds < self.claim_timeout:
+                    continue
+                if claims[0] > 0:
+                    manager.update_job_status(
+                        job_id,
+                        EngravingStatus.FAILED,
+                        f"Interrupted: the dispatcher stopped while engraving ({claim.message}); "
+                        f"check the part before queueing it again"
+                    )
+                else:
+                    manager.release_job(job_id, f"Released an unfinished claim ({claim.message})")
+                recovered += 1
+        finally:
+            db.close()
+        if recovered:
+            logger.warning(f"Recovered {recovered} jobs claimed by a stopped dispatcher")
+        return recovered
+
+    def _probe_offline(self):
+        now = time.monotonic()
+        for device in list(self.devices.values()):
+            if device.state != OFFLINE or now < device._next_probe:
+                continue
+            device._next_probe = now + self.probe_interval
+            if self.probe(device):
+                with self._lock:
+                    device.state = IDLE
+                    device.last_error = None
+                    device._online_since = time.monotonic()
+                    self._changed.notify_all()
+                logger.info(f"Engraver {device.name} back online")
+
+    @staticmethod
+    def probe(device: EngravingDevice) -> bool:
+        """Whether the device connects and reports Idle; the connection is kept for its next job."""
+        session = get_session(device.port, device.baud_rate)
+        try:
+            session.acquire(timeout=1)
+        except Exception as e:
+            device.last_error = str(e)
+            return False
+        session.release()
+        return True
+
+    # -- stats --------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-device state, throughput and utilisation."""
+        with self._lock:
+            devices = [device.get_stats() for device in self.devices.values()]
+        online = sum(device["online_s"] for device in devices)
+        return {
+            "devices": devices,
+            "online": sum(1 for device in devices if device["state"] != OFFLINE),
+            "jobs_completed": sum(device["jobs_completed"] for device in devices),
+            "jobs_failed": sum(device["jobs_failed"] for device in devices),
+            "utilisation": round(sum(device["busy_s"] for device in devices) / online, 3) if online > 0 else None,
+            "unassignable_jobs": sorted(self.unassignable)
+        }
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    """History timestamps come back naive from SQLite (in UTC) and aware from PostgreSQL."""
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
+
+# Singleton instance
+_dispatcher_instance = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher() -> EngravingDispatcher:
+    """Get the process-wide dispatcher for the devices configured in the environment."""
+    global _dispatcher_instance
+    with _dispatcher_lock:
+        if _dispatcher_instance is None:
+            _dispatcher_instance = EngravingDispatcher(
+                devices_from_env(),
+                poll_interval=float(os.getenv("ENGRAVING_POLL_SECONDS", 2)),
+                probe_interval=float(os.getenv("ENGRAVING_PROBE_SECONDS", 30)),
+                queue_depth=int(os.getenv("ENGRAVING_QUEUE_DEPTH", 1)),
+                claim_timeout=float(os.getenv("ENGRAVING_CLAIM_TIMEOUT_SECONDS", 7200))
+            )
+    return _dispatcher_instance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dispatch queued engraving jobs to the configured engravers")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Seconds between stats log lines")
+    args = parser.parse_args()
+
+    dispatcher = get_dispatcher()
+    dispatcher.start()
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            for device in dispatcher.get_stats()["devices"]:
+                logger.info(
+                    f"{device['name']}: {device['state']}, {device['jobs_completed']} done, "
+                    f"{device['jobs_failed']} failed, utilisation {device['utilisation']}, "
+                    f"{device['jobs_per_hour']} jobs/h"
+                )
+    except KeyboardInterrupt:
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,14 @@
 import os
 import redis
 from rq import Queue
-from typing import Optional, Dict, Any, Union, Callable
-from datetime import datetime
+from typing import Optional, Dict, Any, List, Union, Callable
+from datetime import datetime, timedelta
 from .models import EngravingQueue, EngravingStatus, EngravingHistory
 from sqlalchemy.orm import Session
 import logging
 import sys
-from queue import Queue as ThreadQueue
-from threading import Thread, Event
+from queue import Empty, Queue as ThreadQueue
+from threading import Thread, Event, Timer
 import time
 from uuid import uuid4
 
@@ -18,6 +18,8 @@ logger = logging.getLogger(__name__)
 
 # Check if we're in test mode (no Redis available)
 TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
+# "rq": jobs are enqueued for any worker; "dispatcher": app.dispatcher assigns them to engravers
+ENGRAVING_DISPATCH = os.getenv("ENGRAVING_DISPATCH", "rq").lower()
 
 if not TEST_MODE:
     try:
@@ -103,6 +105,11 @@ if TEST_MODE:
         def enqueue(self, func, *args, **kwargs):
             job_id = memory_queue.enqueue(func, *args, **kwargs)
             return type('Job', (), {'id': job_id})
+        
+        def enqueue_in(self, time_delta, func, *args, **kwargs):
+            timer = Timer(time_delta.total_seconds(), memory_queue.enqueue, args=(func, *args), kwargs=kwargs)
+            timer.daemon = True
+            timer.start()
     
     engraving_queue = TestQueue()
 
@@ -133,6 +140,9 @@ class EngravingQueueManager:
         # Add to history
         self._add_history(job.id, EngravingStatus.PENDING, "Added to engraving queue")
         
+        if ENGRAVING_DISPATCH == "rq":
+            self._enqueue(job.id)
+        
         # Get position in queue
         position = self._get_queue_position(job.id)
         
@@ -144,6 +154,28 @@ class EngravingQueueManager:
             "created_at": job.created_at.isoformat()
         }
     
+    def add_batch_to_queue(self, item_uids: List[str], svg_url: str) -> Dict[str, Any]:
+        """
+        Add one job per item and, in rq mode, hand them to a single worker that
+        engraves them back to back with their G-code prefetched
+        """
+        jobs = [EngravingQueue(item_uid=item_uid, svg_url=svg_url, status=EngravingStatus.PENDING)
+                for item_uid in item_uids]
+        self.db.add_all(jobs)
+        self.db.commit()
+        
+        job_ids = [job.id for job in jobs]
+        for job_id in job_ids:
+            self._add_history(job_id, EngravingStatus.PENDING, "Added to engraving queue as part of a batch")
+        
+        if ENGRAVING_DISPATCH == "rq" and job_ids:
+            self._enqueue_batch(job_ids)
+        
+        return {
+            "job_ids": job_ids,
+            "status": EngravingStatus.PENDING.value
+        }
+    
     def get_queue_status(self) -> Dict[str, Any]:
         """
         Get the current status of the engraving queue
@@ -188,9 +220,12 @@ class EngravingQueueManager:
         
         return result
     
-    def update_job_status(self, job_id: int, status: EngravingStatus, message: str = None) -> bool:
+    def update_job_status(self, job_id: int, status: EngravingStatus, message: str = None,
+                          attempts: Optional[int] = None, retry_delay: Optional[float] = None) -> bool:
         """
-        Update the status of a job and add to history
+        Update the status (and optionally the attempt count) of a job and add to history.
+        A job set back to PENDING with a retry_delay is enqueued again in rq mode
+        (the dispatcher picks pending jobs up by itself).
         """
         job = self.db.query(EngravingQueue).filter(EngravingQueue.id == job_id).first()
         if not job:
@@ -198,6 +233,8 @@ class EngravingQueueManager:
             return False
         
         job.status = status
+        if attempts is not None:
+            job.attempts = attempts
         
         # Update timestamps
         if status == EngravingStatus.IN_PROGRESS and not job.started_at:
@@ -210,6 +247,9 @@ class EngravingQueueManager:
         # Add to history
         self._add_history(job_id, status, message)
         
+        if status == EngravingStatus.PENDING and retry_delay is not None and ENGRAVING_DISPATCH == "rq":
+            self._enqueue(job_id, retry_delay)
+        
         return True
     
     def _add_history(self, job_id: int, status: EngravingStatus, message: str = None):
@@ -223,13 +263,63 @@ class EngravingQueueManager:
         )
         self.db.add(history)
         self.db.commit()
-        
-        # Add to queue (works with both RQ and in-memory queue)
-        job = engraving_queue.enqueue(
-            'app.engraving_worker.process_engraving_job' if not TEST_MODE else process_engraving_job,
-            job_id,
-            job_id=f'engrave_{job_id}'
-        )
+    
+    def _enqueue(self, job_id: int, delay: Optional[float] = None):
+        """
+        Hand a job to the RQ workers (works with both RQ and in-memory queue).
+        With a delay (retries), it runs once that many seconds have passed;
+        RQ needs a worker started with --with-scheduler for that.
+        """
+        if TEST_MODE:
+            from .engraving_worker import process_engraving_job
+            func, options = process_engraving_job, {}
+        else:
+            # A retry is enqueued while the original RQ job is still running, so it needs its own id
+            rq_job_id = f'engrave_{job_id}' if delay is None else f'engrave_{job_id}_{uuid4().hex[:8]}'
+            func, options = 'app.engraving_worker.process_engraving_job', {'job_id': rq_job_id}
+        if delay is None:
+            engraving_queue.enqueue(func, job_id, **options)
+        else:
+            engraving_queue.enqueue_in(timedelta(seconds=delay), func, job_id, **options)
+    
+    def _enqueue_batch(self, job_ids: List[int]):
+        """
+        Hand a batch of jobs to one RQ worker (works with both RQ and in-memory queue).
+        Each job is still claimed on its own, so a job enqueued again for a retry
+        is never engraved twice.
+        """
+        if TEST_MODE:
+            from .engraving_worker import process_engraving_batch
+            engraving_queue.enqueue(process_engraving_batch, job_ids)
+        else:
+            engraving_queue.enqueue('app.engraving_worker.process_engraving_batch', job_ids,
+                                    job_id=f'engrave_batch_{job_ids[0]}_{uuid4().hex[:8]}')
+    
+    def claim_job(self, job_id: int, message: str) -> bool:
+        """
+        Atomically take a pending job (False if another dispatcher got it first)
+        """
+        claimed = self.db.query(EngravingQueue).filter(
+            EngravingQueue.id == job_id,
+            EngravingQueue.status == EngravingStatus.PENDING
+        ).update({EngravingQueue.status: EngravingStatus.IN_PROGRESS}, synchronize_session=False)
+        self.db.commit()
+        if claimed:
+            self._add_history(job_id, EngravingStatus.IN_PROGRESS, message)
+        return claimed == 1
+    
+    def release_job(self, job_id: int, message: str) -> bool:
+        """
+        Return a claimed job that has not started to the pending queue
+        """
+        released = self.db.query(EngravingQueue).filter(
+            EngravingQueue.id == job_id,
+            EngravingQueue.status == EngravingStatus.IN_PROGRESS
+        ).update({EngravingQueue.status: EngravingStatus.PENDING}, synchronize_session=False)
+        self.db.commit()
+        if released:
+            self._add_history(job_id, EngravingStatus.PENDING, message)
+        return released == 1
     
     def _get_queue_position(self, job_id: int) -> int:
         """
@@ -263,3 +353,64 @@ class EngravingQueueManager:
             "completed_at": job.completed_at.isoformat() if job.completed_at else None,
             "error_message": job.error_message
         }
+
+
+class EngravingStatusWriter:
+    """
+    Applies job status updates in order on a background thread, so the
+    engraving loop does not wait for database round trips. Same interface
+    as EngravingQueueManager.update_job_status.
+    """
+    
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self.queue = ThreadQueue()
+        self.writes = 0
+        self.errors = 0
+        self._stop_event = Event()
+        self._worker_thread = None
+        self._start_worker()
+    
+    def update_job_status(self, job_id: int, status: EngravingStatus, message: str = None,
+                          attempts: Optional[int] = None, retry_delay: Optional[float] = None) -> bool:
+        self.queue.put((job_id, status, message, attempts, retry_delay))
+        return True
+    
+    def flush(self):
+        """
+        Wait until every queued update has been written
+        """
+        self.queue.join()
+    
+    def stop(self):
+        self.flush()
+        self._stop_event.set()
+        if self._worker_thread:
+            self._worker_thread.join()
+    
+    def _worker(self):
+        db = self.session_factory()
+        manager = EngravingQueueManager(db)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    job_id, status, message, attempts, retry_delay = self.queue.get(timeout=1)
+                except Empty:
+                    continue
+                try:
+                    manager.update_job_status(job_id, status, message, attempts=attempts, retry_delay=retry_delay)
+                    self.writes += 1
+                except Exception as e:
+                    logger.error(f"Status update for job {job_id} failed: {str(e)}")
+                    db.rollback()
+                    self.errors += 1
+                finally:
+                    self.queue.task_done()
+        finally:
+            db.close()
+    
+    def _start_worker(self):
+        if self._worker_thread is None or not self._worker_thread.is_alive():
+            self._stop_event.clear()
+            self._worker_thread = Thread(target=self._worker, name="engraving-status-writer", daemon=True)
+            self._worker_thread.start()
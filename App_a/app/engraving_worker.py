@@ -1,37 +1,80 @@
 import os
 import time
 import requests
-# import serial  # Commented out for now - not needed for QR scanning
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Callable, Optional, Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from rq import get_current_job
 from sqlalchemy.orm import Session
 from .models import EngravingStatus, EngravingQueue, EngravingHistory
 from .database import SessionLocal
-from .engraving_queue import EngravingQueueManager
-import qrcode
-import uuid
+from .engraving_queue import EngravingQueueManager, EngravingStatusWriter
+from .grbl import GrblAlarm, GrblStreamer, validate_gcode
+from .grbl_session import GrblSession, get_session
+from .gcode_optimizer import optimize_gcode
+from .qr_gcode import QR_SCHEME, QR_SIZES_MM, MachineProfile, get_qr_gcode_cache, profile_from_env
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MAX_RETRY_DELAY_SECONDS = 600
+
+class DeviceUnavailable(Exception):
+    """The engraver could not be reached; the job was not started."""
+
+
+class InvalidGcode(ValueError):
+    """The job's G-code can never be engraved on this machine; retrying will not help."""
+
+
 class EngravingWorker:
-    def __init__(self):
-        self.serial_port = os.getenv("SERIAL_PORT", "/dev/ttyACM0")
-        self.baud_rate = int(os.getenv("SERIAL_BAUD", 115200))
+    def __init__(self, serial_port: Optional[str] = None, baud_rate: Optional[int] = None,
+                 machine_profile: Optional[MachineProfile] = None):
+        self.serial_port = serial_port or os.getenv("SERIAL_PORT", "/dev/ttyACM0")
+        self.baud_rate = baud_rate or int(os.getenv("SERIAL_BAUD", 115200))
         self.engrave_interval = int(os.getenv("ENGRAVE_INTERVAL_SECONDS", 5))
+        self.rx_buffer_size = int(os.getenv("GRBL_RX_BUFFER", 128))
+        self.optimize_paths = os.getenv("GCODE_OPTIMIZE", "true").lower() == "true"
+        self.rapid_rate = float(os.getenv("GRBL_RAPID_RATE", 3000))
+        self.acceleration = float(os.getenv("GRBL_ACCELERATION", 500))
+        self.persistent_session = os.getenv("GRBL_PERSISTENT_SESSION", "true").lower() == "true"
+        self.reset_delay = float(os.getenv("GRBL_RESET_DELAY", 2))
+        self.retry_delay = float(os.getenv("ENGRAVE_RETRY_SECONDS", 30))
+        self.machine_profile = machine_profile or profile_from_env()
         self.serial_connection = None
+        self.streamer: Optional[GrblStreamer] = None
+        self.session: Optional[GrblSession] = None
         self.db = SessionLocal()
         self.queue_manager = EngravingQueueManager(self.db)
     
-    def process_job(self, job_id: int) -> Dict[str, Any]:
+    def process_job(self, job_id: int, claim: bool = False) -> Dict[str, Any]:
+        """
+        Engrave one job. With claim=True (RQ workers) the job is first taken from
+        PENDING atomically and skipped if it is no longer pending, e.g. because it
+        was enqueued twice or another worker already runs it.
+        """
         job = self.db.query(EngravingQueue).filter(EngravingQueue.id == job_id).first()
         if not job:
             logger.error(f"Job {job_id} not found")
+            self.db.close()
             return {"status": "error", "message": "Job not found"}
         
+        if claim and not self.queue_manager.claim_job(job_id, "Taken by engraving worker"):
+            logger.info(f"Job {job_id} is no longer pending ({job.status.value}), skipping")
+            self.db.close()
+            return {"status": "skipped", "message": f"Job is {job.status.value}"}
+        
+        try:
+            return self._run_job(job, lambda: self._prepare_gcode(job))
+        finally:
+            self.db.close()
+    
+    def _run_job(self, job: EngravingQueue, load_gcode: Callable[[], List[str]]) -> Dict[str, Any]:
+        """Engrave one job with the G-code from load_gcode, reporting status through self.queue_manager."""
+        job_id = job.id
+        completed = False
         try:
             self.queue_manager.update_job_status(
                 job_id, 
@@ -39,17 +82,17 @@ class EngravingWorker:
                 "Starting engraving process"
             )
             
-            # Assuming the job contains a G-code file URL instead of an SVG
-            gcode_data = self._download_svg(job.svg_url)  # Reusing the download method for G-code
-            if not gcode_data:
-                raise Exception(f"Failed to download G-code from {job.svg_url}")
+            try:
+                gcode_lines = load_gcode()
+            except ValueError as e:
+                raise InvalidGcode(str(e)) from e
 
             self._connect_serial()
             
             # Update GRBL settings for max travel dimensions
             self._update_grbl_settings()
             
-            self._send_gcode_to_arduino(gcode_data)
+            self._send_gcode_to_arduino(gcode_lines)
             self._wait_for_engraving_completion(job_id)
             
             self.queue_manager.update_job_status(
@@ -57,32 +100,70 @@ class EngravingWorker:
                 EngravingStatus.COMPLETED,
                 "Engraving completed successfully"
             )
+            completed = True
             
             return {"status": "success", "message": "Engraving completed"}
             
+        except DeviceUnavailable as e:
+            # Not the job's fault: back to the queue without using up an attempt
+            logger.error(f"Job {job_id} not started: {str(e)}")
+            self.queue_manager.update_job_status(
+                job_id,
+                EngravingStatus.PENDING,
+                f"Engraver unavailable, job returned to the queue: {str(e)}",
+                retry_delay=self._backoff(self._unavailable_count(job_id) + 1)
+            )
+            return {"status": "error", "message": str(e), "device_error": True, "started": False}
+            
         except Exception as e:
             logger.error(f"Error processing job {job_id}: {str(e)}")
-            job.attempts += 1
+            attempts = job.attempts + 1
             
-            if job.attempts >= job.max_attempts:
+            if isinstance(e, InvalidGcode):
+                # Same program, same result: fail now instead of backing off max_attempts times
+                self.queue_manager.update_job_status(
+                    job_id,
+                    EngravingStatus.FAILED,
+                    f"Invalid G-code, not retried: {str(e)}",
+                    attempts=attempts
+                )
+                retry_delay = None
+            elif attempts >= job.max_attempts:
                 self.queue_manager.update_job_status(
                     job_id,
                     EngravingStatus.FAILED,
-                    f"Failed after {job.attempts} attempts: {str(e)}"
+                    f"Failed after {attempts} attempts: {str(e)}",
+                    attempts=attempts
                 )
+                retry_delay = None
             else:
-                job.status = EngravingStatus.PENDING
+                retry_delay = self._backoff(attempts)
                 self.queue_manager.update_job_status(
                     job_id,
                     EngravingStatus.PENDING,
-                    f"Attempt {job.attempts} failed, will retry: {str(e)}"
+                    f"Attempt {attempts} failed, will retry: {str(e)}",
+                    attempts=attempts,
+                    retry_delay=retry_delay
                 )
             
-            return {"status": "error", "message": str(e)}
+            # Alarms, timeouts and serial I/O errors point at the machine rather than the job
+            return {"status": "error", "message": str(e), "device_error": isinstance(e, (GrblAlarm, OSError)),
+                    "started": True, "retry_delay": retry_delay}
         
         finally:
-            self._disconnect_serial()
-            self.db.close()
+            # A failed job may leave motion queued or the controller alarmed: reset it next time
+            self._disconnect_serial(keep_open=completed)
+    
+    def _backoff(self, failures: int) -> float:
+        """Seconds before the next try of a job that failed `failures` times in a row."""
+        return min(self.retry_delay * 2 ** (failures - 1), MAX_RETRY_DELAY_SECONDS)
+    
+    def _unavailable_count(self, job_id: int) -> int:
+        """How often the job was already returned to the queue because the engraver was unreachable."""
+        return self.db.query(EngravingHistory).filter(
+            EngravingHistory.engraving_job_id == job_id,
+            EngravingHistory.message.like("Engraver unavailable%")
+        ).count()
     
     def _download_svg(self, url: str) -> Optional[str]:
         try:
@@ -93,26 +174,59 @@ class EngravingWorker:
             logger.error(f"Error downloading SVG: {str(e)}")
             return None
     
+    def _load_gcode(self, job: EngravingQueue) -> str:
+        """G-code for a job: compiled from the item's QR code for "qr://<size>" jobs, downloaded otherwise."""
+        if job.svg_url.startswith(QR_SCHEME):
+            # Compiled programs are already in scan order, no optimization pass needed
+            return get_qr_gcode_cache().get(job.item_uid, job.svg_url[len(QR_SCHEME):], self.machine_profile)
+        
+        # Assuming the job contains a G-code file URL instead of an SVG
+        gcode_data = self._download_svg(job.svg_url)  # Reusing the download method for G-code
+        if not gcode_data:
+            raise Exception(f"Failed to download G-code from {job.svg_url}")
+        return self._optimize_gcode(gcode_data)
+    
+    def _prepare_gcode(self, job: EngravingQueue) -> List[str]:
+        """Load a job's G-code and check it can be streamed to this machine."""
+        return validate_gcode(self._load_gcode(job), self.rx_buffer_size, self.machine_profile.max_travel)
+    
+    def _optimize_gcode(self, gcode_data: str) -> str:
+        """Reorder the program's marks to cut travel; returns it unchanged if it cannot be optimized."""
+        if not self.optimize_paths:
+            return gcode_data
+        optimized, report = optimize_gcode(gcode_data, self.rapid_rate, self.acceleration)
+        if not report["optimized"]:
+            logger.info(f"G-code sent as is: {report['reason']}")
+            return gcode_data
+        logger.info(
+            f"G-code optimized: travel {report['travel_mm']['before']} -> {report['travel_mm']['after']} mm, "
+            f"{report['lines']['before']} -> {report['lines']['after']} lines, estimated "
+            f"{report['estimated_s']['before']} -> {report['estimated_s']['after']} s"
+        )
+        return optimized
+    
     def _connect_serial(self):
         try:
-            self.serial_connection = serial.Serial(
-                port=self.serial_port,
-                baudrate=self.baud_rate,
-                timeout=10
-            )
-            time.sleep(2)
-            logger.info(f"Connected to {self.serial_port}")
+            # SERIAL_PORT=sim://grbl connects to a simulated controller
+            if self.persistent_session:
+                session = get_session(self.serial_port, self.baud_rate, self.rx_buffer_size)
+            else:
+                session = GrblSession(self.serial_port, self.baud_rate, self.rx_buffer_size,
+                                      reset_delay=self.reset_delay)
+            self.streamer = session.acquire()
+            self.session = session
+            self.serial_connection = session.connection
         except Exception as e:
             logger.error(f"Serial connection error: {str(e)}")
-            raise
+            raise DeviceUnavailable(f"Cannot connect to {self.serial_port}: {str(e)}") from e
     
-    def _disconnect_serial(self):
-        if self.serial_connection and self.serial_connection.is_open:
-            try:
-                self.serial_connection.close()
-                logger.info("Serial connection closed")
-            except Exception as e:
-                logger.error(f"Error closing serial: {str(e)}")
+    def _disconnect_serial(self, keep_open: bool = True):
+        """Release the machine; the port stays open for the next job unless keep_open is False."""
+        if self.session:
+            self.session.release(keep_open=keep_open and self.persistent_session)
+            self.session = None
+        self.streamer = None
+        self.serial_connection = None
     
     def _send_svg_to_arduino(self, svg_data: str):
         if not self.serial_connection or not self.serial_connection.is_open:
@@ -132,21 +246,20 @@ class EngravingWorker:
             logger.error(f"Error sending to Arduino: {str(e)}")
             raise
     
-    def _send_gcode_to_arduino(self, gcode_data: str):
-        """Send G-code commands to the Arduino via GRBL."""
+    def _send_gcode_to_arduino(self, gcode_lines: List[str]):
+        """Stream G-code to the Arduino via GRBL, keeping its RX buffer full."""
         if not self.serial_connection or not self.serial_connection.is_open:
             raise Exception("No serial connection")
 
         try:
             logger.info("Sending G-code to Arduino")
 
-            for line in gcode_data.splitlines():
-                command = line.strip()
-                if command:
-                    response = self._send_command(command)
-                    logger.debug(f"Command: {command}, Response: {response}")
+            result = self.streamer.stream(gcode_lines)
 
-            logger.info("G-code transmission complete")
+            logger.info(
+                f"G-code transmission complete: {result['lines']} lines, {result['bytes']} bytes "
+                f"in {result['elapsed_s']}s ({result['lines_per_s']} lines/s)"
+            )
         except Exception as e:
             logger.error(f"Error sending G-code: {str(e)}")
             raise
@@ -176,17 +289,9 @@ class EngravingWorker:
             raise Exception("No serial connection")
         
         logger.debug(f"Sending: {command}")
-        self.serial_connection.write(f"{command}\n".encode('utf-8'))
-        
-        start_time = time.time()
-        while time.time() - start_time < 10:
-            if self.serial_connection.in_waiting > 0:
-                response = self.serial_connection.readline().decode('utf-8').strip()
-                logger.debug(f"Received: {response}")
-                return response
-            time.sleep(0.1)
-        
-        raise TimeoutError("Arduino response timeout")
+        response = self.streamer.send_line(command, timeout=10)
+        logger.debug(f"Received: {response}")
+        return response
     
     def _wait_for_engraving_completion(self, job_id: int):
         self.queue_manager.update_job_status(
@@ -195,21 +300,16 @@ class EngravingWorker:
             "Engraving in progress"
         )
         
+        if not self.serial_connection or not self.serial_connection.is_open:
+            raise Exception("Serial connection lost")
+        
         start_time = time.time()
         last_update = start_time
         
-        while True:
-            if not self.serial_connection or not self.serial_connection.is_open:
+        def report_progress(status: Dict[str, str]):
+            nonlocal last_update
+            if not self.serial_connection.is_open:
                 raise Exception("Serial connection lost")
-            
-            if self.serial_connection.in_waiting > 0:
-                response = self.serial_connection.readline().decode('utf-8').strip()
-                if response == "DONE":
-                    logger.info("Engraving complete")
-                    return
-                elif response.startswith("ERROR:"):
-                    raise Exception(f"Arduino error: {response[6:]}")
-            
             if time.time() - last_update >= 5:
                 elapsed = int(time.time() - start_time)
                 self.queue_manager.update_job_status(
@@ -218,77 +318,150 @@ class EngravingWorker:
                     f"Engraving in progress ({elapsed}s)"
                 )
                 last_update = time.time()
-            
-            time.sleep(0.1)
-            
-            if time.time() - start_time > 3600:
-                raise TimeoutError("Engraving timeout (1 hour)")
+        
+        # GRBL has acknowledged every line once streaming returns; wait for the motion to finish
+        self.streamer.wait_until_idle(timeout=3600, on_poll=report_progress)
+        logger.info("Engraving complete")
     
     def _update_grbl_settings(self):
-        """Update GRBL settings for max travel dimensions to 250x250mm."""
+        """Set GRBL laser mode and max travel to the machine's work area, writing only values the controller lacks."""
         if not self.serial_connection or not self.serial_connection.is_open:
             raise Exception("No serial connection")
 
         try:
             settings = {
-                "$130": 250.0,  # X max travel
-                "$131": 250.0,  # Y max travel
+                # Laser mode: G0 and S0 moves keep the laser dark. Compiled QR programs leave it
+                # on through those moves, and the optimizer assumes G0 travel does not burn
+                "$32": 1.0,
+                "$130": float(self.machine_profile.max_travel[0]),  # X max travel
+                "$131": float(self.machine_profile.max_travel[1]),  # Y max travel
                 "$132": 250.0   # Z max travel
             }
 
-            for key, value in settings.items():
-                command = f"{key}={value}"
-                response = self._send_command(command)
-                logger.info(f"Updated {key} to {value}, Response: {response}")
+            for key, value in self.session.apply_settings(settings).items():
+                logger.info(f"Updated {key} to {value}")
 
         except Exception as e:
             logger.error(f"Error updating GRBL settings: {str(e)}")
             raise
 
-    def process_batch(self, batch_id: int, delay: int):
-        """Process a batch of engraving jobs with a delay between each job."""
-        jobs = self.db.query(EngravingQueue).filter(EngravingQueue.batch_id == batch_id).all()
-        if not jobs:
-            logger.error(f"No jobs found for batch {batch_id}")
-            return {"status": "error", "message": "No jobs found for batch"}
+    def process_batch(self, job_ids: List[int], delay: float = 0) -> Dict[str, Any]:
+        """Process a batch of engraving jobs back to back (see process_jobs)."""
+        if not job_ids:
+            logger.error("No jobs in batch")
+            self.db.close()
+            return {"status": "error", "message": "No jobs in batch"}
 
         try:
-            for job in jobs:
-                logger.info(f"Processing job {job.id} in batch {batch_id}")
-                self.process_job(job.id)
-                logger.info(f"Completed job {job.id}, waiting for {delay} seconds before next job")
-                time.sleep(delay)
-
-            return {"status": "success", "message": "Batch processing completed"}
+            logger.info(f"Processing batch of {len(job_ids)} jobs")
+            return self.process_jobs(job_ids, delay)
         except Exception as e:
-            logger.error(f"Error processing batch {batch_id}: {str(e)}")
+            logger.error(f"Error processing batch {job_ids}: {str(e)}")
             return {"status": "error", "message": str(e)}
+        finally:
+            self.db.close()
+
+    def process_jobs(self, job_ids: List[int], delay: float = 0) -> Dict[str, Any]:
+        """Engrave jobs in order, preparing each job's G-code while the previous one engraves.
+
+        Downloading or compiling, optimizing and validating job N+1 runs on
+        a prefetch thread during job N, and status/history writes go through
+        a background writer, so between jobs the machine only waits for the
+        serial session check. Each job is claimed from PENDING right before
+        it runs, like process_job(claim=True), and skipped if it is no longer
+        pending. `delay` adds an optional pause between jobs (e.g. to swap
+        parts). The batch stops at the first device error.
+        """
+        results = []
+        started = time.monotonic()
+        queue_manager = self.queue_manager
+        self.queue_manager = EngravingStatusWriter(SessionLocal)
+        try:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="gcode-prefetch") as prefetcher:
+                upcoming = prefetcher.submit(self._prefetch_job, job_ids[0]) if job_ids else None
+                for index, job_id in enumerate(job_ids):
+                    job, gcode_lines, error = upcoming.result()
+                    if index + 1 < len(job_ids):
+                        upcoming = prefetcher.submit(self._prefetch_job, job_ids[index + 1])
+                    if job is None:
+                        logger.error(f"Job {job_id} not found")
+                        results.append({"job_id": job_id, "status": "error", "message": "Job not found"})
+                        continue
+                    if not queue_manager.claim_job(job_id, "Taken by engraving worker"):
+                        # Already done, or being engraved by the dispatcher or an RQ worker
+                        logger.info(f"Job {job_id} is no longer pending, skipping")
+                        results.append({"job_id": job_id, "status": "skipped", "message": "Job is no longer pending"})
+                        continue
+
+                    def load_gcode(lines=gcode_lines, error=error):
+                        if error is not None:
+                            raise error
+                        return lines
+
+                    logger.info(f"Processing job {job_id} ({index + 1}/{len(job_ids)})")
+                    result = self._run_job(job, load_gcode)
+                    results.append({"job_id": job_id, **result})
+                    if result.get("device_error"):
+                        logger.error(f"Stopping after job {job_id}, engraver unavailable: {result['message']}")
+                        break
+                    if delay and index + 1 < len(job_ids):
+                        time.sleep(delay)
+        finally:
+            self.queue_manager.stop()
+            self.queue_manager = queue_manager
+
+        engraved = sum(1 for result in results if result["status"] == "success")
+        skipped = sum(1 for result in results if result["status"] == "skipped")
+        elapsed = time.monotonic() - started
+        logger.info(f"Engraved {engraved}/{len(job_ids)} jobs ({skipped} skipped) in {elapsed:.1f}s")
+        return {
+            "status": "success" if engraved + skipped == len(job_ids) else "error",
+            "message": f"Engraved {engraved} of {len(job_ids)} jobs, {skipped} skipped",
+            "elapsed_s": round(elapsed, 1),
+            "results": results
+        }
+
+    def _prefetch_job(self, job_id: int) -> Tuple[Optional[EngravingQueue], Optional[List[str]], Optional[Exception]]:
+        """Load a job and its prepared G-code on the prefetch thread (own session, detached job)."""
+        db = SessionLocal()
+        try:
+            job = db.query(EngravingQueue).filter(EngravingQueue.id == job_id).first()
+            if job is None:
+                return None, None, None
+            db.expunge(job)
+        finally:
+            db.close()
+        try:
+            return job, self._prepare_gcode(job), None
+        except Exception as e:
+            # Reported when the job's turn comes, through the normal failure path
+            return job, None, e
 
     def stop_engraving(self):
         """Stop the engraving process immediately."""
         if self.serial_connection and self.serial_connection.is_open:
             try:
-                self._send_command("!\n")  # GRBL feed hold command
+                self.streamer.realtime(b"!")  # GRBL feed hold (realtime, no newline)
                 logger.info("Engraving process stopped")
             except Exception as e:
                 logger.error(f"Error stopping engraving: {str(e)}")
         else:
             logger.warning("No active serial connection to stop engraving")
 
-    def fetch_qr_codes(self, batch_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Fetch QR codes from the database, optionally filtered by batch ID."""
+    def fetch_qr_codes(self, job_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """Fetch engraving jobs from the database, optionally only the given job IDs."""
         try:
-            if batch_id:
-                qr_codes = self.db.query(EngravingQueue).filter(EngravingQueue.batch_id == batch_id).all()
-            else:
-                qr_codes = self.db.query(EngravingQueue).all()
+            query = self.db.query(EngravingQueue)
+            if job_ids:
+                query = query.filter(EngravingQueue.id.in_(job_ids))
+            qr_codes = query.order_by(EngravingQueue.id).all()
 
             return [
                 {
                     "id": qr.id,
-                    "qr_code": qr.qr_code,
-                    "status": qr.status,
-                    "batch_id": qr.batch_id
+                    "item_uid": qr.item_uid,
+                    "status": qr.status.value,
+                    "svg_url": qr.svg_url
                 }
                 for qr in qr_codes
             ]
@@ -296,39 +469,28 @@ class EngravingWorker:
             logger.error(f"Error fetching QR codes: {str(e)}")
             return []
 
-    def generate_qr_code(self, data: str, batch_id: Optional[int] = None) -> Dict[str, Any]:
-        """Generate a QR code based on user input and store it in the database."""
+    def generate_qr_code(self, item_uid: str, qr_size: str = "250x250") -> Dict[str, Any]:
+        """Queue a job that engraves an item's QR code, compiled to G-code from its UID."""
+        if qr_size not in QR_SIZES_MM:
+            return {"status": "error", "message": f"Unknown QR size {qr_size}"}
         try:
-            # Generate QR code image
-            qr = qrcode.QRCode(box_size=10, border=4, error_correction=qrcode.constants.ERROR_CORRECT_M)
-            qr.add_data(data)
-            qr.make(fit=True)
-            img = qr.make_image(fill_color="black", back_color="white")
-
-            # Save QR code image to a temporary location
-            temp_path = f"/tmp/{uuid.uuid4().hex}.png"
-            img.save(temp_path)
-
-            # Store QR code in the database
-            qr_entry = EngravingQueue(
-                qr_code=data,
-                batch_id=batch_id,
-                status="ready",
-                image_path=temp_path
-            )
-            self.db.add(qr_entry)
-            self.db.commit()
-
+            job = self.queue_manager.add_to_queue(item_uid, f"{QR_SCHEME}{qr_size}")
             return {
                 "status": "success",
-                "message": "QR code generated and stored successfully",
-                "qr_code": data,
-                "batch_id": batch_id
+                "message": "QR code queued for engraving",
+                "job_id": job["job_id"],
+                "item_uid": item_uid
             }
         except Exception as e:
             logger.error(f"Error generating QR code: {str(e)}")
+            self.db.rollback()
             return {"status": "error", "message": str(e)}
 
 def process_engraving_job(job_id: int) -> Dict[str, Any]:
     worker = EngravingWorker()
-    return worker.process_job(job_id)
+    return worker.process_job(job_id, claim=True)
+
+
+def process_engraving_batch(job_ids: List[int]) -> Dict[str, Any]:
+    worker = EngravingWorker()
+    return worker.process_batch(job_ids)
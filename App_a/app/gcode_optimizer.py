@@ -0,0 +1,575 @@
+import argparse
+import logging
+import math
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .grbl import clean_gcode_line
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))")
+# Modal G-codes that do not move the machine and may appear anywhere in a program
+SETUP_GCODES = {17, 21, 40, 49, 54, 80, 90, 94}
+EPSILON = 1e-4  # mm; programs are written with 3 decimals
+
+DEFAULT_RAPID_RATE = 3000.0   # mm/min, GRBL $110/$111
+DEFAULT_ACCELERATION = 500.0  # mm/s^2, GRBL $120/$121
+
+Point = Tuple[float, float]
+
+
+class UnsupportedGcode(Exception):
+    """The program uses G-code that cannot be reordered safely (arcs, Z, relative moves, ...)."""
+
+
+class Move:
+    """One linear move and the laser state it runs under."""
+
+    __slots__ = ("rapid", "start", "end", "feed", "mode", "power")
+
+    def __init__(self, rapid: bool, start: Optional[Point], end: Point, feed: Optional[float],
+                 mode: Optional[str], power: float):
+        self.rapid = rapid
+        self.start = start
+        self.end = end
+        self.feed = feed
+        self.mode = mode    # "M3", "M4" or None when the laser is off
+        self.power = power  # S value
+
+    @property
+    def length(self) -> float:
+        return _distance(self.start, self.end) if self.start is not None else 0.0
+
+    @property
+    def burns(self) -> bool:
+        return not self.rapid and self.mode is not None and self.power > 0 and self.length > EPSILON
+
+    def reversed(self) -> "Move":
+        return Move(self.rapid, self.end, self.start, self.feed, self.mode, self.power)
+
+
+class Program:
+    """Parsed G-code: setup lines before the first move, then moves and laser changes in order."""
+
+    def __init__(self):
+        self.header: List[str] = []
+        self.ops: List[Tuple] = []  # ("move", Move) | ("spindle", mode, power) | ("end", line)
+        self.state = (None, None, 0.0)  # (feed, mode, power) after the header
+        self.laser_on_rapids = 0
+
+    @property
+    def moves(self) -> List[Move]:
+        return [op[1] for op in self.ops if op[0] == "move"]
+
+
+def parse_gcode(gcode: str) -> Program:
+    """Parse absolute-coordinate XY laser G-code (G0/G1, F, S, M3/M4/M5).
+
+    Raises:
+        UnsupportedGcode: For anything that cannot be reordered without changing the result
+    """
+    program = Program()
+    position: Optional[Point] = None
+    motion = None
+    feed: Optional[float] = None
+    mode: Optional[str] = None
+    power = 0.0
+
+    for number, raw in enumerate(gcode.splitlines(), start=1):
+        line = clean_gcode_line(raw).upper()
+        if not line:
+            continue
+        moved = position is not None
+        if line[0] in "$%":
+            if moved:
+                raise UnsupportedGcode(f"Line {number}: '{line}' after the first move")
+            program.header.append(line)
+            continue
+        if WORD_RE.sub("", line).strip():
+            raise UnsupportedGcode(f"Line {number}: cannot parse '{line}'")
+
+        target = {}
+        spindle_change = end = False
+        for letter, value in WORD_RE.findall(line):
+            number_value = float(value)
+            if letter in "GM" and number_value != int(number_value):
+                raise UnsupportedGcode(f"Line {number}: {letter}{value} is not supported")
+            if letter == "G":
+                code = int(number_value)
+                if code in (0, 1):
+                    motion = code
+                elif code not in SETUP_GCODES:
+                    raise UnsupportedGcode(f"Line {number}: G{code} is not supported")
+            elif letter == "M":
+                code = int(number_value)
+                if code in (3, 4, 5):
+                    mode = f"M{code}" if code != 5 else None
+                    spindle_change = True
+                elif code in (2, 30):
+                    end = True
+                elif moved:
+                    raise UnsupportedGcode(f"Line {number}: M{code} after the first move")
+            elif letter in "XY":
+                target[letter] = number_value
+            elif letter == "F":
+                feed = number_value
+            elif letter == "S":
+                power = number_value
+                spindle_change = True
+            elif letter != "N":
+                raise UnsupportedGcode(f"Line {number}: {letter} words are not supported")
+
+        if not target:
+            if not moved:
+                program.header.append(line)
+                program.state = (feed, mode, power)
+            elif spindle_change:
+                program.ops.append(("spindle", mode, power))
+            if end and moved:
+                program.ops.append(("end", line))
+            continue
+
+        if motion is None:
+            raise UnsupportedGcode(f"Line {number}: coordinates without G0/G1")
+        if motion == 1 and feed is None:
+            raise UnsupportedGcode(f"Line {number}: G1 without a feed rate")
+        if not moved:
+            if len(target) < 2:
+                raise UnsupportedGcode(f"Line {number}: first move must give both X and Y")
+            if motion == 1 and mode is not None and power > 0:
+                raise UnsupportedGcode(f"Line {number}: program starts cutting from an unknown position")
+        end_point = (target.get("X", position[0] if moved else 0.0),
+                     target.get("Y", position[1] if moved else 0.0))
+        move = Move(motion == 0, position, end_point, feed, mode, power)
+        if move.rapid and mode is not None and power > 0 and move.length > EPSILON:
+            program.laser_on_rapids += 1
+        if spindle_change:
+            program.ops.append(("spindle", mode, power))
+        program.ops.append(("move", move))
+        position = end_point
+        if end:
+            program.ops.append(("end", line))
+
+    return program
+
+
+def estimate_seconds(moves: Sequence[Move], rapid_rate: float = DEFAULT_RAPID_RATE,
+                     acceleration: float = DEFAULT_ACCELERATION) -> float:
+    """Machine time for a list of moves.
+
+    Collinear moves at the same rate run as one move; every change of
+    direction or rate is treated as a stop (trapezoidal profile from rest to
+    rest). GRBL's planner cornering makes the real machine somewhat faster.
+    """
+    total = 0.0
+    run_length = 0.0
+    run_rate = None
+    previous: Optional[Move] = None
+    for move in moves:
+        length = move.length
+        if length <= EPSILON:
+            continue
+        rate = rapid_rate if move.rapid else min(move.feed, rapid_rate)
+        if previous is not None and rate == run_rate and _continues(previous, move):
+            run_length += length
+        else:
+            total += move_seconds(run_length, run_rate, acceleration)
+            run_length, run_rate = length, rate
+        previous = move
+    return total + move_seconds(run_length, run_rate, acceleration)
+
+
+def burned_geometry(program: Program) -> Dict[Tuple, List[Tuple[float, float]]]:
+    """Burned segments in a canonical form: per line and laser setting, sorted intervals
+    with touching intervals joined. Order, direction and splitting do not matter."""
+    lines: Dict[Tuple, List[Tuple[float, float]]] = {}
+    for move in program.moves:
+        if not move.burns:
+            continue
+        (x0, y0), (x1, y1) = move.start, move.end
+        length = move.length
+        ux, uy = (x1 - x0) / length, (y1 - y0) / length
+        if ux < -1e-9 or (abs(ux) <= 1e-9 and uy < 0):
+            ux, uy = -ux, -uy
+        offset = ux * y0 - uy * x0
+        key = (round(ux, 4) + 0.0, round(uy, 4) + 0.0, round(offset, 3) + 0.0, move.feed, move.mode, move.power)
+        t0, t1 = sorted((ux * x0 + uy * y0, ux * x1 + uy * y1))
+        lines.setdefault(key, []).append((t0, t1))
+
+    for key, intervals in lines.items():
+        intervals.sort()
+        joined = [list(intervals[0])]
+        for t0, t1 in intervals[1:]:
+            if abs(t0 - joined[-1][1]) <= EPSILON:
+                joined[-1][1] = t1
+            else:
+                joined.append([t0, t1])
+        lines[key] = [(round(t0, 3), round(t1, 3)) for t0, t1 in joined]
+    return lines
+
+
+def optimize_gcode(gcode: str, rapid_rate: float = DEFAULT_RAPID_RATE,
+                   acceleration: float = DEFAULT_ACCELERATION, two_opt_window: int = 40,
+                   time_budget: float = 5.0) -> Tuple[str, Dict]:
+    """Reorder the marks of a laser program to cut travel, and drop redundant words.
+
+    Each mark (a connected run of burning moves) is kept as it is, or run
+    backwards; marks are ordered nearest-neighbour first and the order is then
+    improved with 2-opt. Collinear and touching runs with the same laser
+    setting are merged, and F/S/M3/M4/M5 are only written when they change.
+    The burned geometry of the result is checked against the input; the input
+    is returned unchanged when it cannot be optimized safely.
+
+    Args:
+        gcode: Program text
+        rapid_rate: G0 speed in mm/min, for the time estimate
+        acceleration: mm/s^2, for the time estimate
+        two_opt_window: How many marks ahead 2-opt looks for a better order
+        time_budget: Seconds allowed for 2-opt
+
+    Returns:
+        (G-code, report with travel, line counts and estimated time before and after)
+    """
+    started = time.monotonic()
+    report = {"optimized": False, "reason": None}
+    try:
+        program = parse_gcode(gcode)
+    except UnsupportedGcode as e:
+        report["reason"] = str(e)
+        return gcode, report
+
+    before = _summarize(program, gcode, rapid_rate, acceleration)
+    report.update({key: {"before": value, "after": value} for key, value in before.items()})
+    lead_in, marks, tail = _split_marks(program)
+    report["marks"] = len(marks)
+    if not marks:
+        report["reason"] = "Nothing to engrave"
+        return gcode, report
+
+    start = lead_in.end if lead_in else (0.0, 0.0)
+    tail_moves = [op[1] for op in tail if op[0] == "move"]
+    finish = tail_moves[0].end if tail_moves else None
+    route = _nearest_neighbour_route(marks, start)
+    route = _two_opt(route, marks, start, finish, two_opt_window, started + time_budget)
+    optimized = _emit(program, lead_in, [_oriented(marks[index], flipped) for index, flipped in route], tail)
+
+    try:
+        result = parse_gcode(optimized)
+    except UnsupportedGcode as e:
+        result = None
+        logger.error(f"Optimized G-code failed to parse, keeping the original: {str(e)}")
+    if result is None or burned_geometry(result) != burned_geometry(program):
+        if result is not None:
+            logger.error("Optimized G-code burns different geometry, keeping the original")
+        report["reason"] = "Verification failed"
+        return gcode, report
+
+    after = _summarize(result, optimized, rapid_rate, acceleration)
+    if after["estimated_s"] > before["estimated_s"]:
+        report["reason"] = "No improvement"
+        return gcode, report
+
+    report.update({key: {"before": before[key], "after": after[key]} for key in before})
+    report["optimized"] = True
+    report["saved_s"] = round(before["estimated_s"] - after["estimated_s"], 1)
+    report["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return optimized, report
+
+
+def _summarize(program: Program, gcode: str, rapid_rate: float, acceleration: float) -> Dict:
+    moves = program.moves
+    return {
+        "lines": sum(1 for line in gcode.splitlines() if clean_gcode_line(line)),
+        "travel_mm": round(sum(move.length for move in moves if not move.burns), 1),
+        "cut_mm": round(sum(move.length for move in moves if move.burns), 1),
+        "estimated_s": round(estimate_seconds(moves, rapid_rate, acceleration), 1)
+    }
+
+
+def _split_marks(program: Program) -> Tuple[Optional[Move], List[List[Move]], List[Tuple]]:
+    """The first travel move, the marks (connected runs of burning moves) and the ops after the last mark."""
+    lead_in = None
+    marks: List[List[Move]] = []
+    last_burn = max((i for i, op in enumerate(program.ops) if op[0] == "move" and op[1].burns), default=-1)
+    connected = False
+    for op in program.ops[:last_burn + 1]:
+        if op[0] != "move":
+            continue
+        move = op[1]
+        if move.burns:
+            if connected and _distance(marks[-1][-1].end, move.start) <= EPSILON:
+                marks[-1].append(move)
+            else:
+                marks.append([move])
+            connected = True
+        else:
+            if lead_in is None and not marks:
+                lead_in = move
+            connected = connected and move.length <= EPSILON
+    return lead_in, marks, program.ops[last_burn + 1:]
+
+
+def _oriented(mark: List[Move], flipped: bool) -> List[Move]:
+    return [move.reversed() for move in reversed(mark)] if flipped else mark
+
+
+def _nearest_neighbour_route(marks: List[List[Move]], start: Point) -> List[Tuple[int, bool]]:
+    """Greedy tour: from the current position, go to the closest free end of any mark."""
+    grid = _EndpointGrid([(mark[0].start, mark[-1].end) for mark in marks])
+    route = []
+    position = start
+    for _ in marks:
+        index, flipped = grid.pop_nearest(position)
+        route.append((index, flipped))
+        position = marks[index][0].start if flipped else marks[index][-1].end
+    return route
+
+
+def _two_opt(route: List[Tuple[int, bool]], marks: List[List[Move]], start: Point, finish: Optional[Point],
+             window: int, deadline: float) -> List[Tuple[int, bool]]:
+    """Reverse stretches of the route (running each mark backwards) while that shortens travel."""
+    def entry(step):
+        index, flipped = step
+        return marks[index][-1].end if flipped else marks[index][0].start
+
+    def exit_(step):
+        index, flipped = step
+        return marks[index][0].start if flipped else marks[index][-1].end
+
+    count = len(route)
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for i in range(-1, count - 1):
+            a = start if i < 0 else exit_(route[i])
+            for j in range(i + 1, min(count, i + 1 + window)):
+                b = entry(route[i + 1])
+                c = exit_(route[j])
+                d = entry(route[j + 1]) if j + 1 < count else finish
+                current = _distance(a, b) + (_distance(c, d) if d is not None else 0.0)
+                swapped = _distance(a, c) + (_distance(b, d) if d is not None else 0.0)
+                if swapped < current - 1e-9:
+                    route[i + 1:j + 1] = [(index, not flipped) for index, flipped in reversed(route[i + 1:j + 1])]
+                    improved = True
+            if time.monotonic() >= deadline:
+                logger.info("2-opt stopped at its time budget")
+                break
+    return route
+
+
+class _EndpointGrid:
+    """Uniform grid over mark endpoints for nearest-neighbour lookups."""
+
+    def __init__(self, endpoints: List[Tuple[Point, Point]]):
+        xs = [p[0] for pair in endpoints for p in pair]
+        ys = [p[1] for pair in endpoints for p in pair]
+        self.origin = (min(xs), min(ys))
+        span = max(max(xs) - self.origin[0], max(ys) - self.origin[1], EPSILON)
+        self.size = max(1, int(math.sqrt(len(endpoints))))
+        self.cell = span / self.size
+        self.endpoints = endpoints
+        self.used = [False] * len(endpoints)
+        self.cells: Dict[Tuple[int, int], List[Tuple[int, bool]]] = {}
+        for index, (first, last) in enumerate(endpoints):
+            self.cells.setdefault(self._cell_of(first), []).append((index, False))
+            self.cells.setdefault(self._cell_of(last), []).append((index, True))
+
+    def _cell_of(self, point: Point) -> Tuple[int, int]:
+        return (int(math.floor((point[0] - self.origin[0]) / self.cell)),
+                int(math.floor((point[1] - self.origin[1]) / self.cell)))
+
+    def pop_nearest(self, point: Point) -> Tuple[int, bool]:
+        """Closest unused endpoint as (mark index, whether the mark runs backwards); marks it used."""
+        cx, cy = self._cell_of(point)
+        reach = max(abs(cx), abs(cy), abs(cx - self.size), abs(cy - self.size)) + 1
+        best = None
+        best_distance = math.inf
+        for ring in range(reach + 1):
+            for cell in self._ring(cx, cy, ring):
+                entries = self.cells.get(cell)
+                if not entries:
+                    continue
+                if any(self.used[index] for index, _ in entries):
+                    entries[:] = [entry for entry in entries if not self.used[entry[0]]]
+                for index, flipped in entries:
+                    distance = _distance(point, self.endpoints[index][1 if flipped else 0])
+                    if distance < best_distance or (distance == best_distance and (index, flipped) < best):
+                        best, best_distance = (index, flipped), distance
+            # Cells beyond this ring are at least `ring` cells away
+            if best is not None and best_distance <= ring * self.cell:
+                break
+        self.used[best[0]] = True
+        return best
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+
+class _Emitter:
+    """Writes moves back as G-code, leaving out words that repeat the current modal state."""
+
+    def __init__(self, state: Tuple[Optional[float], Optional[str], float]):
+        self.lines: List[str] = []
+        self.feed, self.mode, self.power = state
+        self.position: Optional[Point] = None
+        self._pending: Optional[Move] = None
+
+    def spindle(self, mode: Optional[str], power: float):
+        self._flush()
+        if mode is None:
+            if self.mode is not None:
+                self.lines.append("M5")
+                self.mode = None
+        elif mode != self.mode:
+            self.lines.append(f"{mode} S{format_number(power)}")
+            self.mode, self.power = mode, power
+
+    def travel(self, move: Move):
+        self._flush()
+        if self.position is not None and _distance(self.position, move.end) <= EPSILON:
+            return
+        if move.rapid:
+            self.lines.append(f"G0 X{format_number(move.end[0])} Y{format_number(move.end[1])}")
+        else:
+            words = f"G1 X{format_number(move.end[0])} Y{format_number(move.end[1])}{self._feed_word(move.feed)}"
+            self.lines.append(words + self._power_word(move.power))
+        self.position = move.end
+
+    def cut(self, move: Move):
+        if move.mode != self.mode:
+            self.spindle(move.mode, move.power)
+        pending = self._pending
+        if pending is not None and (pending.feed, pending.power) == (move.feed, move.power) \
+                and _continues(pending, move):
+            self._pending = Move(False, pending.start, move.end, move.feed, move.mode, move.power)
+        else:
+            self._flush()
+            self._pending = move
+        self.position = move.end
+
+    def raw(self, line: str):
+        self._flush()
+        self.lines.append(line)
+
+    def _flush(self):
+        move = self._pending
+        if move is None:
+            return
+        self._pending = None
+        words = f"G1 X{format_number(move.end[0])} Y{format_number(move.end[1])}{self._feed_word(move.feed)}"
+        self.lines.append(words + self._power_word(move.power))
+
+    def _feed_word(self, feed: float) -> str:
+        if feed == self.feed:
+            return ""
+        self.feed = feed
+        return f" F{format_number(feed)}"
+
+    def _power_word(self, power: float) -> str:
+        if power == self.power:
+            return ""
+        self.power = power
+        return f" S{format_number(power)}"
+
+    def text(self) -> str:
+        self._flush()
+        return "\n".join(self.lines) + "\n"
+
+
+def _emit(program: Program, lead_in: Optional[Move], marks: List[List[Move]], tail: List[Tuple]) -> str:
+    # Programs that switch the laser off for every travel keep doing so; programs that
+    # rely on GRBL laser mode ($32=1) to keep G0 dark keep the laser on between marks.
+    laser_off_for_travel = program.laser_on_rapids == 0
+    emitter = _Emitter(program.state)
+    emitter.lines.extend(program.header)
+    if lead_in is not None:
+        emitter.travel(lead_in)
+
+    for mark in marks:
+        first = mark[0]
+        if emitter.position is None or _distance(emitter.position, first.start) > EPSILON:
+            if laser_off_for_travel:
+                emitter.spindle(None, emitter.power)
+            emitter.travel(Move(True, emitter.position, first.start, None, None, 0.0))
+        for move in mark:
+            emitter.cut(move)
+
+    for op in tail:
+        if op[0] == "move":
+            if op[1].mode != emitter.mode:
+                emitter.spindle(op[1].mode, op[1].power)
+            emitter.travel(op[1])
+        elif op[0] == "spindle":
+            emitter.spindle(op[1], op[2])
+        else:
+            emitter.raw(op[1])
+    return emitter.text()
+
+
+def _continues(previous: Move, move: Move) -> bool:
+    """Whether `move` carries on in a straight line from where `previous` ended."""
+    if previous.start is None or move.start is None or _distance(previous.end, move.start) > EPSILON:
+        return False
+    ax, ay = previous.end[0] - previous.start[0], previous.end[1] - previous.start[1]
+    bx, by = move.end[0] - move.start[0], move.end[1] - move.start[1]
+    if ax * bx + ay * by <= 0:
+        return False
+    return abs(ax * by - ay * bx) / math.hypot(ax + bx, ay + by) <= EPSILON
+
+
+def move_seconds(length: float, rate: Optional[float], acceleration: float) -> float:
+    if not length or not rate:
+        return 0.0
+    speed = rate / 60.0
+    if length >= speed * speed / acceleration:
+        return length / speed + speed / acceleration
+    return 2 * math.sqrt(length / acceleration)
+
+
+def _distance(a: Point, b: Point) -> float:
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def format_number(value: float) -> str:
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reorder laser G-code to minimise travel")
+    parser.add_argument("input", nargs="?", help="G-code file (default: a sample QR raster)")
+    parser.add_argument("-o", "--output", help="Write the optimized program here")
+    parser.add_argument("--rapid-rate", type=float, default=DEFAULT_RAPID_RATE, help="G0 speed in mm/min")
+    parser.add_argument("--acceleration", type=float, default=DEFAULT_ACCELERATION, help="Acceleration in mm/s^2")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            gcode = f.read()
+    else:
+        from .grbl_sim import sample_raster
+        gcode = "\n".join(sample_raster())
+
+    optimized, report = optimize_gcode(gcode, args.rapid_rate, args.acceleration)
+    for key, value in report.items():
+        logger.info(f"{key:12s} {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(optimized)
+
+
+if __name__ == "__main__":
+    main()
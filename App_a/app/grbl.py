@@ -0,0 +1,366 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GRBL_RX_BUFFER_SIZE = 128
+GRBL_LINE_BUFFER_SIZE = 80  # firmware line buffer: at most 79 characters per line, else error:11
+COMMENT_RE = re.compile(r"\(.*?\)|;.*$")
+STATUS_RE = re.compile(r"<(?P<state>[A-Za-z]+)(?::\d+)?(?P<fields>(?:\|[^>]*)?)>")
+SETTING_RE = re.compile(r"^(?P<key>\$\d+)=(?P<value>[-+]?\d*\.?\d+)")
+DISTANCE_MODE_RE = re.compile(r"G0*(9[01])(?![.\d])")
+OFFSET_RE = re.compile(r"G0*92(?!\d)")
+AXIS_RE = re.compile(r"([XY])\s*([-+]?\d*\.?\d+)")
+
+
+class GrblError(Exception):
+    """A line the controller rejected with ``error:N``."""
+
+    def __init__(self, code: int, line: str, line_number: Optional[int] = None):
+        super().__init__(f"GRBL error:{code} on line {line_number}: {line}")
+        self.code = code
+        self.line = line
+        self.line_number = line_number
+
+
+class GrblAlarm(Exception):
+    """The controller entered an alarm state (``ALARM:N``); motion has stopped."""
+
+    def __init__(self, code: int):
+        super().__init__(f"GRBL alarm {code}")
+        self.code = code
+
+
+def open_serial(port: str, baud_rate: int, timeout: float = 1.0):
+    """Open a serial port, or a simulated controller for ``sim://`` ports."""
+    if port.startswith("sim://"):
+        from .grbl_sim import open_simulated
+        return open_simulated(port, baud_rate, timeout)
+    import serial  # pyserial, only needed on machines with an engraver attached
+    return serial.Serial(port=port, baudrate=baud_rate, timeout=timeout)
+
+
+def clean_gcode_line(line: str) -> str:
+    """Strip comments and surrounding whitespace; GRBL counts every byte sent."""
+    return COMMENT_RE.sub("", line).strip()
+
+
+def validate_gcode(gcode: str, rx_buffer_size: int = GRBL_RX_BUFFER_SIZE,
+                   max_travel: Optional[Tuple[float, float]] = None,
+                   line_buffer_size: int = GRBL_LINE_BUFFER_SIZE) -> List[str]:
+    """Clean a program for streaming, rejecting what would otherwise fail partway through a job.
+
+    Args:
+        gcode: G-code program
+        rx_buffer_size: Controller RX buffer; longer lines can never be sent
+        max_travel: X/Y work area; absolute moves outside it are rejected (skipped after G92 offsets)
+        line_buffer_size: Firmware line buffer; longer lines are rejected with error:11
+
+    Returns:
+        The non-empty lines, comments stripped
+
+    Raises:
+        ValueError: Empty program, a line too long for the controller, or a move outside the work area
+    """
+    max_chars = min(line_buffer_size - 1, rx_buffer_size - 1)
+    lines = []
+    absolute = True
+    for number, raw in enumerate(gcode.splitlines(), 1):
+        line = clean_gcode_line(raw)
+        if not line:
+            continue
+        if len(line.replace(" ", "")) > max_chars:  # GRBL drops spaces before buffering
+            raise ValueError(f"Line {number} is longer than the controller's {max_chars} characters: {line}")
+        lines.append(line)
+        if max_travel is None or line.startswith("$"):
+            continue
+        upper = line.upper()
+        if OFFSET_RE.search(upper):
+            max_travel = None  # coordinates are no longer machine positions
+            continue
+        for mode in DISTANCE_MODE_RE.findall(upper):
+            absolute = mode == "90"
+        if not absolute:
+            continue
+        for axis, value in AXIS_RE.findall(upper):
+            limit = max_travel["XY".index(axis)]
+            if abs(float(value)) > limit:
+                raise ValueError(f"Line {number} moves {axis} to {value}, outside the {limit:g} mm work area: {line}")
+    if not lines:
+        raise ValueError("G-code program is empty")
+    return lines
+
+
+class GrblStreamer:
+    """Character-counting G-code streamer for GRBL.
+
+    Instead of waiting for each line's ``ok`` before sending the next, lines
+    are written as long as the bytes not yet acknowledged fit in the
+    controller's serial RX buffer (128 bytes on an Arduino Uno). The planner
+    buffer therefore never runs dry between short segments. A background
+    reader thread parses ``ok``/``error:N`` acknowledgements, ``ALARM:N``
+    and ``<...>`` status reports as they arrive.
+    """
+
+    def __init__(self, connection, rx_buffer_size: int = GRBL_RX_BUFFER_SIZE, ack_timeout: float = 30.0):
+        self.connection = connection
+        self.rx_buffer_size = rx_buffer_size
+        self.ack_timeout = ack_timeout
+        self.alarm: Optional[int] = None
+        self.last_status: Optional[Dict[str, str]] = None
+        self.settings: Dict[str, float] = {}  # as last reported by ``$$``
+        self.resets = 0  # startup banners seen
+        self.messages: Deque[str] = deque(maxlen=50)
+
+        self._pending: Deque[Tuple[int, str, int]] = deque()  # (line number, line, bytes)
+        self._in_flight = 0
+        self._acked = 0
+        self._errors: List[GrblError] = []
+        self._status_seq = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._reader: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self):
+        """Start the acknowledgement reader thread."""
+        if self._reader is not None and self._reader.is_alive():
+            return
+        self._running = True
+        self._reader = threading.Thread(target=self._read_loop, name="grbl-reader", daemon=True)
+        self._reader.start()
+
+    def stop(self):
+        """Stop the reader thread (the connection stays open)."""
+        self._running = False
+        with self._lock:
+            self._changed.notify_all()
+        if self._reader is not None:
+            self._reader.join(timeout=2)
+            self._reader = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the reader thread is still receiving from the controller."""
+        return self._running and self._reader is not None and self._reader.is_alive()
+
+    # -- sending ------------------------------------------------------------
+
+    def stream(self, lines: Iterable[str], stop_on_error: bool = True,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Stream G-code, keeping the controller's RX buffer as full as possible.
+
+        Args:
+            lines: G-code lines (comments and blank lines are skipped)
+            stop_on_error: Stop sending at the first ``error:N`` and raise it
+            on_progress: Called with (lines sent, lines acknowledged) after each line
+
+        Returns:
+            Dict with lines, bytes, errors and elapsed time
+        """
+        started = time.monotonic()
+        with self._lock:
+            self._errors = []
+        sent = sent_bytes = 0
+        for raw in lines:
+            line = clean_gcode_line(raw)
+            if not line:
+                continue
+            if stop_on_error and self._errors:
+                break
+            self._send(line, sent + 1)
+            sent += 1
+            sent_bytes += len(line) + 1
+            if on_progress:
+                on_progress(sent, self._acked)
+
+        self.wait_for_acks()
+        elapsed = time.monotonic() - started
+        if stop_on_error and self._errors:
+            raise self._errors[0]
+        return {
+            "lines": sent,
+            "bytes": sent_bytes,
+            "errors": [str(error) for error in self._errors],
+            "elapsed_s": round(elapsed, 3),
+            "lines_per_s": round(sent / elapsed, 1) if elapsed > 0 else None
+        }
+
+    def send_line(self, line: str, timeout: Optional[float] = None) -> str:
+        """Send one line and wait for its acknowledgement (for settings and one-off commands).
+
+        Returns:
+            "ok"
+
+        Raises:
+            GrblError: The controller answered ``error:N``
+        """
+        line = clean_gcode_line(line)
+        with self._lock:
+            self._errors = []
+        self._send(line, None)
+        self.wait_for_acks(timeout)
+        if self._errors:
+            raise self._errors[0]
+        return "ok"
+
+    def _send(self, line: str, line_number: Optional[int]):
+        """Write a line once it fits in the controller's RX buffer."""
+        size = len(line) + 1
+        if size > self.rx_buffer_size:
+            raise ValueError(f"G-code line longer than the {self.rx_buffer_size}-byte RX buffer: {line}")
+        deadline = time.monotonic() + self.ack_timeout
+        with self._lock:
+            while self._in_flight + size > self.rx_buffer_size:
+                self._check_state()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No acknowledgement from controller within {self.ack_timeout}s")
+                self._changed.wait(remaining)
+            self._check_state()
+            self._pending.append((line_number, line, size))
+            self._in_flight += size
+        self.connection.write(f"{line}\n".encode("ascii"))
+
+    def wait_for_acks(self, timeout: Optional[float] = None):
+        """Wait until every line sent so far has been acknowledged."""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.ack_timeout)
+        with self._lock:
+            while self._pending:
+                self._check_state()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"{len(self._pending)} lines not acknowledged by the controller")
+                self._changed.wait(remaining)
+
+    def realtime(self, command: bytes):
+        """Send a realtime command (``?``, ``!``, ``~``, ``\\x18``); these bypass the RX buffer."""
+        self.connection.write(command)
+
+    # -- machine state ------------------------------------------------------
+
+    def query_status(self, timeout: float = 2.0) -> Dict[str, str]:
+        """Ask for a ``<...>`` status report and return it parsed ({'state': 'Idle', ...})."""
+        with self._lock:
+            seq = self._status_seq
+        self.realtime(b"?")
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._status_seq == seq:
+                self._check_state()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("No status report from controller")
+                self._changed.wait(remaining)
+            return dict(self.last_status)
+
+    def wait_until_idle(self, timeout: float = 3600, poll_interval: float = 0.2,
+                        on_poll: Optional[Callable[[Dict[str, str]], None]] = None):
+        """Wait until all motion has finished (acknowledged and the machine reports Idle)."""
+        deadline = time.monotonic() + timeout
+        self.wait_for_acks(timeout)
+        while True:
+            with self._lock:
+                self._check_state()
+            status = self.query_status()
+            if on_poll:
+                on_poll(status)
+            if status["state"] == "Idle" and not self._pending:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Machine still {status['state']} after {timeout}s")
+            time.sleep(poll_interval)
+
+    def wait_for_banner(self, timeout: float) -> bool:
+        """Wait for the ``Grbl 1.1x`` line printed when the controller (re)starts."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while not self.resets:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return False
+                self._changed.wait(remaining)
+            return True
+
+    def read_settings(self, timeout: float = 10.0) -> Dict[str, float]:
+        """Read the controller's ``$N=value`` settings with ``$$``."""
+        self.send_line("$$", timeout=timeout)
+        with self._lock:
+            return dict(self.settings)
+
+    def clear_alarm(self):
+        """Forget a handled alarm (after ``$X`` unlock or a reset)."""
+        with self._lock:
+            self.alarm = None
+
+    def _check_state(self):
+        if self.alarm is not None:
+            raise GrblAlarm(self.alarm)
+        if not self._running:
+            raise ConnectionError("Serial connection lost")
+
+    # -- receiving ----------------------------------------------------------
+
+    def _read_loop(self):
+        while self._running and self.connection.is_open:
+            try:
+                raw = self.connection.readline()
+            except Exception as e:
+                logger.error(f"Serial read failed: {str(e)}")
+                break
+            if not raw:
+                continue
+            self._handle(raw.decode("ascii", errors="replace").strip())
+        with self._lock:
+            self._running = False
+            self._changed.notify_all()
+
+    def _handle(self, response: str):
+        if not response:
+            return
+        with self._lock:
+            if response == "ok" or response.startswith("error:"):
+                if not self._pending:
+                    logger.warning(f"Unexpected acknowledgement: {response}")
+                    return
+                line_number, line, size = self._pending.popleft()
+                self._in_flight -= size
+                self._acked += 1
+                if response != "ok":
+                    code = int(response[6:]) if response[6:].isdigit() else -1
+                    self._errors.append(GrblError(code, line, line_number))
+                    logger.warning(f"GRBL error:{code} for '{line}'")
+            elif response.startswith("<"):
+                match = STATUS_RE.match(response)
+                if match:
+                    status = {"state": match.group("state")}
+                    for field in match.group("fields").strip("|").split("|"):
+                        key, _, value = field.partition(":")
+                        if key:
+                            status[key] = value
+                    self.last_status = status
+                    self._status_seq += 1
+            elif response.startswith("ALARM:"):
+                self.alarm = int(response[6:]) if response[6:].isdigit() else -1
+                logger.error(f"GRBL alarm: {response}")
+            elif response.startswith("Grbl "):
+                # Controller reset: everything in flight was discarded
+                if self._pending:
+                    logger.warning(f"Controller reset with {len(self._pending)} lines unacknowledged")
+                self._pending.clear()
+                self._in_flight = 0
+                self.resets += 1
+                self.messages.append(response)
+            elif SETTING_RE.match(response):
+                match = SETTING_RE.match(response)
+                self.settings[match.group("key")] = float(match.group("value"))
+            else:
+                self.messages.append(response)
+                logger.debug(f"GRBL: {response}")
+            self._changed.notify_all()
@@ -0,0 +1,189 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from .grbl import GRBL_RX_BUFFER_SIZE, GrblStreamer, open_serial
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SETTING_TOLERANCE = 1e-3
+
+
+class GrblSession:
+    """A connection to one GRBL controller that stays open across jobs.
+
+    Opening the port resets the Arduino, so connecting per job costs the
+    boot time on every job. A session connects once and waits for the
+    startup banner, not a fixed delay. It reads the controller's settings
+    with ``$$`` and writes only those that differ. Before each job it checks
+    the link with a status query. If the port was closed, the reader died,
+    the query went unanswered or an alarm was raised, it reconnects, which
+    resets the controller, rather than failing the job.
+    """
+
+    def __init__(self, port: str, baud_rate: int = 115200, rx_buffer_size: int = GRBL_RX_BUFFER_SIZE,
+                 reset_delay: float = 2.0, health_timeout: float = 1.0):
+        """
+        Args:
+            port: Serial port, or sim://<name> for a simulated controller
+            baud_rate: Serial speed
+            rx_buffer_size: Controller RX buffer used for character counting
+            reset_delay: Longest wait for the startup banner after opening the port
+            health_timeout: Seconds to wait for the status report checked before each job
+        """
+        self.port = port
+        self.baud_rate = baud_rate
+        self.rx_buffer_size = rx_buffer_size
+        self.reset_delay = reset_delay
+        self.health_timeout = health_timeout
+        self.connection = None
+        self.streamer: Optional[GrblStreamer] = None
+        self.settings: Optional[Dict[str, float]] = None  # controller settings, read once per connection
+        self.stats = {
+            "connects": 0, "reconnects": 0, "jobs": 0,
+            "settings_written": 0, "settings_skipped": 0, "connect_s": 0.0
+        }
+        self._lock = threading.Lock()  # one job on the machine at a time
+
+    @property
+    def is_connected(self) -> bool:
+        return (self.connection is not None and self.connection.is_open
+                and self.streamer is not None and self.streamer.is_running)
+
+    def acquire(self, timeout: Optional[float] = None) -> GrblStreamer:
+        """Take the machine for a job; returns a streamer on a checked connection.
+
+        Raises:
+            TimeoutError: Another job holds the machine
+            Exception: The controller cannot be reached or is in an alarm state
+        """
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"{self.port} is busy with another job")
+        try:
+            self._ensure_ready()
+        except Exception:
+            self._lock.release()
+            raise
+        self.stats["jobs"] += 1
+        return self.streamer
+
+    def release(self, keep_open: bool = True):
+        """Hand the machine back; keep_open=False drops the connection (e.g. after a failed job)."""
+        try:
+            if not keep_open:
+                self.close()
+        finally:
+            self._lock.release()
+
+    def apply_settings(self, wanted: Dict[str, float]) -> Dict[str, float]:
+        """Write the settings that differ from the controller's; returns those written."""
+        if self.settings is None:
+            try:
+                self.settings = self.streamer.read_settings()
+            except Exception as e:
+                logger.warning(f"Could not read settings from {self.port}, writing all: {str(e)}")
+                self.settings = {}
+        changed = {
+            key: value for key, value in wanted.items()
+            if key not in self.settings or abs(self.settings[key] - value) > SETTING_TOLERANCE
+        }
+        for key, value in changed.items():
+            self.streamer.send_line(f"{key}={value:g}", timeout=10)
+            self.settings[key] = value
+        self.stats["settings_written"] += len(changed)
+        self.stats["settings_skipped"] += len(wanted) - len(changed)
+        return changed
+
+    def close(self):
+        if self.streamer:
+            self.streamer.stop()
+            self.streamer = None
+        if self.connection is not None and self.connection.is_open:
+            try:
+                self.connection.close()
+                logger.info(f"Serial connection to {self.port} closed")
+            except Exception as e:
+                logger.error(f"Error closing serial: {str(e)}")
+        self.connection = None
+        self.settings = None
+
+    def _ensure_ready(self):
+        problem = self._check()
+        if problem is None:
+            return
+        if self.connection is not None:
+            logger.warning(f"Reconnecting to {self.port}: {problem}")
+            self.stats["reconnects"] += 1
+        self.close()
+        self._connect()
+        problem = self._check()
+        if problem is not None:
+            self.close()
+            raise ConnectionError(f"{self.port} not ready after connecting: {problem}")
+
+    def _check(self) -> Optional[str]:
+        """Why the connection cannot take a job, or None if it can."""
+        if self.connection is None:
+            return "not connected"
+        if not self.is_connected:
+            return "connection lost"
+        if self.streamer.alarm is not None:
+            return f"alarm {self.streamer.alarm}"
+        try:
+            state = self.streamer.query_status(timeout=self.health_timeout)["state"]
+        except Exception as e:
+            return f"no status report ({str(e)})"
+        if state != "Idle":
+            return f"controller {state}"
+        return None
+
+    def _connect(self):
+        started = time.monotonic()
+        self.connection = open_serial(self.port, self.baud_rate)
+        self.streamer = GrblStreamer(self.connection, rx_buffer_size=self.rx_buffer_size)
+        self.streamer.start()
+        # Opening the port resets the Arduino; boards without auto-reset print no banner
+        if not self.streamer.wait_for_banner(self.reset_delay):
+            logger.info(f"No startup banner from {self.port} within {self.reset_delay}s")
+        self.stats["connects"] += 1
+        self.stats["connect_s"] += time.monotonic() - started
+        logger.info(f"Connected to {self.port}")
+
+    def get_stats(self) -> Dict:
+        return {"port": self.port, "connected": self.is_connected, **self.stats,
+                "connect_s": round(self.stats["connect_s"], 3)}
+
+
+# One session per port, shared by every worker in the process
+_sessions: Dict[str, GrblSession] = {}
+_sessions_lock = threading.Lock()
+
+def get_session(port: str, baud_rate: int = 115200, rx_buffer_size: Optional[int] = None) -> GrblSession:
+    """Get the process-wide session for a port, creating it on first use."""
+    with _sessions_lock:
+        session = _sessions.get(port)
+        if session is None:
+            session = _sessions[port] = GrblSession(
+                port,
+                baud_rate=baud_rate,
+                rx_buffer_size=rx_buffer_size or int(os.getenv("GRBL_RX_BUFFER", GRBL_RX_BUFFER_SIZE)),
+                reset_delay=float(os.getenv("GRBL_RESET_DELAY", 2))
+            )
+        return session
+
+
+def close_sessions():
+    """Close every open session (at shutdown)."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+atexit.register(close_sessions)
@@ -0,0 +1,453 @@
+import argparse
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WELCOME = "Grbl 1.1h ['$' for help]"
+LINE_BUFFER_SIZE = 80  # lines of 80+ characters overflow it (error:11)
+WORD_RE = re.compile(r"([A-Z])([-+]?\d*\.?\d+)")
+SUPPORTED_WORDS = set("GMXYZFSPIJKNT")
+
+
+class SimulatedGrbl:
+    """In-process stand-in for a GRBL controller on a serial port.
+
+    Exposes the subset of the pyserial ``Serial`` interface the worker uses
+    (write, readline, in_waiting, is_open, close) and models what matters for
+    streaming: the 128-byte serial RX buffer, the 15-block planner buffer,
+    ``ok``/``error:N`` acknowledgements, ``?`` status reports, the USB-serial
+    round trip (``latency`` before a response becomes readable) and motion
+    time derived from the G-code (distance over feed rate, scaled by
+    ``time_scale``). Bytes written beyond the free RX space are dropped and
+    counted in ``stats["rx_overflows"]``, like on a real controller.
+    """
+
+    def __init__(self, rx_buffer_size: int = 128, planner_size: int = 15, baud_rate: int = 115200,
+                 rapid_rate: float = 3000.0, time_scale: float = 1.0, latency: float = 0.004,
+                 timeout: float = 10.0, max_travel: Tuple[float, float, float] = (200.0, 200.0, 200.0),
+                 boot_s: float = 0.0):
+        self.port = "sim://grbl"
+        self.rx_buffer_size = rx_buffer_size
+        self.planner_size = planner_size
+        self.baud_rate = baud_rate
+        self.rapid_rate = rapid_rate
+        self.time_scale = time_scale
+        self.latency = latency
+        self.timeout = timeout
+        self.settings: Dict[str, float] = {"$130": max_travel[0], "$131": max_travel[1], "$132": max_travel[2]}
+
+        self.is_open = True
+        self.state = "Idle"
+        self.alarm: Optional[int] = None
+        self.position = [0.0, 0.0, 0.0]
+        self.feed_rate = 0.0
+        self.motion_mode = 0
+        self.stats = {
+            "lines": 0, "errors": 0, "rx_overflows": 0, "bytes_received": 0,
+            "motion_s": 0.0, "starved_s": 0.0
+        }
+
+        self._rx = bytearray()
+        self._tx = bytearray()
+        self._outbox: Deque[Tuple[float, bytes]] = deque()  # responses still on the wire
+        self._planner: Deque[float] = deque()
+        self._block_end: Optional[float] = None
+        self._hold = False
+        self._starved_since: Optional[float] = None
+        self._lock = threading.Lock()
+        self._rx_ready = threading.Condition(self._lock)
+        self._tx_ready = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name="grbl-sim", daemon=True)
+        self._thread.start()
+        # Opening the port resets the Arduino: the banner comes once the bootloader has run
+        with self._lock:
+            self._outbox.append((time.monotonic() + latency + boot_s, f"{WELCOME}\r\n".encode()))
+
+    # -- pyserial interface -------------------------------------------------
+
+    @property
+    def in_waiting(self) -> int:
+        with self._lock:
+            self._deliver()
+            return len(self._tx)
+
+    def write(self, data: bytes) -> int:
+        if not self.is_open:
+            raise OSError("Simulated port is closed")
+        # Time on the wire at the configured baud rate (10 bits per byte)
+        time.sleep(len(data) * 10 / self.baud_rate)
+        with self._lock:
+            for byte in data:
+                if self._realtime(byte):
+                    continue
+                if len(self._rx) >= self.rx_buffer_size:
+                    self.stats["rx_overflows"] += 1
+                    continue
+                self._rx.append(byte)
+                self.stats["bytes_received"] += 1
+            self._rx_ready.notify_all()
+        return len(data)
+
+    def readline(self) -> bytes:
+        deadline = time.monotonic() + (self.timeout if self.timeout is not None else 1e9)
+        with self._lock:
+            while True:
+                self._deliver()
+                if b"\n" in self._tx:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.is_open:
+                    line, self._tx = bytes(self._tx), bytearray()
+                    return line
+                if self._outbox:
+                    remaining = min(remaining, self._outbox[0][0] - time.monotonic())
+                self._tx_ready.wait(max(0.0001, remaining))
+            index = self._tx.index(b"\n") + 1
+            line, self._tx = bytes(self._tx[:index]), self._tx[index:]
+            return line
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._outbox.clear()
+            self._tx.clear()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            self.is_open = False
+            self._rx_ready.notify_all()
+            self._tx_ready.notify_all()
+
+    # -- test hooks ---------------------------------------------------------
+
+    def trigger_alarm(self, code: int = 1):
+        """Raise an alarm as a limit switch would (motion stops, lines get error:9)."""
+        with self._lock:
+            self.alarm = code
+            self.state = "Alarm"
+            self._planner.clear()
+            self._block_end = None
+            self._emit_locked(f"ALARM:{code}")
+
+    # -- controller ---------------------------------------------------------
+
+    def _realtime(self, byte: int) -> bool:
+        """Handle realtime commands, which bypass the RX buffer."""
+        if byte == ord("?"):
+            x, y, z = self.position
+            feed = self.feed_rate if self.state == "Run" else 0
+            self._emit_locked(f"<{self.state}|MPos:{x:.3f},{y:.3f},{z:.3f}|FS:{feed:.0f},0>")
+        elif byte == ord("!"):
+            self._hold = True
+            if self.state == "Run":
+                self.state = "Hold"
+        elif byte == ord("~"):
+            self._hold = False
+            if self.state == "Hold":
+                self.state = "Run"
+        elif byte == 0x18:
+            self._rx.clear()
+            self._planner.clear()
+            self._block_end = None
+            self._hold = False
+            self.state = "Alarm" if self.alarm is not None else "Idle"
+            self._emit_locked(WELCOME)
+        else:
+            return False
+        return True
+
+    def _emit(self, line: str):
+        with self._lock:
+            self._emit_locked(line)
+
+    def _emit_locked(self, line: str):
+        self._outbox.append((time.monotonic() + self.latency, f"{line}\r\n".encode()))
+        self._tx_ready.notify_all()
+
+    def _deliver(self):
+        """Move responses whose latency has passed into the readable buffer."""
+        now = time.monotonic()
+        while self._outbox and self._outbox[0][0] <= now:
+            self._tx.extend(self._outbox.popleft()[1])
+
+    def _run(self):
+        """Parse buffered lines into the planner and execute planned motion."""
+        with self._lock:
+            while self.is_open:
+                now = time.monotonic()
+                if self._block_end is not None and now >= self._block_end and not self._hold:
+                    self._block_end = None
+                if self._block_end is None and self._planner and not self._hold:
+                    self._block_end = now + self._planner.popleft()
+                    self.state = "Run"
+                    self._track_starvation(now, running=True)
+                elif self._block_end is None and not self._planner and self.state == "Run":
+                    self.state = "Idle"
+                    self._track_starvation(now, running=False)
+
+                if b"\n" in self._rx and len(self._planner) < self.planner_size:
+                    index = self._rx.index(b"\n") + 1
+                    line, self._rx = bytes(self._rx[:index]), self._rx[index:]
+                    self._emit_locked(self._execute(line.decode(errors="replace").strip()))
+                    continue
+
+                wait = self._block_end - now if self._block_end is not None else 0.05
+                self._rx_ready.wait(max(0.0005, min(wait, 0.05)))
+
+    def _track_starvation(self, now: float, running: bool):
+        """Time the planner ran dry between blocks while lines were still arriving."""
+        if running and self._starved_since is not None:
+            self.stats["starved_s"] += now - self._starved_since
+            self._starved_since = None
+        elif not running:
+            self._starved_since = now
+
+    def _execute(self, line: str) -> str:
+        """Handle one line from the RX buffer and return the acknowledgement."""
+        self.stats["lines"] += 1
+        if not line:
+            return "ok"
+        if len(line.replace(" ", "")) >= LINE_BUFFER_SIZE:
+            return self._error(11)
+        if line.startswith("$"):
+            return self._setting(line)
+        if self.alarm is not None:
+            return self._error(9)
+
+        words = WORD_RE.findall(line.upper().replace(" ", ""))
+        if not words or len("".join(letter + value for letter, value in words)) != len(line.replace(" ", "")):
+            return self._error(2)
+        target = list(self.position)
+        moved = False
+        dwell = 0.0
+        for letter, value in words:
+            number = float(value)
+            if letter not in SUPPORTED_WORDS:
+                return self._error(20)
+            if letter == "G" and number in (0, 1):
+                self.motion_mode = int(number)
+            elif letter == "G" and number == 4:
+                dwell = -1.0
+            elif letter in "XYZ":
+                target["XYZ".index(letter)] = number
+                moved = True
+            elif letter == "F":
+                self.feed_rate = number
+            elif letter == "P" and dwell < 0:
+                dwell = number
+
+        duration = 0.0
+        if moved:
+            travel = self.settings["$130"], self.settings["$131"], self.settings["$132"]
+            if any(abs(value) > limit for value, limit in zip(target, travel)):
+                return self._error(15)
+            distance = math.dist(self.position, target)
+            rate = self.rapid_rate if self.motion_mode == 0 else self.feed_rate
+            if self.motion_mode == 1 and rate <= 0:
+                return self._error(22)
+            duration = distance / rate * 60.0
+            self.position = target
+        elif dwell > 0:
+            duration = dwell
+
+        if duration > 0:
+            self.stats["motion_s"] += duration
+            self._planner.append(duration * self.time_scale)
+        return "ok"
+
+    def _setting(self, line: str) -> str:
+        if line == "$$":
+            for key, value in self.settings.items():
+                self._emit_locked(f"{key}={value:.3f}")
+            return "ok"
+        if line == "$X":
+            self.alarm = None
+            self.state = "Idle"
+            self._emit_locked("[MSG:Caution: Unlocked]")
+            return "ok"
+        key, _, value = line.partition("=")
+        try:
+            self.settings[key] = float(value)
+        except ValueError:
+            return self._error(3)
+        return "ok"
+
+    def _error(self, code: int) -> str:
+        self.stats["errors"] += 1
+        return f"error:{code}"
+
+
+# Simulated ports that refuse to open, the device currently open on each port and its
+# settings, which survive reconnects like GRBL's EEPROM
+_unplugged = set()
+_open_devices: Dict[str, SimulatedGrbl] = {}
+_eeprom: Dict[str, Dict[str, float]] = {}
+
+
+def open_simulated(port: str, baud_rate: int = 115200, timeout: float = 1.0) -> SimulatedGrbl:
+    """Open ``sim://<name>[?time_scale=0.01&latency=0.001&boot=1.5]`` as a simulated controller."""
+    name, _, query = port.partition("?")
+    if name in _unplugged:
+        raise OSError(f"could not open port {name}: device unplugged")
+    options = dict(parse_qsl(query))
+    device = SimulatedGrbl(baud_rate=baud_rate, timeout=timeout,
+                           time_scale=float(options.get("time_scale", 1.0)),
+                           latency=float(options.get("latency", 0.004)),
+                           boot_s=float(options.get("boot", 0.0)))
+    device.port = name
+    device.settings = _eeprom.setdefault(name, device.settings)
+    _open_devices[name] = device
+    return device
+
+
+def unplug(port: str):
+    """Take a simulated device offline: it disconnects now and cannot be reopened until `plug`."""
+    name = port.partition("?")[0]
+    _unplugged.add(name)
+    device = _open_devices.pop(name, None)
+    if device is not None:
+        device.close()
+
+
+def plug(port: str):
+    _unplugged.discard(port.partition("?")[0])
+
+
+def sample_raster(rows: int = 25, cols: int = 25, module: float = 0.5, seed: int = 7) -> List[str]:
+    """A QR-like raster: one short burn per dark module, row by row."""
+    import random
+    rng = random.Random(seed)
+    lines = ["G21", "G90", "M5", "G0 X0 Y0", "F1200", "M3 S800"]
+    for row in range(rows):
+        for col in range(cols):
+            if rng.random() < 0.5:
+                x, y = col * module, row * module
+                lines += [f"G0 X{x:.3f} Y{y:.3f}", f"G1 X{x + module:.3f} Y{y:.3f} S800"]
+    return lines + ["M5", "G0 X0 Y0"]
+
+
+def send_polling(device, lines: List[str]):
+    """The worker's previous sender: write a line, then poll for the reply every 100 ms."""
+    for line in lines:
+        device.write(f"{line}\n".encode())
+        while device.in_waiting == 0:
+            time.sleep(0.1)
+        device.readline()
+
+
+def run_benchmark(lines: List[str], time_scale: float = 1.0, latency: float = 0.004,
+                  modes: Tuple[str, ...] = ("polling", "send_and_wait", "character_counting")) -> Dict[str, Dict]:
+    """Send the same job with each method and compare wall time against pure motion time."""
+    from .grbl import GrblStreamer
+
+    results = {}
+    for mode in modes:
+        device = SimulatedGrbl(time_scale=time_scale, latency=latency)
+        device.readline()  # welcome banner
+        streamer = GrblStreamer(device)
+        started = time.monotonic()
+        if mode == "polling":
+            send_polling(device, lines)
+            streamer.start()
+        else:
+            streamer.start()
+            if mode == "send_and_wait":
+                for line in lines:
+                    streamer.send_line(line)
+            else:
+                streamer.stream(lines)
+        streamer.wait_until_idle(timeout=3600)
+        elapsed = time.monotonic() - started
+        streamer.stop()
+        device.close()
+        results[mode] = {
+            "elapsed_s": round(elapsed, 2),
+            "motion_s": round(device.stats["motion_s"] * time_scale, 2),
+            "starved_s": round(device.stats["starved_s"], 2),
+            "rx_overflows": device.stats["rx_overflows"],
+            "errors": device.stats["errors"]
+        }
+    return results
+
+
+def run_session_benchmark(lines: List[str], jobs: int = 8, time_scale: float = 1.0, latency: float = 0.004,
+                          boot_s: float = 1.5, reset_delay: float = 2.0,
+                          modes: Tuple[str, ...] = ("per_job", "persistent")) -> Dict[str, Dict]:
+    """Engrave the same job `jobs` times in a row, reopening the port for each job or keeping one session.
+
+    Each job goes through the serial steps of EngravingWorker._run_job:
+    acquire the session, apply the GRBL settings, stream, wait for Idle and
+    release. "per_job" is GRBL_PERSISTENT_SESSION=false, "persistent" the
+    default. `boot_s` is how long the controller takes to print its banner
+    after the port is opened (the Arduino bootloader).
+    """
+    from .grbl_session import GrblSession
+
+    settings = {"$32": 1.0, "$130": 200.0, "$131": 200.0, "$132": 250.0}
+    results = {}
+    for mode in modes:
+        name = f"sim://session-benchmark-{mode}"
+        _eeprom.pop(name, None)  # every mode starts from the same controller settings
+        port = f"{name}?time_scale={time_scale}&latency={latency}&boot={boot_s}"
+        sessions = []
+        started = time.monotonic()
+        for _ in range(jobs):
+            if mode == "per_job" or not sessions:
+                sessions.append(GrblSession(port, reset_delay=reset_delay))
+            session = sessions[-1]
+            streamer = session.acquire()
+            session.apply_settings(settings)
+            streamer.stream(lines)
+            streamer.wait_until_idle(timeout=3600)
+            session.release(keep_open=mode == "persistent")
+        sessions[-1].close()
+        elapsed = time.monotonic() - started
+        results[mode] = {
+            "jobs": jobs,
+            "elapsed_s": round(elapsed, 2),
+            "jobs_per_h": round(jobs * 3600 / elapsed),
+            "connects": sum(session.stats["connects"] for session in sessions)
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark G-code streaming against a simulated GRBL controller")
+    parser.add_argument("--rows", type=int, default=25, help="Raster rows (QR modules)")
+    parser.add_argument("--cols", type=int, default=25, help="Raster columns (QR modules)")
+    parser.add_argument("--module", type=float, default=0.5, help="Module size in mm")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Scale simulated motion time")
+    parser.add_argument("--latency", type=float, default=0.004, help="Serial round-trip latency in seconds")
+    parser.add_argument("--skip-polling", action="store_true", help="Skip the slow 100 ms polling sender")
+    parser.add_argument("--batch", type=int, default=0,
+                        help="Instead, engrave this many jobs in a row with and without a persistent session")
+    parser.add_argument("--boot", type=float, default=1.5, help="Controller boot time after opening the port (--batch)")
+    args = parser.parse_args()
+
+    lines = sample_raster(args.rows, args.cols, args.module)
+    if args.batch:
+        logger.info(f"Engraving {args.batch} jobs of {len(lines)} lines")
+        for mode, result in run_session_benchmark(lines, args.batch, args.time_scale, args.latency,
+                                                  args.boot).items():
+            logger.info(f"{mode:20s} {result}")
+        return
+    modes = ("send_and_wait", "character_counting") if args.skip_polling else \
+        ("polling", "send_and_wait", "character_counting")
+    logger.info(f"Streaming {len(lines)} lines ({sum(len(line) + 1 for line in lines)} bytes)")
+    for mode, result in run_benchmark(lines, args.time_scale, args.latency, modes).items():
+        logger.info(f"{mode:20s} {result}")
+
+
+if __name__ == "__main__":
+    main()
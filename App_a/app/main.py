@@ -20,6 +20,7 @@ from . import models
 # from .engraving_queue import EngravingQueueManager, engraving_queue as rq_queue
 # from .engraving_worker import process_engraving_job
 from .auth import router as auth_router
+from .qr_gcode import qr_payload
 
 load_dotenv()
 
@@ -110,7 +111,6 @@ def create_items(payload: ItemCreateReq, db: Session = Depends(get_db)):
             continue
 
         # Generate QR
-        qr_payload = f"http://localhost:8000/scan/{item.uid}"
         qr = qrcode.QRCode(
             box_size={
                 "250x250": 10,
@@ -121,7 +121,7 @@ def create_items(payload: ItemCreateReq, db: Session = Depends(get_db)):
             border=4,
             error_correction=qrcode.constants.ERROR_CORRECT_M
         )
-        qr.add_data(qr_payload)
+        qr.add_data(qr_payload(item.uid))
         qr.make(fit=True)
         img = qr.make_image(fill_color="black", back_color="white")
 
@@ -153,6 +153,34 @@ def create_items(payload: ItemCreateReq, db: Session = Depends(get_db)):
 # def get_engraving_status(uid: str, db: Session = Depends(get_db)):
 #     ...
 
+# Multi-engraver dispatcher, imported lazily so the API runs without serial/RQ dependencies
+ENGRAVING_DISPATCHER = os.getenv("ENGRAVING_DISPATCHER", "false").lower() == "true"
+
+@app.on_event("startup")
+def start_engraving_dispatcher():
+    if ENGRAVING_DISPATCHER:
+        from .dispatcher import get_dispatcher
+        get_dispatcher().start()
+
+@app.on_event("shutdown")
+def stop_engraving_dispatcher():
+    if ENGRAVING_DISPATCHER:
+        from .dispatcher import get_dispatcher
+        get_dispatcher().stop()
+
+@app.get("/api/engrave/devices")
+def get_engraving_devices():
+    """
+    Engraver state, throughput and utilisation
+    """
+    if not ENGRAVING_DISPATCHER:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Engraving dispatcher is not enabled"
+        )
+    from .dispatcher import get_dispatcher
+    return get_dispatcher().get_stats()
+
 @app.get("/api/items/{uid}")
 def get_item_by_uid(uid: str, db: Session = Depends(get_db)):
     """
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import qrcode
+
+from .gcode_optimizer import estimate_seconds, format_number, move_seconds, parse_gcode
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Item.qr_size options, engraved as width x height in mm (quiet zone included)
+QR_SIZES_MM = {
+    "250x250": 250.0,
+    "125x125": 125.0,
+    "100x100": 100.0,
+    "50x50": 50.0
+}
+QR_BORDER = 4
+# EngravingQueue.svg_url of a job whose G-code is compiled here, e.g. "qr://50x50"
+QR_SCHEME = "qr://"
+
+
+def qr_payload(uid: str) -> str:
+    """The URL encoded in an item's QR code."""
+    return f"{os.getenv('APP_BASE_URL', 'http://localhost:8000')}/scan/{uid}"
+
+
+def qr_matrix(uid: str) -> List[List[bool]]:
+    """Module matrix (True = dark) of an item's QR code, quiet zone included."""
+    qr = qrcode.QRCode(border=QR_BORDER, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(qr_payload(uid))
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+class MachineProfile:
+    """Engraver settings that shape the compiled G-code."""
+
+    def __init__(self, name: str = "default", feed_rate: float = 800.0, laser_power: float = 600.0,
+                 laser_mode: str = "M4", lines_per_mm: float = 8.0, overscan_mm: float = 1.0,
+                 origin: Tuple[float, float] = (0.0, 0.0), max_travel: Tuple[float, float] = (250.0, 250.0),
+                 rapid_rate: float = 3000.0, acceleration: float = 500.0):
+        """
+        Args:
+            feed_rate: Engraving speed in mm/min
+            laser_power: S value while burning (0-1000 with GRBL $30=1000)
+            laser_mode: "M4" (dynamic power, recommended) or "M3" (constant)
+            lines_per_mm: Scanline density
+            overscan_mm: Distance run with the laser at S0 before and after the marks of
+                each scanline, so burning happens at full speed
+            origin: Machine position of the QR's bottom-left corner
+            max_travel: X/Y travel of the machine (GRBL $130/$131)
+            rapid_rate: G0 speed in mm/min, for time estimates
+            acceleration: mm/s^2, for time estimates
+        """
+        if laser_mode not in ("M3", "M4"):
+            raise ValueError(f"Laser mode must be M3 or M4, not {laser_mode}")
+        self.name = name
+        self.feed_rate = feed_rate
+        self.laser_power = laser_power
+        self.laser_mode = laser_mode
+        self.lines_per_mm = lines_per_mm
+        self.overscan_mm = overscan_mm
+        self.origin = tuple(origin)
+        self.max_travel = tuple(max_travel)
+        self.rapid_rate = rapid_rate
+        self.acceleration = acceleration
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+    @property
+    def key(self) -> str:
+        """Digest of every setting, so a changed profile never reuses stale G-code."""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def profile_from_env() -> MachineProfile:
+    """The machine profile configured by ENGRAVE_* and GRBL_* variables."""
+    return MachineProfile(
+        name=os.getenv("ENGRAVE_PROFILE", "default"),
+        feed_rate=float(os.getenv("ENGRAVE_FEED_RATE", 800)),
+        laser_power=float(os.getenv("ENGRAVE_LASER_POWER", 600)),
+        laser_mode=os.getenv("ENGRAVE_LASER_MODE", "M4"),
+        lines_per_mm=float(os.getenv("ENGRAVE_LINES_PER_MM", 8)),
+        overscan_mm=float(os.getenv("ENGRAVE_OVERSCAN_MM", 1.0)),
+        origin=(float(os.getenv("ENGRAVE_ORIGIN_X", 0)), float(os.getenv("ENGRAVE_ORIGIN_Y", 0))),
+        max_travel=(float(os.getenv("ENGRAVE_MAX_TRAVEL_X", 250)), float(os.getenv("ENGRAVE_MAX_TRAVEL_Y", 250))),
+        rapid_rate=float(os.getenv("GRBL_RAPID_RATE", 3000)),
+        acceleration=float(os.getenv("GRBL_ACCELERATION", 500))
+    )
+
+
+def dark_runs(row: List[bool]) -> List[Tuple[int, int]]:
+    """Runs of dark modules in a row as (first column, column after the last)."""
+    runs = []
+    start = None
+    for col, dark in enumerate(row):
+        if dark and start is None:
+            start = col
+        elif not dark and start is not None:
+            runs.append((start, col))
+            start = None
+    if start is not None:
+        runs.append((start, len(row)))
+    return runs
+
+
+def compile_qr_gcode(matrix: List[List[bool]], size_mm: float, profile: MachineProfile,
+                     title: Optional[str] = None) -> str:
+    """Raster G-code for a QR module matrix.
+
+    Each module row is burned as several scanlines. On a scanline, adjacent
+    dark modules are merged into one burn. Narrow gaps are crossed at
+    engraving feed with the power switched to S0, and wide gaps are skipped
+    with a rapid move, whichever is faster. Every burn starts and ends inside
+    an overscan run at engraving speed. Scanlines alternate direction
+    (serpentine), so there are no return passes, and empty scanlines are
+    skipped. Requires GRBL laser mode ($32=1) so that S0 and G0 moves do
+    not burn.
+
+    Args:
+        matrix: Module matrix, row 0 at the top
+        size_mm: Width and height of the engraved symbol
+        profile: Machine settings
+        title: Comment written at the top of the program
+
+    Returns:
+        G-code program
+    """
+    modules = len(matrix)
+    module_mm = size_mm / modules
+    x0, y0 = profile.origin
+    if x0 < 0 or y0 < 0 or x0 + size_mm > profile.max_travel[0] or y0 + size_mm > profile.max_travel[1]:
+        raise ValueError(f"A {size_mm:g} mm QR at {profile.origin} does not fit the "
+                         f"{profile.max_travel[0]:g}x{profile.max_travel[1]:g} mm work area")
+    lines_per_module = max(1, round(module_mm * profile.lines_per_mm))
+
+    def x_at(col: float) -> float:
+        return x0 + col * module_mm
+
+    lines = [
+        f"; {title or 'QR code'}: {size_mm:g} mm, {modules} modules of {module_mm:.3f} mm, "
+        f"{lines_per_module} lines/module, profile {profile.name}",
+        "G21",
+        "G90",
+        "G94",
+        "M5",
+        f"{profile.laser_mode} S0"
+    ]
+    power = 0.0
+    feed = None
+    feed_speed = profile.feed_rate / 60.0
+    overscan = profile.overscan_mm
+
+    def feed_to(x: float, target_power: float):
+        nonlocal feed, power
+        words = f"G1 X{format_number(x)}"
+        if feed != profile.feed_rate:
+            words += f" F{format_number(profile.feed_rate)}"
+            feed = profile.feed_rate
+        if power != target_power:
+            words += f" S{format_number(target_power)}"
+            power = target_power
+        lines.append(words)
+
+    def clamp(x: float) -> float:
+        return min(max(x, 0.0), profile.max_travel[0])
+
+    def skip_is_faster(gap: float) -> bool:
+        # Crossing a gap at S0 keeps the head at engraving speed; stopping, rapiding
+        # across and running up again over the overscan pays off for wide gaps
+        run_up = 2 * overscan / feed_speed + feed_speed / profile.acceleration
+        return run_up + move_seconds(gap + 2 * overscan, profile.rapid_rate, profile.acceleration) < gap / feed_speed
+
+    left_to_right = True
+    for row_index, row in enumerate(matrix):
+        runs = dark_runs(row)
+        if not runs:
+            continue
+        for line_index in range(lines_per_module):
+            # Machine Y grows upwards while row 0 is the top of the symbol
+            y = y0 + size_mm - (row_index + (line_index + 0.5) / lines_per_module) * module_mm
+            direction = 1 if left_to_right else -1
+            if left_to_right:
+                ordered = [(x_at(start), x_at(end)) for start, end in runs]
+            else:
+                ordered = [(x_at(end), x_at(start)) for start, end in reversed(runs)]
+
+            position = None
+            for start, end in ordered:
+                if position is None:
+                    position = clamp(start - direction * overscan)
+                    lines.append(f"G0 X{format_number(position)} Y{format_number(y)}")
+                elif skip_is_faster(abs(start - position)):
+                    feed_to(clamp(position + direction * overscan), 0.0)
+                    position = clamp(start - direction * overscan)
+                    lines.append(f"G0 X{format_number(position)}")
+                if abs(start - position) > 1e-6:
+                    feed_to(start, 0.0)
+                feed_to(end, profile.laser_power)
+                position = end
+            if abs(clamp(position + direction * overscan) - position) > 1e-6:
+                feed_to(clamp(position + direction * overscan), 0.0)
+            left_to_right = not left_to_right
+
+    lines += ["M5", f"G0 X{format_number(x0)} Y{format_number(y0)}"]
+    return "\n".join(lines) + "\n"
+
+
+class QrGcodeCache:
+    """Compiled QR programs per (UID, size, machine profile), in memory and on disk.
+
+    RQ runs each job in a fresh work horse process, so the disk copy is what
+    lets retries and other workers on the host reuse a compilation.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, uid: str, qr_size: str, profile: MachineProfile) -> str:
+        """G-code for an item's QR code at `qr_size` ("50x50" ... "250x250"), compiled on first use."""
+        if qr_size not in QR_SIZES_MM:
+            raise ValueError(f"Unknown QR size {qr_size}; expected one of {', '.join(QR_SIZES_MM)}")
+        key = (uid, qr_size, profile.key)
+        with self._lock:
+            gcode = self._entries.get(key)
+            if gcode is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return gcode
+
+        gcode = self._read(key)
+        if gcode is not None:
+            self.stats["disk_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            gcode = compile_qr_gcode(qr_matrix(uid), QR_SIZES_MM[qr_size], profile, title=uid)
+            self._write(key, gcode)
+            moves = parse_gcode(gcode).moves
+            logger.info(
+                f"Compiled QR G-code for {uid} ({qr_size}, profile {profile.name}): "
+                f"{gcode.count(chr(10))} lines, estimated "
+                f"{estimate_seconds(moves, profile.rapid_rate, profile.acceleration):.1f}s"
+            )
+
+        with self._lock:
+            self._entries[key] = gcode
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return gcode
+
+    def _path(self, key: Tuple[str, str, str]) -> Optional[str]:
+        if not self.directory:
+            return None
+        digest = hashlib.sha256("|".join(key).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.gcode")
+
+    def _read(self, key: Tuple[str, str, str]) -> Optional[str]:
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return f.read()
+        except OSError as e:
+            logger.warning(f"Could not read cached G-code {path}: {str(e)}")
+            return None
+
+    def _write(self, key: Tuple[str, str, str], gcode: str):
+        path = self._path(key)
+        if not path:
+            return
+        try:
+            # Write then rename, so a concurrent reader never sees half a program
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(gcode)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache G-code in {self.directory}: {str(e)}")
+
+
+# Singleton instance
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+def get_qr_gcode_cache() -> QrGcodeCache:
+    """Get the process-wide QR G-code cache (QR_GCODE_CACHE_DIR, QR_GCODE_CACHE_ENTRIES)."""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = QrGcodeCache(
+                directory=os.getenv("QR_GCODE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "qr_gcode_cache")) or None,
+                max_entries=int(os.getenv("QR_GCODE_CACHE_ENTRIES", 256))
+            )
+    return _cache_instance
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+
+# The app reads its settings at import time: in-memory queue instead of Redis, SQLite instead of Postgres
+DB_PATH = os.path.join(tempfile.gettempdir(), f"app_a_tests_{os.getpid()}.db")
+os.environ["TEST_MODE"] = "true"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["ENGRAVING_DISPATCH"] = "dispatcher"
+os.environ["GRBL_RESET_DELAY"] = "0.5"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# SQLite only autoincrements INTEGER PRIMARY KEY columns
+@compiles(BigInteger, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    return "INTEGER"
+
+
+@pytest.fixture
+def db():
+    from app import models  # registers the tables
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(engine)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    from app.grbl_session import close_sessions
+    close_sessions()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
@@ -0,0 +1,161 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from app import engraving_queue, grbl_sim
+from app.database import SessionLocal
+from app.dispatcher import OFFLINE, EngravingDevice, EngravingDispatcher
+from app.engraving_queue import EngravingQueueManager
+from app.engraving_worker import EngravingWorker
+from app.models import EngravingHistory, EngravingQueue, EngravingStatus, Item
+
+BAY1 = "sim://dispatch-bay1?time_scale=0.002&latency=0"
+BAY2 = "sim://dispatch-bay2?time_scale=0.002&latency=0"
+SMALL_JOB = "\n".join(grbl_sim.sample_raster(4, 4, 0.5))
+
+
+def add_jobs(db, job_ids, svg_url="http://files/job.gcode"):
+    for job_id in job_ids:
+        db.add(Item(id=job_id, uid=f"UID{job_id}", component_type="EC", lot_number="L1", vendor_id=1))
+        db.add(EngravingQueue(id=job_id, item_uid=f"UID{job_id}", svg_url=svg_url))
+    db.commit()
+
+
+def small_job_worker(device):
+    worker = EngravingDispatcher._default_worker(device)
+    worker._download_svg = lambda url: SMALL_JOB
+    return worker
+
+
+def statuses(job_ids):
+    db = SessionLocal()
+    try:
+        return {job.id: job.status for job in db.query(EngravingQueue).filter(EngravingQueue.id.in_(job_ids))}
+    finally:
+        db.close()
+
+
+def wait_for(condition, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_unplugged_bay_requeues_then_recovers(db):
+    add_jobs(db, range(1, 7))
+    grbl_sim.unplug(BAY2)
+    bay1, bay2 = EngravingDevice("bay1", BAY1), EngravingDevice("bay2", BAY2)
+    dispatcher = EngravingDispatcher([bay1, bay2], poll_interval=0.05, probe_interval=0.2,
+                                     queue_depth=1, worker_factory=small_job_worker, session_factory=SessionLocal)
+    dispatcher.start()
+    try:
+        # bay2 cannot connect: it goes offline and bay1 runs everything, including what bay2 had claimed
+        wait_for(lambda: set(statuses(range(1, 7)).values()) == {EngravingStatus.COMPLETED})
+        assert bay2.state == OFFLINE
+        assert bay2.last_error
+        assert bay2.jobs_completed == 0 and bay2.jobs_failed == 0
+        assert bay1.jobs_completed == 6
+        returned = db.query(EngravingHistory).filter(EngravingHistory.message.like("Engraver unavailable%")).count()
+        assert returned >= 1
+
+        # Plugged back in: the next probe brings it online and it takes work again
+        grbl_sim.plug(BAY2)
+        wait_for(lambda: bay2.state != OFFLINE)
+        assert bay2.last_error is None
+        add_jobs(db, range(7, 15))
+        dispatcher.wake()
+        wait_for(lambda: set(statuses(range(7, 15)).values()) == {EngravingStatus.COMPLETED})
+        assert bay2.jobs_completed > 0
+        assert bay1.jobs_completed + bay2.jobs_completed == 14
+    finally:
+        dispatcher.stop()
+        grbl_sim.plug(BAY2)
+
+
+def test_unassignable_jobs_are_forgotten_once_no_longer_pending(db):
+    add_jobs(db, [1], svg_url="qr://250x250")
+    small = EngravingDevice("small", "sim://dispatch-small?time_scale=0.002&latency=0", qr_sizes=["50x50"])
+    dispatcher = EngravingDispatcher([small], session_factory=SessionLocal)
+
+    assert dispatcher.dispatch_once() == 0
+    assert dispatcher.unassignable == {1: "qr://250x250"}
+
+    db.query(EngravingQueue).filter(EngravingQueue.id == 1).update({"status": EngravingStatus.FAILED})
+    db.commit()
+    dispatcher.dispatch_once()
+    assert dispatcher.unassignable == {}
+
+
+def test_dispatcher_with_default_settings_leaves_jobs_to_rq_which_engraves_each_once(db, monkeypatch):
+    monkeypatch.setattr(engraving_queue, "ENGRAVING_DISPATCH", "rq")  # the default
+    monkeypatch.setenv("SERIAL_PORT", "sim://dispatch-rq?time_scale=0.002&latency=0")
+    monkeypatch.setattr(EngravingWorker, "_download_svg", lambda self, url: SMALL_JOB)
+    dispatcher = EngravingDispatcher([EngravingDevice("bay1", BAY1)], poll_interval=0.05,
+                                     worker_factory=small_job_worker, session_factory=SessionLocal)
+    with pytest.raises(RuntimeError):
+        dispatcher.start()
+
+    for job_id in range(1, 5):
+        db.add(Item(id=job_id, uid=f"UID{job_id}", component_type="EC", lot_number="L1", vendor_id=1))
+    db.commit()
+    manager = EngravingQueueManager(db)
+    job_ids = [manager.add_to_queue(f"UID{i}", "http://files/job.gcode")["job_id"] for i in range(1, 5)]
+    manager._enqueue(job_ids[0])  # a duplicate RQ job must not engrave the part again
+    engraving_queue.memory_queue.queue.join()
+
+    assert set(statuses(job_ids).values()) == {EngravingStatus.COMPLETED}
+    for job_id in job_ids:
+        engraved = db.query(EngravingHistory).filter(
+            EngravingHistory.engraving_job_id == job_id,
+            EngravingHistory.status == EngravingStatus.COMPLETED
+        ).count()
+        assert engraved == 1
+
+
+def test_start_recovers_claims_of_a_stopped_dispatcher(db):
+    add_jobs(db, range(1, 5))
+    manager = EngravingQueueManager(db)
+    manager.claim_job(1, "Assigned to engraver bay1 by dispatcher depot-a")  # this one, before a crash
+    manager.claim_job(2, "Assigned to engraver bay1 by dispatcher depot-a")
+    manager.update_job_status(2, EngravingStatus.IN_PROGRESS, "Starting engraving process")
+    manager.claim_job(3, "Assigned to engraver bay9 by dispatcher depot-b")  # alive elsewhere
+    manager.claim_job(4, "Assigned to engraver bay9 by dispatcher depot-b")
+    db.query(EngravingHistory).filter(EngravingHistory.engraving_job_id == 4).update(
+        {"created_at": datetime(2000, 1, 1)})
+    db.commit()
+
+    dispatcher = EngravingDispatcher([EngravingDevice("bay1", BAY1)], session_factory=SessionLocal,
+                                     name="depot-a", claim_timeout=3600)
+
+    assert dispatcher.recover_claims() == 3
+    assert statuses(range(1, 5)) == {
+        1: EngravingStatus.PENDING,  # only claimed: runs again
+        2: EngravingStatus.FAILED,  # was engraving: the part needs a look first
+        3: EngravingStatus.IN_PROGRESS,
+        4: EngravingStatus.PENDING
+    }
+
+
+def test_failed_job_waits_for_its_retry_delay(db, monkeypatch):
+    monkeypatch.setenv("ENGRAVE_RETRY_SECONDS", "0.3")
+    add_jobs(db, [1])
+    attempts = []
+
+    def failing_worker(device):
+        worker = EngravingDispatcher._default_worker(device)
+        worker._download_svg = lambda url: attempts.append(time.monotonic())  # no G-code: the job fails
+        return worker
+
+    dispatcher = EngravingDispatcher([EngravingDevice("bay1", BAY1)], poll_interval=0.02,
+                                     worker_factory=failing_worker, session_factory=SessionLocal)
+    dispatcher.start()
+    try:
+        wait_for(lambda: statuses([1])[1] == EngravingStatus.FAILED)
+    finally:
+        dispatcher.stop()
+
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.3
+    assert attempts[2] - attempts[1] >= 0.6
@@ -0,0 +1,44 @@
+from app.database import SessionLocal
+from app.engraving_queue import EngravingStatusWriter
+from app.models import EngravingHistory, EngravingQueue, EngravingStatus, Item
+
+
+def add_job(db, job_id):
+    db.add(Item(id=job_id, uid=f"UID{job_id}", component_type="EC", lot_number="L1", vendor_id=1))
+    db.add(EngravingQueue(id=job_id, item_uid=f"UID{job_id}", svg_url="http://files/job.gcode"))
+    db.commit()
+
+
+def test_status_writer_applies_updates_in_order(db):
+    add_job(db, 1)
+    writer = EngravingStatusWriter(SessionLocal)
+
+    writer.update_job_status(1, EngravingStatus.IN_PROGRESS, "Starting")
+    writer.update_job_status(1, EngravingStatus.PENDING, "Attempt 1 failed", attempts=1)
+    writer.update_job_status(1, EngravingStatus.IN_PROGRESS, "Starting again")
+    writer.update_job_status(1, EngravingStatus.COMPLETED, "Done")
+    writer.flush()
+
+    history = db.query(EngravingHistory).filter(EngravingHistory.engraving_job_id == 1) \
+        .order_by(EngravingHistory.id).all()
+    assert [h.message for h in history] == ["Starting", "Attempt 1 failed", "Starting again", "Done"]
+    job = db.get(EngravingQueue, 1)
+    assert job.status == EngravingStatus.COMPLETED
+    assert job.attempts == 1
+    assert writer.writes == 4 and writer.errors == 0
+    writer.stop()
+
+
+def test_status_writer_stop_writes_everything_queued(db):
+    add_job(db, 1)
+    writer = EngravingStatusWriter(SessionLocal)
+    for number in range(20):
+        writer.update_job_status(1, EngravingStatus.IN_PROGRESS, f"Progress {number}")
+    writer.update_job_status(999, EngravingStatus.COMPLETED, "Unknown job")
+
+    writer.stop()
+
+    assert not writer._worker_thread.is_alive()
+    assert writer.queue.empty()
+    assert db.query(EngravingHistory).filter(EngravingHistory.engraving_job_id == 1).count() == 20
+    assert writer.writes == 21  # an unknown job is logged by the manager, not an error
@@ -0,0 +1,135 @@
+from app import grbl_sim
+from app.engraving_worker import EngravingWorker
+from app.models import EngravingHistory, EngravingQueue, EngravingStatus, Item
+
+SMALL_JOB = "\n".join(grbl_sim.sample_raster(4, 4, 0.5))
+
+
+def add_jobs(db, job_ids, svg_url="http://files/job.gcode"):
+    for job_id in job_ids:
+        db.add(Item(id=job_id, uid=f"UID{job_id}", component_type="EC", lot_number="L1", vendor_id=1))
+        db.add(EngravingQueue(id=job_id, item_uid=f"UID{job_id}", svg_url=svg_url))
+    db.commit()
+
+
+def make_worker(port, gcode=SMALL_JOB):
+    worker = EngravingWorker(serial_port=port)
+    worker._download_svg = lambda url: gcode
+    return worker
+
+
+def test_job_turns_on_laser_mode(db):
+    port = "sim://worker-laser-mode?time_scale=0.002&latency=0"
+    grbl_sim._eeprom["sim://worker-laser-mode"] = {"$32": 0.0, "$130": 200.0, "$131": 200.0, "$132": 200.0}
+    add_jobs(db, [1])
+
+    result = make_worker(port).process_job(1)
+
+    assert result["status"] == "success"
+    assert grbl_sim._eeprom["sim://worker-laser-mode"]["$32"] == 1.0
+    db.expire_all()
+    assert db.get(EngravingQueue, 1).status == EngravingStatus.COMPLETED
+
+
+def test_prefetch_error_fails_only_that_job(db):
+    port = "sim://worker-prefetch?time_scale=0.002&latency=0"
+    add_jobs(db, [1, 3])
+    add_jobs(db, [2], svg_url="http://files/too-wide.gcode")
+    worker = make_worker(port)
+    worker._download_svg = lambda url: "G90\nG0 X900 Y10" if "too-wide" in url else SMALL_JOB
+
+    result = worker.process_jobs([1, 2, 3])
+
+    assert [r["status"] for r in result["results"]] == ["success", "error", "success"]
+    db.expire_all()
+    failed = db.get(EngravingQueue, 2)
+    # Validation errors are deterministic: failed on the first attempt, no retry scheduled
+    assert failed.status == EngravingStatus.FAILED
+    assert failed.attempts == 1
+    assert result["results"][1]["retry_delay"] is None
+    messages = [h.message for h in db.query(EngravingHistory).filter(EngravingHistory.engraving_job_id == 2)]
+    assert any(m.startswith("Invalid G-code") and "X900" in m for m in messages)
+    assert db.get(EngravingQueue, 1).status == EngravingStatus.COMPLETED
+    assert db.get(EngravingQueue, 3).status == EngravingStatus.COMPLETED
+
+
+def test_batch_stops_at_first_device_error(db):
+    port = "sim://worker-unplugged?time_scale=0.002&latency=0"
+    add_jobs(db, [1, 2, 3])
+    grbl_sim.unplug(port)
+    try:
+        result = make_worker(port).process_jobs([1, 2, 3])
+    finally:
+        grbl_sim.plug(port)
+
+    assert [r["job_id"] for r in result["results"]] == [1]
+    assert result["results"][0]["device_error"]
+    db.expire_all()
+    assert db.get(EngravingQueue, 1).status == EngravingStatus.PENDING
+    assert db.get(EngravingQueue, 1).attempts == 0
+    # The rest of the batch was never started
+    assert db.query(EngravingHistory).filter(EngravingHistory.engraving_job_id.in_([2, 3])).count() == 0
+
+
+def test_batch_skips_jobs_that_are_no_longer_pending(db):
+    port = "sim://worker-claim?time_scale=0.002&latency=0"
+    add_jobs(db, [1, 2, 3])
+    db.get(EngravingQueue, 2).status = EngravingStatus.COMPLETED
+    db.get(EngravingQueue, 3).status = EngravingStatus.IN_PROGRESS  # e.g. taken by the dispatcher
+    db.commit()
+    worker = make_worker(port)
+    engraved = []
+    run_job = worker._run_job
+    worker._run_job = lambda job, load_gcode: engraved.append(job.id) or run_job(job, load_gcode)
+
+    result = worker.process_jobs([1, 2, 3])
+
+    assert engraved == [1]
+    assert [r["status"] for r in result["results"]] == ["success", "skipped", "skipped"]
+    assert result["status"] == "success"
+    db.expire_all()
+    assert db.get(EngravingQueue, 2).status == EngravingStatus.COMPLETED
+    assert db.get(EngravingQueue, 3).status == EngravingStatus.IN_PROGRESS
+
+
+def test_batch_of_queued_items(db):
+    from app.engraving_queue import EngravingQueueManager
+
+    port = "sim://worker-batch?time_scale=0.002&latency=0"
+    for number in (1, 2):
+        db.add(Item(uid=f"UID{number}", component_type="EC", lot_number="L1", vendor_id=1))
+    db.commit()
+    batch = EngravingQueueManager(db).add_batch_to_queue(["UID1", "UID2"], "http://files/job.gcode")
+
+    result = make_worker(port).process_batch(batch["job_ids"])
+
+    assert [r["job_id"] for r in result["results"]] == batch["job_ids"]
+    assert result["status"] == "success"
+    db.expire_all()
+    assert {db.get(EngravingQueue, job_id).status for job_id in batch["job_ids"]} == {EngravingStatus.COMPLETED}
+
+
+def test_generate_qr_code_queues_a_compiled_job(db):
+    db.add(Item(uid="UID1", component_type="EC", lot_number="L1", vendor_id=1))
+    db.commit()
+    worker = EngravingWorker(serial_port="sim://worker-qr")
+
+    assert worker.generate_qr_code("UID1", "12x12")["status"] == "error"
+    queued = worker.generate_qr_code("UID1", "50x50")
+
+    assert queued["status"] == "success"
+    assert worker.fetch_qr_codes([queued["job_id"]]) == [
+        {"id": queued["job_id"], "item_uid": "UID1", "status": "pending", "svg_url": "qr://50x50"}
+    ]
+
+
+def test_connect_per_job_uses_the_reset_delay(db, monkeypatch):
+    monkeypatch.setenv("GRBL_PERSISTENT_SESSION", "false")
+    monkeypatch.setenv("GRBL_RESET_DELAY", "0.25")
+    worker = EngravingWorker(serial_port="sim://worker-reset-delay?time_scale=0.002&latency=0")
+
+    worker._connect_serial()
+    try:
+        assert worker.session.reset_delay == 0.25
+    finally:
+        worker._disconnect_serial(keep_open=False)
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from app.gcode_optimizer import burned_geometry, optimize_gcode, parse_gcode
+from app.grbl_sim import sample_raster
+
+
+def qr_matrix(size=21, seed=3):
+    rng = random.Random(seed)
+    return [[rng.random() < 0.5 for _ in range(size)] for _ in range(size)]
+
+
+def laser_off_per_travel(matrix, module=1.0):
+    """One burn per dark run, the laser switched on and off around each (as the web front end writes it),
+    with the runs in shuffled order."""
+    marks = []
+    for row, cells in enumerate(matrix):
+        col = 0
+        while col < len(cells):
+            if not cells[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(cells) and cells[col]:
+                col += 1
+            y = row * module
+            marks.append([f"G0 X{start * module:.3f} Y{y:.3f} F3000", "M4 S600",
+                          f"G1 X{col * module:.3f} Y{y:.3f} F800", "M5"])
+    random.Random(1).shuffle(marks)
+    lines = ["G21 ; mm", "G90", "G94", "M5", "G0 X0 Y0"]
+    return "\n".join(lines + [line for mark in marks for line in mark] + ["M5", "G0 X0 Y0"])
+
+
+def laser_mode(matrix, module=1.0):
+    """GRBL laser mode ($32=1): M4 stays on, travels are G1 at S0, rows alternate direction."""
+    lines = ["G21", "G90", "G0 X0 Y0", "M4 S0", "F1000"]
+    for row, cells in enumerate(matrix):
+        cols = range(len(cells)) if row % 2 else range(len(cells) - 1, -1, -1)
+        for col in cols:
+            x = col * module if row % 2 else (col + 1) * module
+            step = module if row % 2 else -module
+            lines.append(f"G1 X{x:.3f} Y{row * module:.3f} S0")
+            if cells[col]:
+                lines.append(f"G1 X{x + step:.3f} S800")
+    return "\n".join(lines + ["M5", "G0 X0 Y0"])
+
+
+@pytest.mark.parametrize("gcode", [
+    laser_off_per_travel(qr_matrix()),
+    laser_mode(qr_matrix()),
+    "\n".join(sample_raster(15, 15, 0.5)),
+], ids=["laser-off-per-travel", "laser-mode", "sample-raster"])
+def test_optimized_program_burns_the_same_geometry(gcode):
+    optimized, report = optimize_gcode(gcode)
+
+    assert report["optimized"], report["reason"]
+    assert optimized != gcode
+    assert burned_geometry(parse_gcode(optimized)) == burned_geometry(parse_gcode(gcode))
+
+
+@pytest.mark.parametrize("unsupported", [
+    "G2 X5 Y5 I2.5 J0 F800",
+    "G91",
+    "G0 X5 Y5 Z1",
+])
+def test_unsupported_program_is_returned_unchanged(unsupported):
+    lines = laser_off_per_travel(qr_matrix(9)).splitlines()
+    gcode = "\n".join(lines[:12] + [unsupported] + lines[12:])
+
+    optimized, report = optimize_gcode(gcode)
+
+    assert optimized == gcode
+    assert not report["optimized"]
+    assert report["reason"]
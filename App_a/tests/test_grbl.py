@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from app.grbl import GrblAlarm, GrblError, GrblStreamer, validate_gcode
+from app.grbl_sim import SimulatedGrbl, sample_raster
+
+
+@pytest.fixture
+def controller():
+    device = SimulatedGrbl(time_scale=0.001, latency=0.001, timeout=0.2)
+    streamer = GrblStreamer(device, rx_buffer_size=device.rx_buffer_size, ack_timeout=10)
+    streamer.start()
+    assert streamer.wait_for_banner(2)
+    yield device, streamer
+    streamer.stop()
+    device.close()
+
+
+def test_stream_keeps_rx_buffer_from_overflowing(controller):
+    device, streamer = controller
+    lines = sample_raster(12, 12, 0.5)
+
+    result = streamer.stream(lines)
+
+    assert result["lines"] == len(lines)
+    assert result["errors"] == []
+    assert device.stats["rx_overflows"] == 0
+    assert device.stats["errors"] == 0
+    assert device.stats["lines"] == len(lines)
+
+
+def test_error_response_raises_for_the_rejected_line(controller):
+    device, streamer = controller
+    lines = ["G21", "G90", "G0 X1 Y1", "G0 X999 Y1 ; past the 200 mm travel", "G0 X2 Y2"]
+
+    with pytest.raises(GrblError) as error:
+        streamer.stream(lines)
+
+    assert error.value.code == 15
+    assert error.value.line == "G0 X999 Y1"
+    assert error.value.line_number == 4
+
+
+def test_alarm_stops_streaming(controller):
+    device, streamer = controller
+    device.time_scale = 1.0  # slow enough that the job is still streaming when the alarm comes
+    threading.Timer(0.2, device.trigger_alarm, args=(1,)).start()
+
+    with pytest.raises(GrblAlarm) as alarm:
+        streamer.stream(sample_raster(25, 25, 0.5))
+
+    assert alarm.value.code == 1
+    assert streamer.alarm == 1
+
+
+def test_wait_until_idle_returns_once_motion_ends(controller):
+    device, streamer = controller
+    device.time_scale = 0.2  # about half a second of motion
+    streamer.stream(["G21", "G90", "F1200", "G1 X20 Y0", "G1 X20 Y20", "G0 X0 Y0"])
+    assert streamer.query_status()["state"] == "Run"
+
+    started = time.monotonic()
+    streamer.wait_until_idle(timeout=10, poll_interval=0.01)
+
+    assert time.monotonic() - started < 5
+    assert streamer.query_status()["state"] == "Idle"
+    assert device.position == [0.0, 0.0, 0.0]
+
+
+def test_validate_gcode_counts_line_length_without_spaces():
+    long_line = "G1" + " X1.00" * 14  # 86 characters, 72 without spaces
+    assert validate_gcode(long_line) == [long_line]
+
+    with pytest.raises(ValueError, match="longer than the controller's 79 characters"):
+        validate_gcode("G1" + "X1.0" * 20)  # 82 characters
+    assert validate_gcode("G1" + "X1.0" * 19 + " ; comments do not count")
+
+
+def test_validate_gcode_rejects_moves_outside_the_work_area():
+    with pytest.raises(ValueError, match="Line 3 moves Y to 260"):
+        validate_gcode("G21\nG90\nG0 X10 Y260", max_travel=(250.0, 250.0))
+    with pytest.raises(ValueError, match="moves X to -260"):
+        validate_gcode("G0 X-260 Y0", max_travel=(250.0, 250.0))
+    assert validate_gcode("G0 X250 Y250", max_travel=(250.0, 250.0)) == ["G0 X250 Y250"]
+
+
+def test_validate_gcode_skips_travel_check_for_relative_moves_and_offsets():
+    relative = "G90\nG0 X200 Y200\nG91\nG0 X100 Y100\nG90"
+    assert len(validate_gcode(relative, max_travel=(250.0, 250.0))) == 5
+    with pytest.raises(ValueError):
+        validate_gcode(relative + "\nG0 X300", max_travel=(250.0, 250.0))
+
+    offset = "G92 X0 Y0\nG0 X400 Y400"
+    assert validate_gcode(offset, max_travel=(250.0, 250.0)) == ["G92 X0 Y0", "G0 X400 Y400"]
+
+
+def test_validate_gcode_rejects_empty_programs():
+    with pytest.raises(ValueError, match="empty"):
+        validate_gcode("; only a comment\n\n(another)")
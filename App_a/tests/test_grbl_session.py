@@ -0,0 +1,103 @@
+import pytest
+
+from app import grbl_sim
+from app.grbl_session import GrblSession
+
+PORT = "sim://session?time_scale=0.002&latency=0"
+
+
+@pytest.fixture
+def session():
+    grbl_sim._eeprom.pop("sim://session", None)
+    session = GrblSession(PORT, reset_delay=0.5, health_timeout=0.5)
+    yield session
+    session.close()
+    grbl_sim.plug(PORT)
+
+
+def run_job(session, lines=None):
+    streamer = session.acquire(timeout=1)
+    try:
+        streamer.stream(lines or grbl_sim.sample_raster(4, 4, 0.5))
+        streamer.wait_until_idle(timeout=5)
+    finally:
+        session.release()
+
+
+def test_settings_already_on_the_controller_are_not_written(session):
+    wanted = {"$32": 1.0, "$130": 250.0, "$131": 250.0}
+    session.acquire(timeout=1)
+    try:
+        assert session.apply_settings(wanted) == wanted
+        assert session.apply_settings(wanted) == {}
+    finally:
+        session.release()
+    assert session.stats["settings_written"] == 3
+    assert session.stats["settings_skipped"] == 3
+
+    # A new connection reads the settings back from the controller's EEPROM
+    session.close()
+    session.acquire(timeout=1)
+    try:
+        assert session.apply_settings(wanted) == {}
+        assert session.apply_settings({"$130": 300.0}) == {"$130": 300.0}
+    finally:
+        session.release()
+    assert grbl_sim._eeprom["sim://session"]["$130"] == 300.0
+
+
+def test_jobs_share_one_connection(session):
+    run_job(session)
+    run_job(session)
+
+    assert session.stats["connects"] == 1
+    assert session.stats["reconnects"] == 0
+    assert session.stats["jobs"] == 2
+
+
+def test_reconnects_after_unplug(session):
+    run_job(session)
+    grbl_sim.unplug(PORT)
+
+    with pytest.raises(OSError):
+        session.acquire(timeout=1)
+    assert not session.is_connected
+
+    grbl_sim.plug(PORT)
+    run_job(session)
+    assert session.stats["connects"] == 2
+    assert session.stats["reconnects"] == 1
+
+
+def test_reconnects_after_alarm(session):
+    run_job(session)
+    first = session.connection
+    first.trigger_alarm(1)
+
+    run_job(session)
+
+    assert session.connection is not first
+    assert not first.is_open
+    assert session.streamer.alarm is None
+    assert session.stats["connects"] == 2
+    assert session.stats["reconnects"] == 1
+
+
+def test_connect_waits_for_the_boot_banner():
+    session = GrblSession("sim://session-boot?time_scale=0.002&latency=0&boot=0.3", reset_delay=1.0)
+    try:
+        run_job(session)
+    finally:
+        session.close()
+
+    # Long enough for the banner, not the whole reset_delay
+    assert 0.3 <= session.stats["connect_s"] < 1.0
+
+
+def test_session_benchmark_connects_once_when_persistent():
+    results = grbl_sim.run_session_benchmark(grbl_sim.sample_raster(4, 4, 0.5), jobs=3,
+                                             time_scale=0.002, latency=0, boot_s=0.2, reset_delay=1.0)
+
+    assert results["per_job"]["connects"] == 3
+    assert results["persistent"]["connects"] == 1
+    assert results["persistent"]["elapsed_s"] < results["per_job"]["elapsed_s"]
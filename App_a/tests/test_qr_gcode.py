@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from app.gcode_optimizer import parse_gcode
+from app.qr_gcode import MachineProfile, QrGcodeCache, compile_qr_gcode, qr_matrix
+
+
+def rasterise(gcode, modules, size_mm, profile):
+    """Module matrix burned by a program: a module is dark when its centre lies on a burn,
+    and the burns of each module row must match on every one of its scanlines."""
+    module_mm = size_mm / modules
+    x0, y0 = profile.origin
+    scanlines = {}
+    for move in parse_gcode(gcode).moves:
+        if not move.burns:
+            continue
+        (sx, sy), (ex, ey) = move.start, move.end
+        assert sy == ey, "burns run along scanlines"
+        assert move.feed == profile.feed_rate and move.power == profile.laser_power
+        low, high = sorted((sx, ex))
+        burned = scanlines.setdefault(sy, set())
+        for col in range(modules):
+            centre = x0 + (col + 0.5) * module_mm
+            if low < centre < high:
+                burned.add(col)
+
+    matrix = [[False] * modules for _ in range(modules)]
+    rows = {}
+    for y, cols in scanlines.items():
+        row = int((y0 + size_mm - y) / module_mm)
+        rows.setdefault(row, []).append(cols)
+    for row, lines in rows.items():
+        assert all(cols == lines[0] for cols in lines), f"scanlines of row {row} differ"
+        for col in lines[0]:
+            matrix[row][col] = True
+    return matrix, rows
+
+
+@pytest.mark.parametrize("matrix", [
+    qr_matrix("UID-0001"),
+    [[random.Random(5).random() < 0.5 for _ in range(25)] for _ in range(25)]
+])
+def test_compiled_program_burns_exactly_the_dark_modules(matrix):
+    profile = MachineProfile(origin=(10.0, 20.0), max_travel=(200.0, 200.0))
+    size_mm = 50.0
+
+    gcode = compile_qr_gcode(matrix, size_mm, profile)
+    burned, rows = rasterise(gcode, len(matrix), size_mm, profile)
+
+    assert burned == [[bool(dark) for dark in row] for row in matrix]
+    lines_per_module = max(1, round(size_mm / len(matrix) * profile.lines_per_mm))
+    assert all(len(lines) == lines_per_module for lines in rows.values())
+    # Nothing is burned outside the symbol
+    for move in parse_gcode(gcode).moves:
+        if move.burns:
+            assert 10.0 <= min(move.start[0], move.end[0]) and max(move.start[0], move.end[0]) <= 60.0
+
+
+def test_program_that_does_not_fit_is_rejected():
+    with pytest.raises(ValueError, match="does not fit"):
+        compile_qr_gcode(qr_matrix("UID-0001"), 100.0, MachineProfile(origin=(160.0, 0.0), max_travel=(250.0, 250.0)))
+
+
+def test_cache_misses_when_the_profile_changes(tmp_path):
+    cache = QrGcodeCache(directory=str(tmp_path))
+    profile = MachineProfile(feed_rate=800.0)
+
+    first = cache.get("UID-0001", "50x50", profile)
+    assert cache.get("UID-0001", "50x50", MachineProfile(feed_rate=800.0)) == first
+    assert cache.stats == {"hits": 1, "disk_hits": 0, "misses": 1}
+
+    faster = cache.get("UID-0001", "50x50", MachineProfile(feed_rate=1200.0))
+    assert cache.stats["misses"] == 2
+    assert faster != first and "F1200" in faster
+
+    # Another process with the same cache directory reuses both compilations
+    other = QrGcodeCache(directory=str(tmp_path))
+    assert other.get("UID-0001", "50x50", profile) == first
+    assert other.get("UID-0001", "50x50", MachineProfile(feed_rate=1200.0)) == faster
+    assert other.stats == {"hits": 0, "disk_hits": 2, "misses": 0}
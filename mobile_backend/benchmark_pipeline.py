@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Inspection Pipeline Benchmark
+=============================
+Replays recorded JPEGs or synthetic images through the inspection pipeline,
+either in-process (`InspectionPipeline.inspect`) or through the HTTP
+endpoints of a running backend, at one or more concurrency levels.
+
+Reports p50/p95/p99 latency, throughput, the pipeline's per-stage timings
+and peak RSS, and writes everything to a JSON file that can be compared
+between commits:
+
+    # In-process, synthetic images at three resolutions
+    python benchmark_pipeline.py --synthetic 640x480,1280x720,4032x3024 \\
+        --concurrency 1,4 --output bench_before.json
+    
+    # Recorded field photos against a running server's upload endpoint
+    python benchmark_pipeline.py --images ~/field_photos --target http \\
+        --url http://localhost:8000 --endpoint upload --concurrency 1,8
+    
+    # Fail if p95 latency regressed by more than 10% against a baseline
+    python benchmark_pipeline.py --synthetic 1280x720 --compare bench_before.json
+
+Against a server, every request sends distinct bytes (a JPEG comment or PNG
+text chunk carrying a request counter) so the result cache cannot answer
+it. Responses that still come from the cache are counted and reported
+separately, never in the latency and stage figures.
+"""
+
+import argparse
+import base64
+import io
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+ENDPOINTS = {
+    'base64': '/api/inspect-component',
+    'upload': '/api/inspect-component/upload',
+    'detect': '/api/detect-components-base64'
+}
+
+# Configuration that changes pipeline performance, recorded with every run
+CONFIG_PREFIXES = ('PIPELINE_', 'INFERENCE_', 'ONNX_', 'MODEL_', 'TORCH_', 'OMP_')
+
+
+def latency_summary(values: List[float]) -> Dict:
+    """Average and p50/p95/p99/max of a list of latencies in milliseconds."""
+    if not values:
+        return {'count': 0, 'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    values = sorted(values)
+    
+    def percentile(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))], 2)
+    
+    return {
+        'count': len(values),
+        'avg': round(sum(values) / len(values), 2),
+        'p50': percentile(0.50),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'max': round(values[-1], 2)
+    }
+
+
+def peak_rss_mb() -> Dict:
+    """Peak resident memory of this process and of its (finished) child processes."""
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 1e6, 1)
+    }
+
+
+def process_peak_rss_mb(pid: int) -> float:
+    """Peak resident memory of another process (e.g. the server), from /proc."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) * 1024 / 1e6, 1)
+    except OSError:
+        pass
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Workloads
+# ---------------------------------------------------------------------------
+
+def synthetic_image(width: int, height: int, seed: int, quality: int = 90) -> bytes:
+    """
+    A JPEG with smooth structure plus noise, so it compresses like a photo
+    rather than like pure noise or a flat colour.
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        127 + 100 * np.sin(x / (width / (3 + c)) + y / (height / (2 + c)) + rng.uniform(0, 6))
+        for c in range(3)
+    ], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def load_workload(args) -> List[Tuple[str, bytes]]:
+    """(name, JPEG bytes) pairs: recorded images, or synthetic ones per resolution."""
+    if args.images:
+        paths = sorted(
+            p for p in Path(args.images).expanduser().iterdir()
+            if p.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        )[:args.limit or None]
+        if not paths:
+            raise SystemExit(f"❌ No images found in {args.images}")
+        return [(p.name, p.read_bytes()) for p in paths]
+    
+    images = []
+    for resolution in args.synthetic.split(','):
+        width, height = (int(v) for v in resolution.lower().split('x'))
+        for i in range(args.per_resolution):
+            images.append((f'synthetic_{width}x{height}_{i}', synthetic_image(width, height, seed=i)))
+    return images
+
+
+_request_counter = itertools.count()
+
+
+def unique_image(image: bytes, marker: int) -> bytes:
+    """
+    The same image with a marker embedded, so its bytes (and result cache key)
+    differ from every other request while it decodes to identical pixels.
+    """
+    text = f'benchmark request {marker}'.encode()
+    if image[:2] == b'\xff\xd8':
+        # JPEG comment segment right after the start-of-image marker
+        return image[:2] + b'\xff\xfe' + (len(text) + 2).to_bytes(2, 'big') + text + image[2:]
+    if image[:8] == b'\x89PNG\r\n\x1a\n':
+        # tEXt chunk after the 25-byte IHDR chunk
+        data = b'Comment\x00' + text
+        chunk = len(data).to_bytes(4, 'big') + b'tEXt' + data + zlib.crc32(b'tEXt' + data).to_bytes(4, 'big')
+        return image[:33] + chunk + image[33:]
+    raise ValueError("Only JPEG and PNG images can be made unique")
+
+
+# ---------------------------------------------------------------------------
+# Targets: each returns a callable running one request and returning its result dict
+# ---------------------------------------------------------------------------
+
+def pipeline_target(args) -> Callable[[bytes], Dict]:
+    """Run `InspectionPipeline.inspect` in this process."""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from pipeline import InspectionPipeline
+    
+    pipeline = InspectionPipeline(detect_mode=args.detect_mode)
+    pipeline.initialize()
+    return lambda image: pipeline.inspect(image, args.component_type, args.hint)
+
+
+def http_target(args) -> Callable[[bytes], Dict]:
+    """POST to one of the backend's inspection endpoints."""
+    url = args.url.rstrip('/') + ENDPOINTS[args.endpoint]
+    
+    def run(image: bytes) -> Dict:
+        if args.endpoint == 'upload':
+            query = '&'.join(f'{k}={v}' for k, v in (('component_type', args.component_type),
+                                                     ('expected_component', args.hint)) if v)
+            request = urllib.request.Request(url + (f'?{query}' if query else ''), data=image,
+                                             headers={'Content-Type': 'image/jpeg'})
+        else:
+            body = {'image_base64': base64.b64encode(image).decode()}
+            if args.endpoint == 'base64':
+                body.update(component_type=args.component_type, expected_component=args.hint)
+            request = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                             headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=args.timeout) as response:
+            return json.loads(response.read())
+    
+    return run
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_level(run: Callable[[bytes], Dict], images: List[Tuple[str, bytes]],
+              concurrency: int, requests: int, unique: bool = False) -> Dict:
+    """
+    Send `requests` requests with `concurrency` in flight and summarize them.
+    
+    With `unique`, every request's bytes differ (see `unique_image`). Results
+    marked 'cached' are left out of the latency, workload and stage figures
+    and summarized under 'cached_latency_ms'.
+    """
+    latencies = []
+    cached_latencies = []
+    by_image = {}
+    stages = {}
+    errors = []
+    lock = threading.Lock()
+    
+    def one(i: int):
+        name, image = images[i % len(images)]
+        if unique:
+            image = unique_image(image, next(_request_counter))
+        started = time.perf_counter()
+        try:
+            result = run(image)
+            error = None
+        except Exception as e:
+            result, error = {}, f"{type(e).__name__}: {e}"
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            if error is not None:
+                errors.append(error)
+                return
+            if result.get('cached'):
+                cached_latencies.append(elapsed_ms)
+                return
+            latencies.append(elapsed_ms)
+            by_image.setdefault(name.rsplit('_', 1)[0] if name.startswith('synthetic_') else 'recorded', []).append(elapsed_ms)
+            for stage, value in (result.get('timings') or {}).items():
+                if value is not None:
+                    stages.setdefault(stage, []).append(value)
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall_s = time.perf_counter() - started
+    
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'cached': len(cached_latencies),
+        'wall_s': round(wall_s, 3),
+        'throughput_rps': round(len(latencies) / wall_s, 2) if wall_s else 0.0,
+        'latency_ms': latency_summary(latencies),
+        'cached_latency_ms': latency_summary(cached_latencies),
+        'latency_by_workload_ms': {name: latency_summary(values) for name, values in sorted(by_image.items())},
+        'stages_ms': {stage: latency_summary(values) for stage, values in sorted(stages.items())}
+    }
+
+
+def git_revision() -> str:
+    """Commit the benchmark ran against (with '-dirty' for uncommitted changes)."""
+    try:
+        root = Path(__file__).parent
+        revision = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--', '.'], cwd=root) != 0
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict, baseline: Dict, threshold_pct: float) -> bool:
+    """Print per-level deltas against a baseline report; False if p95 regressed beyond the threshold."""
+    baseline_levels = {level['concurrency']: level for level in baseline.get('levels', [])}
+    ok = True
+    print(f"\n📊 Compared with {baseline.get('git_revision')} ({baseline.get('created_at')})")
+    for level in report['levels']:
+        before = baseline_levels.get(level['concurrency'])
+        if before is None:
+            continue
+        for metric, higher_is_better in (('p50', False), ('p95', False), ('throughput_rps', True)):
+            old = before['throughput_rps'] if metric == 'throughput_rps' else before['latency_ms'][metric]
+            new = level['throughput_rps'] if metric == 'throughput_rps' else level['latency_ms'][metric]
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change < -threshold_pct if higher_is_better else change > threshold_pct
+            if worse and metric == 'p95':
+                ok = False
+            print(f"  c={level['concurrency']:<3} {metric:<15} {old:>10.2f} → {new:>10.2f}  "
+                  f"({change:+.1f}%){'  ⚠️' if worse else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inspection pipeline")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--images", type=str, default=None,
+                        help="Directory of recorded JPEG/PNG images to replay")
+    source.add_argument("--synthetic", type=str, default="640x480,1280x720,1920x1080",
+                        help="Comma-separated WIDTHxHEIGHT list of synthetic image sizes")
+    parser.add_argument("--per-resolution", type=int, default=4,
+                        help="Synthetic images per resolution")
+    parser.add_argument("--limit", type=int, default=0,
+                        help="Use at most this many recorded images (0 = all)")
+    
+    parser.add_argument("--target", type=str, default="pipeline", choices=["pipeline", "http"],
+                        help="Run in-process or against a running server")
+    parser.add_argument("--url", type=str, default="http://localhost:8000",
+                        help="Server base URL (http target)")
+    parser.add_argument("--endpoint", type=str, default="base64", choices=sorted(ENDPOINTS),
+                        help="Endpoint to call (http target)")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="Per-request timeout in seconds (http target)")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="Server process to read peak RSS from (http target)")
+    parser.add_argument("--repeat-bytes", action="store_true",
+                        help="Resend identical bytes (http target), e.g. to measure result-cache hits")
+    
+    parser.add_argument("--concurrency", type=str, default="1,4",
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="Requests per level (default: 2 passes over the images, at least 8 per worker)")
+    parser.add_argument("--warmup", type=int, default=3,
+                        help="Untimed requests before the first level")
+    parser.add_argument("--component-type", type=str, default=None,
+                        help="Force a component type ('erc', 'sleeper', ...)")
+    parser.add_argument("--hint", type=str, default=None,
+                        help="Expected component (routes detection to its detector first)")
+    parser.add_argument("--detect-mode", type=str, default=None,
+                        choices=["sequential", "concurrent", "fused"],
+                        help="Pipeline detect mode (pipeline target)")
+    
+    parser.add_argument("--output", type=str, default="benchmark_results.json",
+                        help="Where to write the JSON report")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="p95 regression (percent) that fails --compare")
+    args = parser.parse_args()
+    
+    images = load_workload(args)
+    levels = [int(c) for c in args.concurrency.split(',')]
+    print(f"🖼️  {len(images)} images, {sum(len(image) for _, image in images) / 1e6:.1f} MB total")
+    
+    run = pipeline_target(args) if args.target == 'pipeline' else http_target(args)
+    for i in range(args.warmup):
+        run(images[i % len(images)][1])
+    
+    unique = args.target == 'http' and not args.repeat_bytes
+    results = []
+    for concurrency in levels:
+        requests = args.requests or max(2 * len(images), 8 * concurrency)
+        level = run_level(run, images, concurrency, requests, unique=unique)
+        results.append(level)
+        latency = level['latency_ms']
+        print(f"⏱️  c={concurrency:<3} {level['throughput_rps']:>7.2f} req/s  "
+              f"p50 {latency['p50']:>8.1f} ms  p95 {latency['p95']:>8.1f} ms  p99 {latency['p99']:>8.1f} ms  "
+              f"errors {level['errors']}  cached {level['cached']}")
+        for stage, summary in level['stages_ms'].items():
+            print(f"     {stage:<14} p50 {summary['p50']:>8.1f} ms  p95 {summary['p95']:>8.1f} ms")
+    
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'target': args.target,
+        'endpoint': ENDPOINTS[args.endpoint] if args.target == 'http' else None,
+        'workload': {
+            'source': str(args.images) if args.images else f'synthetic:{args.synthetic}',
+            'images': len(images),
+            'bytes': sum(len(image) for _, image in images),
+            'component_type': args.component_type,
+            'hint': args.hint,
+            'unique_bytes': unique
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {k: v for k, v in sorted(os.environ.items()) if k.startswith(CONFIG_PREFIXES)}
+        },
+        'levels': results,
+        'peak_rss_mb': {
+            **peak_rss_mb(),
+            'server': process_peak_rss_mb(args.server_pid) if args.server_pid else None
+        }
+    }
+    
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {args.output} (peak RSS {report['peak_rss_mb']['self']} MB)")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.threshold):
+            print(f"❌ p95 latency regressed by more than {args.threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,30 +3,81 @@ Mobile Scanning Backend - Simple FastAPI server for RailChinh Flutter App
 With YOLO Detection and Multi-Model Inspection Pipeline
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import hashlib
+import hmac
+import time
 from datetime import datetime
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Enum, Text, Float
+from sqlalchemy import create_engine, event, insert, update, or_, tuple_, Index, Column, Integer, String, Boolean, DateTime, Enum, Text, Float
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.exc import IntegrityError
 import enum
 import io
 from PIL import Image
 import numpy as np
 import base64
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 
 # Import inspection pipeline
 try:
-    from pipeline import get_pipeline, InspectionPipeline
+    from pipeline import get_pipeline, get_batcher, get_result_cache, weights_fingerprint, InspectionPipeline
+    from pipeline import get_inference_executor, InferenceTimeout
+    from pipeline.executor import inspect_task, predict_boxes_task, status_task, predict_boxes, max_box_confidence
+    from pipeline.resolution import get_resolution_ladder
+    from pipeline.admission import get_admission_controller, AdmissionRejected
+    from pipeline.registry import get_model_registry, resolve_model_path
+    from pipeline.detector import load_yolo
+    from pipeline import reload_models, get_model_store, component_type_from_name
+    from pipeline.stats import LatencyTracker
+    from pipeline.metrics import (
+        get_metrics_registry, start_request_spans, record_span, record_timings, format_timing_header
+    )
     PIPELINE_AVAILABLE = True
 except ImportError:
     PIPELINE_AVAILABLE = False
+    InferenceTimeout = TimeoutError
     print("⚠️ Pipeline module not available")
 
+    # Stand-ins so the legacy detection endpoints keep working without the pipeline package
+    def record_span(name, duration_ms):
+        pass
+
+    def record_timings(timings):
+        pass
+
+    def get_resolution_ladder():
+        return None
+
+    def resolve_model_path(relative_path, extra_candidates=()):
+        from pathlib import Path
+        for candidate in [Path(__file__).parent.parent / relative_path, *extra_candidates]:
+            if candidate.exists():
+                return candidate.resolve()
+        return None
+
+    def load_yolo(model_path):
+        from ultralytics import YOLO
+        return YOLO(str(model_path))
+
+    # Detection runs on asyncio.to_thread; YOLO predictors are not thread-safe
+    _predict_lock = threading.Lock()
+
+    def predict_boxes(model, img_array, conf, imgsz=None):
+        kwargs = {'imgsz': imgsz} if imgsz is not None else {}
+        with _predict_lock:
+            results = model.predict(source=img_array, conf=conf, save=False, verbose=False, **kwargs)
+        return [
+            result.boxes.xyxy[i].tolist() + [float(result.boxes.conf[i]), int(result.boxes.cls[i])]
+            for result in results for i in range(len(result.boxes))
+        ]
+
 # Database setup
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -74,6 +125,9 @@ class Item(Base):
     qr_image_url = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Keyset pagination of the item list (see migrate_add_pagination_indexes.py)
+    __table_args__ = (Index("ix_items_created_at_id", "created_at", "id"),)
 
 # Pydantic Models
 class LoginRequest(BaseModel):
@@ -93,6 +147,17 @@ class InspectionRequest(BaseModel):
     remark: str
     inspector_id: Optional[int] = None
 
+class SyncInspection(BaseModel):
+    idempotency_key: str  # Generated by the app when the inspection is queued
+    qr_id: str
+    status: str
+    remark: str = ""
+    inspector_id: Optional[int] = None
+    inspected_at: Optional[datetime] = None  # When it was recorded offline
+
+class InspectionSyncRequest(BaseModel):
+    inspections: List[SyncInspection]
+
 class DefectClassificationRequest(BaseModel):
     image_base64: str  # Base64 encoded image
 
@@ -121,6 +186,7 @@ class ComponentDetectionResponse(BaseModel):
     detections: list[ComponentDetection]
     model_available: bool = True
     inference_time_ms: Optional[float] = None
+    cached: bool = False
 
 # Database Model for Inspections
 class Inspection(Base):
@@ -137,6 +203,17 @@ class Inspection(Base):
     # ai_confidence = Column(Float)  # AI confidence score
     inspected_at = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Keyset pagination of an item's inspections (see migrate_add_pagination_indexes.py)
+    __table_args__ = (Index("ix_inspections_item_uid_created_at_id", "item_uid", "created_at", "id"),)
+
+class InspectionSyncKey(Base):
+    """Idempotency keys of inspections uploaded through the offline sync endpoint"""
+    __tablename__ = "inspection_sync_keys"
+    
+    idempotency_key = Column(String(100), primary_key=True)
+    inspection_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 # Create tables if they don't exist
 try:
@@ -158,8 +235,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Timing", "X-Next-Cursor"],
 )
 
+# Request timing: every request gets a span collector, a duration histogram
+# entry and (if asked for) an X-Timing header with its spans
+TIMING_HEADER = os.getenv("TIMING_HEADER", "false").lower() == "true"
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    if not PIPELINE_AVAILABLE:
+        return await call_next(request)
+    
+    spans = start_request_spans()
+    started = time.perf_counter()
+    request.state.started = started  # upload endpoints time their receive phase from here
+    response = await call_next(request)
+    total_ms = (time.perf_counter() - started) * 1000
+    
+    route = request.scope.get('route')
+    get_metrics_registry().http_duration.observe(
+        total_ms / 1000.0,
+        method=request.method,
+        route=route.path if route is not None else 'unmatched',
+        status=response.status_code
+    )
+    if TIMING_HEADER or request.headers.get('x-timing'):
+        response.headers['X-Timing'] = format_timing_header(spans, total_ms)
+    return response
+
+# Database spans: each statement is a db_read/db_write span, commits are db_commit
+@event.listens_for(engine, "before_cursor_execute")
+def _start_db_span(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('span_started', []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _end_db_span(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['span_started'].pop()
+    if PIPELINE_AVAILABLE:
+        kind = 'db_read' if statement.lstrip()[:6].upper() == 'SELECT' else 'db_write'
+        record_span(kind, (time.perf_counter() - started) * 1000)
+
+@event.listens_for(Session, "before_commit")
+def _start_commit_span(session):
+    session.info['commit_started'] = time.perf_counter()
+
+@event.listens_for(Session, "after_commit")
+def _end_commit_span(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None and PIPELINE_AVAILABLE:
+        record_span('db_commit', (time.perf_counter() - started) * 1000)
+
 # Helper functions
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
@@ -181,6 +307,7 @@ def get_db():
 
 # Global variable to store YOLO model
 _yolo_model = None
+_yolo_model_path = None
 _component_class_names = ['elastic_clip_good', 'elastic_clip_missing']
 
 # Defect class names - used by fallback classifier
@@ -203,42 +330,44 @@ DEFECT_REMARKS = {
 
 
 
+def find_yolo_model_path():
+    """Locate the legacy YOLO weights (the path may not exist)"""
+    from pathlib import Path
+    
+    # Same weights as the pipeline's ERC detector; deployment copies are tried last
+    fallbacks = [
+        Path('/Users/dakshrathore/Desktop/Code_on_track/railway-yolo-detection/models/best.pt'),
+        Path(__file__).parent / 'yolo_best.pt',
+        Path('/opt/render/project/src/mobile_backend/yolo_best.pt')
+    ]
+    model_path = resolve_model_path('railway-yolo-detection/models/best.pt', extra_candidates=fallbacks)
+    if model_path is None:
+        model_path = fallbacks[1]
+    
+    return model_path
+
 def load_yolo_model():
     """Load YOLO object detection model on startup"""
-    global _yolo_model
+    global _yolo_model, _yolo_model_path
     
     try:
-        from ultralytics import YOLO
-        from pathlib import Path
-        
-        # Path to the trained YOLO model - try multiple locations
-        # Priority 1: Railway YOLO detection project
-        model_path = Path(__file__).parent.parent / 'railway-yolo-detection' / 'models' / 'best.pt'
-        
-        if not model_path.exists():
-            # Priority 2: Alternative absolute path (local dev)
-            model_path = Path('/Users/dakshrathore/Desktop/Code_on_track/railway-yolo-detection/models/best.pt')
-        
-        if not model_path.exists():
-            # Priority 3: Local yolo_best.pt (for deployment)
-            model_path = Path(__file__).parent / 'yolo_best.pt'
-        
-        if not model_path.exists():
-            # Priority 4: Try /opt/render paths for production
-            render_path = Path('/opt/render/project/src/mobile_backend/yolo_best.pt')
-            if render_path.exists():
-                model_path = render_path
+        model_path = find_yolo_model_path()
         
         if model_path.exists():
             print(f"Loading YOLO model from: {model_path}")
-            _yolo_model = YOLO(str(model_path))
+            # Shared with the pipeline's ERC detector instead of a second copy
+            if PIPELINE_AVAILABLE:
+                _yolo_model = get_model_registry().load(model_path, 'yolo', load_yolo)
+            else:
+                _yolo_model = load_yolo(model_path)
+            _yolo_model_path = model_path
             print("✅ YOLO object detection model loaded successfully!")
             return True
         else:
             print(f"⚠️  YOLO model not found at: {model_path}")
             print("Model will need to be trained first. Run: python railway-yolo-detection/scripts/train_yolo.py")
             return False
-            
+    
     except ImportError:
         print("⚠️  Ultralytics not installed. Install with: pip install ultralytics")
         return False
@@ -246,8 +375,8 @@ def load_yolo_model():
         print(f"⚠️  Error loading YOLO model: {e}")
         return False
 
-def detect_components(image: Image.Image, conf_threshold: float = 0.25) -> dict:
-    """Detect railway components using YOLO model"""
+def detect_components(image: Image.Image, conf_threshold: float = 0.25, imgsz: Optional[int] = None) -> dict:
+    """Detect railway components using YOLO model (at a fixed input size if `imgsz` is given)"""
     global _yolo_model, _component_class_names
     import time
     
@@ -267,47 +396,176 @@ def detect_components(image: Image.Image, conf_threshold: float = 0.25) -> dict:
         # Convert PIL Image to numpy array
         img_array = np.array(image)
         
-        # Run inference
-        results = _yolo_model.predict(
-            source=img_array,
-            conf=conf_threshold,
-            save=False,
-            verbose=False
-        )
+        # Run inference (smallest sufficient input size in adaptive mode)
+        ladder = get_resolution_ladder()
+        if imgsz is not None:
+            boxes = predict_boxes(_yolo_model, img_array, conf_threshold, imgsz)
+        elif ladder is None:
+            boxes = predict_boxes(_yolo_model, img_array, conf_threshold)
+        else:
+            boxes, level = ladder.run(
+                lambda size: predict_boxes(_yolo_model, img_array, conf_threshold, size),
+                max_box_confidence, img_array.shape
+            )
+            ladder.record('detect_endpoint', level)
         
         inference_time = (time.time() - start_time) * 1000  # Convert to ms
         
-        # Parse results
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            
-            for i in range(len(boxes)):
-                class_id = int(boxes.cls[i].item())
-                class_name = _component_class_names[class_id] if class_id < len(_component_class_names) else f"class_{class_id}"
-                
-                detection = {
-                    'class_id': class_id,
-                    'class_name': class_name,
-                    'confidence': float(boxes.conf[i].item()),
-                    'bbox': {
-                        'x1': float(boxes.xyxy[i][0].item()),
-                        'y1': float(boxes.xyxy[i][1].item()),
-                        'x2': float(boxes.xyxy[i][2].item()),
-                        'y2': float(boxes.xyxy[i][3].item())
-                    }
-                }
-                detections.append(detection)
+        return format_detections(boxes, inference_time)
+    
+    except Exception as e:
+        raise Exception(f"Detection error: {str(e)}")
+
+def format_detections(boxes: list, inference_time: float) -> dict:
+    """Build the detection response from [x1, y1, x2, y2, confidence, class_id] rows"""
+    detections = []
+    for x1, y1, x2, y2, confidence, class_id in boxes:
+        class_id = int(class_id)
+        class_name = _component_class_names[class_id] if class_id < len(_component_class_names) else f"class_{class_id}"
         
+        detection = {
+            'class_id': class_id,
+            'class_name': class_name,
+            'confidence': float(confidence),
+            'bbox': {
+                'x1': float(x1),
+                'y1': float(y1),
+                'x2': float(x2),
+                'y2': float(y2)
+            }
+        }
+        detections.append(detection)
+    
+    return {
+        'num_detections': len(detections),
+        'detections': detections,
+        'model_available': True,
+        'inference_time_ms': round(inference_time, 2)
+    }
+
+def get_executor():
+    """Inference process pool (None if disabled with INFERENCE_WORKERS=0)."""
+    return get_inference_executor() if PIPELINE_AVAILABLE else None
+
+async def run_detection(image_data: bytes, conf_threshold: float = 0.25, imgsz: Optional[int] = None) -> dict:
+    """Run legacy YOLO detection without blocking the event loop"""
+    executor = get_executor()
+    if executor is None:
+        return await asyncio.to_thread(
+            lambda: detect_components(Image.open(io.BytesIO(image_data)), conf_threshold=conf_threshold, imgsz=imgsz)
+        )
+    
+    model_path = _yolo_model_path or find_yolo_model_path()
+    if not model_path.exists():
         return {
-            'num_detections': len(detections),
-            'detections': detections,
-            'model_available': True,
-            'inference_time_ms': round(inference_time, 2)
+            "num_detections": 0,
+            "detections": [],
+            "model_available": False,
+            "message": "YOLO model not available. Please train the model first."
         }
-        
-    except Exception as e:
-        raise Exception(f"Detection error: {str(e)}")
+    result = await executor.run_async(predict_boxes_task, str(model_path), image_data, conf_threshold, imgsz)
+    ladder = get_resolution_ladder()
+    if ladder is not None and result.get('imgsz'):
+        ladder.record('detect_endpoint', result['imgsz'])
+    return format_detections(result['boxes'], result['inference_time_ms'])
+
+async def run_inspection(image_data: bytes, component_type: Optional[str], hint: Optional[str] = None) -> dict:
+    """Run the inspection pipeline without blocking the event loop"""
+    # Micro-batched with concurrent requests when enabled (dispatches to the pool itself)
+    batcher = get_batcher()
+    executor = get_executor()
+    if batcher is not None:
+        future = batcher.submit_async((image_data, component_type, hint))
+        if executor is None:
+            return await future
+        return await asyncio.wait_for(future, timeout=executor.deadline_ms / 1000.0)
+    if executor is not None:
+        return await executor.run_async(inspect_task, image_data, component_type, hint)
+    return await asyncio.to_thread(get_pipeline().inspect, image_data, component_type, hint)
+
+def lookup_item_component(uid: str) -> Optional[str]:
+    """Pipeline component type of an inventory item (None if unknown)"""
+    db = SessionLocal()
+    try:
+        item = db.query(Item).filter(Item.uid == uid).first()
+        return component_type_from_name(item.component_type) if item else None
+    finally:
+        db.close()
+
+async def resolve_component_hint(expected_component: Optional[str], uid: Optional[str]) -> Optional[str]:
+    """Component the photo should show: the QR's expected component, else the scanned item's type"""
+    hint = component_type_from_name(expected_component)
+    if hint is None and uid:
+        try:
+            hint = await asyncio.to_thread(lookup_item_component, uid)
+        except Exception as e:
+            print(f"⚠️ Item lookup for routing failed: {e}")
+    return hint
+
+def current_model_version() -> str:
+    """
+    Version of the pipeline weights: the model store's active version, else a file fingerprint
+    
+    Blocking (file reads, and in-process it may construct the pipeline); call it from a thread.
+    """
+    store = get_model_store()
+    if store is not None and store.active_version():
+        return store.active_version()
+    executor = get_executor()
+    if executor is not None:
+        return weights_fingerprint(executor.model_paths())
+    return get_pipeline().model_version()
+
+def get_cache():
+    """Result cache shared by the detection and inspection endpoints (None if disabled)."""
+    return get_result_cache() if PIPELINE_AVAILABLE else None
+
+# Detection input size in the cheaper mode served under load
+DEGRADED_IMGSZ = int(os.getenv("ADMISSION_DEGRADED_IMGSZ", "320"))
+
+def get_admission():
+    """Admission controller of the inference endpoints (None if disabled with ADMISSION_CONTROL=false)."""
+    return get_admission_controller() if PIPELINE_AVAILABLE else None
+
+@asynccontextmanager
+async def admitted(endpoint: str, nbytes: int):
+    """Hold an inference slot for the block; 503 with Retry-After when the server is saturated."""
+    controller = get_admission()
+    if controller is None:
+        yield None
+        return
+    try:
+        async with controller.admit(endpoint, nbytes) as ticket:
+            record_span('admission_wait', ticket.wait_ms)
+            yield ticket
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def detect_components_cached(image_data: bytes, conf_threshold: float = 0.25) -> dict:
+    """
+    Run legacy detection on uploaded bytes, answering repeated uploads from the result cache.
+    
+    Cache misses need an admission slot; under pressure they may run at
+    DEGRADED_IMGSZ, and such results are not cached.
+    """
+    cache = get_cache()
+    if cache is not None:
+        key = cache.make_key(image_data, conf=conf_threshold)
+        version = weights_fingerprint([_yolo_model_path or find_yolo_model_path()])
+        result = cache.get('detect', key, version)
+        if result is not None:
+            result['cached'] = True
+            return result
+    
+    async with admitted('detect', len(image_data)) as ticket:
+        degraded = ticket is not None and ticket.degraded
+        result = await run_detection(image_data, conf_threshold, DEGRADED_IMGSZ if degraded else None)
+    record_span('detect_legacy', result.get('inference_time_ms'))
+    if degraded:
+        result['degraded'] = True
+    elif cache is not None and result.get('model_available'):
+        cache.put('detect', key, version, result)
+    return result
 
 
 
@@ -381,6 +639,87 @@ def login(request: LoginRequest):
     finally:
         db.close()
 
+# ============================================================================
+# LIST PAGINATION
+# ============================================================================
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Selectable columns of the list endpoints and their defaults (no base64 QR images)
+ITEM_FIELDS = {column.name: column for column in Item.__table__.columns}
+ITEM_LIST_FIELDS = ["uid", "component_type", "lot_number", "vendor_id", "quantity", "current_status"]
+INSPECTION_FIELDS = {column.name: column for column in Inspection.__table__.columns}
+INSPECTION_LIST_FIELDS = [
+    name for name in ["id", "item_uid", "status", "remark", "inspector_id", "ai_classification",
+                      "ai_confidence", "inspected_at"]
+    if name in INSPECTION_FIELDS  # AI columns only exist once migrated
+]
+
+def select_fields(fields: Optional[str], available: Dict, default: List[str]) -> Dict:
+    """Columns for a comma-separated `fields` parameter (name -> column)"""
+    names = [name.strip() for name in fields.split(",") if name.strip()] if fields else default
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}"
+        )
+    return {name: available[name] for name in names}
+
+def page_limit(limit: int) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    """Opaque cursor for the position after a row (created_at may be NULL)"""
+    raw = f"{created_at.isoformat() if created_at is not None else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """(created_at or None, id) from a cursor made by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_page(query, model, cursor: Optional[str], limit: int):
+    """
+    One page of `query` ordered by (created_at, id) descending.
+    
+    Seeks past the cursor instead of using OFFSET, so deep pages cost the
+    same as the first one (served by the (created_at, id) indexes). Rows
+    without created_at come first, ordered by id, as in a descending scan
+    of those indexes. An empty cursor starts at the first page.
+    
+    Returns:
+        (rows, next cursor or None on the last page)
+    """
+    limit = page_limit(limit)
+    query = query.add_columns(model.created_at, model.id)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if created_at is None:
+            query = query.filter(or_(model.created_at.isnot(None), model.id < row_id))
+        else:
+            query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    rows = query.order_by(model.created_at.desc().nullsfirst(), model.id.desc()).limit(limit + 1).all()
+    
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][-2], rows[-1][-1])
+
+def serialize_row(row, columns: Dict) -> dict:
+    """JSON dict of the selected columns of a row"""
+    data = {}
+    for index, name in enumerate(columns):
+        value = row[index]
+        data[name] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
 @app.get("/api/items/{uid}")
 def get_item(uid: str):
     """
@@ -409,24 +748,30 @@ def get_item(uid: str):
         db.close()
 
 @app.get("/api/items")
-def get_all_items(skip: int = 0, limit: int = 100):
+def get_all_items(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                  fields: Optional[str] = None):
     """
-    Get all items with pagination
+    Get items with pagination
+    
+    `skip`/`limit` page through items in the same order as before. For
+    keyset paging, newest first, pass an empty `cursor` for the first page
+    and the X-Next-Cursor response header as `cursor` for the next one (the
+    header is absent on the last page). `fields` selects columns, e.g.
+    `fields=uid,current_status`; the heavy qr_image_url is only returned
+    when asked for.
     """
+    columns = select_fields(fields, ITEM_FIELDS, ITEM_LIST_FIELDS)
     db = SessionLocal()
     try:
-        items = db.query(Item).offset(skip).limit(limit).all()
-        return [
-            {
-                "uid": item.uid,
-                "component_type": item.component_type,
-                "lot_number": item.lot_number,
-                "vendor_id": item.vendor_id,
-                "quantity": item.quantity,
-                "current_status": item.current_status,
-            }
-            for item in items
-        ]
+        query = db.query(*columns.values())
+        if cursor is None:
+            rows = query.offset(skip).limit(page_limit(limit)).all()
+            return [serialize_row(row, columns) for row in rows]
+        
+        rows, next_cursor = keyset_page(query, Item, cursor, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return [serialize_row(row, columns) for row in rows]
     finally:
         db.close()
 
@@ -456,6 +801,14 @@ def update_item(uid: str, status_update: StatusUpdate):
     finally:
         db.close()
 
+def item_status_for_inspection(status: str) -> str:
+    """Item status that an inspection result moves the item to"""
+    if status in ["approved", "passed", "ok"]:
+        return "inspected"
+    if status in ["rejected", "failed", "damaged"]:
+        return "rejected"
+    return status
+
 @app.post("/qr/inspection")
 def submit_inspection(request: InspectionRequest):
     """
@@ -482,12 +835,7 @@ def submit_inspection(request: InspectionRequest):
         db.add(inspection)
         
         # Update item status based on inspection
-        if request.status in ["approved", "passed", "ok"]:
-            item.current_status = "inspected"
-        elif request.status in ["rejected", "failed", "damaged"]:
-            item.current_status = "rejected"
-        else:
-            item.current_status = request.status
+        item.current_status = item_status_for_inspection(request.status)
         
         item.updated_at = datetime.utcnow()
         db.commit()
@@ -507,27 +855,141 @@ def submit_inspection(request: InspectionRequest):
     finally:
         db.close()
 
+# Largest batch the offline sync endpoint accepts in one request
+MAX_SYNC_RECORDS = int(os.getenv("MAX_SYNC_RECORDS", "1000"))
+
+def _sync_inspections(db: Session, records: List[SyncInspection]) -> List[dict]:
+    """
+    Insert a batch of queued inspections in one transaction.
+    
+    Items and already-synced idempotency keys are each resolved with a
+    single query, and inspections, keys and item statuses are written with
+    one bulk statement each. Records are applied in the order the app
+    queued them, so the last inspection of an item sets its status.
+    
+    Returns:
+        One result per record: created, duplicate or item_not_found
+    """
+    keys = {record.idempotency_key for record in records}
+    synced = dict(
+        db.query(InspectionSyncKey.idempotency_key, InspectionSyncKey.inspection_id)
+        .filter(InspectionSyncKey.idempotency_key.in_(keys))
+    )
+    item_ids = dict(db.query(Item.uid, Item.id).filter(Item.uid.in_({record.qr_id for record in records})))
+    
+    now = datetime.utcnow()
+    results = []
+    created = {}  # idempotency key -> index into rows
+    rows = []
+    item_status = {}  # item id -> status after this batch
+    for record in records:
+        result = {"idempotency_key": record.idempotency_key, "item_uid": record.qr_id}
+        results.append(result)
+        
+        if record.idempotency_key in synced:
+            # Uploaded by an earlier sync whose response never reached the app
+            result.update(status="duplicate", inspection_id=synced[record.idempotency_key])
+            continue
+        if record.idempotency_key in created:
+            result["status"] = "duplicate"
+            continue
+        if record.qr_id not in item_ids:
+            result["status"] = "item_not_found"
+            continue
+        
+        created[record.idempotency_key] = len(rows)
+        rows.append({
+            'item_uid': record.qr_id,
+            'status': record.status,
+            'remark': record.remark,
+            'inspector_id': record.inspector_id,
+            'inspected_at': record.inspected_at or now,
+            'created_at': now
+        })
+        item_status[item_ids[record.qr_id]] = item_status_for_inspection(record.status)
+        result.update(status="created", new_status=item_status[item_ids[record.qr_id]])
+    
+    if rows:
+        inspection_ids = list(db.scalars(
+            insert(Inspection).returning(Inspection.id, sort_by_parameter_order=True), rows
+        ))
+        db.execute(insert(InspectionSyncKey), [
+            {'idempotency_key': key, 'inspection_id': inspection_ids[index], 'created_at': now}
+            for key, index in created.items()
+        ])
+        db.execute(update(Item), [
+            {'id': item_id, 'current_status': status, 'updated_at': now}
+            for item_id, status in item_status.items()
+        ])
+        for result in results:
+            if result["idempotency_key"] in created:
+                result["inspection_id"] = inspection_ids[created[result["idempotency_key"]]]
+    
+    db.commit()
+    return results
+
+@app.post("/api/inspections/sync")
+def sync_inspections(request: InspectionSyncRequest):
+    """
+    Upload inspections queued while offline in one request.
+    
+    Each record carries an idempotency key generated by the app, so a sync
+    that is retried after a lost response does not create duplicates. All
+    inspections and item status changes are written in a single transaction.
+    """
+    records = request.inspections
+    if not records:
+        return {"success": True, "created": 0, "duplicates": 0, "not_found": 0, "results": []}
+    if len(records) > MAX_SYNC_RECORDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many records ({len(records)}), at most {MAX_SYNC_RECORDS} per sync"
+        )
+    if any(not record.idempotency_key or len(record.idempotency_key) > 100 for record in records):
+        raise HTTPException(status_code=400, detail="Every record needs an idempotency_key of at most 100 characters")
+    
+    db = SessionLocal()
+    try:
+        try:
+            results = _sync_inspections(db, records)
+        except IntegrityError:
+            # A concurrent sync of the same records committed first; its keys now exist
+            db.rollback()
+            results = _sync_inspections(db, records)
+        
+        counts = {status: sum(1 for r in results if r["status"] == status)
+                  for status in ("created", "duplicate", "item_not_found")}
+        return {
+            "success": True,
+            "created": counts["created"],
+            "duplicates": counts["duplicate"],
+            "not_found": counts["item_not_found"],
+            "results": results
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error syncing inspections: {str(e)}")
+    finally:
+        db.close()
+
 @app.get("/api/inspections/{uid}")
-def get_inspections(uid: str):
+def get_inspections(uid: str, response: Response, limit: Optional[int] = None, cursor: Optional[str] = None,
+                    fields: Optional[str] = None):
     """
-    Get all inspections for an item
+    Get inspections for an item, newest first, a page at a time
+    
+    Pages hold `limit` inspections (DEFAULT_PAGE_SIZE if not given); pass
+    the X-Next-Cursor response header back as `cursor` for the next page.
+    `fields` selects columns as in /api/items.
     """
+    columns = select_fields(fields, INSPECTION_FIELDS, INSPECTION_LIST_FIELDS)
     db = SessionLocal()
     try:
-        inspections = db.query(Inspection).filter(Inspection.item_uid == uid).order_by(Inspection.inspected_at.desc()).all()
-        return [
-            {
-                "id": insp.id,
-                "item_uid": insp.item_uid,
-                "status": insp.status,
-                "remark": insp.remark,
-                "inspector_id": insp.inspector_id,
-                "ai_classification": insp.ai_classification,
-                "ai_confidence": insp.ai_confidence,
-                "inspected_at": insp.inspected_at.isoformat() if insp.inspected_at else None
-            }
-            for insp in inspections
-        ]
+        query = db.query(*columns.values()).filter(Inspection.item_uid == uid)
+        rows, next_cursor = keyset_page(query, Inspection, cursor, DEFAULT_PAGE_SIZE if limit is None else limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return [serialize_row(row, columns) for row in rows]
     finally:
         db.close()
 
@@ -542,7 +1004,9 @@ def get_detection_model_status():
     """Check if YOLO object detection model is loaded and ready"""
     global _yolo_model
     
-    is_loaded = _yolo_model is not None
+    # With the inference pool the model is loaded in the worker processes
+    is_loaded = _yolo_model is not None or (get_executor() is not None and _yolo_model_path is not None)
+    ladder = get_resolution_ladder()
     
     return {
         "model_loaded": is_loaded,
@@ -550,7 +1014,8 @@ def get_detection_model_status():
         "classes": _component_class_names if is_loaded else [],
         "class_descriptions": COMPONENT_DESCRIPTIONS if is_loaded else {},
         "status": "ready" if is_loaded else "not loaded",
-        "message": "Model is ready for component detection" if is_loaded else "Model needs to be trained first"
+        "message": "Model is ready for component detection" if is_loaded else "Model needs to be trained first",
+        "resolution": ladder.get_stats() if ladder else {"enabled": False}
     }
 
 @app.post("/api/detect-components", response_model=ComponentDetectionResponse)
@@ -572,10 +1037,9 @@ async def detect_railway_components(
     try:
         # Read image file
         image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
         
         # Detect components
-        result = detect_components(image, conf_threshold=conf)
+        result = await detect_components_cached(image_data, conf_threshold=conf)
         
         # Convert to response model format
         detections = []
@@ -591,14 +1055,19 @@ async def detect_railway_components(
             num_detections=result['num_detections'],
             detections=detections,
             model_available=result.get('model_available', True),
-            inference_time_ms=result.get('inference_time_ms')
+            inference_time_ms=result.get('inference_time_ms'),
+            cached=result.get('cached', False)
         )
-        
+    
+    except HTTPException:
+        raise
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Detection timed out: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
 @app.post("/api/detect-components-base64")
-def detect_components_base64(request: DefectClassificationRequest, conf: float = 0.25):
+async def detect_components_base64(request: DefectClassificationRequest, conf: float = 0.25):
     """
     Detect railway components from base64 encoded image
     Used by mobile app to send captured photos
@@ -606,13 +1075,16 @@ def detect_components_base64(request: DefectClassificationRequest, conf: float =
     try:
         # Decode base64 image
         image_data = base64.b64decode(request.image_base64)
-        image = Image.open(io.BytesIO(image_data))
         
         # Detect components
-        result = detect_components(image, conf_threshold=conf)
+        result = await detect_components_cached(image_data, conf_threshold=conf)
         
         return result
-        
+    
+    except HTTPException:
+        raise
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Detection timed out: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
@@ -632,6 +1104,7 @@ class InspectionRequest(BaseModel):
     image_base64: str
     component_type: Optional[str] = None  # Optional: 'erc', 'sleeper', 'liner', 'rubber_pad'
     expected_component: Optional[str] = None  # From QR code: validate detected matches expected
+    uid: Optional[str] = None  # Scanned item UID: its component type routes detection when expected_component is not set
 
 class InspectionResponse(BaseModel):
     success: bool
@@ -643,31 +1116,102 @@ class InspectionResponse(BaseModel):
     condition: Optional[str] = None  # Alias for severity
     defects: list = []
     recommendations: list = []
+    instances: Optional[list] = None  # Per-instance results when several components are detected
     error: Optional[str] = None
     wrong_component: bool = False  # True if detected != expected
+    timings: Optional[Dict[str, Optional[float]]] = None  # Per-stage pipeline timings in ms
+    cached: bool = False  # True if served from the result cache (timings are from the original run)
+    model_version: Optional[str] = None  # Weights version that produced the result
+    degraded: bool = False  # True if served in the cheaper mode under load (expected component's detector only)
 
-@app.post("/api/inspect-component", response_model=InspectionResponse)
-async def inspect_component(request: InspectionRequest):
+# Upload limits and per-transport timing, to compare base64 JSON with binary uploads
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", 15)) * 1024 * 1024)
+UPLOAD_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
+_upload_stats = {}
+
+def record_upload(transport: str, payload_bytes: int, receive_ms: float, total_ms: float):
+    """Log one inspection upload and add it to the per-transport statistics"""
+    stats = _upload_stats.get(transport)
+    if stats is None:
+        stats = _upload_stats.setdefault(transport, {
+            'requests': 0, 'payload_bytes': 0, 'max_payload_bytes': 0,
+            'receive_ms': LatencyTracker(), 'total_ms': LatencyTracker()
+        })
+    stats['requests'] += 1
+    stats['payload_bytes'] += payload_bytes
+    stats['max_payload_bytes'] = max(stats['max_payload_bytes'], payload_bytes)
+    stats['receive_ms'].record(receive_ms)
+    stats['total_ms'].record(total_ms)
+    get_metrics_registry().upload_bytes.observe(payload_bytes, transport=transport)
+    print(f"📥 Inspection upload ({transport}): {payload_bytes / 1024:.1f} KB, "
+          f"receive {receive_ms:.1f} ms, total {total_ms:.1f} ms")
+
+def get_upload_stats() -> dict:
+    """Per-transport upload counts, sizes and server-side timings"""
+    return {
+        'max_upload_bytes': MAX_UPLOAD_BYTES,
+        'transports': {
+            transport: {
+                'requests': stats['requests'],
+                'avg_payload_bytes': round(stats['payload_bytes'] / stats['requests']) if stats['requests'] else 0,
+                'max_payload_bytes': stats['max_payload_bytes'],
+                'receive_ms': stats['receive_ms'].summary(),
+                'total_ms': stats['total_ms'].summary()
+            }
+            for transport, stats in list(_upload_stats.items())
+        }
+    }
+
+async def read_raw_upload(request: Request) -> bytes:
+    """Read a raw image body chunk by chunk, rejecting it as soon as it exceeds the size limit"""
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)  # The only copy; decoding reads these bytes in place
+
+async def inspect_image(image_data: bytes, component_type: Optional[str],
+                        expected_component: Optional[str], uid: Optional[str] = None) -> InspectionResponse:
     """
-    Multi-model inspection pipeline:
-    1. YOLO detects component type
-    2. ResNet classifies condition/defects
+    Run the inspection pipeline on an uploaded image and build the API response.
     
-    Single-component policy: Returns error if multiple components detected.
+    Shared by the base64 JSON and the binary upload endpoints. The expected
+    component (or the scanned item's type) routes detection to its detector first.
     """
-    if not PIPELINE_AVAILABLE:
-        return InspectionResponse(
-            success=False,
-            error="Inspection pipeline not available"
-        )
-    
     try:
-        # Decode base64 image
-        image_data = base64.b64decode(request.image_base64)
+        hint = await resolve_component_hint(expected_component, uid)
         
-        # Get pipeline and run inspection
-        pipeline = get_pipeline()
-        result = pipeline.inspect(image_data, request.component_type)
+        # Retried uploads of the same photo are answered from the result cache
+        cache = get_cache()
+        result = None
+        if cache is not None:
+            cache_key = cache.make_key(image_data, component_type=component_type, hint=hint)
+            # May read the store manifest or build the pipeline on first use: off the event loop
+            model_version = await asyncio.to_thread(current_model_version)
+            result = cache.get('inspect', cache_key, model_version)
+            if result is not None:
+                result['cached'] = True
+        
+        degraded = False
+        if result is None:
+            # Run inspection off the event loop (worker pool, batcher or thread)
+            async with admitted('inspect', len(image_data)) as ticket:
+                # Under pressure, only the expected component's detector runs (no fallback to the others)
+                degraded = ticket is not None and ticket.degraded and hint is not None and component_type is None
+                if degraded:
+                    result = await run_inspection(image_data, hint)
+                else:
+                    result = await run_inspection(image_data, component_type, hint)
+            record_timings(result.get('timings'))
+            
+            # Only successful inspections are cached; failed captures are re-run.
+            # Skip results from weights that are still being swapped out.
+            if cache is not None and result['success'] and not degraded and \
+                    result.get('model_version') in (model_version, 'local'):
+                cache.put('inspect', cache_key, model_version, result)
         
         if result['success']:
             detected_type = result.get('component_type', '').lower()
@@ -682,8 +1226,8 @@ async def inspect_component(request: InspectionRequest):
             component_detected = COMPONENT_DISPLAY_NAMES.get(detected_type, detected_type.title())
             
             # Validate expected component if provided (from QR code)
-            if request.expected_component:
-                expected = request.expected_component.lower()
+            if expected_component:
+                expected = component_type_from_name(expected_component) or expected_component.lower()
                 if detected_type != expected:
                     expected_name = COMPONENT_DISPLAY_NAMES.get(expected, expected.title())
                     return InspectionResponse(
@@ -692,7 +1236,10 @@ async def inspect_component(request: InspectionRequest):
                         component_type=detected_type,
                         detection_confidence=result.get('detection_confidence'),
                         wrong_component=True,
-                        error=f"Wrong component! Expected {expected_name} but detected {component_detected}. Please position the correct component in front of the camera."
+                        error=f"Wrong component! Expected {expected_name} but detected {component_detected}. Please position the correct component in front of the camera.",
+                        timings=result.get('timings'),
+                        cached=result.get('cached', False),
+                        model_version=result.get('model_version')
                     )
             
             # Success - return full results
@@ -706,23 +1253,157 @@ async def inspect_component(request: InspectionRequest):
                 severity=condition,
                 condition=condition,
                 defects=result.get('defects', []),
-                recommendations=result.get('recommendations', [])
+                recommendations=result.get('recommendations', []),
+                instances=result.get('instances'),
+                timings=result.get('timings'),
+                cached=result.get('cached', False),
+                model_version=result.get('model_version'),
+                degraded=degraded
             )
         else:
             return InspectionResponse(
                 success=False,
-                error=result.get('error', 'Inspection failed')
+                error=result.get('error', 'Inspection failed'),
+                timings=result.get('timings'),
+                model_version=result.get('model_version'),
+                degraded=degraded
             )
-            
+    
+    except HTTPException:
+        raise
+    except (InferenceTimeout, asyncio.TimeoutError):
+        return InspectionResponse(
+            success=False,
+            error="Inspection timed out. The server is busy, please try again."
+        )
     except Exception as e:
         return InspectionResponse(
             success=False,
             error=f"Inspection error: {str(e)}"
         )
 
+def request_started(request: Request) -> float:
+    """
+    When the request reached the app, so receive_ms covers reading and
+    parsing the body for every transport (FastAPI parses JSON bodies before
+    the endpoint runs)
+    """
+    return getattr(request.state, 'started', None) or time.perf_counter()
+
+def with_receive_timing(response: InspectionResponse, receive_ms: float) -> InspectionResponse:
+    """Add the time spent receiving/decoding the upload to the response timings"""
+    response.timings = {'receive_ms': round(receive_ms, 2), **(response.timings or {})}
+    return response
+
+@app.post("/api/inspect-component", response_model=InspectionResponse)
+async def inspect_component(request: InspectionRequest, http_request: Request):
+    """
+    Multi-model inspection pipeline:
+    1. YOLO detects component type
+    2. ResNet classifies condition/defects
+    
+    Single-component policy: Returns error if multiple components detected.
+    
+    The photo is sent base64-encoded in JSON; /api/inspect-component/upload
+    takes the same request as a binary upload.
+    """
+    if not PIPELINE_AVAILABLE:
+        return InspectionResponse(
+            success=False,
+            error="Inspection pipeline not available"
+        )
+    
+    started = request_started(http_request)
+    try:
+        # Decode base64 image
+        image_data = base64.b64decode(request.image_base64)
+    except Exception as e:
+        return InspectionResponse(success=False, error=f"Inspection error: {str(e)}")
+    if len(image_data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+    receive_ms = (time.perf_counter() - started) * 1000
+    record_span('receive', receive_ms)
+    
+    response = await inspect_image(image_data, request.component_type, request.expected_component, request.uid)
+    record_upload('base64', len(request.image_base64), receive_ms, (time.perf_counter() - started) * 1000)
+    return with_receive_timing(response, receive_ms)
+
+@app.post("/api/inspect-component/upload", response_model=InspectionResponse)
+async def inspect_component_upload(
+    request: Request,
+    component_type: Optional[str] = None,
+    expected_component: Optional[str] = None,
+    uid: Optional[str] = None
+):
+    """
+    Inspection pipeline with a binary image upload instead of base64 JSON.
+    
+    Accepts either:
+    - a raw body with Content-Type image/jpeg (or image/png, image/webp,
+      application/octet-stream); component_type, expected_component and
+      uid are query parameters
+    - multipart/form-data with the photo in a 'file' field; component_type,
+      expected_component and uid may also be form fields
+    
+    Bodies larger than MAX_UPLOAD_MB (default 15) are rejected with 413.
+    """
+    if not PIPELINE_AVAILABLE:
+        return InspectionResponse(
+            success=False,
+            error="Inspection pipeline not available"
+        )
+    
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+    
+    started = request_started(request)
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type == 'multipart/form-data':
+        transport = 'multipart'
+        form = await request.form()
+        upload = form.get('file')
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Multipart upload needs the image in a 'file' field")
+        image_data = await upload.read()
+        await upload.close()
+        component_type = form.get('component_type') or component_type
+        expected_component = form.get('expected_component') or expected_component
+        uid = form.get('uid') or uid
+    elif content_type in UPLOAD_CONTENT_TYPES:
+        transport = 'raw'
+        image_data = await read_raw_upload(request)
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type or 'none'}")
+    
+    if not image_data:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    if len(image_data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {MAX_UPLOAD_BYTES} bytes")
+    receive_ms = (time.perf_counter() - started) * 1000
+    record_span('receive', receive_ms)
+    
+    response = await inspect_image(image_data, component_type, expected_component, uid)
+    record_upload(transport, len(image_data), receive_ms, (time.perf_counter() - started) * 1000)
+    return with_receive_timing(response, receive_ms)
+
+@app.get("/metrics")
+def metrics():
+    """Request, stage and upload histograms in the Prometheus text format"""
+    if not PIPELINE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Metrics not available")
+    return Response(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/pipeline-status")
 async def get_pipeline_status():
-    """Get status of the multi-model inspection pipeline."""
+    """
+    Get status of the multi-model inspection pipeline.
+    
+    With the inference pool, the pipeline fields (models, stage timings,
+    routing, resolution ladder) come from one worker process, named by
+    'worker_pid', and describe that worker only ('scope': 'worker').
+    In-process they cover the whole server ('scope': 'process').
+    """
     if not PIPELINE_AVAILABLE:
         return {
             "available": False,
@@ -730,11 +1411,24 @@ async def get_pipeline_status():
         }
     
     try:
-        pipeline = get_pipeline()
-        status = pipeline.get_status()
+        executor = get_executor()
+        if executor is not None:
+            # Models live in the worker processes; one of them answers, for itself only
+            status = await executor.run_async(status_task)
+            status.pop('model_paths', None)
+            status['scope'] = 'worker'
+        else:
+            status = {**get_pipeline().get_status(), 'scope': 'process'}
+        batcher = get_batcher()
+        cache = get_cache()
         return {
             "available": True,
-            **status
+            **status,
+            "executor": executor.get_stats() if executor is not None else {"enabled": False},
+            "batching": batcher.get_stats() if batcher is not None else {"enabled": False},
+            "cache": cache.get_stats() if cache is not None else {"enabled": False},
+            "uploads": get_upload_stats(),
+            "admission": get_admission().get_stats() if get_admission() else {"enabled": False}
         }
     except Exception as e:
         return {
@@ -742,6 +1436,50 @@ async def get_pipeline_status():
             "error": str(e)
         }
 
+class ModelReloadRequest(BaseModel):
+    version: Optional[str] = None  # Version to activate; default: reload the manifest's active version
+
+@app.post("/api/admin/models/reload")
+async def reload_pipeline_models(request: ModelReloadRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Roll the inspection pipeline onto another weights version from the model store.
+    
+    Requires the X-Admin-Token header to match ADMIN_TOKEN (disabled when unset).
+    The new weights load and warm up in the background while the current
+    ones keep serving; poll /api/pipeline-status for 'model_store'.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if not PIPELINE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Inspection pipeline not available")
+    
+    store = get_model_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="No model store configured")
+    
+    executor = get_executor()
+    poll_seconds = float(os.getenv("MODEL_STORE_POLL_SECONDS", 10))
+    if executor is not None and poll_seconds <= 0:
+        # Pool workers only swap through their manifest pollers
+        raise HTTPException(
+            status_code=409,
+            detail="Inference workers do not poll the model store (MODEL_STORE_POLL_SECONDS<=0); "
+                   "enable polling or restart the server to change versions"
+        )
+    
+    try:
+        version = request.version or store.active_version()
+        if request.version:
+            store.activate(request.version)
+        if executor is not None:
+            # Each worker process polls the manifest and swaps on its own
+            return {"success": True, "version": version, "mode": "workers_poll", "poll_seconds": poll_seconds}
+        status = await asyncio.to_thread(reload_models, version)
+        return {"success": True, "version": version, "mode": "in_process", **status}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Load models on startup
 @app.on_event("startup")
 async def startup_event():
@@ -752,7 +1490,17 @@ async def startup_event():
     print("\n📦 Loading AI Pipeline...")
     
     # Initialize the new multi-model pipeline
-    if PIPELINE_AVAILABLE:
+    executor = get_executor()
+    if executor is not None:
+        # Models are loaded once per worker process instead of in the server
+        global _yolo_model_path
+        model_path = find_yolo_model_path()
+        _yolo_model_path = model_path if model_path.exists() else None
+        try:
+            executor.start(preload_models=[str(_yolo_model_path)] if _yolo_model_path else [])
+        except Exception as e:
+            print(f"⚠️ Inference pool start error: {e}")
+    elif PIPELINE_AVAILABLE:
         try:
             pipeline = get_pipeline()
             status = pipeline.get_status()
@@ -763,7 +1511,8 @@ async def startup_event():
         print("⚠️ Pipeline module not available")
     
     # Load legacy YOLO model for backward compatibility
-    load_yolo_model()
+    if executor is None:
+        load_yolo_model()
     print("="*70 + "\n")
 
 # Run with: uvicorn main:app --host 0.0.0.0 --port 8000
@@ -0,0 +1,59 @@
+"""
+Database migration to add the indexes used by keyset pagination
+Run this script to update the database schema
+
+/api/items and /api/inspections/{uid} page by (created_at, id), so both
+tables need composite indexes on those columns. Rows without created_at
+are backfilled first; the endpoints page over them, but ahead of every
+other row instead of by age.
+"""
+import psycopg2
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+INDEXES = [
+    ("ix_items_created_at_id", "items", "(created_at, id)"),
+    ("ix_inspections_item_uid_created_at_id", "inspections", "(item_uid, created_at, id)"),
+]
+
+def add_pagination_indexes():
+    """Backfill created_at and create the pagination indexes if they don't exist"""
+    conn = None
+    cur = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        conn.autocommit = True
+        cur = conn.cursor()
+        
+        print("Backfilling missing created_at...")
+        cur.execute("UPDATE items SET created_at = COALESCE(updated_at, NOW()) WHERE created_at IS NULL;")
+        print(f"✓ items: {cur.rowcount} rows updated")
+        cur.execute("UPDATE inspections SET created_at = COALESCE(inspected_at, NOW()) WHERE created_at IS NULL;")
+        print(f"✓ inspections: {cur.rowcount} rows updated")
+        
+        for name, table, columns in INDEXES:
+            print(f"Creating {name}...")
+            # Concurrently, so the app keeps writing while the index builds
+            cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {columns};")
+            print(f"✅ {name} ready")
+        
+        print("\n✅ Migration completed successfully!")
+    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Database Migration: Add Pagination Indexes")
+    print("=" * 60)
+    add_pagination_indexes()
@@ -4,11 +4,29 @@ Multi-Model AI Pipeline for Railway Component Inspection
 This package provides a cascading pipeline:
 1. YOLO Detection - Identifies component type
 2. ResNet Classification - Classifies component condition
+
+Concurrent requests can be micro-batched through `get_batcher()`, and each
+upload is decoded once into a shared `Frame`. Repeated uploads are served
+from `get_result_cache()`, and inference runs in the worker processes of
+`get_inference_executor()`. Each model file is loaded once per process
+through `get_model_registry()`.
 """
 
-from .pipeline import InspectionPipeline, get_pipeline
+from .pipeline import InspectionPipeline, get_pipeline, reload_models, get_swap_status, component_type_from_name
 from .detector import ComponentDetector
 from .classifiers import ComponentClassifier
+from .batching import MicroBatcher, get_batcher
+from .frame import Frame
+from .cache import ResultCache, get_result_cache, weights_fingerprint
+from .executor import InferenceExecutor, InferenceTimeout, get_inference_executor
+from .registry import ModelRegistry, get_model_registry, resolve_model_path
+from .model_store import ModelStore, get_model_store
+from .metrics import MetricsRegistry, get_metrics_registry
+from .video import VideoInspector
 
-__all__ = ['InspectionPipeline', 'get_pipeline', 'ComponentDetector', 'ComponentClassifier']
+__all__ = ['InspectionPipeline', 'get_pipeline', 'reload_models', 'get_swap_status', 'component_type_from_name', 'ComponentDetector', 'ComponentClassifier',
+           'MicroBatcher', 'get_batcher', 'Frame', 'ResultCache', 'get_result_cache', 'weights_fingerprint',
+           'InferenceExecutor', 'InferenceTimeout', 'get_inference_executor',
+           'ModelRegistry', 'get_model_registry', 'resolve_model_path', 'ModelStore', 'get_model_store',
+           'MetricsRegistry', 'get_metrics_registry', 'VideoInspector']
 
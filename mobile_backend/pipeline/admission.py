@@ -0,0 +1,230 @@
+"""
+Admission Control
+=================
+Caps how many inferences run at once and how much uploaded image data may
+wait for a slot, so a burst of uploads gets fast 503 responses (with a
+Retry-After estimate) instead of piling up behind CPU-bound inference
+until clients time out.
+
+    ADMISSION_CONTROL=true           enable (default)
+    ADMISSION_MAX_INFLIGHT=8         concurrent inferences (default: 2 x CPUs)
+    ADMISSION_MAX_QUEUE=32           requests waiting for a slot
+    ADMISSION_MAX_QUEUED_MB=64       image bytes waiting for a slot
+    ADMISSION_MAX_WAIT_SECONDS=15    longest wait before giving up with 503
+    ADMISSION_DEGRADE=false          serve a cheaper mode under pressure
+    ADMISSION_DEGRADE_AT=16          queue depth at which requests are degraded
+    ADMISSION_DEGRADED_IMGSZ=320     detection input size in the cheaper mode
+
+The controller lives on the event loop: endpoints wrap their inference in
+`async with controller.admit(endpoint, nbytes) as ticket`. Waiters are
+served in arrival order.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from .metrics import get_metrics_registry
+from .stats import LatencyTracker
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to 503 with Retry-After."""
+    
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """An admitted request: how long it waited and whether to use the cheaper mode."""
+    
+    def __init__(self, endpoint: str, wait_ms: float, degraded: bool):
+        self.endpoint = endpoint
+        self.wait_ms = wait_ms
+        self.degraded = degraded
+
+
+class AdmissionController:
+    """Bounded in-flight inference slots with a bounded FIFO wait queue."""
+    
+    def __init__(self, max_inflight: int = 8, max_queue: int = 32, max_queued_bytes: int = 64 * 1024 * 1024,
+                 max_wait: float = 15.0, degrade: bool = False, degrade_at: Optional[int] = None):
+        """
+        Args:
+            max_inflight: Inferences allowed to run at once
+            max_queue: Requests allowed to wait for a slot
+            max_queued_bytes: Image bytes allowed to wait for a slot
+            max_wait: Seconds a request may wait before it is rejected
+            degrade: Mark requests admitted under pressure as degraded
+            degrade_at: Queue depth (on arrival) from which requests are degraded
+        """
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.max_queued_bytes = max_queued_bytes
+        self.max_wait = max_wait
+        self.degrade = degrade
+        self.degrade_at = degrade_at if degrade_at is not None else max(1, self.max_queue // 2)
+        
+        self._inflight = 0
+        self._waiters = deque()
+        self._queued_bytes = 0
+        self._service_seconds = None  # moving average of slot hold time
+        self._counts = {}  # endpoint -> {'admitted', 'degraded', 'rejected': {reason: n}}
+        self._wait = LatencyTracker()
+    
+    @asynccontextmanager
+    async def admit(self, endpoint: str, nbytes: int = 0):
+        """
+        Hold an inference slot for the duration of the block.
+        
+        Args:
+            endpoint: Endpoint label for stats and metrics
+            nbytes: Size of the request's image data
+        
+        Yields:
+            AdmissionTicket
+        
+        Raises:
+            AdmissionRejected: Queue full, too many queued bytes or waited too long
+        """
+        started = time.perf_counter()
+        depth = len(self._waiters)
+        if self._inflight < self.max_inflight and not self._waiters:
+            self._inflight += 1
+        else:
+            await self._wait_for_slot(endpoint, nbytes)
+        
+        wait_ms = (time.perf_counter() - started) * 1000
+        ticket = AdmissionTicket(endpoint, wait_ms, self.degrade and depth >= self.degrade_at)
+        self._record_admitted(ticket)
+        
+        held_from = time.perf_counter()
+        try:
+            yield ticket
+        finally:
+            held = time.perf_counter() - held_from
+            self._service_seconds = held if self._service_seconds is None else \
+                0.9 * self._service_seconds + 0.1 * held
+            self._release()
+    
+    async def _wait_for_slot(self, endpoint: str, nbytes: int):
+        """Queue for a slot handed over by `_release`, within the queue limits."""
+        if len(self._waiters) >= self.max_queue:
+            self._reject(endpoint, 'queue_full')
+        if self._queued_bytes + nbytes > self.max_queued_bytes:
+            self._reject(endpoint, 'queued_bytes')
+        
+        slot = asyncio.get_running_loop().create_future()
+        self._waiters.append(slot)
+        self._queued_bytes += nbytes
+        try:
+            await asyncio.wait_for(asyncio.shield(slot), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._abandon(slot)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(endpoint, 'wait_timeout')
+        finally:
+            self._queued_bytes -= nbytes
+    
+    def _abandon(self, slot: asyncio.Future):
+        """Leave the queue; a slot handed over in the meantime is passed on."""
+        if slot.done():
+            self._release()
+        else:
+            slot.cancel()
+            try:
+                self._waiters.remove(slot)
+            except ValueError:
+                pass
+    
+    def _release(self):
+        """Hand the slot to the oldest waiter, or free it."""
+        while self._waiters:
+            slot = self._waiters.popleft()
+            if not slot.done():
+                slot.set_result(True)
+                return
+        self._inflight -= 1
+    
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead drained at the observed rate."""
+        service = self._service_seconds or 1.0
+        return max(1, min(60, math.ceil(service * (len(self._waiters) + 1) / self.max_inflight)))
+    
+    def _reject(self, endpoint: str, reason: str):
+        counts = self._endpoint_counts(endpoint)
+        counts['rejected'][reason] = counts['rejected'].get(reason, 0) + 1
+        get_metrics_registry().admission_rejections.inc(endpoint=endpoint, reason=reason)
+        raise AdmissionRejected(reason, self.retry_after())
+    
+    def _record_admitted(self, ticket: AdmissionTicket):
+        counts = self._endpoint_counts(ticket.endpoint)
+        counts['admitted'] += 1
+        if ticket.degraded:
+            counts['degraded'] += 1
+            get_metrics_registry().admission_degraded.inc(endpoint=ticket.endpoint)
+        self._wait.record(ticket.wait_ms)
+        get_metrics_registry().admission_wait.observe(ticket.wait_ms / 1000.0, endpoint=ticket.endpoint)
+    
+    def _endpoint_counts(self, endpoint: str) -> Dict:
+        return self._counts.setdefault(endpoint, {'admitted': 0, 'degraded': 0, 'rejected': {}})
+    
+    def get_stats(self) -> Dict:
+        """Current load, limits and per-endpoint admissions/rejections."""
+        return {
+            'enabled': True,
+            'inflight': self._inflight,
+            'queued': len(self._waiters),
+            'queued_bytes': self._queued_bytes,
+            'limits': {
+                'max_inflight': self.max_inflight,
+                'max_queue': self.max_queue,
+                'max_queued_bytes': self.max_queued_bytes,
+                'max_wait_seconds': self.max_wait,
+                'degrade_at': self.degrade_at if self.degrade else None
+            },
+            'service_ms': round(self._service_seconds * 1000, 1) if self._service_seconds is not None else None,
+            'wait_ms': self._wait.summary(),
+            'endpoints': {
+                endpoint: {**counts, 'rejected': dict(counts['rejected'])}
+                for endpoint, counts in self._counts.items()
+            }
+        }
+
+
+def controller_from_env() -> Optional[AdmissionController]:
+    """The controller configured by ADMISSION_* variables, None when disabled."""
+    if os.getenv("ADMISSION_CONTROL", "true").lower() != "true":
+        return None
+    degrade_at = os.getenv("ADMISSION_DEGRADE_AT")
+    return AdmissionController(
+        max_inflight=int(os.getenv("ADMISSION_MAX_INFLIGHT", 2 * (os.cpu_count() or 2))),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+        max_queued_bytes=int(float(os.getenv("ADMISSION_MAX_QUEUED_MB", "64")) * 1024 * 1024),
+        max_wait=float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "15")),
+        degrade=os.getenv("ADMISSION_DEGRADE", "false").lower() == "true",
+        degrade_at=int(degrade_at) if degrade_at else None
+    )
+
+
+# Singleton instance
+_admission_instance = None
+_admission_loaded = False
+_admission_lock = threading.Lock()
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Get the process-wide admission controller (None when disabled)."""
+    global _admission_instance, _admission_loaded
+    with _admission_lock:
+        if not _admission_loaded:
+            _admission_instance = controller_from_env()
+            _admission_loaded = True
+    return _admission_instance
@@ -0,0 +1,213 @@
+"""
+Inference Backends
+==================
+Pluggable model runtimes for the pipeline. The default 'torch' backend
+uses ultralytics / torchvision as before. The 'onnx' backend runs
+exported ONNX graphs (optionally static INT8, see
+railway-yolo-detection/scripts/export_onnx_int8.py) with ONNX Runtime on
+CPU, with graph optimizations and explicit thread counts.
+
+Select with PIPELINE_BACKEND=onnx. Thread counts come from
+ONNX_INTRA_OP_THREADS / ONNX_INTER_OP_THREADS (0 = ONNX Runtime default).
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+
+BACKENDS = ('torch', 'onnx')
+
+
+def get_backend_name() -> str:
+    """Get the configured inference backend name."""
+    backend = os.getenv("PIPELINE_BACKEND", "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    return backend
+
+
+def find_onnx_model(weights_path: Path) -> Optional[Path]:
+    """
+    Find an exported ONNX model next to a PyTorch weights file.
+    
+    Prefers the static INT8 export (`name.int8.onnx`) over FP32 (`name.onnx`).
+    """
+    for suffix in ('.int8.onnx', '.onnx'):
+        candidate = weights_path.with_name(weights_path.stem + suffix)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def create_onnx_session(model_path: Path, intra_op_threads: int = None, inter_op_threads: int = None,
+                        optimization: str = None):
+    """
+    Create a CPU ONNX Runtime session.
+    
+    Args:
+        model_path: Path to the .onnx file
+        intra_op_threads: Threads used inside one operator
+                          (default: ONNX_INTRA_OP_THREADS or ORT default)
+        inter_op_threads: Threads used across operators
+                          (default: ONNX_INTER_OP_THREADS or ORT default)
+        optimization: 'disable', 'basic', 'extended' or 'all'
+                      (default: ONNX_GRAPH_OPTIMIZATION or 'all')
+    """
+    import onnxruntime as ort
+    
+    levels = {
+        'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    }
+    optimization = (optimization or os.getenv("ONNX_GRAPH_OPTIMIZATION", "all")).lower()
+    
+    options = ort.SessionOptions()
+    options.graph_optimization_level = levels[optimization]
+    options.intra_op_num_threads = int(intra_op_threads if intra_op_threads is not None
+                                       else os.getenv("ONNX_INTRA_OP_THREADS", 0))
+    options.inter_op_num_threads = int(inter_op_threads if inter_op_threads is not None
+                                       else os.getenv("ONNX_INTER_OP_THREADS", 0))
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    
+    return ort.InferenceSession(str(model_path), sess_options=options, providers=['CPUExecutionProvider'])
+
+
+def read_model_metadata(model_path: Path) -> Dict:
+    """Read the JSON sidecar written by the export CLI (`model.onnx.json`), if any."""
+    sidecar = model_path.with_name(model_path.name + '.json')
+    if sidecar.exists():
+        with open(sidecar) as f:
+            return json.load(f)
+    return {}
+
+
+def letterbox(image: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize keeping aspect ratio and pad to a square, like YOLO training.
+    
+    Returns:
+        (NCHW float32 batch of one in [0, 1], scale, (pad_x, pad_y))
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = np.asarray(Image.fromarray(np.ascontiguousarray(image)).resize((new_w, new_h), Image.BILINEAR))
+    
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    canvas[top:top + new_h, left:left + new_w] = resized
+    
+    tensor = canvas.transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return tensor, scale, (left, top)
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> List[int]:
+    """Plain greedy non-maximum suppression on [x1, y1, x2, y2] boxes."""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(int(i))
+        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return keep
+
+
+class _OnnxBox:
+    """One detection, shaped like an ultralytics box (cls/conf/xyxy/xywhn)."""
+    
+    def __init__(self, class_id: int, confidence: float, xyxy: np.ndarray, xywhn: np.ndarray):
+        self.cls = np.array([class_id])
+        self.conf = np.array([confidence])
+        self.xyxy = xyxy[None]
+        self.xywhn = xywhn[None]
+
+
+class _OnnxResult:
+    """Detections for one image, shaped like an ultralytics Results object."""
+    
+    def __init__(self, boxes: List[_OnnxBox]):
+        self.boxes = boxes
+
+
+class OnnxYOLO:
+    """
+    YOLOv8 detector running an exported ONNX graph on ONNX Runtime.
+    
+    Called like an ultralytics model (`model(images, conf=...)`) and returns
+    objects exposing the same `.boxes` fields, so `ComponentDetector` can
+    parse either backend's output with the same code.
+    """
+    
+    def __init__(self, model_path: Path, iou_threshold: float = 0.7, max_det: int = 300):
+        self.model_path = Path(model_path)
+        self.session = create_onnx_session(self.model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        shape = self.session.get_inputs()[0].shape
+        self.imgsz = shape[2] if isinstance(shape[2], int) else 640
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+    
+    def __call__(self, source, conf: float = 0.25, verbose: bool = False, imgsz: int = None) -> List[_OnnxResult]:
+        images = source if isinstance(source, list) else [source]
+        return [self._predict_one(np.asarray(image), conf) for image in images]
+    
+    def _predict_one(self, image: np.ndarray, conf: float) -> _OnnxResult:
+        height, width = image.shape[:2]
+        tensor, scale, (pad_x, pad_y) = letterbox(image, self.imgsz)
+        
+        # Output: (1, 4 + num_classes, num_anchors) with cx, cy, w, h first
+        output = self.session.run(None, {self.input_name: tensor})[0][0].T
+        class_scores = output[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        mask = scores >= conf
+        if not mask.any():
+            return _OnnxResult([])
+        
+        cxcywh, scores, class_ids = output[mask, :4], scores[mask], class_ids[mask]
+        boxes = np.empty_like(cxcywh)
+        boxes[:, 0] = (cxcywh[:, 0] - cxcywh[:, 2] / 2 - pad_x) / scale
+        boxes[:, 1] = (cxcywh[:, 1] - cxcywh[:, 3] / 2 - pad_y) / scale
+        boxes[:, 2] = (cxcywh[:, 0] + cxcywh[:, 2] / 2 - pad_x) / scale
+        boxes[:, 3] = (cxcywh[:, 1] + cxcywh[:, 3] / 2 - pad_y) / scale
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        
+        # Class-aware NMS: offset boxes per class so classes never suppress each other
+        offsets = class_ids[:, None].astype(np.float32) * 7680
+        keep = _nms(boxes + offsets, scores, self.iou_threshold)[:self.max_det]
+        
+        result = []
+        for i in keep:
+            x1, y1, x2, y2 = boxes[i]
+            xywhn = np.array([(x1 + x2) / 2 / width, (y1 + y2) / 2 / height, (x2 - x1) / width, (y2 - y1) / height])
+            result.append(_OnnxBox(int(class_ids[i]), float(scores[i]), boxes[i].astype(np.float64), xywhn))
+        return _OnnxResult(result)
+
+
+class OnnxClassifier:
+    """ResNet classifier running an exported ONNX graph; returns logits for NCHW batches."""
+    
+    def __init__(self, model_path: Path):
+        self.model_path = Path(model_path)
+        self.session = create_onnx_session(self.model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.metadata = read_model_metadata(self.model_path)
+    
+    def run(self, batch_nchw: np.ndarray) -> np.ndarray:
+        """Run one batch and return logits of shape (N, num_classes)."""
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch_nchw, dtype=np.float32)})[0]
@@ -0,0 +1,205 @@
+"""
+Micro-Batching Inference Queue
+==============================
+Gathers concurrent inspection requests for up to N images or T milliseconds
+and runs them through the pipeline as one batch, so the detector and the
+classifier each do a single forward pass per batch. When the inference
+process pool is enabled, batches are dispatched to it, one in flight per
+worker.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue, Empty
+from typing import Any, Callable, Dict, List, Optional
+
+from .stats import LatencyTracker
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batcher in front of a batch handler.
+    
+    Callers submit single items and get a Future back. A background thread
+    collects items until either `max_batch_size` items are waiting or
+    `max_wait_ms` has passed since the first one arrived, then calls
+    `handler` once with the whole batch and resolves each caller's Future
+    with its own result.
+    """
+    
+    def __init__(self, handler: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = None, max_wait_ms: float = None, concurrency: int = 1):
+        """
+        Initialize the batcher.
+        
+        Args:
+            handler: Function taking a list of items and returning a list of
+                     results of the same length, in the same order
+            max_batch_size: Maximum number of items per batch
+                            (default: PIPELINE_BATCH_SIZE or 8)
+            max_wait_ms: Maximum time to wait for a batch to fill up
+                         (default: PIPELINE_BATCH_WAIT_MS or 10)
+            concurrency: Number of batches the handler may run at once;
+                         new batches keep filling while all slots are busy
+        """
+        self.handler = handler
+        self.max_batch_size = max(1, int(max_batch_size or os.getenv("PIPELINE_BATCH_SIZE", 8)))
+        self.max_wait_ms = float(max_wait_ms if max_wait_ms is not None else os.getenv("PIPELINE_BATCH_WAIT_MS", 10))
+        self.concurrency = max(1, int(concurrency))
+        
+        self._queue = Queue()
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._batch_latency = LatencyTracker()
+        self._queue_wait = LatencyTracker()
+        self._batch_sizes = {}
+        self._total_batches = 0
+        self._total_items = 0
+        self._total_errors = 0
+        
+        self._slots = threading.Semaphore(self.concurrency)
+        self._dispatch_pool = (ThreadPoolExecutor(self.concurrency, thread_name_prefix="pipeline-batch")
+                               if self.concurrency > 1 else None)
+        
+        self._thread = threading.Thread(target=self._run, name="pipeline-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, item: Any) -> Future:
+        """Queue one item and return a Future for its result."""
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+    
+    async def submit_async(self, item: Any) -> Any:
+        """Queue one item and await its result from an asyncio event loop."""
+        import asyncio
+        return await asyncio.wrap_future(self.submit(item))
+    
+    def _run(self):
+        """Collect items into batches and dispatch them until stopped."""
+        while not self._stop_event.is_set():
+            # Wait for a free dispatch slot; requests keep queueing meanwhile
+            if not self._slots.acquire(timeout=0.5):
+                continue
+            try:
+                first = self._queue.get(timeout=0.5)
+            except Empty:
+                self._slots.release()
+                continue
+            
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            
+            if self._dispatch_pool is not None:
+                self._dispatch_pool.submit(self._dispatch, batch)
+            else:
+                self._dispatch(batch)
+    
+    def _dispatch(self, batch: List[tuple]):
+        """Run the handler on one batch and resolve every caller's Future."""
+        try:
+            self._run_handler(batch)
+        finally:
+            self._slots.release()
+    
+    def _run_handler(self, batch: List[tuple]):
+        """Call the handler for one batch and record its statistics."""
+        # Drop requests whose caller already gave up
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        
+        started = time.perf_counter()
+        waits = [(started - enqueued) * 1000 for _, _, enqueued in batch]
+        
+        try:
+            results = self.handler([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            failed = False
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            failed = True
+        
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._total_batches += 1
+            self._total_items += len(batch)
+            self._total_errors += int(failed)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+        self._batch_latency.record(latency_ms)
+        self._queue_wait.extend(waits)
+    
+    def get_stats(self) -> Dict:
+        """Get batching configuration and per-batch latency statistics."""
+        with self._stats_lock:
+            return {
+                'enabled': True,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'concurrency': self.concurrency,
+                'queue_depth': self._queue.qsize(),
+                'total_batches': self._total_batches,
+                'total_items': self._total_items,
+                'failed_batches': self._total_errors,
+                'avg_batch_size': round(self._total_items / self._total_batches, 2) if self._total_batches else 0.0,
+                'batch_size_counts': dict(sorted(self._batch_sizes.items())),
+                'batch_latency_ms': self._batch_latency.summary(),
+                'queue_wait_ms': self._queue_wait.summary()
+            }
+    
+    def stop(self):
+        """Stop the background thread."""
+        self._stop_event.set()
+        self._thread.join()
+        if self._dispatch_pool is not None:
+            self._dispatch_pool.shutdown(wait=False)
+
+
+def _inspect_batch(items: List[tuple]) -> List[Dict]:
+    """Batch handler: run the shared pipeline on (image, component_type, hint) items."""
+    from .executor import get_inference_executor, inspect_batch_task
+    from .pipeline import get_pipeline
+    
+    executor = get_inference_executor()
+    if executor is not None:
+        return executor.run(inspect_batch_task, items)
+    
+    images = [image for image, _, _ in items]
+    component_types = [component_type for _, component_type, _ in items]
+    hints = [hint for _, _, hint in items]
+    return get_pipeline().inspect_batch(images, component_types, hints)
+
+
+# Singleton instance
+_batcher_instance = None
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> Optional[MicroBatcher]:
+    """
+    Get or create the singleton inspection batcher.
+    
+    Returns None when batching is disabled with PIPELINE_BATCHING=false.
+    """
+    global _batcher_instance
+    if os.getenv("PIPELINE_BATCHING", "true").lower() != "true":
+        return None
+    with _batcher_lock:
+        if _batcher_instance is None:
+            from .executor import get_inference_executor
+            executor = get_inference_executor()
+            _batcher_instance = MicroBatcher(_inspect_batch, concurrency=executor.workers if executor else 1)
+    return _batcher_instance
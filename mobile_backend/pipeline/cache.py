@@ -0,0 +1,187 @@
+"""
+Inspection Result Cache
+=======================
+Bounded LRU + TTL cache for pipeline results, keyed by a hash of the
+uploaded image bytes, the request parameters and a fingerprint of the
+loaded model weights. Field retries of the same photo are answered from
+memory instead of re-running the models, and any change to the weights
+on disk invalidates every cached result produced by the old ones.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def image_digest(data: bytes) -> str:
+    """Content hash of an uploaded image."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def weights_fingerprint(paths: Iterable[Optional[Path]]) -> str:
+    """
+    Fingerprint a set of model files by path, size and modification time.
+    
+    Cheap enough to compute per request; changes whenever a weight file is
+    replaced, so results cached against the old weights stop matching.
+    """
+    parts = []
+    for path in sorted(str(p) for p in paths if p is not None):
+        try:
+            stat = os.stat(path)
+            parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=8).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and a memory budget.
+    
+    Entries are stored as serialized JSON, which keeps cached results
+    immutable (every hit returns a fresh copy) and makes their memory use
+    exact. Keys are namespaced so the inspection pipeline and the legacy
+    detector can each be invalidated when their own weights change.
+    """
+    
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None, max_bytes: int = None):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Maximum number of cached results
+                         (default: PIPELINE_CACHE_SIZE or 256)
+            ttl_seconds: Lifetime of an entry
+                         (default: PIPELINE_CACHE_TTL or 300)
+            max_bytes: Memory budget for cached results
+                       (default: PIPELINE_CACHE_MAX_MB or 64 MB)
+        """
+        self.max_entries = int(max_entries or os.getenv("PIPELINE_CACHE_SIZE", 256))
+        self.ttl_seconds = float(ttl_seconds or os.getenv("PIPELINE_CACHE_TTL", 300))
+        self.max_bytes = int(max_bytes or float(os.getenv("PIPELINE_CACHE_MAX_MB", 64)) * 1024 * 1024)
+        
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at, payload)
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+    
+    @staticmethod
+    def make_key(image_data: bytes, **params) -> str:
+        """Build a cache key from the image content and request parameters."""
+        return image_digest(image_data) + ":" + json.dumps(params, sort_keys=True, default=str)
+    
+    def get(self, namespace: str, key: str, version: str) -> Optional[Dict]:
+        """
+        Look up a cached result.
+        
+        Args:
+            namespace: Result family, e.g. 'inspect' or 'detect'
+            key: Key from `make_key`
+            version: Current model fingerprint for the namespace
+        
+        Returns:
+            A copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            self._check_version(namespace, version)
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove((namespace, key))
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self._hits += 1
+            payload = entry[1]
+        return json.loads(payload)
+    
+    def put(self, namespace: str, key: str, version: str, result: Dict):
+        """Store a result computed with the given model fingerprint."""
+        payload = json.dumps(result, default=str)
+        if len(payload) > self.max_bytes:
+            return
+        
+        with self._lock:
+            self._check_version(namespace, version)
+            if (namespace, key) in self._entries:
+                self._remove((namespace, key))
+            self._entries[(namespace, key)] = (time.monotonic() + self.ttl_seconds, payload)
+            self._bytes += len(payload)
+            
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+    
+    def _check_version(self, namespace: str, version: str):
+        """Drop a namespace's entries when its model fingerprint changes."""
+        previous = self._versions.get(namespace)
+        if previous == version:
+            return
+        self._versions[namespace] = version
+        if previous is None:
+            return
+        for entry_key in [k for k in self._entries if k[0] == namespace]:
+            self._remove(entry_key)
+        self._invalidations += 1
+    
+    def _remove(self, entry_key: Tuple[str, str]):
+        _, payload = self._entries.pop(entry_key)
+        self._bytes -= len(payload)
+    
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': True,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'memory_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+                'model_versions': dict(self._versions)
+            }
+
+
+# Singleton instance
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Get or create the singleton result cache.
+    
+    Returns None when caching is disabled with PIPELINE_CACHE=false.
+    """
+    global _cache_instance
+    if os.getenv("PIPELINE_CACHE", "true").lower() != "true":
+        return None
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ResultCache()
+    return _cache_instance
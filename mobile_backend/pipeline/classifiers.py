@@ -2,14 +2,20 @@
 ResNet Component Classifiers
 =============================
 Classifies component condition (Good, Rust, Crack, Broken, etc.)
-using ResNet50 models.
+using ResNet50 models, on PyTorch or, with PIPELINE_BACKEND=onnx, on an
+exported (INT8) ONNX model.
 """
 
+from pathlib import Path
 from typing import Dict, List, Optional, Union
 import numpy as np
 from PIL import Image
 import io
 
+from .backends import OnnxClassifier, find_onnx_model, get_backend_name
+from .frame import Frame
+from .registry import get_model_registry, model_search_paths
+
 
 class ComponentClassifier:
     """
@@ -22,6 +28,10 @@ class ComponentClassifier:
     # Condition categories
     CONDITIONS = ['Good', 'Fair', 'Bad']
     
+    # Input normalization used by train_component_classifier.py
+    IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+    
     # Defect types per component
     DEFECT_TYPES = {
         'erc': ['Good', 'Rust', 'Crack', 'Broken', 'Missing'],
@@ -30,65 +40,57 @@ class ComponentClassifier:
         'rubber_pad': ['Good', 'Worn', 'Cracked', 'Degraded']
     }
     
-    def __init__(self, component_type: str = 'erc'):
+    def __init__(self, component_type: str = 'erc', weights_path: Path = None, classes: List[str] = None):
         """
         Initialize classifier for a specific component type.
         
         Args:
             component_type: 'erc', 'sleeper', 'liner', or 'rubber_pad'
+            weights_path: Explicit checkpoint (e.g. from the model store)
+                          instead of the default locations
+            classes: Class names overriding those stored in the checkpoint
         """
         self.component_type = component_type
         self.model = None
+        self.model_path = None
+        self.backend = None
         self.classes = self.DEFECT_TYPES.get(component_type, ['Good', 'Defective'])
+        self._weights_path = weights_path
         self._load_model()
+        if classes:
+            self.classes = classes
     
     def _load_model(self):
         """
         Load the ResNet model for classification.
         
-        Tries to load a trained PyTorch model from the models directory.
+        Tries to load a trained PyTorch model from the models directory
+        (or its ONNX export, with the ONNX backend).
         Falls back to rule-based logic if model not found.
         """
+        # Look for trained model file
+        name = f'{self.component_type}_classifier_best.pt'
+        model_paths = [base / 'railway-yolo-detection' / 'models' / name for base in model_search_paths()]
+        model_paths.append(Path.cwd() / 'models' / name)
+        if self._weights_path is not None:
+            model_paths = [Path(self._weights_path)]
+        
+        if get_backend_name() == 'onnx' and self._load_onnx_model(model_paths):
+            return
+        
         try:
-            import torch
-            import torch.nn as nn
-            from torchvision import models
-            from pathlib import Path
-            
-            # Look for trained model file
-            model_paths = [
-                Path(__file__).parent.parent.parent / 'railway-yolo-detection' / 'models' / f'{self.component_type}_classifier_best.pt',
-                Path.cwd() / 'models' / f'{self.component_type}_classifier_best.pt',
-                Path.home() / 'Code_on_track' / 'railway-yolo-detection' / 'models' / f'{self.component_type}_classifier_best.pt',
-            ]
-            
             for model_path in model_paths:
                 if model_path.exists():
-                    # Load checkpoint
-                    checkpoint = torch.load(model_path, map_location='cpu', weights_only=False)
-                    
-                    # Get class info from checkpoint
-                    if 'class_names' in checkpoint:
-                        self.classes = checkpoint['class_names']
-                    num_classes = checkpoint.get('num_classes', len(self.classes))
-                    
-                    # Create model architecture
-                    model = models.resnet50(weights=None)
-                    model.fc = nn.Sequential(
-                        nn.Dropout(0.5),
-                        nn.Linear(model.fc.in_features, 512),
-                        nn.ReLU(),
-                        nn.Dropout(0.3),
-                        nn.Linear(512, num_classes)
-                    )
-                    
-                    # Load weights
-                    model.load_state_dict(checkpoint['model_state_dict'])
-                    model.eval()
+                    # Shared with any other classifier using the same weights
+                    model, class_names = get_model_registry().load(model_path, 'resnet50_classifier',
+                                                                   load_resnet_classifier)
+                    if class_names:
+                        self.classes = class_names
                     
                     self.model = model
-                    self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-                    self.model.to(self.device)
+                    self.backend = 'torch'
+                    self.model_path = model_path
+                    self.device = next(model.parameters()).device
                     
                     print(f"✅ Loaded ResNet classifier for {self.component_type} from {model_path}")
                     print(f"   Classes: {self.classes}")
@@ -105,6 +107,32 @@ class ComponentClassifier:
             print(f"⚠️ Error loading {self.component_type} classifier: {e}")
             self.model = None
     
+    def _load_onnx_model(self, model_paths: List[Path]) -> bool:
+        """Load the first ONNX export found next to the candidate .pt paths."""
+        for model_path in model_paths:
+            onnx_path = find_onnx_model(model_path)
+            if onnx_path is None:
+                continue
+            try:
+                self.model = get_model_registry().load(onnx_path, 'onnx_classifier', OnnxClassifier)
+                self.classes = self.model.metadata.get('class_names', self.classes)
+                self.backend = 'onnx'
+                self.model_path = onnx_path
+                print(f"✅ Loaded ONNX classifier for {self.component_type} from {onnx_path}")
+                print(f"   Classes: {self.classes}")
+                return True
+            except ImportError as e:
+                print(f"⚠️ onnxruntime not available ({e}), trying PyTorch for the {self.component_type} classifier")
+                self.model = None
+                return False
+            except Exception as e:
+                print(f"⚠️ Error loading ONNX {self.component_type} classifier: {e}")
+                self.model = None
+                return False
+        
+        print(f"ℹ️ No ONNX export for {self.component_type} classifier, trying PyTorch")
+        return False
+    
     def classify(self, image: Union[bytes, np.ndarray, Image.Image], 
                  detection_class: str = None) -> Dict:
         """
@@ -117,58 +145,109 @@ class ComponentClassifier:
         Returns:
             Dict with classification results
         """
+        return self.classify_batch([image], [detection_class])[0]
+    
+    def classify_batch(self, images: List[Union[bytes, np.ndarray, Image.Image]],
+                       detection_classes: List[Optional[str]] = None) -> List[Dict]:
+        """
+        Classify several component images with a single forward pass.
+        
+        Crops are stacked into one tensor so several instances, or several
+        uploads, cost a single ResNet forward pass.
+        
+        Args:
+            images: Cropped images of the components
+            detection_classes: YOLO class name per image (for fallback logic)
+            
+        Returns:
+            List of classification dicts, one per input image, in input order
+        """
+        if detection_classes is None:
+            detection_classes = [None] * len(images)
+        
         # If ResNet model is not loaded, use fallback logic
         if self.model is None:
-            return self._fallback_classify(detection_class)
+            return [self._fallback_classify(cls) for cls in detection_classes]
+        
+        if not images:
+            return []
         
         try:
-            # Preprocess image
-            if isinstance(image, bytes):
-                img = Image.open(io.BytesIO(image))
-            elif isinstance(image, np.ndarray):
-                img = Image.fromarray(image)
-            else:
-                img = image
-            
-            # Resize to model input size
-            img = img.resize((224, 224))
-            img_array = np.array(img) / 255.0
-            img_array = np.expand_dims(img_array, axis=0)
+            batch = np.stack([self._preprocess(image) for image in images])
             
             # Run inference
-            predictions = self.model.predict(img_array, verbose=0)
-            predicted_class_idx = np.argmax(predictions[0])
-            confidence = float(predictions[0][predicted_class_idx])
+            predictions = self._predict(batch)
             
-            predicted_class = self.classes[predicted_class_idx]
-            
-            # Determine condition based on class
-            if predicted_class == 'Good':
-                condition = 'Good'
-                defects = []
-            else:
-                condition = 'Bad' if confidence > 0.8 else 'Fair'
-                defects = [predicted_class]
-            
-            return {
-                'success': True,
-                'condition': condition,
-                'defect_class': predicted_class,
-                'confidence': confidence,
-                'defects': defects,
-                'all_probabilities': {
-                    cls: float(predictions[0][i]) 
-                    for i, cls in enumerate(self.classes)
-                }
-            }
+            return [self._format_prediction(probs) for probs in predictions]
             
         except Exception as e:
-            return {
+            return [{
                 'success': False,
                 'error': f'Classification failed: {str(e)}',
                 'condition': 'Unknown',
                 'defects': []
+            } for _ in images]
+    
+    @classmethod
+    def _preprocess(cls, image: Union[bytes, np.ndarray, Image.Image, Frame]) -> np.ndarray:
+        """Resize one image to 224x224 and normalize it like the training transforms."""
+        if isinstance(image, Frame):
+            img_array = image.resized((224, 224))
+        else:
+            if isinstance(image, bytes):
+                img = Image.open(io.BytesIO(image))
+            elif isinstance(image, np.ndarray):
+                img = Image.fromarray(image)
+            else:
+                img = image
+            
+            # Resize to model input size
+            img_array = np.asarray(img.convert('RGB').resize((224, 224)))
+        
+        return (img_array.astype(np.float32) / 255.0 - cls.IMAGENET_MEAN) / cls.IMAGENET_STD
+    
+    def _predict(self, batch: np.ndarray) -> np.ndarray:
+        """Run the ResNet on an NHWC batch and return class probabilities."""
+        if self.backend == 'onnx':
+            logits = self.model.run(batch.transpose(0, 3, 1, 2))
+            logits = logits - logits.max(axis=1, keepdims=True)
+            exp = np.exp(logits)
+            return exp / exp.sum(axis=1, keepdims=True)
+        
+        import torch
+        
+        with torch.inference_mode():
+            tensor = torch.from_numpy(batch).permute(0, 3, 1, 2).contiguous().to(self.device)
+            logits = self.model(tensor)
+            probs = torch.softmax(logits, dim=1)
+        return probs.cpu().numpy()
+    
+    def _format_prediction(self, probs: np.ndarray) -> Dict:
+        """Turn one row of class probabilities into a classification result."""
+        predicted_class_idx = int(np.argmax(probs))
+        confidence = float(probs[predicted_class_idx])
+        
+        predicted_class = self.classes[predicted_class_idx]
+        
+        # Determine condition based on class
+        if predicted_class == 'Good':
+            condition = 'Good'
+            defects = []
+        else:
+            condition = 'Bad' if confidence > 0.8 else 'Fair'
+            defects = [predicted_class]
+        
+        return {
+            'success': True,
+            'condition': condition,
+            'defect_class': predicted_class,
+            'confidence': confidence,
+            'defects': defects,
+            'all_probabilities': {
+                cls: float(probs[i]) 
+                for i, cls in enumerate(self.classes)
             }
+        }
     
     def _fallback_classify(self, detection_class: str = None) -> Dict:
         """
@@ -226,25 +305,60 @@ class ComponentClassifier:
         return self.model is not None
 
 
+def load_resnet_classifier(model_path: Path):
+    """
+    Build a ResNet50 classifier from a training checkpoint.
+    
+    Returns:
+        (model in eval mode on the best device, class names or None)
+    """
+    import torch
+    import torch.nn as nn
+    from torchvision import models
+    
+    # Load checkpoint
+    checkpoint = torch.load(model_path, map_location='cpu', weights_only=False)
+    
+    # Get class info from checkpoint
+    class_names = checkpoint.get('class_names')
+    num_classes = checkpoint.get('num_classes', len(class_names or []))
+    
+    # Create model architecture
+    model = models.resnet50(weights=None)
+    model.fc = nn.Sequential(
+        nn.Dropout(0.5),
+        nn.Linear(model.fc.in_features, 512),
+        nn.ReLU(),
+        nn.Dropout(0.3),
+        nn.Linear(512, num_classes)
+    )
+    
+    # Load weights
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    model.to(torch.device('cuda' if torch.cuda.is_available() else 'cpu'))
+    return model, class_names
+
+
 class ERCClassifier(ComponentClassifier):
     """Classifier for Elastic Rail Clip defects."""
-    def __init__(self):
-        super().__init__('erc')
+    def __init__(self, **kwargs):
+        super().__init__('erc', **kwargs)
 
 
 class SleeperClassifier(ComponentClassifier):
     """Classifier for Sleeper defects."""
-    def __init__(self):
-        super().__init__('sleeper')
+    def __init__(self, **kwargs):
+        super().__init__('sleeper', **kwargs)
 
 
 class LinerClassifier(ComponentClassifier):
     """Classifier for Liner defects."""
-    def __init__(self):
-        super().__init__('liner')
+    def __init__(self, **kwargs):
+        super().__init__('liner', **kwargs)
 
 
 class RubberPadClassifier(ComponentClassifier):
     """Classifier for Rubber Pad defects."""
-    def __init__(self):
-        super().__init__('rubber_pad')
+    def __init__(self, **kwargs):
+        super().__init__('rubber_pad', **kwargs)
@@ -3,14 +3,28 @@ YOLO Component Detector
 =======================
 Detects railway components using YOLOv8 model.
 Enforces single-component policy.
+
+Detectors can run one after another, concurrently on a shared thread pool,
+or as one fused pass of a multi-head model covering every component type.
+With PIPELINE_BACKEND=onnx, exported ONNX models (INT8 when available) are
+run on ONNX Runtime instead of PyTorch. With DETECT_ADAPTIVE_IMGSZ=true,
+PyTorch detectors try reduced input sizes first (see resolution.py).
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 import numpy as np
 from PIL import Image
 import io
+import threading
+import time
+
+from .backends import OnnxYOLO, find_onnx_model, get_backend_name
+from .frame import Frame
+from .registry import get_model_registry, resolve_model_path
+from .resolution import ResolutionLadder, get_resolution_ladder
 
 
 class ComponentDetector:
@@ -32,50 +46,49 @@ class ComponentDetector:
         }
     }
     
-    def __init__(self, model_type: str = 'erc', confidence_threshold: float = 0.25):
+    def __init__(self, model_type: str = 'erc', confidence_threshold: float = 0.25,
+                 weights_path: Path = None, classes: List[str] = None):
         """
         Initialize the component detector.
         
         Args:
             model_type: Type of component to detect ('erc', 'sleeper', 'liner', 'rubber_pad')
             confidence_threshold: Minimum confidence for detection
+            weights_path: Explicit weight file (e.g. from the model store)
+                          instead of the default location
+            classes: Class names overriding the built-in list
         """
         self.model_type = model_type
         self.confidence_threshold = confidence_threshold
         self.model = None
+        self.model_path = None
+        self.backend = None
         self.classes = []
+        self._weights_path = weights_path
+        self._classes_override = classes
         self._load_model()
     
     def _load_model(self):
         """Load the YOLO model for the specified component type."""
         try:
-            from ultralytics import YOLO
-            
             if self.model_type not in self.COMPONENT_MODELS:
                 raise ValueError(f"Unknown model type: {self.model_type}")
             
             config = self.COMPONENT_MODELS[self.model_type]
             
-            # Try multiple paths for model
-            base_paths = [
-                Path(__file__).parent.parent.parent,  # From pipeline folder
-                Path.cwd(),
-                Path.home() / 'Code_on_track'
-            ]
-            
             model_loaded = False
-            for base in base_paths:
-                model_path = base / config['model_path']
-                if model_path.exists():
-                    self.model = YOLO(str(model_path))
-                    self.classes = config['classes']
-                    model_loaded = True
-                    print(f"✅ Loaded {self.model_type} detector from: {model_path}")
-                    break
+            model_path = self._weights_path or self._resolve_model_path(config['model_path'])
+            if model_path is not None:
+                self.model, model_path = self._load_weights(model_path)
+                self.classes = self._classes_override or config['classes']
+                model_loaded = True
+                print(f"✅ Loaded {self.model_type} detector ({self.backend}) from: {model_path}")
             
             if not model_loaded:
+                from ultralytics import YOLO
                 print(f"⚠️ Model not found for {self.model_type}, using default YOLOv8n")
                 self.model = YOLO('yolov8n.pt')
+                self.backend = 'torch'
                 
         except ImportError:
             print("⚠️ ultralytics not installed, detector will not work")
@@ -84,15 +97,51 @@ class ComponentDetector:
             print(f"❌ Error loading model: {e}")
             self.model = None
     
-    def detect(self, image: Union[bytes, np.ndarray, Image.Image, str]) -> Dict:
+    def _load_weights(self, model_path: Path) -> Tuple[object, Path]:
+        """
+        Load YOLO weights with the configured backend.
+        
+        With the ONNX backend, an exported model next to the .pt file is
+        preferred (INT8 first); otherwise the PyTorch weights are used.
+        
+        Returns:
+            (callable model, path actually loaded)
+        """
+        registry = get_model_registry()
+        if get_backend_name() == 'onnx':
+            onnx_path = find_onnx_model(model_path)
+            if onnx_path is None:
+                print(f"ℹ️ No ONNX export for {model_path.name}, using PyTorch")
+            else:
+                try:
+                    model = registry.load(onnx_path, 'onnx_yolo', OnnxYOLO)
+                except ImportError as e:
+                    # Caught here so it is not reported as a missing ultralytics install
+                    print(f"⚠️ onnxruntime not available ({e}), using PyTorch for {model_path.name}")
+                else:
+                    self.backend = 'onnx'
+                    self.model_path = onnx_path
+                    return model, onnx_path
+        
+        self.backend = 'torch'
+        self.model_path = model_path
+        return registry.load(model_path, 'yolo', load_yolo), model_path
+    
+    @staticmethod
+    def _resolve_model_path(relative_path: str) -> Optional[Path]:
+        """Find a model file relative to the known project locations."""
+        return resolve_model_path(relative_path)
+    
+    def detect(self, image: Union[bytes, np.ndarray, Image.Image, str, Frame]) -> Dict:
         """
         Detect components in an image.
         
         Args:
-            image: Image as bytes, numpy array, PIL Image, or file path
+            image: Image as bytes, numpy array, PIL Image, file path, or shared Frame
             
         Returns:
-            Dict with detection results including single-component enforcement
+            Dict with detection results including single-component enforcement,
+            and 'detect_ms' (this detector's inference time)
         """
         if self.model is None:
             return {
@@ -102,88 +151,326 @@ class ComponentDetector:
             }
         
         try:
-            # Convert image to appropriate format
-            if isinstance(image, bytes):
-                img = Image.open(io.BytesIO(image))
-                img_array = np.array(img)
-            elif isinstance(image, Image.Image):
-                img_array = np.array(image)
-            elif isinstance(image, str):
-                img_array = np.array(Image.open(image))
-            else:
-                img_array = image
+            started = time.perf_counter()
+            img_array = self._to_array(image)
             
             # Run detection
-            results = self.model(img_array, conf=self.confidence_threshold, verbose=False)
-            
-            # Parse results
-            detections = []
-            config = self.COMPONENT_MODELS.get(self.model_type, {})
-            target_class = config.get('target_class', None)
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for i, box in enumerate(boxes):
-                        class_id = int(box.cls[0])
-                        
-                        # Filter by target_class if specified
-                        if target_class is not None and class_id != target_class:
-                            continue
-                        
-                        detection = {
-                            'class_id': class_id,
-                            'class_name': self.classes[class_id] if class_id < len(self.classes) else f"class_{class_id}",
-                            'confidence': float(box.conf[0]),
-                            'bbox': box.xyxy[0].tolist(),  # [x1, y1, x2, y2]
-                            'bbox_normalized': box.xywhn[0].tolist()  # [x_center, y_center, w, h] normalized
-                        }
-                        detections.append(detection)
-            
-            # Single-component enforcement
-            unique_classes = set(d['class_name'] for d in detections)
-            
-            if len(detections) == 0:
-                return {
-                    'success': False,
-                    'error': 'No component detected. Please ensure the component is clearly visible.',
-                    'detections': [],
-                    'component_count': 0
-                }
-            
-            if len(unique_classes) > 1:
-                return {
-                    'success': False,
-                    'error': f'Multiple component types detected ({", ".join(unique_classes)}). Please capture only ONE component.',
-                    'detections': detections,
-                    'component_count': len(detections)
-                }
-            
-            # Return successful detection (single component)
-            primary_detection = max(detections, key=lambda x: x['confidence'])
+            ladder = self._ladder()
+            if ladder is None:
+                result = self._parse_results(self._predict(img_array))
+            else:
+                result, level = ladder.run(
+                    lambda size: self._parse_results(self._predict(img_array, size)),
+                    self._result_confidence, img_array.shape
+                )
+                ladder.record(self.model_type, level)
+                result['imgsz'] = level
+            result = self._to_original_coords(result, image)
+            result['detect_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            return result
             
+        except Exception as e:
             return {
-                'success': True,
-                'component_type': self.model_type,
-                'component_class': primary_detection['class_name'],
-                'confidence': primary_detection['confidence'],
-                'bbox': primary_detection['bbox'],
-                'detections': detections,
-                'component_count': len(detections)
+                'success': False,
+                'error': f'Detection failed: {str(e)}',
+                'detections': []
             }
+    
+    def detect_batch(self, images: List[Union[bytes, np.ndarray, Image.Image, str, Frame]]) -> List[Dict]:
+        """
+        Detect components in several images with a single forward pass.
+        
+        Args:
+            images: List of images (bytes, numpy arrays, PIL Images, file paths, or Frames)
             
+        Returns:
+            List of detection dicts, one per input image, in input order
+            ('detect_ms' is the time of the whole batched pass)
+        """
+        if self.model is None:
+            return [self.detect(image) for image in images]
+        
+        if not images:
+            return []
+        
+        try:
+            started = time.perf_counter()
+            arrays = [self._to_array(image) for image in images]
+            ladder = self._ladder()
+            if ladder is None:
+                parsed = [self._parse_results([result]) for result in self._predict(arrays)]
+            else:
+                parsed, levels = ladder.run_batch(
+                    lambda indices, size: [
+                        self._parse_results([result])
+                        for result in self._predict([arrays[i] for i in indices], size)
+                    ],
+                    self._result_confidence, [array.shape for array in arrays]
+                )
+                for result, level in zip(parsed, levels):
+                    ladder.record(self.model_type, level)
+                    result['imgsz'] = level
+            outputs = [self._to_original_coords(result, image) for result, image in zip(parsed, images)]
+            detect_ms = round((time.perf_counter() - started) * 1000, 2)
+            for output in outputs:
+                output['detect_ms'] = detect_ms
+            return outputs
         except Exception as e:
-            return {
+            return [{
                 'success': False,
                 'error': f'Detection failed: {str(e)}',
                 'detections': []
-            }
+            } for _ in images]
+    
+    def _predict(self, source, imgsz: Optional[int] = None):
+        """Run the model on one array or a list of arrays (at the model's own size unless `imgsz`)."""
+        # The instance may be shared with other detectors and the legacy endpoint
+        with get_model_registry().predict_lock(self.model):
+            if imgsz is None:
+                return self.model(source, conf=self.confidence_threshold, verbose=False)
+            return self.model(source, conf=self.confidence_threshold, verbose=False, imgsz=imgsz)
+    
+    def _ladder(self) -> Optional[ResolutionLadder]:
+        """Resolution ladder for adaptive mode; ONNX exports have a fixed input size."""
+        return get_resolution_ladder() if self.backend == 'torch' else None
+    
+    @staticmethod
+    def _result_confidence(result: Dict) -> Optional[float]:
+        """Confidence of a usable detection, None when the policy rejected the image."""
+        return result['confidence'] if result.get('success') else None
+    
+    @staticmethod
+    def _to_array(image: Union[bytes, np.ndarray, Image.Image, str, Frame]) -> np.ndarray:
+        """Convert any supported image input to a numpy array."""
+        if isinstance(image, Frame):
+            return image.array
+        if isinstance(image, bytes):
+            return np.array(Image.open(io.BytesIO(image)))
+        if isinstance(image, Image.Image):
+            return np.array(image)
+        if isinstance(image, str):
+            return np.array(Image.open(image))
+        return image
+    
+    @staticmethod
+    def _to_original_coords(result: Dict, image) -> Dict:
+        """Map boxes found on a reduced-size Frame back to original image coordinates."""
+        if not isinstance(image, Frame) or image.scale == (1.0, 1.0):
+            return result
+        for detection in result.get('detections', []):
+            detection['bbox'] = image.to_original(detection['bbox'])
+        if 'bbox' in result:
+            result['bbox'] = image.to_original(result['bbox'])
+        return result
+    
+    def _parse_results(self, results) -> Dict:
+        """Parse YOLO results for one image and apply the single-component policy."""
+        detections = []
+        config = self.COMPONENT_MODELS.get(self.model_type, {})
+        target_class = config.get('target_class', None)
+        
+        for result in results:
+            boxes = result.boxes
+            if boxes is not None:
+                for i, box in enumerate(boxes):
+                    class_id = int(box.cls[0])
+                    
+                    # Filter by target_class if specified
+                    if target_class is not None and class_id != target_class:
+                        continue
+                    
+                    detection = {
+                        'class_id': class_id,
+                        'class_name': self.classes[class_id] if class_id < len(self.classes) else f"class_{class_id}",
+                        'confidence': float(box.conf[0]),
+                        'bbox': box.xyxy[0].tolist(),  # [x1, y1, x2, y2]
+                        'bbox_normalized': box.xywhn[0].tolist()  # [x_center, y_center, w, h] normalized
+                    }
+                    detections.append(detection)
+        
+        return enforce_single_component(detections, self.model_type)
     
     def is_loaded(self) -> bool:
         """Check if model is loaded."""
         return self.model is not None
 
 
+def load_yolo(model_path: Path):
+    """Build an ultralytics YOLO model; the registry loader for 'yolo' weights."""
+    from ultralytics import YOLO
+    return YOLO(str(model_path))
+
+
+def enforce_single_component(detections: List[Dict], component_type: str) -> Dict:
+    """
+    Apply the single-component policy to one detector's detections.
+    
+    Args:
+        detections: Parsed detections for one image
+        component_type: Component type the detections belong to
+        
+    Returns:
+        Detection result dict (success only when exactly one class was found)
+    """
+    unique_classes = set(d['class_name'] for d in detections)
+    
+    if len(detections) == 0:
+        return {
+            'success': False,
+            'error': 'No component detected. Please ensure the component is clearly visible.',
+            'detections': [],
+            'component_count': 0
+        }
+    
+    if len(unique_classes) > 1:
+        return {
+            'success': False,
+            'error': f'Multiple component types detected ({", ".join(unique_classes)}). Please capture only ONE component.',
+            'detections': detections,
+            'component_count': len(detections)
+        }
+    
+    # Return successful detection (single component)
+    primary_detection = max(detections, key=lambda x: x['confidence'])
+    
+    return {
+        'success': True,
+        'component_type': component_type,
+        'component_class': primary_detection['class_name'],
+        'confidence': primary_detection['confidence'],
+        'bbox': primary_detection['bbox'],
+        'detections': detections,
+        'component_count': len(detections)
+    }
+
+
+class FusedComponentDetector(ComponentDetector):
+    """
+    Single YOLO model trained on the merged dataset of every component type.
+    
+    One forward pass replaces running each per-component detector. Its
+    classes are mapped back onto the per-component types and class names so
+    results look exactly like those of `ComponentDetector`.
+    """
+    
+    FUSED_MODEL = {
+        'model_path': 'railway-yolo-detection/models/unified_best.pt',
+        'classes': {
+            0: ('erc', 'elastic_clip_good'),
+            1: ('erc', 'elastic_clip_missing'),
+            2: ('sleeper', 'sleepers')
+        }
+    }
+    
+    def __init__(self, confidence_threshold: float = 0.25, weights_path: Path = None):
+        super().__init__('fused', confidence_threshold, weights_path)
+    
+    def _load_model(self):
+        """Load the unified YOLO model; stay unloaded if it has not been trained."""
+        try:
+            model_path = self._weights_path or self._resolve_model_path(self.FUSED_MODEL['model_path'])
+            if model_path is None:
+                print("ℹ️ Fused detector not found, falling back to per-component detectors")
+                self.model = None
+                return
+            
+            self.model, model_path = self._load_weights(model_path)
+            self.classes = [name for _, name in self.FUSED_MODEL['classes'].values()]
+            print(f"✅ Loaded fused detector ({self.backend}) from: {model_path}")
+            
+        except ImportError:
+            print("⚠️ ultralytics not installed, detector will not work")
+            self.model = None
+        except Exception as e:
+            print(f"❌ Error loading fused model: {e}")
+            self.model = None
+    
+    def _parse_results(self, results) -> Dict:
+        """Split fused detections per component type and keep the best one."""
+        by_type = {}
+        for result in results:
+            boxes = result.boxes
+            if boxes is not None:
+                for box in boxes:
+                    class_id = int(box.cls[0])
+                    if class_id not in self.FUSED_MODEL['classes']:
+                        continue
+                    component_type, class_name = self.FUSED_MODEL['classes'][class_id]
+                    by_type.setdefault(component_type, []).append({
+                        'class_id': class_id,
+                        'class_name': class_name,
+                        'confidence': float(box.conf[0]),
+                        'bbox': box.xyxy[0].tolist(),
+                        'bbox_normalized': box.xywhn[0].tolist()
+                    })
+        
+        best_result = None
+        for component_type, detections in by_type.items():
+            result = enforce_single_component(detections, component_type)
+            if result['success'] and (best_result is None or result['confidence'] > best_result['confidence']):
+                best_result = result
+        
+        if best_result:
+            return best_result
+        
+        # Report the first failure (e.g. multiple classes) or a plain miss
+        for component_type, detections in by_type.items():
+            return enforce_single_component(detections, component_type)
+        return enforce_single_component([], self.model_type)
+
+
+# Shared pool for running detectors concurrently
+_detector_pool = None
+_detector_pool_lock = threading.Lock()
+
+def get_detector_pool() -> ThreadPoolExecutor:
+    """Get the thread pool shared by all concurrent detector runs."""
+    global _detector_pool
+    with _detector_pool_lock:
+        if _detector_pool is None:
+            workers = int(os.getenv("PIPELINE_DETECTOR_THREADS", len(ComponentDetector.COMPONENT_MODELS)))
+            _detector_pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="detector")
+    return _detector_pool
+
+
+def detect_concurrently(detectors: Dict[str, ComponentDetector], image: Union[bytes, np.ndarray, Image.Image, str],
+                        early_exit_confidence: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Run several detectors on the same image in parallel.
+    
+    As soon as one detector succeeds with a confidence of at least
+    `early_exit_confidence`, the detectors that have not started yet are
+    cancelled and the ones still running are no longer waited for.
+    
+    Args:
+        detectors: Detectors keyed by component type
+        image: Image to run every detector on
+        early_exit_confidence: Confidence that ends the search early (None waits for all)
+        
+    Returns:
+        Detection results keyed by component type, for the detectors that finished
+    """
+    pool = get_detector_pool()
+    pending = {pool.submit(detector.detect, image): model_type for model_type, detector in detectors.items()}
+    results = {}
+    
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            model_type = pending.pop(future)
+            results[model_type] = future.result()
+        
+        if early_exit_confidence is not None and any(
+            result['success'] and result.get('confidence', 0) >= early_exit_confidence
+            for result in results.values()
+        ):
+            for future in pending:
+                future.cancel()
+            break
+    
+    return results
+
+
 class MultiComponentDetector:
     """Wrapper that can detect multiple component types."""
     
@@ -200,20 +487,26 @@ class MultiComponentDetector:
             except Exception as e:
                 print(f"⚠️ Could not load {model_type} detector: {e}")
     
-    def detect_all(self, image: Union[bytes, np.ndarray, Image.Image, str]) -> Dict:
+    def detect_all(self, image: Union[bytes, np.ndarray, Image.Image, str],
+                   concurrent: bool = False, early_exit_confidence: Optional[float] = None) -> Dict:
         """
         Run all detectors on an image and return combined results.
         
         Returns the detection with highest confidence across all detectors.
+        With `concurrent=True` the detectors run in parallel on the shared
+        detector pool and may stop early at `early_exit_confidence`.
         """
         all_results = {}
         best_result = None
         best_confidence = 0
         
-        for model_type, detector in self.detectors.items():
-            result = detector.detect(image)
-            all_results[model_type] = result
-            
+        if concurrent:
+            all_results = detect_concurrently(self.detectors, image, early_exit_confidence)
+        else:
+            for model_type, detector in self.detectors.items():
+                all_results[model_type] = detector.detect(image)
+        
+        for model_type, result in all_results.items():
             if result['success'] and result['confidence'] > best_confidence:
                 best_confidence = result['confidence']
                 best_result = result
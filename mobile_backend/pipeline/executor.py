@@ -0,0 +1,343 @@
+"""
+Inference Process Pool
+======================
+Runs model inference in a pool of worker processes so CPU-heavy work never
+blocks the FastAPI event loop and spreads across cores instead of sharing
+one GIL. Every worker loads the inspection pipeline (and any extra YOLO
+weights) once in its initializer; requests then only ship image bytes in
+and result dicts out.
+
+Each call carries a deadline: calls still queued when it passes are
+cancelled, and workers skip calls that expired before they started.
+
+Configure with INFERENCE_WORKERS (0 disables the pool and inference runs in
+a thread of the server process), INFERENCE_DEADLINE_MS and
+INFERENCE_WORKER_THREADS (torch/ONNX threads per worker).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .stats import LatencyTracker
+
+
+class InferenceTimeout(TimeoutError):
+    """Raised when an inference call misses its deadline."""
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def _init_worker(threads: int, preload_models: List[str]):
+    """Process initializer: pin thread counts and load every model once."""
+    os.environ.setdefault("ONNX_INTRA_OP_THREADS", str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    
+    from .pipeline import get_pipeline
+    get_pipeline()
+    for model_path in preload_models:
+        _load_yolo(model_path)
+    print(f"✅ Inference worker {os.getpid()} ready ({threads} threads)")
+
+
+def _load_yolo(model_path: str):
+    """Get a plain YOLO model by path, shared with the pipeline's detectors."""
+    from .detector import load_yolo
+    from .registry import get_model_registry
+    return get_model_registry().load(model_path, 'yolo', load_yolo)
+
+
+def _run_task(fn: Callable, args: tuple, deadline: float) -> tuple:
+    """Run one task in a worker, refusing calls whose deadline already passed."""
+    started = time.time()
+    if deadline and started > deadline:
+        raise InferenceTimeout("Deadline passed before inference started")
+    result = fn(*args)
+    return result, started, (time.time() - started) * 1000
+
+
+def inspect_task(image_data: bytes, component_type: Optional[str], hint: Optional[str] = None) -> Dict:
+    """Worker task: run the inspection pipeline on one upload."""
+    from .pipeline import get_pipeline
+    return get_pipeline().inspect(image_data, component_type, hint)
+
+
+def inspect_batch_task(items: List[tuple]) -> List[Dict]:
+    """Worker task: run the inspection pipeline on (image, component_type, hint) items."""
+    from .pipeline import get_pipeline
+    images = [image for image, _, _ in items]
+    component_types = [component_type for _, component_type, _ in items]
+    hints = [hint for _, _, hint in items]
+    return get_pipeline().inspect_batch(images, component_types, hints)
+
+
+def predict_boxes_task(model_path: str, image_data: bytes, conf: float, imgsz: Optional[int] = None) -> Dict:
+    """
+    Worker task: run a plain YOLO model and return raw boxes.
+    
+    A fixed `imgsz` (the cheaper mode under load) bypasses the resolution ladder.
+    
+    Returns:
+        Dict with 'boxes' as [x1, y1, x2, y2, confidence, class_id] rows,
+        'inference_time_ms' and 'imgsz' (ladder level, None when adaptive
+        resolution is off; recorded by the caller)
+    """
+    import io
+    import numpy as np
+    from PIL import Image
+    from .resolution import get_resolution_ladder
+    
+    model = _load_yolo(model_path)
+    started = time.perf_counter()
+    img_array = np.array(Image.open(io.BytesIO(image_data)).convert('RGB'))
+    ladder = get_resolution_ladder()
+    if imgsz is not None:
+        boxes, level = predict_boxes(model, img_array, conf, imgsz), None
+    elif ladder is None:
+        boxes, level = predict_boxes(model, img_array, conf), None
+    else:
+        boxes, level = ladder.run(lambda size: predict_boxes(model, img_array, conf, size), max_box_confidence,
+                                  img_array.shape)
+    return {'boxes': boxes, 'inference_time_ms': round((time.perf_counter() - started) * 1000, 2), 'imgsz': level}
+
+
+def predict_boxes(model, img_array, conf: float, imgsz: Optional[int] = None) -> List[List[float]]:
+    """Run a plain YOLO model and return [x1, y1, x2, y2, confidence, class_id] rows."""
+    from .registry import get_model_registry
+    kwargs = {'imgsz': imgsz} if imgsz is not None else {}
+    with get_model_registry().predict_lock(model):
+        results = model.predict(source=img_array, conf=conf, save=False, verbose=False, **kwargs)
+    
+    boxes = []
+    for result in results:
+        for i in range(len(result.boxes)):
+            boxes.append(result.boxes.xyxy[i].tolist() + [float(result.boxes.conf[i]), int(result.boxes.cls[i])])
+    return boxes
+
+
+def max_box_confidence(boxes: List[List[float]]) -> Optional[float]:
+    """Best confidence of predict_boxes rows (None when there are none)."""
+    return max(box[4] for box in boxes) if boxes else None
+
+
+def status_task() -> Dict:
+    """Worker task: this worker's pipeline status and counters, its pid and the weight files it loaded."""
+    from .pipeline import get_pipeline
+    pipeline = get_pipeline()
+    return {
+        **pipeline.get_status(),
+        'worker_pid': os.getpid(),
+        'model_paths': pipeline.model_paths()
+    }
+
+
+# ---------------------------------------------------------------------------
+# Server side
+# ---------------------------------------------------------------------------
+
+class InferenceExecutor:
+    """
+    Process pool for model inference with deadlines and queue metrics.
+    
+    `run` blocks the calling thread (used by the micro-batcher) and
+    `run_async` awaits from the event loop; both return the task's result
+    or raise `InferenceTimeout`.
+    """
+    
+    def __init__(self, workers: int = None, deadline_ms: float = None, worker_threads: int = None):
+        """
+        Initialize the executor (worker processes start on `start()` or first use).
+        
+        Args:
+            workers: Number of worker processes (default: INFERENCE_WORKERS or 1)
+            deadline_ms: Default per-call deadline (default: INFERENCE_DEADLINE_MS or 30000)
+            worker_threads: Compute threads per worker
+                            (default: INFERENCE_WORKER_THREADS or cores / workers)
+        """
+        self.workers = max(1, int(workers or os.getenv("INFERENCE_WORKERS", 1)))
+        self.deadline_ms = float(deadline_ms or os.getenv("INFERENCE_DEADLINE_MS", 30000))
+        self.worker_threads = max(1, int(worker_threads or os.getenv(
+            "INFERENCE_WORKER_THREADS", (os.cpu_count() or 1) // self.workers)))
+        
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._model_paths = []
+        self._queue_wait = LatencyTracker()
+        self._run_latency = LatencyTracker()
+    
+    def start(self, preload_models: List[str] = None):
+        """Start the worker processes and wait until every one has loaded its models."""
+        with self._pool_lock:
+            if self._pool is not None:
+                return
+            context = multiprocessing.get_context(os.getenv("INFERENCE_START_METHOD", "spawn"))
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.worker_threads, list(preload_models or []))
+            )
+        
+        # One call per worker spawns them all; initializers run before the first task
+        warmups = [self._submit(status_task, (), deadline_ms=0) for _ in range(self.workers)]
+        status = warmups[0].result()
+        self._model_paths = status['model_paths']
+        for future in warmups[1:]:
+            future.result()
+        
+        # Start-up time is not request latency
+        with self._stats_lock:
+            self._submitted = self._completed = 0
+            self._queue_wait = LatencyTracker()
+            self._run_latency = LatencyTracker()
+        print(f"✅ Inference pool started: {self.workers} workers x {self.worker_threads} threads")
+    
+    def _submit(self, fn: Callable, args: tuple, deadline_ms: float = None) -> Future:
+        """Submit a task and return a Future resolving to the task's own result."""
+        if self._pool is None:
+            self.start()
+        
+        deadline_ms = self.deadline_ms if deadline_ms is None else deadline_ms
+        submitted = time.time()
+        deadline = submitted + deadline_ms / 1000.0 if deadline_ms else 0
+        
+        with self._stats_lock:
+            self._in_flight += 1
+            self._submitted += 1
+        
+        outer = Future()
+        inner = self._pool.submit(_run_task, fn, args, deadline)
+        
+        def _done(f: Future):
+            with self._stats_lock:
+                self._in_flight -= 1
+            if f.cancelled():
+                error = InferenceTimeout("Inference cancelled before it started")
+            else:
+                error = f.exception()
+            
+            if error is None:
+                result, started, run_ms = f.result()
+                self._queue_wait.record(max(0.0, (started - submitted) * 1000))
+                self._run_latency.record(run_ms)
+            with self._stats_lock:
+                # A call that timed out while running was already counted by _expire
+                if not outer.counted:
+                    outer.counted = True
+                    if error is None:
+                        self._completed += 1
+                    elif isinstance(error, InferenceTimeout):
+                        self._timeouts += 1
+                    else:
+                        self._failed += 1
+            
+            # The caller may have given up (and cancelled) already
+            if outer.set_running_or_notify_cancel():
+                if error is None:
+                    outer.set_result(result)
+                else:
+                    outer.set_exception(error)
+        
+        outer.inner = inner
+        outer.counted = False  # in completed/failed/timeouts, exactly once
+        inner.add_done_callback(_done)
+        return outer
+    
+    def run(self, fn: Callable, *args, deadline_ms: float = None) -> Any:
+        """Run a task in a worker and wait for it from a regular thread."""
+        deadline_ms = self.deadline_ms if deadline_ms is None else deadline_ms
+        future = self._submit(fn, args, deadline_ms)
+        try:
+            return future.result(timeout=deadline_ms / 1000.0 if deadline_ms else None)
+        except InferenceTimeout:
+            raise
+        except TimeoutError:
+            raise self._expire(future)
+    
+    async def run_async(self, fn: Callable, *args, deadline_ms: float = None) -> Any:
+        """Run a task in a worker and await it from the event loop."""
+        deadline_ms = self.deadline_ms if deadline_ms is None else deadline_ms
+        future = self._submit(fn, args, deadline_ms)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future),
+                                          timeout=deadline_ms / 1000.0 if deadline_ms else None)
+        except InferenceTimeout:
+            raise
+        except asyncio.TimeoutError:
+            raise self._expire(future)
+    
+    def _expire(self, future: Future) -> InferenceTimeout:
+        """Cancel a call that missed its deadline if it has not started yet."""
+        if future.inner.cancel():
+            return InferenceTimeout("Inference deadline exceeded while queued")
+        # Already running in a worker; its result will be discarded
+        with self._stats_lock:
+            if not future.counted:
+                future.counted = True
+                self._timeouts += 1
+        return InferenceTimeout("Inference deadline exceeded")
+    
+    def model_paths(self) -> List[str]:
+        """Weight files loaded by the workers (reported at start-up)."""
+        return list(self._model_paths)
+    
+    def get_stats(self) -> Dict:
+        """Get pool configuration, queue depth and latency statistics."""
+        with self._stats_lock:
+            return {
+                'enabled': True,
+                'started': self._pool is not None,
+                'workers': self.workers,
+                'worker_threads': self.worker_threads,
+                'deadline_ms': self.deadline_ms,
+                'in_flight': self._in_flight,
+                'queue_depth': max(0, self._in_flight - self.workers),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'timeouts': self._timeouts,
+                'queue_wait_ms': self._queue_wait.summary(),
+                'run_ms': self._run_latency.summary()
+            }
+    
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Singleton instance
+_executor_instance = None
+_executor_lock = threading.Lock()
+
+def get_inference_executor() -> Optional[InferenceExecutor]:
+    """
+    Get or create the singleton inference executor.
+    
+    Returns None when INFERENCE_WORKERS=0 (inference stays in-process).
+    """
+    global _executor_instance
+    if int(os.getenv("INFERENCE_WORKERS", 1)) <= 0:
+        return None
+    with _executor_lock:
+        if _executor_instance is None:
+            _executor_instance = InferenceExecutor()
+    return _executor_instance
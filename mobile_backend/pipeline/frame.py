@@ -0,0 +1,170 @@
+"""
+Shared Decoded Frame
+====================
+Decodes an uploaded image once and hands the same pixels to every
+pipeline stage. JPEGs are decoded with PIL draft mode straight down to
+roughly the detector's input size, so a 12 MP phone photo is never
+decoded at full resolution. Crops are zero-copy numpy views and resized
+copies are cached per size.
+"""
+
+import io
+import os
+import time
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from PIL import Image
+
+
+class Frame:
+    """
+    One decoded RGB image shared by detection and classification.
+    
+    Pixel data is held as a read-only HxWx3 uint8 array at the decoded
+    resolution. Bounding boxes going in and out of the frame are always
+    expressed in the coordinates of the original upload, so callers never
+    see the reduced decode size.
+    """
+    
+    def __init__(self, array: np.ndarray, original_size: Tuple[int, int] = None, decode_ms: float = 0.0):
+        """
+        Wrap an already decoded image.
+        
+        Args:
+            array: HxWx3 RGB uint8 pixels
+            original_size: (width, height) of the image before reduced decoding
+            decode_ms: Time spent decoding, in milliseconds
+        """
+        if array.ndim == 2:
+            array = np.stack([array] * 3, axis=-1)
+        elif array.shape[2] == 4:
+            array = array[:, :, :3]
+        else:
+            array = array.view()  # Don't change the caller's array flags
+        array.flags.writeable = False
+        
+        self._array = array
+        self.height, self.width = array.shape[:2]
+        self.original_size = original_size or (self.width, self.height)
+        self.decode_ms = decode_ms
+        self._resized = {}
+        self._pil = None
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, target_size: int = None) -> 'Frame':
+        """
+        Decode encoded image bytes (JPEG, PNG, ...) once.
+        
+        Args:
+            data: Encoded image
+            target_size: Smallest side the decoded frame needs for detection;
+                         JPEGs are decoded at the largest 1/2, 1/4 or 1/8
+                         reduction that still covers it
+        """
+        return cls._decode(io.BytesIO(data), target_size)
+    
+    @classmethod
+    def from_file(cls, fp, target_size: int = None) -> 'Frame':
+        """Decode an image from a path or a binary file object."""
+        return cls._decode(fp, target_size)
+    
+    @classmethod
+    def _decode(cls, source, target_size: Optional[int]) -> 'Frame':
+        started = time.perf_counter()
+        img = Image.open(source)
+        original_size = img.size
+        if target_size and img.format == 'JPEG':
+            img.draft('RGB', (target_size, target_size))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        array = np.asarray(img)
+        return cls(array, original_size, (time.perf_counter() - started) * 1000)
+    
+    @classmethod
+    def from_image(cls, image: Union[bytes, np.ndarray, Image.Image, str, 'Frame'],
+                   target_size: int = None) -> 'Frame':
+        """
+        Build a frame from any image input the pipeline accepts.
+        
+        Frames are returned as-is; numpy arrays are wrapped without copying.
+        """
+        if isinstance(image, Frame):
+            return image
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return cls.from_bytes(bytes(image), target_size)
+        if isinstance(image, str):
+            return cls.from_file(image, target_size)
+        if isinstance(image, Image.Image):
+            started = time.perf_counter()
+            array = np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+            return cls(array, image.size, (time.perf_counter() - started) * 1000)
+        return cls(np.asarray(image))
+    
+    @property
+    def array(self) -> np.ndarray:
+        """Read-only RGB pixels at the decoded resolution."""
+        return self._array
+    
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """(x, y) factor from decoded to original coordinates."""
+        return self.original_size[0] / self.width, self.original_size[1] / self.height
+    
+    def to_original(self, bbox: List[float]) -> List[float]:
+        """Map an [x1, y1, x2, y2] box from decoded to original coordinates."""
+        sx, sy = self.scale
+        return [bbox[0] * sx, bbox[1] * sy, bbox[2] * sx, bbox[3] * sy]
+    
+    def to_decoded(self, bbox: List[float]) -> List[float]:
+        """Map an [x1, y1, x2, y2] box from original to decoded coordinates."""
+        sx, sy = self.scale
+        return [bbox[0] / sx, bbox[1] / sy, bbox[2] / sx, bbox[3] / sy]
+    
+    def crop(self, bbox: List[float], padding: float = 0.0) -> np.ndarray:
+        """
+        Cut a box out of the frame without copying pixels.
+        
+        Args:
+            bbox: [x1, y1, x2, y2] in original image coordinates
+            padding: Extra margin on every side, as a fraction of box width/height
+        
+        Returns:
+            Read-only numpy view into the frame
+        """
+        x1, y1, x2, y2 = self.to_decoded(bbox)
+        pad_x = (x2 - x1) * padding
+        pad_y = (y2 - y1) * padding
+        left = max(0, int(x1 - pad_x))
+        top = max(0, int(y1 - pad_y))
+        right = min(self.width, int(np.ceil(x2 + pad_x)))
+        bottom = min(self.height, int(np.ceil(y2 + pad_y)))
+        if right <= left or bottom <= top:
+            return self._array
+        return self._array[top:bottom, left:right]
+    
+    def resized(self, size: Tuple[int, int]) -> np.ndarray:
+        """Get the whole frame resized to (width, height), cached per size."""
+        cached = self._resized.get(size)
+        if cached is None:
+            cached = np.asarray(self.pil().resize(size))
+            self._resized[size] = cached
+        return cached
+    
+    def pil(self) -> Image.Image:
+        """Get a PIL view of the frame (shares memory with the array)."""
+        if self._pil is None:
+            self._pil = Image.fromarray(self._array)
+        return self._pil
+    
+    def describe(self) -> Dict:
+        """Decoded and original sizes, for logging and result metadata."""
+        return {
+            'original_size': list(self.original_size),
+            'decoded_size': [self.width, self.height],
+            'decode_ms': round(self.decode_ms, 2)
+        }
+
+
+def default_decode_size() -> int:
+    """Decode target used by the pipeline (PIPELINE_DECODE_SIZE, default 640)."""
+    return int(os.getenv("PIPELINE_DECODE_SIZE", 640))
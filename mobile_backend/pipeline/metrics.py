@@ -0,0 +1,204 @@
+"""
+Request Spans and Prometheus Metrics
+====================================
+Per-request timing spans (decode, detect per detector, crop, classify,
+database access, ...) aggregated into histograms and exposed in the
+Prometheus text format, without a client library dependency.
+
+A request's spans are collected in a context variable set up by the HTTP
+middleware; code running for that request adds to them with `span()`,
+`record_span()` or `record_timings()` (for the `timings` dict the pipeline
+returns from its worker processes).
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+# Seconds; covers cache hits (~1 ms) up to slow CPU inference and DB round trips
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Prometheus histogram with a fixed label set."""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        """Record one observation (in the metric's unit, seconds for durations)."""
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+    
+    def render(self) -> str:
+        """Exposition lines for this histogram."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, [list(counts), total, count]) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="{}"'.format('+Inf' if bound == math.inf else repr(bound))
+                lines.append(f"{self.name}_bucket{{{','.join(labels + [le])}}} {cumulative}")
+            label_text = f"{{{','.join(labels)}}}" if labels else ''
+            lines.append(f"{self.name}_sum{label_text} {total:.6f}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return '\n'.join(lines)
+
+
+class Counter:
+    """Prometheus counter with a fixed label set."""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels):
+        """Increase the counter for a label combination."""
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self) -> str:
+        """Exposition lines for this counter."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            labels = ','.join(f'{name}="{_escape(label)}"' for name, label in zip(self.labelnames, key))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return '\n'.join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Named histograms and counters rendered together for the /metrics endpoint."""
+    
+    def __init__(self, prefix: str = 'railchinh'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+        
+        self.http_duration = self.histogram(
+            'http_request_duration_seconds', 'HTTP request duration by route', ('method', 'route', 'status'))
+        self.stage_duration = self.histogram(
+            'stage_duration_seconds', 'Duration of request stages (decode, detect, classify, db, ...)', ('stage',))
+        self.upload_bytes = self.histogram(
+            'upload_size_bytes', 'Size of uploaded inspection images', ('transport',),
+            buckets=(16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6))
+        self.admission_wait = self.histogram(
+            'admission_wait_seconds', 'Time inference requests waited for an admission slot', ('endpoint',))
+        self.admission_rejections = self.counter(
+            'admission_rejections_total', 'Inference requests rejected with 503 by admission control',
+            ('endpoint', 'reason'))
+        self.admission_degraded = self.counter(
+            'admission_degraded_total', 'Inference requests served in the cheaper mode under pressure', ('endpoint',))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram (the name is prefixed)."""
+        full_name = f"{self.prefix}_{name}"
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = Histogram(full_name, documentation, labelnames, buckets)
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Get or create a counter (the name is prefixed)."""
+        full_name = f"{self.prefix}_{name}"
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = Counter(full_name, documentation, labelnames)
+        return metric
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# Singleton instance
+_metrics_instance = None
+_metrics_lock = threading.Lock()
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry."""
+    global _metrics_instance
+    with _metrics_lock:
+        if _metrics_instance is None:
+            _metrics_instance = MetricsRegistry()
+    return _metrics_instance
+
+
+# ---------------------------------------------------------------------------
+# Request spans
+# ---------------------------------------------------------------------------
+
+_request_spans: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_spans', default=None)
+
+
+def start_request_spans() -> Dict[str, float]:
+    """Begin collecting spans for the current request; returns the (live) span dict."""
+    spans = {}
+    _request_spans.set(spans)
+    return spans
+
+
+def record_span(name: str, duration_ms: Optional[float]):
+    """Add a span to the current request (if any) and to the stage histogram."""
+    if duration_ms is None:
+        return
+    spans = _request_spans.get()
+    if spans is not None:
+        spans[name] = round(spans.get(name, 0.0) + duration_ms, 2)
+    get_metrics_registry().stage_duration.observe(duration_ms / 1000.0, stage=name)
+
+
+def record_timings(timings: Optional[Dict[str, Optional[float]]]):
+    """Record a pipeline `timings` dict ({'decode_ms': ..., 'detect_erc_ms': ...}) as spans."""
+    for key, value in (timings or {}).items():
+        record_span(key[:-3] if key.endswith('_ms') else key, value)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block of code as a span of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, (time.perf_counter() - started) * 1000)
+
+
+def format_timing_header(spans: Dict[str, float], total_ms: float) -> str:
+    """Spans as an X-Timing header value: 'total=412.3, decode=6.1, detect=380.2, ...' (ms)."""
+    return ', '.join([f"total={total_ms:.1f}"] + [f"{name}={value:.1f}" for name, value in spans.items()])
@@ -0,0 +1,250 @@
+"""
+Versioned Model Store
+=====================
+A directory of model weights described by a manifest, so new weights can
+be published and activated without redeploying the backend:
+
+    model_store/
+    ├── manifest.json
+    ├── 2026-10-01/
+    │   ├── erc_detector.pt
+    │   ├── sleeper_detector.pt
+    │   └── erc_classifier.pt
+    └── 2026-10-16/
+        └── ...
+
+manifest.json:
+
+    {
+      "active": "2026-10-16",
+      "versions": {
+        "2026-10-16": {
+          "created_at": "2026-10-16T09:12:00",
+          "models": {
+            "erc_detector": {"file": "2026-10-16/erc_detector.pt", "sha256": "...",
+                             "classes": ["elastic_clip_good", "elastic_clip_missing"]},
+            "erc_classifier": {"file": "2026-10-16/erc_classifier.pt", "sha256": "...",
+                               "classes": ["Good", "Rust", "Crack", "Broken", "Missing"]}
+          }
+        }
+      }
+    }
+
+Model keys are `<type>_detector` ('erc', 'sleeper', 'fused') and
+`<type>_classifier` ('erc', 'sleeper', 'liner', 'rubber_pad'). Models a
+version does not list fall back to the default search paths.
+
+Publish a version from the command line:
+
+    python -m pipeline.model_store publish 2026-10-16 \\
+        --model erc_detector=../railway-yolo-detection/models/best.pt --activate
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .registry import resolve_model_path
+
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 of a file, streamed."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ModelStore:
+    """Reads, verifies and updates a versioned model store directory."""
+    
+    MANIFEST = 'manifest.json'
+    
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.manifest_path = self.root / self.MANIFEST
+        self._lock = threading.Lock()
+    
+    def read_manifest(self) -> Dict:
+        """Load the manifest (empty structure if there is none yet)."""
+        if not self.manifest_path.exists():
+            return {'active': None, 'versions': {}}
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        manifest.setdefault('versions', {})
+        return manifest
+    
+    def manifest_mtime(self) -> Optional[int]:
+        """Modification time of the manifest, used by the poller."""
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def active_version(self) -> Optional[str]:
+        """Version the manifest currently marks as active."""
+        return self.read_manifest().get('active')
+    
+    def versions(self) -> List[str]:
+        """All published versions."""
+        return sorted(self.read_manifest()['versions'])
+    
+    def resolve(self, version: str, verify: bool = True) -> Dict[str, Dict]:
+        """
+        Get the model files of a version.
+        
+        Args:
+            version: Version name from the manifest
+            verify: Check each file's SHA-256 against the manifest
+        
+        Returns:
+            Dict of model key -> {'path': Path, 'classes': list or None}
+        
+        Raises:
+            ValueError: Unknown version, missing file or hash mismatch
+        """
+        manifest = self.read_manifest()
+        if version not in manifest['versions']:
+            raise ValueError(f"Unknown model version: {version}")
+        
+        models = {}
+        for key, spec in manifest['versions'][version].get('models', {}).items():
+            path = self.root / spec['file']
+            if not path.exists():
+                raise ValueError(f"Model file missing for {key}: {path}")
+            if verify and spec.get('sha256') and sha256_file(path) != spec['sha256']:
+                raise ValueError(f"Hash mismatch for {key}: {path}")
+            models[key] = {'path': path, 'classes': spec.get('classes')}
+        return models
+    
+    def publish(self, version: str, files: Dict[str, Path], classes: Dict[str, List[str]] = None,
+                activate: bool = False) -> Dict:
+        """
+        Copy weights into a new version directory and add it to the manifest.
+        
+        Each file is stored under its model key (`erc_detector.pt`), since the
+        sources often share a name (every detector's `best.pt`).
+        
+        Args:
+            version: New version name
+            files: Model key -> weight file to copy
+            classes: Optional model key -> class names
+            activate: Make the new version active
+        
+        Returns:
+            The version's manifest entry
+        
+        Raises:
+            ValueError: A key is not a plain file name, or two keys map to the same file
+        """
+        classes = classes or {}
+        version_dir = self.root / version
+        
+        targets = {}
+        for key, source in files.items():
+            if not key or Path(key).name != key or key.startswith('.'):
+                raise ValueError(f"Model key must be a plain name: {key!r}")
+            target = version_dir / f"{key}{Path(source).suffix}"
+            if target.name.lower() in {t.name.lower() for t in targets.values()}:
+                raise ValueError(f"Two models would be stored as {target.name}")
+            targets[key] = target
+        
+        version_dir.mkdir(parents=True, exist_ok=True)
+        models = {}
+        for key, source in files.items():
+            target = targets[key]
+            shutil.copy2(source, target)
+            models[key] = {
+                'file': f"{version}/{target.name}",
+                'sha256': sha256_file(target),
+                'classes': classes.get(key)
+            }
+        
+        entry = {'created_at': datetime.now().isoformat(timespec='seconds'), 'models': models}
+        with self._lock:
+            manifest = self.read_manifest()
+            manifest['versions'][version] = entry
+            if activate or not manifest.get('active'):
+                manifest['active'] = version
+            self._write_manifest(manifest)
+        return entry
+    
+    def activate(self, version: str):
+        """Mark a published version as active (pollers pick it up)."""
+        with self._lock:
+            manifest = self.read_manifest()
+            if version not in manifest['versions']:
+                raise ValueError(f"Unknown model version: {version}")
+            manifest['active'] = version
+            self._write_manifest(manifest)
+    
+    def _write_manifest(self, manifest: Dict):
+        """Replace the manifest atomically so readers never see a partial file."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def get_model_store() -> Optional[ModelStore]:
+    """
+    Get the configured model store.
+    
+    Uses MODEL_STORE if set, otherwise `railway-yolo-detection/model_store`
+    when it has a manifest. Returns None when there is no store.
+    """
+    if os.getenv("MODEL_STORE"):
+        return ModelStore(Path(os.getenv("MODEL_STORE")))
+    manifest = resolve_model_path(f"railway-yolo-detection/model_store/{ModelStore.MANIFEST}")
+    return ModelStore(manifest.parent) if manifest is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the versioned model store")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Model store directory (default: MODEL_STORE or railway-yolo-detection/model_store)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    publish_parser = subparsers.add_parser("publish", help="Publish a new version")
+    publish_parser.add_argument("version", type=str)
+    publish_parser.add_argument("--model", action="append", default=[], metavar="KEY=PATH",
+                                help="Model key and weight file, e.g. erc_detector=best.pt")
+    publish_parser.add_argument("--classes", action="append", default=[], metavar="KEY=A,B,C",
+                                help="Class names for a model key")
+    publish_parser.add_argument("--activate", action="store_true",
+                                help="Make the new version active")
+    
+    activate_parser = subparsers.add_parser("activate", help="Activate a published version")
+    activate_parser.add_argument("version", type=str)
+    
+    subparsers.add_parser("list", help="List versions")
+    
+    args = parser.parse_args()
+    store = ModelStore(Path(args.store)) if args.store else get_model_store()
+    if store is None:
+        store = ModelStore(Path(__file__).parent.parent.parent / 'railway-yolo-detection' / 'model_store')
+    
+    if args.command == "publish":
+        files = dict(item.split("=", 1) for item in args.model)
+        classes = {key: value.split(",") for key, value in (item.split("=", 1) for item in args.classes)}
+        store.publish(args.version, {key: Path(path) for key, path in files.items()}, classes, args.activate)
+        print(f"✅ Published {args.version} to {store.root}")
+    elif args.command == "activate":
+        store.activate(args.version)
+        print(f"✅ Activated {args.version}")
+    else:
+        active = store.active_version()
+        for version in store.versions():
+            print(f"{'*' if version == active else ' '} {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,18 @@ from typing import Dict, List, Optional, Union
 from PIL import Image
 import numpy as np
 import io
+import os
+import threading
+import time
 import base64
 
-from .detector import ComponentDetector, MultiComponentDetector
+from .detector import (
+    ComponentDetector,
+    MultiComponentDetector,
+    FusedComponentDetector,
+    detect_concurrently,
+    get_detector_pool
+)
 from .classifiers import (
     ComponentClassifier, 
     ERCClassifier, 
@@ -18,6 +27,36 @@ from .classifiers import (
     LinerClassifier,
     RubberPadClassifier
 )
+from .backends import get_backend_name
+from .cache import weights_fingerprint
+from .model_store import get_model_store
+from .registry import get_model_registry
+from .resolution import get_resolution_ladder
+from .frame import Frame, default_decode_size
+from .stats import LatencyTracker
+from .video import VideoInspector
+
+
+# Names the app and the inventory use for components, mapped to pipeline types
+COMPONENT_ALIASES = {
+    'erc': 'erc',
+    'ec': 'erc',
+    'elastic_rail_clip': 'erc',
+    'elastic_clip': 'erc',
+    'sleeper': 'sleeper',
+    'liner': 'liner',
+    'rubber_pad': 'rubber_pad',
+    'pad': 'rubber_pad'
+}
+
+def component_type_from_name(name: Optional[str]) -> Optional[str]:
+    """
+    Map a component name ('Elastic Rail Clip', 'ERC', 'rubber pad', ...) to
+    its pipeline type, or None if it is not one the pipeline knows.
+    """
+    if not name:
+        return None
+    return COMPONENT_ALIASES.get('_'.join(name.strip().lower().replace('-', ' ').split()))
 
 
 class InspectionPipeline:
@@ -30,83 +69,326 @@ class InspectionPipeline:
     3. Enforce single-component policy
     4. Run ResNet classification for defect detection
     5. Return combined results
+    
+    Detection modes (when no component type is given):
+    - sequential: run each detector one after another, keep the best
+    - concurrent: run all detectors on a shared thread pool, stop early
+      once one is confident enough
+    - fused: one pass of the unified multi-head model (falls back to
+      concurrent if it is not available)
+    
+    Routing: when the caller knows what it expects (e.g. from the scanned
+    QR code) but does not force a component type, that detector runs first
+    and the others only run if it misses or is not confident enough.
+    
+    Classification runs on padded crops of the detected boxes, not on the
+    whole photo; every detected instance is classified in one batch.
+    Rarely used classifiers (PIPELINE_LAZY_CLASSIFIERS, default liner and
+    rubber_pad) are loaded on first use instead of at startup.
+    
+    A pipeline is built for one set of weights (`weights_version`, from the
+    model store or 'local'); new weights are rolled out by building a new
+    pipeline and swapping it in with `reload_models()`.
     """
     
-    def __init__(self, confidence_threshold: float = 0.5):
+    DETECT_MODES = ('sequential', 'concurrent', 'fused')
+    
+    CLASSIFIER_CLASSES = {
+        'erc': ERCClassifier,
+        'sleeper': SleeperClassifier,
+        'liner': LinerClassifier,
+        'rubber_pad': RubberPadClassifier
+    }
+    
+    def __init__(self, confidence_threshold: float = 0.5, detect_mode: str = None,
+                 early_exit_confidence: float = None, crop_padding: float = None,
+                 model_files: Dict[str, Dict] = None, weights_version: str = None):
         """
         Initialize the inspection pipeline.
         
         Args:
             confidence_threshold: Minimum confidence for detection
+            detect_mode: 'sequential', 'concurrent' or 'fused'
+                         (default: PIPELINE_DETECT_MODE or 'concurrent')
+            early_exit_confidence: Confidence at which concurrent detection stops
+                                   waiting for other detectors
+                                   (default: PIPELINE_EARLY_EXIT_CONFIDENCE or 0.8)
+            crop_padding: Margin added around each detection box before
+                          classification, as a fraction of box size
+                          (default: PIPELINE_CROP_PADDING or 0.1)
+            model_files: Model key -> {'path', 'classes'} from the model store;
+                         models not listed use the default locations
+            weights_version: Name of the weights version, stamped on every result
+                             (default: 'local')
         """
         self.confidence_threshold = confidence_threshold
+        self.detect_mode = (detect_mode or os.getenv("PIPELINE_DETECT_MODE", "concurrent")).lower()
+        if self.detect_mode not in self.DETECT_MODES:
+            raise ValueError(f"Unknown detect mode: {self.detect_mode}")
+        self.early_exit_confidence = float(
+            early_exit_confidence if early_exit_confidence is not None
+            else os.getenv("PIPELINE_EARLY_EXIT_CONFIDENCE", 0.8)
+        )
         self.detectors = {}
+        self.fused_detector = None
         self.classifiers = {}
+        self.crop_padding = float(crop_padding if crop_padding is not None else os.getenv("PIPELINE_CROP_PADDING", 0.1))
+        self.max_crops = int(os.getenv("PIPELINE_MAX_CROPS", 8))
+        self.decode_size = default_decode_size()
+        self._detect_latency = {}
+        self._routing = {}
+        self._routing_lock = threading.Lock()  # recorded from the batcher, detector pool and request threads
+        self._stage_latency = {stage: LatencyTracker() for stage in ('decode', 'detect', 'crop', 'classify')}
+        self.lazy_classifiers = [
+            name.strip() for name in os.getenv("PIPELINE_LAZY_CLASSIFIERS", "liner,rubber_pad").split(",")
+            if name.strip()
+        ]
+        self._classifier_lock = threading.Lock()
+        self.model_files = model_files or {}
+        self.weights_version = weights_version or 'local'
+        self.startup_ms = None
         self._initialized = False
-        
+    
     def initialize(self):
         """Load all models (call this at startup)."""
-        print("🚀 Initializing Inspection Pipeline...")
+        print(f"🚀 Initializing Inspection Pipeline (weights: {self.weights_version})...")
+        started = time.perf_counter()
         
         # Load available detectors
         for model_type in ['erc', 'sleeper']:
             try:
-                detector = ComponentDetector(model_type, self.confidence_threshold)
+                spec = self.model_files.get(f'{model_type}_detector', {})
+                detector = ComponentDetector(model_type, self.confidence_threshold,
+                                             spec.get('path'), spec.get('classes'))
                 if detector.is_loaded():
                     self.detectors[model_type] = detector
                     print(f"  ✅ {model_type.upper()} detector loaded")
             except Exception as e:
                 print(f"  ❌ Failed to load {model_type} detector: {e}")
         
-        # Load classifiers
-        classifier_map = {
-            'erc': ERCClassifier,
-            'sleeper': SleeperClassifier,
-            'liner': LinerClassifier,
-            'rubber_pad': RubberPadClassifier
-        }
+        if self.detect_mode == 'fused':
+            detector = FusedComponentDetector(self.confidence_threshold,
+                                              self.model_files.get('fused_detector', {}).get('path'))
+            if detector.is_loaded():
+                self.fused_detector = detector
+                print("  ✅ Fused detector loaded")
         
-        for comp_type, classifier_cls in classifier_map.items():
-            try:
-                self.classifiers[comp_type] = classifier_cls()
-                print(f"  ✅ {comp_type.upper()} classifier loaded")
-            except Exception as e:
-                print(f"  ❌ Failed to load {comp_type} classifier: {e}")
+        # Load classifiers (lazy ones on first use)
+        for comp_type in self.CLASSIFIER_CLASSES:
+            if comp_type in self.lazy_classifiers:
+                print(f"  ℹ️ {comp_type.upper()} classifier will load on first use")
+                continue
+            self._load_classifier(comp_type)
         
+        self.startup_ms = round((time.perf_counter() - started) * 1000, 1)
         self._initialized = True
-        print(f"✅ Pipeline initialized with {len(self.detectors)} detectors and {len(self.classifiers)} classifiers")
+        print(f"✅ Pipeline initialized with {len(self.detectors)} detectors and {len(self.classifiers)} classifiers "
+              f"in {self.startup_ms / 1000:.1f}s")
+    
+    def _load_classifier(self, component_type: str) -> Optional[ComponentClassifier]:
+        """Create the classifier for a component type and register it."""
+        try:
+            spec = self.model_files.get(f'{component_type}_classifier', {})
+            classifier = self.CLASSIFIER_CLASSES[component_type](
+                weights_path=spec.get('path'), classes=spec.get('classes'))
+            self.classifiers[component_type] = classifier
+            print(f"  ✅ {component_type.upper()} classifier loaded")
+            return classifier
+        except Exception as e:
+            print(f"  ❌ Failed to load {component_type} classifier: {e}")
+            return None
+    
+    def _get_classifier(self, component_type: str) -> Optional[ComponentClassifier]:
+        """Get a component's classifier, loading a lazy one on first use."""
+        classifier = self.classifiers.get(component_type)
+        if classifier is not None or component_type not in self.CLASSIFIER_CLASSES:
+            return classifier
+        with self._classifier_lock:
+            classifier = self.classifiers.get(component_type)
+            if classifier is None:
+                classifier = self._load_classifier(component_type)
+        return classifier
     
     def inspect(self, image: Union[bytes, np.ndarray, Image.Image, str], 
-                component_type: str = None) -> Dict:
+                component_type: str = None, hint: str = None) -> Dict:
         """
         Run full inspection pipeline on an image.
         
         Args:
-            image: Image to inspect (bytes, numpy array, PIL Image, or path)
+            image: Image to inspect (bytes, numpy array, PIL Image, path, or Frame)
             component_type: Optional - specify component type ('erc', 'sleeper', etc.)
                           If None, tries all detectors
+            hint: Expected component type; its detector runs first and the
+                  others only on a miss (ignored when component_type is set)
         
         Returns:
-            Dict with inspection results
+            Dict with inspection results, including per-stage 'timings' in ms
         """
         if not self._initialized:
             self.initialize()
         
+        # Step 0: Decode once, shared by every later stage
+        frame = self._decode(image)
+        timings = {'decode_ms': round(frame.decode_ms, 2)}
+        
         # Step 1: Detection
-        detection_result = self._detect(image, component_type)
+        started = time.perf_counter()
+        detection_result = self._detect(frame, component_type, hint)
+        timings['detect_ms'] = self._record_stage('detect', started)
+        for name, detect_ms in detection_result.pop('detector_ms', {}).items():
+            timings[f'detect_{name}_ms'] = detect_ms
         
         if not detection_result['success']:
+            detection_result['timings'] = timings
+            detection_result['model_version'] = self.weights_version
             return detection_result
         
-        # Step 2: Classification
-        classification_result = self._classify(
-            image, 
+        # Step 2: Crop the detected component(s) out of the shared frame
+        started = time.perf_counter()
+        crops = self._crop(frame, detection_result)
+        timings['crop_ms'] = self._record_stage('crop', started)
+        
+        # Step 3: Classification - every instance crop in one batch
+        started = time.perf_counter()
+        classification_results = self._classify(
+            crops, 
             detection_result['component_type'],
             detection_result['component_class']
         )
+        timings['classify_ms'] = self._record_stage('classify', started)
         
-        # Step 3: Combine results
-        return {
+        # Step 4: Combine results
+        result = self._combine(detection_result, classification_results)
+        result['timings'] = timings
+        result['model_version'] = self.weights_version
+        return result
+    
+    def inspect_batch(self, images: List[Union[bytes, np.ndarray, Image.Image, str]],
+                      component_types: List[Optional[str]] = None,
+                      hints: List[Optional[str]] = None) -> List[Dict]:
+        """
+        Run the inspection pipeline on several images at once.
+        
+        Images are grouped so that each detector and each classifier runs a
+        single batched forward pass, instead of one pass per image.
+        
+        Args:
+            images: Images to inspect
+            component_types: Optional component type per image
+            hints: Optional expected component type per image (see `inspect`)
+        
+        Returns:
+            List of inspection result dicts, one per input image, in input order
+        """
+        if not self._initialized:
+            self.initialize()
+        
+        if component_types is None:
+            component_types = [None] * len(images)
+        if hints is None:
+            hints = [None] * len(images)
+        
+        # Step 0: Decode each image once
+        images = [self._decode(image) for image in images]
+        timings = [{'decode_ms': round(frame.decode_ms, 2)} for frame in images]
+        
+        # Step 1: Detection - one batch per detector
+        started = time.perf_counter()
+        detection_results = self._detect_batch(images, component_types, hints)
+        detect_ms = self._record_stage('detect', started)
+        
+        # Step 2: Crop the detected component(s) out of each frame
+        started = time.perf_counter()
+        crops = [
+            self._crop(frame, detection_result) if detection_result['success'] else []
+            for frame, detection_result in zip(images, detection_results)
+        ]
+        crop_ms = self._record_stage('crop', started)
+        
+        # Step 3: Classification - one batch per detected component type,
+        # covering every crop of every image of that type
+        started = time.perf_counter()
+        classification_results = [None] * len(images)
+        groups = {}
+        for idx, detection_result in enumerate(detection_results):
+            if detection_result['success']:
+                groups.setdefault(detection_result['component_type'], []).append(idx)
+        
+        for comp_type, indices in groups.items():
+            outputs = self._classify(
+                [crop for i in indices for crop in crops[i]],
+                comp_type,
+                [detection_results[i]['component_class'] for i in indices for _ in crops[i]]
+            )
+            offset = 0
+            for idx in indices:
+                classification_results[idx] = outputs[offset:offset + len(crops[idx])]
+                offset += len(crops[idx])
+        classify_ms = self._record_stage('classify', started) if groups else None
+        
+        # Step 4: Combine results
+        results = []
+        for detection_result, classification_result, timing in zip(detection_results, classification_results, timings):
+            timing['detect_ms'] = detect_ms
+            for name, detector_ms in detection_result.pop('detector_ms', {}).items():
+                timing[f'detect_{name}_ms'] = detector_ms
+            if detection_result['success']:
+                timing['crop_ms'] = crop_ms
+                timing['classify_ms'] = classify_ms
+                result = self._combine(detection_result, classification_result)
+            else:
+                result = detection_result
+            result['timings'] = timing
+            result['model_version'] = self.weights_version
+            results.append(result)
+        return results
+    
+    def inspect_video(self, source: str, max_frames: int = None, **options) -> Dict:
+        """
+        Inspect a track video: detect every few frames, track components
+        across frames and classify each one once (see `VideoInspector`).
+        
+        Args:
+            source: Video file path, stream URL or camera index
+            max_frames: Stop after this many frames
+            **options: VideoInspector settings (stride, adaptive, motion_threshold, ...)
+        
+        Returns:
+            Dict with per-component frame ranges and conditions, and frames per second processed
+        """
+        if not self._initialized:
+            self.initialize()
+        return VideoInspector(self, **options).inspect(source, max_frames=max_frames)
+    
+    def _decode(self, image: Union[bytes, np.ndarray, Image.Image, str, Frame]) -> Frame:
+        """Decode the input once into a shared Frame and record decode time."""
+        frame = Frame.from_image(image, self.decode_size)
+        self._stage_latency['decode'].record(frame.decode_ms)
+        return frame
+    
+    def _record_stage(self, stage: str, started: float) -> float:
+        """Record the elapsed time of a pipeline stage and return it in ms."""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._stage_latency[stage].record(elapsed_ms)
+        return round(elapsed_ms, 2)
+    
+    def _crop(self, frame: Frame, detection_result: Dict) -> List[np.ndarray]:
+        """
+        Cut the detected instances out of the frame, primary detection first.
+        
+        Returns zero-copy views with `crop_padding` margin, at most `max_crops`.
+        """
+        detections = sorted(
+            detection_result.get('detections') or [{'bbox': detection_result['bbox']}],
+            key=lambda d: d.get('confidence', 0),
+            reverse=True
+        )
+        return [frame.crop(d['bbox'], self.crop_padding) for d in detections[:max(1, self.max_crops)]]
+    
+    def _combine(self, detection_result: Dict, classification_results: List[Dict]) -> Dict:
+        """Merge detection and per-instance classification outputs into the API result."""
+        classification_result = classification_results[0]
+        result = {
             'success': True,
             'component_type': detection_result['component_type'],
             'component_class': detection_result['component_class'],
@@ -114,53 +396,253 @@ class InspectionPipeline:
             'bbox': detection_result['bbox'],
             'condition': classification_result['condition'],
             'defects': classification_result['defects'],
-            'classification_confidence': classification_result['confidence'],
+            'classification_confidence': classification_result.get('confidence', 0.0),
             'recommendations': self._get_recommendations(
                 detection_result['component_class'],
                 classification_result['condition'],
                 classification_result['defects']
             )
         }
+        
+        if len(classification_results) > 1:
+            detections = sorted(detection_result['detections'], key=lambda d: d['confidence'], reverse=True)
+            result['instances'] = [
+                {
+                    'bbox': detection['bbox'],
+                    'detection_confidence': detection['confidence'],
+                    'condition': classification['condition'],
+                    'defects': classification['defects'],
+                    'classification_confidence': classification.get('confidence', 0.0)
+                }
+                for detection, classification in zip(detections, classification_results)
+            ]
+        
+        return result
     
     def _detect(self, image: Union[bytes, np.ndarray, Image.Image, str],
-                component_type: str = None) -> Dict:
+                component_type: str = None, hint: str = None) -> Dict:
         """Run detection step."""
         
+        started = time.perf_counter()
+        
         if component_type and component_type in self.detectors:
             # Use specific detector
-            return self.detectors[component_type].detect(image)
+            mode = 'single'
+            result = self.detectors[component_type].detect(image)
+            result['detector_ms'] = {component_type: result.get('detect_ms')}
+        elif hint in self.detectors and not (self.detect_mode == 'fused' and self.fused_detector is not None):
+            # The fused model already covers every type in one pass; routing only helps without it
+            return self._detect_routed(image, hint)
+        elif self.detect_mode == 'fused' and self.fused_detector is not None:
+            mode = 'fused'
+            result = self.fused_detector.detect(image)
+            result['detector_ms'] = {'fused': result.get('detect_ms')}
+        else:
+            mode = 'sequential' if self.detect_mode == 'sequential' else 'concurrent'
+            result = self._detect_all(image, mode)
+        
+        self._record_detect_latency(mode, (time.perf_counter() - started) * 1000)
+        return result
+    
+    def _detect_routed(self, image: Union[bytes, np.ndarray, Image.Image, str], hint: str) -> Dict:
+        """Run the hinted detector first; fall back to the others if it misses."""
+        
+        started = time.perf_counter()
+        result = self.detectors[hint].detect(image)
+        detector_ms = {hint: result.get('detect_ms')}
+        hit = result['success'] and result.get('confidence', 0) >= self.early_exit_confidence
+        
+        if not hit:
+            others = {name: detector for name, detector in self.detectors.items() if name != hint}
+            mode = 'sequential' if self.detect_mode == 'sequential' else 'concurrent'
+            fallback = self._detect_all(image, mode, others) if others else None
+            if fallback is not None:
+                detector_ms.update(fallback.pop('detector_ms', {}))
+                if fallback['success'] and (not result['success'] or fallback['confidence'] > result.get('confidence', 0)):
+                    result = fallback
+        result['detector_ms'] = detector_ms
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._record_detect_latency('routed', elapsed_ms)
+        self._record_routing(hint, hit, result, elapsed_ms)
+        return result
+    
+    def _record_routing(self, hint: str, hit: bool, result: Dict, elapsed_ms: float = None):
+        """
+        Record one routed detection for the hint's component type.
+        
+        Latency saved is estimated against the average unrouted detection
+        latency of the configured mode (negative when a miss cost extra).
+        """
+        saved_ms = None
+        if elapsed_ms is not None:
+            mode = 'sequential' if self.detect_mode == 'sequential' else 'concurrent'
+            baseline = self._detect_latency.get(mode)
+            if baseline is not None:
+                summary = baseline.summary()
+                if summary['count']:
+                    saved_ms = summary['avg'] - elapsed_ms
+        
+        with self._routing_lock:
+            stats = self._routing.get(hint)
+            if stats is None:
+                stats = self._routing[hint] = {
+                    'requests': 0, 'hits': 0, 'fallbacks': 0, 'mismatches': 0,
+                    'saved_ms': 0.0, 'latency': LatencyTracker()
+                }
+            stats['requests'] += 1
+            stats['hits' if hit else 'fallbacks'] += 1
+            if result['success'] and result.get('component_type') != hint:
+                stats['mismatches'] += 1
+            if saved_ms is not None:
+                stats['saved_ms'] += saved_ms
+        
+        if elapsed_ms is not None:
+            stats['latency'].record(elapsed_ms)
+    
+    def _detect_all(self, image: Union[bytes, np.ndarray, Image.Image, str], mode: str,
+                    detectors: Dict[str, ComponentDetector] = None) -> Dict:
+        """Try all detectors (or the given subset) and return the best result."""
+        
+        detectors = self.detectors if detectors is None else detectors
+        if mode == 'concurrent' and len(detectors) > 1:
+            results = detect_concurrently(detectors, image, self.early_exit_confidence)
+        else:
+            results = {
+                detector_type: detector.detect(image)
+                for detector_type, detector in detectors.items()
+            }
         
-        # Try all detectors and return best result
         best_result = None
         best_confidence = 0
         
-        for detector_type, detector in self.detectors.items():
-            result = detector.detect(image)
+        for detector_type, result in results.items():
             if result['success'] and result.get('confidence', 0) > best_confidence:
                 best_confidence = result['confidence']
                 best_result = result
         
+        detector_ms = {detector_type: result.get('detect_ms') for detector_type, result in results.items()}
         if best_result:
+            best_result['detector_ms'] = detector_ms
             return best_result
         
         # If no successful detection, return error
         return {
             'success': False,
             'error': 'No railway component detected. Please capture a clear image of a single component.',
-            'detections': []
+            'detections': [],
+            'detector_ms': detector_ms
         }
     
-    def _classify(self, image: Union[bytes, np.ndarray, Image.Image, str],
-                  component_type: str, detection_class: str) -> Dict:
-        """Run classification step."""
+    def _record_detect_latency(self, mode: str, latency_ms: float):
+        """Record detection latency for one execution mode."""
+        tracker = self._detect_latency.get(mode)
+        if tracker is None:
+            tracker = self._detect_latency.setdefault(mode, LatencyTracker())
+        tracker.record(latency_ms)
+    
+    def _classify(self, crops: List[np.ndarray], component_type: str,
+                  detection_class: Union[str, List[str]]) -> List[Dict]:
+        """Run classification step on a batch of component crops."""
         
-        classifier = self.classifiers.get(component_type)
+        detection_classes = detection_class if isinstance(detection_class, list) else [detection_class] * len(crops)
+        classifier = self._get_classifier(component_type)
         
         if classifier:
-            return classifier.classify(image, detection_class)
+            return classifier.classify_batch(crops, detection_classes)
         
         # Fallback classification
-        return ComponentClassifier(component_type)._fallback_classify(detection_class)
+        fallback = ComponentClassifier(component_type)
+        return [fallback._fallback_classify(cls) for cls in detection_classes]
+    
+    def _detect_batch(self, images: List[Union[bytes, np.ndarray, Image.Image, str]],
+                      component_types: List[Optional[str]],
+                      hints: List[Optional[str]] = None) -> List[Dict]:
+        """Run the detection step for a batch, one forward pass per detector."""
+        
+        results = [None] * len(images)
+        detector_ms = [{} for _ in images]
+        hints = hints or [None] * len(images)
+        fused = self.detect_mode == 'fused' and self.fused_detector is not None
+        typed = {}
+        routed = {}
+        untyped = []
+        for idx, (component_type, hint) in enumerate(zip(component_types, hints)):
+            if component_type and component_type in self.detectors:
+                typed.setdefault(component_type, []).append(idx)
+            elif hint in self.detectors and not fused:
+                routed.setdefault(hint, []).append(idx)
+            else:
+                untyped.append(idx)
+        
+        # Images with a component type only go through that detector
+        for component_type, indices in typed.items():
+            outputs = self.detectors[component_type].detect_batch([images[i] for i in indices])
+            for idx, output in zip(indices, outputs):
+                results[idx] = output
+                detector_ms[idx][component_type] = output.get('detect_ms')
+        
+        # Images with an expected type go through its detector first; the
+        # others only run on the images it missed
+        for hint, indices in routed.items():
+            outputs = self.detectors[hint].detect_batch([images[i] for i in indices])
+            misses = []
+            for idx, output in zip(indices, outputs):
+                results[idx] = output if output['success'] else None
+                detector_ms[idx][hint] = output.get('detect_ms')
+                if not (output['success'] and output.get('confidence', 0) >= self.early_exit_confidence):
+                    misses.append(idx)
+            
+            for name, detector in self.detectors.items():
+                if name == hint or not misses:
+                    continue
+                for idx, output in zip(misses, detector.detect_batch([images[i] for i in misses])):
+                    detector_ms[idx][name] = output.get('detect_ms')
+                    best = results[idx]
+                    if output['success'] and (best is None or output.get('confidence', 0) > best.get('confidence', 0)):
+                        results[idx] = output
+            
+            for idx in indices:
+                self._record_routing(hint, idx not in misses, results[idx] or {'success': False})
+        
+        # Untyped images go through the fused model or every detector; keep the best per image
+        if untyped:
+            untyped_images = [images[i] for i in untyped]
+            started = time.perf_counter()
+            
+            if self.detect_mode == 'fused' and self.fused_detector is not None:
+                mode = 'fused'
+                for idx, output in zip(untyped, self.fused_detector.detect_batch(untyped_images)):
+                    detector_ms[idx]['fused'] = output.get('detect_ms')
+                    if output['success']:
+                        results[idx] = output
+            else:
+                mode = 'sequential' if self.detect_mode == 'sequential' else 'concurrent'
+                if mode == 'concurrent':
+                    pool = get_detector_pool()
+                    futures = [pool.submit(detector.detect_batch, untyped_images) for detector in self.detectors.values()]
+                    all_outputs = [future.result() for future in futures]
+                else:
+                    all_outputs = [detector.detect_batch(untyped_images) for detector in self.detectors.values()]
+                
+                for name, outputs in zip(self.detectors, all_outputs):
+                    for idx, output in zip(untyped, outputs):
+                        detector_ms[idx][name] = output.get('detect_ms')
+                        best = results[idx]
+                        if output['success'] and (best is None or output.get('confidence', 0) > best.get('confidence', 0)):
+                            results[idx] = output
+            
+            self._record_detect_latency(f'{mode}_batch', (time.perf_counter() - started) * 1000)
+        
+        no_detection = {
+            'success': False,
+            'error': 'No railway component detected. Please capture a clear image of a single component.',
+            'detections': []
+        }
+        results = [result if result is not None else dict(no_detection) for result in results]
+        for result, per_detector in zip(results, detector_ms):
+            result['detector_ms'] = per_detector
+        return results
     
     def _get_recommendations(self, component_class: str, condition: str, 
                             defects: List[str]) -> List[str]:
@@ -191,17 +673,97 @@ class InspectionPipeline:
         
         return recommendations
     
+    def warm_up(self):
+        """
+        Run every loaded model once on a blank image.
+        
+        Pays first-inference costs (allocator growth, kernel selection)
+        before the pipeline serves requests, so a freshly swapped-in set of
+        weights does not make the next request slow.
+        """
+        blank = np.zeros((640, 640, 3), dtype=np.uint8)
+        detectors = list(self.detectors.values())
+        if self.fused_detector is not None:
+            detectors.append(self.fused_detector)
+        for detector in detectors:
+            detector.detect(blank)
+        for classifier in list(self.classifiers.values()):
+            if classifier.is_loaded():
+                classifier.classify_batch([blank[:224, :224]], [None])
+    
+    def model_paths(self) -> List[str]:
+        """Weight files of every loaded model."""
+        models = list(self.detectors.values()) + list(self.classifiers.values())
+        if self.fused_detector is not None:
+            models.append(self.fused_detector)
+        return [str(model.model_path) for model in models if model.model_path is not None]
+    
+    def model_version(self) -> str:
+        """Fingerprint of every loaded weight file, used to key cached results."""
+        models = list(self.detectors.values()) + list(self.classifiers.values())
+        if self.fused_detector is not None:
+            models.append(self.fused_detector)
+        return weights_fingerprint(model.model_path for model in models)
+    
+    def get_routing_stats(self) -> Dict:
+        """Per component type: routed requests, hit rate and estimated latency saved."""
+        with self._routing_lock:
+            routing = {
+                hint: {key: value for key, value in stats.items() if key != 'latency'}
+                for hint, stats in self._routing.items()
+            }
+            latency = {hint: stats['latency'] for hint, stats in self._routing.items()}
+        return {
+            hint: {
+                'requests': stats['requests'],
+                'hits': stats['hits'],
+                'fallbacks': stats['fallbacks'],
+                'hit_rate': round(stats['hits'] / stats['requests'], 4) if stats['requests'] else 0.0,
+                'mismatches': stats['mismatches'],
+                'latency_ms': latency[hint].summary(),
+                'latency_saved_ms_total': round(stats['saved_ms'], 1)
+            }
+            for hint, stats in routing.items()
+        }
+    
     def get_status(self) -> Dict:
         """Get pipeline status and loaded models."""
+        ladder = get_resolution_ladder()
         return {
             'initialized': self._initialized,
+            'model_version': self.weights_version,
+            'model_store': get_swap_status(),
             'detectors': {
                 name: detector.is_loaded() 
                 for name, detector in self.detectors.items()
             },
             'classifiers': {
                 name: classifier.is_loaded() 
-                for name, classifier in self.classifiers.items()
+                for name, classifier in list(self.classifiers.items())
+            },
+            'lazy_classifiers': [name for name in self.lazy_classifiers if name not in self.classifiers],
+            'startup_ms': self.startup_ms,
+            'models': get_model_registry().get_stats(),
+            'stages_ms': {
+                stage: tracker.summary()
+                for stage, tracker in self._stage_latency.items()
+            },
+            'decode_size': self.decode_size,
+            'backends': {
+                'configured': get_backend_name(),
+                'detectors': {name: detector.backend for name, detector in self.detectors.items()},
+                'classifiers': {name: classifier.backend for name, classifier in list(self.classifiers.items())}
+            },
+            'detection': {
+                'mode': self.detect_mode,
+                'fused_detector_loaded': self.fused_detector is not None,
+                'early_exit_confidence': self.early_exit_confidence,
+                'latency_ms': {
+                    mode: tracker.summary()
+                    for mode, tracker in list(self._detect_latency.items())
+                },
+                'routing': self.get_routing_stats(),
+                'resolution': ladder.get_stats() if ladder else {'enabled': False}
             },
             'supported_components': list(ComponentDetector.COMPONENT_MODELS.keys())
         }
@@ -209,11 +771,155 @@ class InspectionPipeline:
 
 # Singleton instance
 _pipeline_instance = None
+_pipeline_lock = threading.Lock()
+_swap_lock = threading.Lock()
+_poller_thread = None
+_swap_status = {
+    'store': None,
+    'active': None,
+    'loading': None,
+    'swaps': 0,
+    'last_swap_at': None,
+    'last_error': None
+}
 
 def get_pipeline() -> InspectionPipeline:
-    """Get or create the singleton pipeline instance."""
+    """
+    Get or create the singleton pipeline instance.
+    
+    When a model store is configured the pipeline is built from its active
+    version (falling back to the default weights if that version cannot be
+    loaded), and a background poller swaps in newly activated versions.
+    """
     global _pipeline_instance
     if _pipeline_instance is None:
-        _pipeline_instance = InspectionPipeline()
-        _pipeline_instance.initialize()
+        with _pipeline_lock:
+            if _pipeline_instance is None:
+                store = get_model_store()
+                version = store.active_version() if store is not None else None
+                pipeline = None
+                if version:
+                    try:
+                        pipeline = InspectionPipeline(model_files=store.resolve(version), weights_version=version)
+                    except ValueError as e:
+                        print(f"⚠️ Model version {version} unusable, using local weights: {e}")
+                        _swap_status['last_error'] = str(e)
+                if pipeline is None:
+                    pipeline = InspectionPipeline()
+                pipeline.initialize()
+                
+                _swap_status['store'] = str(store.root) if store is not None else None
+                _swap_status['active'] = pipeline.weights_version
+                _pipeline_instance = pipeline
+                _start_model_poller(store)
     return _pipeline_instance
+
+
+def reload_models(version: str = None, background: bool = True) -> Dict:
+    """
+    Swap the pipeline to another weights version from the model store.
+    
+    The new pipeline is loaded and warmed up while the current one keeps
+    serving requests, then replaces it atomically; requests already running
+    finish on the old weights. Unchanged weight files are shared through
+    the model registry rather than loaded again.
+    
+    Args:
+        version: Version to load (default: the store's active version)
+        background: Load in a background thread and return immediately
+    
+    Returns:
+        Swap status dict (see `get_swap_status`)
+    
+    Raises:
+        ValueError: No model store, or unknown version
+    """
+    store = get_model_store()
+    if store is None:
+        raise ValueError("No model store configured")
+    version = version or store.active_version()
+    if version not in store.versions():
+        raise ValueError(f"Unknown model version: {version}")
+    
+    if background:
+        threading.Thread(target=_swap_to, args=(store, version), daemon=True, name="model-swap").start()
+    else:
+        _swap_to(store, version)
+    return get_swap_status()
+
+
+def _swap_to(store, version: str) -> bool:
+    """Build, warm up and swap in the pipeline for a version. Returns True if swapped."""
+    global _pipeline_instance
+    with _swap_lock:
+        current = get_pipeline()
+        if current.weights_version == version:
+            return False
+        
+        _swap_status['loading'] = version
+        print(f"🔄 Loading model version {version}...")
+        try:
+            pipeline = InspectionPipeline(model_files=store.resolve(version), weights_version=version)
+            pipeline.initialize()
+            pipeline.warm_up()
+        except Exception as e:
+            print(f"❌ Model version {version} failed to load, keeping {current.weights_version}: {e}")
+            _swap_status['last_error'] = f"{version}: {e}"
+            return False
+        finally:
+            _swap_status['loading'] = None
+        
+        # Keep latency history across the swap; warm-up runs are not requests
+        pipeline._stage_latency = current._stage_latency
+        pipeline._detect_latency = current._detect_latency
+        pipeline._routing = current._routing
+        pipeline._routing_lock = current._routing_lock
+        
+        with _pipeline_lock:
+            _pipeline_instance = pipeline
+        _swap_status.update(
+            active=version,
+            swaps=_swap_status['swaps'] + 1,
+            last_swap_at=time.time(),
+            last_error=None
+        )
+        
+        # Release the old weights once nothing refers to them
+        get_model_registry().evict(set(current.model_paths()) - set(pipeline.model_paths()))
+        print(f"✅ Swapped to model version {version} (was {current.weights_version})")
+        return True
+
+
+def _start_model_poller(store):
+    """Start the thread that watches the model store manifest (once per process)."""
+    global _poller_thread
+    interval = float(os.getenv("MODEL_STORE_POLL_SECONDS", 10))
+    if store is None or interval <= 0 or _poller_thread is not None:
+        return
+    
+    def poll():
+        last_mtime = None
+        while True:
+            time.sleep(interval)
+            mtime = store.manifest_mtime()
+            if mtime is None or mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            try:
+                version = store.active_version()
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not read model store manifest: {e}")
+                continue
+            if version and version != _swap_status['active']:
+                _swap_to(store, version)
+    
+    _poller_thread = threading.Thread(target=poll, daemon=True, name="model-store-poller")
+    _poller_thread.start()
+
+
+def get_swap_status() -> Dict:
+    """Get the active weights version and the state of the last swap."""
+    return {
+        **_swap_status,
+        'poll_seconds': float(os.getenv("MODEL_STORE_POLL_SECONDS", 10)) if _swap_status['store'] else None
+    }
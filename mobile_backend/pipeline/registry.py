@@ -0,0 +1,226 @@
+"""
+Shared Model Registry
+=====================
+Process-wide cache of loaded models. Weights are identified by the
+content hash of the file (plus the kind of model built from it), so the
+same weights are loaded once even when they are reached through
+different paths or code paths: the legacy detection endpoint and the
+pipeline's ERC detector share one YOLO instance.
+
+Shared instances are not safe to run from several threads at once
+(ultralytics predictors set up and mutate their state, input size
+included, on each call), so callers hold `predict_lock(model)` around
+inference.
+
+Also centralizes where model files are searched for, and records load
+time and resident memory per model for the status endpoints.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .stats import current_rss_bytes
+
+
+def model_search_paths() -> List[Path]:
+    """Base directories model paths are resolved against, in priority order."""
+    paths = []
+    if os.getenv("MODEL_ROOT"):
+        paths.append(Path(os.getenv("MODEL_ROOT")))
+    paths.extend([
+        Path(__file__).parent.parent.parent,  # Repository root, from pipeline folder
+        Path.cwd(),
+        Path.home() / 'Code_on_track'
+    ])
+    return paths
+
+
+def resolve_model_path(relative_path: str, extra_candidates: Iterable[Path] = ()) -> Optional[Path]:
+    """
+    Find a model file relative to the known project locations.
+    
+    Args:
+        relative_path: Path relative to the repository root
+        extra_candidates: Absolute fallbacks tried after the search paths
+    
+    Returns:
+        Resolved absolute path, or None if no candidate exists
+    """
+    candidates = [base / relative_path for base in model_search_paths()] + list(extra_candidates)
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate.resolve()
+    return None
+
+
+def _parameter_bytes(model: Any) -> Optional[int]:
+    """Size of a torch model's parameters and buffers, if it is one."""
+    if isinstance(model, tuple):
+        model = model[0]  # Loaders may return (model, metadata)
+    module = getattr(model, 'model', model)  # ultralytics YOLO wraps the nn.Module
+    if not hasattr(module, 'parameters'):
+        return None
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """
+    Loads each distinct model file once per process.
+    
+    Entries are keyed by (kind, content hash); `kind` distinguishes the
+    object built from the file (e.g. 'yolo' vs 'resnet50_classifier').
+    The first loader registered for a key builds the shared instance.
+    """
+    
+    def __init__(self):
+        self._models = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._hash_cache = {}
+        self._predict_locks = weakref.WeakKeyDictionary()  # for models that do not take attributes
+    
+    def file_hash(self, path: Path) -> str:
+        """Content hash of a weight file, cached per (path, size, mtime)."""
+        stat = os.stat(path)
+        cache_key = (str(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._hash_cache.get(cache_key)
+        if digest is None:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            self._hash_cache[cache_key] = digest
+        return digest
+    
+    def load(self, path: Path, kind: str, loader: Callable[[Path], Any]) -> Any:
+        """
+        Get the shared model for a weight file, loading it on first use.
+        
+        Args:
+            path: Weight file
+            kind: What the loader builds from the file
+            loader: Function building the model from the resolved path
+        
+        Returns:
+            The shared model instance
+        """
+        path = Path(path).resolve()
+        key = (kind, self.file_hash(path))
+        
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                entry['shares'] += 1
+                if str(path) not in entry['paths']:
+                    entry['paths'].append(str(path))
+                return entry['model']
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        
+        # Load outside the registry lock so other models can load in parallel
+        with key_lock:
+            with self._lock:
+                entry = self._models.get(key)
+            if entry is not None:
+                with self._lock:
+                    entry['shares'] += 1
+                    if str(path) not in entry['paths']:
+                        entry['paths'].append(str(path))
+                return entry['model']
+            
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            model = loader(path)
+            load_ms = (time.perf_counter() - started) * 1000
+            rss_after = current_rss_bytes()
+            param_bytes = _parameter_bytes(model)
+            
+            with self._lock:
+                self._models[key] = {
+                    'model': model,
+                    'kind': kind,
+                    'hash': key[1],
+                    'paths': [str(path)],
+                    'file_mb': round(path.stat().st_size / 1e6, 2),
+                    'load_ms': round(load_ms, 1),
+                    'rss_delta_mb': round((rss_after - rss_before) / 1e6, 1) if rss_before and rss_after else None,
+                    'param_mb': round(param_bytes / 1e6, 1) if param_bytes is not None else None,
+                    'loaded_at': time.time(),
+                    'shares': 1
+                }
+            return model
+    
+    def evict(self, paths: Iterable[Path]):
+        """
+        Forget weight files, e.g. after a model version was swapped out.
+        
+        A model is dropped once none of the paths it was loaded through
+        remain, so weights still used elsewhere (under another path) stay.
+        Callers holding the model keep it alive until they let go.
+        """
+        paths = {str(Path(p).resolve()) for p in paths}
+        with self._lock:
+            for key, entry in list(self._models.items()):
+                entry['paths'] = [p for p in entry['paths'] if p not in paths]
+                if not entry['paths']:
+                    del self._models[key]
+                    self._key_locks.pop(key, None)
+    
+    def predict_lock(self, model: Any) -> threading.RLock:
+        """
+        Lock serializing inference on one model instance.
+        
+        Covers models loaded outside the registry too, so every thread
+        running the same object takes turns. The lock lives on the model
+        object itself, so requests still running on an evicted model keep
+        sharing it and it goes away with the model.
+        """
+        lock = getattr(model, '_predict_lock', None)
+        if lock is not None:
+            return lock
+        with self._lock:
+            lock = getattr(model, '_predict_lock', None) or self._predict_locks.get(model)
+            if lock is None:
+                lock = threading.RLock()
+                try:
+                    model._predict_lock = lock
+                except AttributeError:
+                    self._predict_locks[model] = lock
+            return lock
+    
+    def get_stats(self) -> Dict:
+        """Per-model load time, memory and sharing, plus process totals."""
+        with self._lock:
+            models = [
+                {**{k: v for k, v in entry.items() if k != 'model'}, 'paths': list(entry['paths'])}
+                for entry in self._models.values()
+            ]
+        rss = current_rss_bytes()
+        return {
+            'count': len(models),
+            'total_load_ms': round(sum(m['load_ms'] for m in models), 1),
+            'process_rss_mb': round(rss / 1e6, 1) if rss else None,
+            'models': models
+        }
+
+
+# Singleton instance
+_registry_instance = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Get the process-wide model registry."""
+    global _registry_instance
+    with _registry_lock:
+        if _registry_instance is None:
+            _registry_instance = ModelRegistry()
+    return _registry_instance
@@ -0,0 +1,155 @@
+"""
+Adaptive Inference Resolution
+=============================
+Close-up captures of a single component are usually detected just as well
+at a fraction of the model's input size. In adaptive mode a detector first
+runs at the smallest size of a ladder and only re-runs at the next size
+when nothing was detected or the best confidence is below a threshold; the
+last rung is always the model's own (full) input size.
+
+    DETECT_ADAPTIVE_IMGSZ=true         enable the ladder (default: off)
+    DETECT_IMGSZ_LADDER=320,480        reduced sizes tried before full size
+    DETECT_ESCALATE_CONFIDENCE=0.5     re-run below this confidence
+
+Sizes at or above an image's longer side are skipped, since they cost as
+much as full resolution without adding detail. Exported ONNX models have a
+fixed input size, so the ladder only applies to the PyTorch backend.
+"""
+
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+FULL = 'full'
+
+
+class ResolutionLadder:
+    """Input sizes tried in order, and how many requests each size answered."""
+    
+    def __init__(self, sizes: Sequence[int] = (320, 480), escalate_confidence: float = 0.5):
+        """
+        Args:
+            sizes: Reduced input sizes, tried smallest first (rounded to the
+                   YOLO stride of 32)
+            escalate_confidence: Best confidence below which the next size is tried
+        """
+        self.sizes = sorted({max(32, int(round(size / 32)) * 32) for size in sizes})
+        self.escalate_confidence = escalate_confidence
+        self._served = {}  # model type -> {level: requests}
+        self._lock = threading.Lock()
+    
+    def levels_for(self, shape: Tuple[int, ...]) -> List[Optional[int]]:
+        """Sizes to try for an image of `shape` (None is the model's full size)."""
+        longest = max(shape[:2]) if len(shape) >= 2 else None
+        return [size for size in self.sizes if longest is None or size < longest] + [None]
+    
+    def should_escalate(self, confidence: Optional[float]) -> bool:
+        """Whether a result with this best confidence (None: no detection) needs a larger size."""
+        return confidence is None or confidence < self.escalate_confidence
+    
+    def run(self, predict: Callable[[Optional[int]], object], confidence: Callable[[object], Optional[float]],
+            shape: Tuple[int, ...]) -> Tuple[object, str]:
+        """
+        Climb the ladder for one image.
+        
+        Args:
+            predict: Runs the model at a size (None for full) and returns its output
+            confidence: Best confidence of an output, None when nothing usable was found
+            shape: Shape of the image array
+        
+        Returns:
+            (output of the size that answered, level name)
+        """
+        levels = self.levels_for(shape)
+        for level in levels:
+            output = predict(level)
+            if level is None or not self.should_escalate(confidence(output)):
+                return output, self.level_name(level)
+    
+    def run_batch(self, predict: Callable[[List[int], Optional[int]], List],
+                  confidence: Callable[[object], Optional[float]],
+                  shapes: List[Tuple[int, ...]]) -> Tuple[List, List[str]]:
+        """
+        Climb the ladder for a batch: each rung runs once over the images
+        that still need it.
+        
+        Args:
+            predict: Runs the model on the images at the given indices at a size
+                     and returns their outputs in the same order
+            confidence: Best confidence of one output (None: nothing usable)
+            shapes: Shape of each image array
+        
+        Returns:
+            (outputs in input order, level name per image)
+        """
+        outputs = [None] * len(shapes)
+        levels = [FULL] * len(shapes)
+        pending = list(range(len(shapes)))
+        for size in self.sizes + [None]:
+            batch = [i for i in pending if size is None or size in self.levels_for(shapes[i])]
+            if not batch:
+                continue
+            still_pending = [i for i in pending if i not in batch]
+            for i, output in zip(batch, predict(batch, size)):
+                if size is None or not self.should_escalate(confidence(output)):
+                    outputs[i] = output
+                    levels[i] = self.level_name(size)
+                else:
+                    still_pending.append(i)
+            pending = still_pending
+        return outputs, levels
+    
+    @staticmethod
+    def level_name(size: Optional[int]) -> str:
+        return FULL if size is None else str(size)
+    
+    def record(self, model_type: str, level: str):
+        """Count one request answered at `level`."""
+        with self._lock:
+            served = self._served.setdefault(model_type, {})
+            served[level] = served.get(level, 0) + 1
+    
+    def get_stats(self) -> Dict:
+        """Share of requests served at each size, per detector."""
+        with self._lock:
+            served = {model_type: dict(levels) for model_type, levels in self._served.items()}
+        
+        detectors = {}
+        for model_type, levels in served.items():
+            total = sum(levels.values())
+            detectors[model_type] = {
+                'requests': total,
+                'served': {
+                    level: {'requests': levels.get(level, 0), 'share': round(levels.get(level, 0) / total, 4)}
+                    for level in [str(size) for size in self.sizes] + [FULL]
+                }
+            }
+        return {
+            'enabled': True,
+            'ladder': self.sizes + [FULL],
+            'escalate_confidence': self.escalate_confidence,
+            'detectors': detectors
+        }
+
+
+def ladder_from_env() -> Optional[ResolutionLadder]:
+    """The ladder configured by DETECT_* variables, None when adaptive mode is off."""
+    if os.getenv("DETECT_ADAPTIVE_IMGSZ", "false").lower() != "true":
+        return None
+    sizes = [int(size) for size in os.getenv("DETECT_IMGSZ_LADDER", "320,480").split(",") if size.strip()]
+    return ResolutionLadder(sizes, float(os.getenv("DETECT_ESCALATE_CONFIDENCE", "0.5")))
+
+
+# Singleton instance
+_ladder_instance = None
+_ladder_loaded = False
+_ladder_lock = threading.Lock()
+
+def get_resolution_ladder() -> Optional[ResolutionLadder]:
+    """Get the process-wide resolution ladder (None when adaptive mode is off)."""
+    global _ladder_instance, _ladder_loaded
+    with _ladder_lock:
+        if not _ladder_loaded:
+            _ladder_instance = ladder_from_env()
+            _ladder_loaded = True
+    return _ladder_instance
@@ -0,0 +1,71 @@
+"""
+Pipeline Statistics
+===================
+Small thread-safe helpers for tracking latencies and memory reported by
+the pipeline status endpoint.
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class LatencyTracker:
+    """Rolling window of latency samples (ms) with percentile summaries."""
+    
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def record(self, value_ms: float):
+        """Record one latency sample in milliseconds."""
+        with self._lock:
+            self._samples.append(value_ms)
+            self._count += 1
+    
+    def extend(self, values_ms: List[float]):
+        """Record several latency samples in milliseconds."""
+        with self._lock:
+            self._samples.extend(values_ms)
+            self._count += len(values_ms)
+    
+    def summary(self) -> Dict:
+        """Get count, average, p50, p95 and max over the rolling window."""
+        with self._lock:
+            values = sorted(self._samples)
+            count = self._count
+        return {'count': count, **summarize(values)}
+
+
+def summarize(sorted_values: List[float]) -> Dict:
+    """Summarize a sorted list of latencies in milliseconds."""
+    if not sorted_values:
+        return {'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    
+    def percentile(p):
+        return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+    
+    return {
+        'avg': round(sum(sorted_values) / len(sorted_values), 2),
+        'p50': round(percentile(0.50), 2),
+        'p95': round(percentile(0.95), 2),
+        'max': round(sorted_values[-1], 2)
+    }
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident memory of this process in bytes (None if it cannot be read)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Peak, not current
+    except ImportError:
+        return None
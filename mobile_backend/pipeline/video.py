@@ -0,0 +1,394 @@
+"""
+Video Inspection
+================
+Inspects continuous track video (e.g. from the trolley camera) instead of
+single photos. Frames are read one at a time from a generator and only
+decoded when they may be detected on; detection runs only on every k-th
+frame, or sooner when the picture moves a lot, and a lightweight IoU
+tracker with constant-velocity prediction associates detections across
+frames. Each tracked component is classified once, from
+its most confident sighting, when its track ends.
+
+    python -m pipeline.video trolley_run.mp4 --stride 5 --adaptive --output run.json
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .detector import detect_concurrently
+
+
+def iter_video_frames(source: str, max_frames: int = None) -> Iterator[Tuple[int, float, Callable[[], Optional[np.ndarray]]]]:
+    """
+    Step through a video file (or camera index / stream URL) frame by frame.
+    
+    Frames are only grabbed, which skips decoding them; call the yielded
+    function to decode the current frame (before advancing).
+    
+    Yields:
+        (frame index, timestamp in seconds, function returning the HxWx3
+        RGB uint8 array, or None if the frame cannot be decoded)
+    """
+    import cv2
+    
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else str(source))
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {source}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    
+    def retrieve() -> Optional[np.ndarray]:
+        ok, bgr = capture.retrieve()
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB) if ok else None
+    
+    try:
+        index = 0
+        while max_frames is None or index < max_frames:
+            if not capture.grab():
+                break
+            yield index, index / fps, retrieve
+            index += 1
+    finally:
+        capture.release()
+
+
+def video_info(source: str) -> Dict:
+    """Frame rate, frame count and size reported by the container."""
+    import cv2
+    
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else str(source))
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        return {
+            'fps': round(fps, 2),
+            'frames': frames,
+            'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'duration_s': round(frames / fps, 2) if frames else None
+        }
+    finally:
+        capture.release()
+
+
+def iou(a: List[float], b: List[float]) -> float:
+    """Intersection over union of two [x1, y1, x2, y2] boxes."""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """One physical component followed across frames."""
+    
+    def __init__(self, track_id: int, component_type: str, detection: Dict, frame_index: int,
+                 timestamp: float, crop: np.ndarray):
+        self.track_id = track_id
+        self.component_type = component_type
+        self.bbox = list(detection['bbox'])
+        self.velocity = [0.0, 0.0, 0.0, 0.0]  # Box change per frame
+        self.first_frame = self.last_frame = frame_index
+        self.first_time = self.last_time = timestamp
+        self.hits = 1
+        self.missed = 0
+        self.class_votes = {detection['class_name']: detection['confidence']}
+        self.best_confidence = detection['confidence']
+        self.best_bbox = list(detection['bbox'])
+        self.best_frame = frame_index
+        self.best_crop = crop
+    
+    def predict(self, frame_index: int) -> List[float]:
+        """Box expected at a later frame, assuming constant velocity."""
+        gap = frame_index - self.last_frame
+        return [c + v * gap for c, v in zip(self.bbox, self.velocity)]
+    
+    def update(self, detection: Dict, frame_index: int, timestamp: float, crop_fn):
+        """Add a matched detection; keep the most confident crop for classification."""
+        gap = max(1, frame_index - self.last_frame)
+        self.velocity = [(new - old) / gap for new, old in zip(detection['bbox'], self.bbox)]
+        self.bbox = list(detection['bbox'])
+        self.last_frame, self.last_time = frame_index, timestamp
+        self.hits += 1
+        self.missed = 0
+        self.class_votes[detection['class_name']] = self.class_votes.get(detection['class_name'], 0.0) + detection['confidence']
+        if detection['confidence'] > self.best_confidence:
+            self.best_confidence = detection['confidence']
+            self.best_bbox = list(detection['bbox'])
+            self.best_frame = frame_index
+            self.best_crop = crop_fn()
+    
+    @property
+    def component_class(self) -> str:
+        """Detection class with the most confidence-weighted votes."""
+        return max(self.class_votes, key=self.class_votes.get)
+
+
+class VideoInspector:
+    """
+    Runs the inspection pipeline's detectors and classifiers over a video.
+    
+    Detection runs every `stride` frames; with `adaptive` it also runs early
+    (but not more often than every `min_stride` frames) when the mean pixel
+    change since the last detected frame exceeds `motion_threshold`. Frames
+    that can be neither are skipped without decoding them.
+    """
+    
+    def __init__(self, pipeline, stride: int = None, adaptive: bool = None, min_stride: int = None,
+                 motion_threshold: float = None, iou_threshold: float = 0.3, max_missed: int = 2,
+                 min_hits: int = 2):
+        """
+        Initialize the inspector.
+        
+        Args:
+            pipeline: Initialized InspectionPipeline whose models are used
+            stride: Detect on every stride-th frame (default: VIDEO_DETECT_STRIDE or 5)
+            adaptive: Also detect early on high motion (default: VIDEO_ADAPTIVE or true)
+            min_stride: Smallest gap between detections in adaptive mode (default: 2)
+            motion_threshold: Mean absolute change (0-255) of a 64x36 grayscale
+                              thumbnail that counts as high motion
+                              (default: VIDEO_MOTION_THRESHOLD or 12)
+            iou_threshold: Minimum IoU between a track's predicted box and a detection
+            max_missed: Detection passes a track may miss before it is closed
+            min_hits: Sightings needed to report a track (filters one-frame false positives)
+        """
+        self.pipeline = pipeline
+        self.stride = max(1, int(stride or os.getenv("VIDEO_DETECT_STRIDE", 5)))
+        self.adaptive = adaptive if adaptive is not None else \
+            os.getenv("VIDEO_ADAPTIVE", "true").lower() == "true"
+        self.min_stride = max(1, min(self.stride, int(min_stride or 2)))
+        self.motion_threshold = float(motion_threshold or os.getenv("VIDEO_MOTION_THRESHOLD", 12))
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+    
+    def inspect(self, source: str, max_frames: int = None, progress_every: int = 0) -> Dict:
+        """
+        Inspect a video and report every tracked component once.
+        
+        Args:
+            source: Video file path, stream URL or camera index
+            max_frames: Stop after this many frames
+            progress_every: Print progress every N frames (0 = quiet)
+        
+        Returns:
+            Dict with 'components' (one entry per tracked component with its
+            frame range and condition), 'summary' and 'processing' stats
+        """
+        info = video_info(source)
+        tracks, finished = [], []
+        next_id = 1
+        last_thumb = None
+        since_detect = self.stride  # Detect on the first frame
+        frames = decoded = detected = 0
+        detect_ms = 0.0
+        next_progress = progress_every
+        started = time.perf_counter()
+        
+        for index, timestamp, retrieve in iter_video_frames(source, max_frames):
+            frames += 1
+            since_detect += 1
+            
+            # Only frames that may be detected on are decoded
+            if since_detect < self.stride and not (self.adaptive and since_detect >= self.min_stride):
+                continue
+            rgb = retrieve()
+            if rgb is None:
+                continue
+            decoded += 1
+            
+            thumb = self._thumbnail(rgb)
+            motion = float(np.abs(thumb - last_thumb).mean()) if last_thumb is not None else 0.0
+            due = since_detect >= self.stride or \
+                (self.adaptive and since_detect >= self.min_stride and motion > self.motion_threshold)
+            if not due:
+                continue
+            
+            detect_started = time.perf_counter()
+            detections = self._detect(rgb)
+            detect_ms += (time.perf_counter() - detect_started) * 1000
+            detected += 1
+            since_detect = 0
+            last_thumb = thumb
+            
+            next_id = self._associate(tracks, detections, rgb, index, timestamp, next_id)
+            still_open = []
+            for track in tracks:
+                (finished if track.missed > self.max_missed else still_open).append(track)
+            tracks = still_open
+            
+            if progress_every and frames >= next_progress:
+                next_progress += progress_every
+                elapsed = time.perf_counter() - started
+                print(f"  🎞️  frame {index}: {len(tracks)} open / {len(finished)} closed tracks, "
+                      f"{frames / elapsed:.1f} fps")
+        
+        finished.extend(tracks)
+        reported = [track for track in finished if track.hits >= self.min_hits]
+        
+        classify_started = time.perf_counter()
+        components = self._classify_tracks(reported)
+        classify_ms = (time.perf_counter() - classify_started) * 1000
+        elapsed = time.perf_counter() - started
+        
+        summary = {}
+        for component in components:
+            counts = summary.setdefault(component['component_type'], {})
+            counts[component['condition']] = counts.get(component['condition'], 0) + 1
+        
+        fps = info['fps'] or 25.0
+        return {
+            'success': True,
+            'source': str(source),
+            'video': info,
+            'components': components,
+            'summary': summary,
+            'processing': {
+                'frames_read': frames,
+                'frames_decoded': decoded,
+                'frames_detected': detected,
+                'detect_stride': self.stride,
+                'adaptive': self.adaptive,
+                'tracks_total': len(finished),
+                'tracks_reported': len(reported),
+                'elapsed_s': round(elapsed, 2),
+                'fps_processed': round(frames / elapsed, 2) if elapsed else 0.0,
+                'realtime_factor': round(frames / fps / elapsed, 2) if elapsed else 0.0,
+                'detect_ms_avg': round(detect_ms / detected, 2) if detected else 0.0,
+                'classify_ms_total': round(classify_ms, 2)
+            },
+            'model_version': self.pipeline.weights_version
+        }
+    
+    @staticmethod
+    def _thumbnail(rgb: np.ndarray) -> np.ndarray:
+        """Tiny grayscale version of a frame for motion estimation."""
+        h, w = rgb.shape[:2]
+        small = rgb[::max(1, h // 36), ::max(1, w // 64)]
+        return small.mean(axis=2, dtype=np.float32)[:36, :64]
+    
+    def _detect(self, rgb: np.ndarray) -> List[Tuple[str, Dict]]:
+        """
+        All detections in a frame as (component type, detection) pairs.
+        
+        Uses the per-type detectors rather than the single-component policy:
+        a video frame normally shows several clips and a sleeper at once.
+        """
+        results = detect_concurrently(self.pipeline.detectors, rgb)
+        return [
+            (component_type, detection)
+            for component_type, result in results.items()
+            for detection in result.get('detections', [])
+        ]
+    
+    def _associate(self, tracks: List[Track], detections: List[Tuple[str, Dict]], rgb: np.ndarray,
+                   index: int, timestamp: float, next_id: int) -> int:
+        """Greedily match detections to tracks by IoU with the predicted box; open new tracks."""
+        pairs = []
+        for t, track in enumerate(tracks):
+            predicted = track.predict(index)
+            for d, (component_type, detection) in enumerate(detections):
+                if component_type == track.component_type:
+                    overlap = iou(predicted, detection['bbox'])
+                    if overlap >= self.iou_threshold:
+                        pairs.append((overlap, t, d))
+        
+        matched_tracks, matched_detections = set(), set()
+        for _, t, d in sorted(pairs, reverse=True):
+            if t in matched_tracks or d in matched_detections:
+                continue
+            matched_tracks.add(t)
+            matched_detections.add(d)
+            detection = detections[d][1]
+            tracks[t].update(detection, index, timestamp, lambda: self._crop(rgb, detection['bbox']))
+        
+        for t, track in enumerate(tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+        
+        for d, (component_type, detection) in enumerate(detections):
+            if d not in matched_detections:
+                tracks.append(Track(next_id, component_type, detection, index, timestamp,
+                                    self._crop(rgb, detection['bbox'])))
+                next_id += 1
+        return next_id
+    
+    def _crop(self, rgb: np.ndarray, bbox: List[float]) -> np.ndarray:
+        """Padded copy of a box (copied so the track does not keep the whole frame alive)."""
+        h, w = rgb.shape[:2]
+        pad_x = (bbox[2] - bbox[0]) * self.pipeline.crop_padding
+        pad_y = (bbox[3] - bbox[1]) * self.pipeline.crop_padding
+        x1, y1 = max(0, int(bbox[0] - pad_x)), max(0, int(bbox[1] - pad_y))
+        x2, y2 = min(w, int(bbox[2] + pad_x) + 1), min(h, int(bbox[3] + pad_y) + 1)
+        return np.ascontiguousarray(rgb[y1:y2, x1:x2])
+    
+    def _classify_tracks(self, tracks: List[Track]) -> List[Dict]:
+        """Classify each track's best crop, one batch per component type."""
+        by_type = {}
+        for track in tracks:
+            by_type.setdefault(track.component_type, []).append(track)
+        
+        components = []
+        for component_type, group in by_type.items():
+            classes = [track.component_class for track in group]
+            outputs = self.pipeline._classify([track.best_crop for track in group], component_type, classes)
+            for track, output in zip(group, outputs):
+                components.append({
+                    'track_id': track.track_id,
+                    'component_type': component_type,
+                    'component_class': track.component_class,
+                    'first_frame': track.first_frame,
+                    'last_frame': track.last_frame,
+                    'start_s': round(track.first_time, 2),
+                    'end_s': round(track.last_time, 2),
+                    'sightings': track.hits,
+                    'best_frame': track.best_frame,
+                    'bbox': track.best_bbox,
+                    'detection_confidence': round(track.best_confidence, 4),
+                    'condition': output['condition'],
+                    'defects': output['defects'],
+                    'classification_confidence': output.get('confidence', 0.0),
+                    'recommendations': self.pipeline._get_recommendations(
+                        track.component_class, output['condition'], output['defects'])
+                })
+        return sorted(components, key=lambda c: (c['first_frame'], c['track_id']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect track video with frame skipping and tracking")
+    parser.add_argument("source", type=str, help="Video file, stream URL or camera index")
+    parser.add_argument("--stride", type=int, default=None, help="Detect on every N-th frame")
+    parser.add_argument("--adaptive", action=argparse.BooleanOptionalAction, default=None,
+                        help="Also detect early when the picture moves a lot")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="Mean thumbnail change (0-255) that triggers an early detection")
+    parser.add_argument("--max-frames", type=int, default=None, help="Stop after this many frames")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+    
+    from .pipeline import get_pipeline
+    pipeline = get_pipeline()
+    inspector = VideoInspector(pipeline, stride=args.stride, adaptive=args.adaptive,
+                               motion_threshold=args.motion_threshold)
+    report = inspector.inspect(args.source, max_frames=args.max_frames, progress_every=250)
+    
+    processing = report['processing']
+    print(f"✅ {len(report['components'])} components in {processing['frames_read']} frames "
+          f"({processing['frames_decoded']} decoded, {processing['frames_detected']} detected) at {processing['fps_processed']} fps "
+          f"({processing['realtime_factor']}x realtime)")
+    for component_type, counts in report['summary'].items():
+        print(f"   {component_type}: {counts}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# main.py creates its engine at import time: point it at a throwaway SQLite file
+DB_PATH = os.path.join(tempfile.gettempdir(), f"mobile_backend_tests_{os.getpid()}.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    import main
+
+    main.Base.metadata.create_all(main.engine)
+    session = main.SessionLocal()
+    yield session
+    session.close()
+    main.Base.metadata.drop_all(main.engine)
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    import main
+
+    # Not used as a context manager, so the startup hook does not load the models
+    return TestClient(main.app)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
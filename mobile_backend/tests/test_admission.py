@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from pipeline.admission import AdmissionController, AdmissionRejected
+
+
+async def hold(controller, endpoint, release, nbytes=0, tickets=None):
+    async with controller.admit(endpoint, nbytes) as ticket:
+        if tickets is not None:
+            tickets.append(ticket)
+        await release.wait()
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=1, max_wait=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, 'inspect', release))
+        waiting = asyncio.create_task(hold(controller, 'inspect', release))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit('inspect'):
+                pass
+
+        release.set()
+        await asyncio.gather(running, waiting)
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+
+    assert rejected.reason == 'queue_full'
+    assert 1 <= rejected.retry_after <= 60
+    stats = controller.get_stats()
+    assert stats['endpoints']['inspect']['admitted'] == 2
+    assert stats['endpoints']['inspect']['rejected'] == {'queue_full': 1}
+    assert stats['inflight'] == 0 and stats['queued'] == 0
+
+
+def test_queued_bytes_and_wait_time_are_bounded():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=10, max_queued_bytes=1000, max_wait=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, 'detect', release))
+        await asyncio.sleep(0.01)
+
+        reasons = []
+        for nbytes in (2000, 10):
+            try:
+                async with controller.admit('detect', nbytes):
+                    pass
+            except AdmissionRejected as e:
+                reasons.append(e.reason)
+
+        release.set()
+        await running
+        return controller, reasons
+
+    controller, reasons = asyncio.run(scenario())
+
+    assert reasons == ['queued_bytes', 'wait_timeout']
+    assert controller.get_stats()['queued_bytes'] == 0
+
+
+def test_requests_arriving_behind_a_deep_queue_are_degraded():
+    async def scenario():
+        controller = AdmissionController(max_inflight=1, max_queue=10, degrade=True, degrade_at=2)
+        release = asyncio.Event()
+        tickets = []
+        tasks = []
+        for _ in range(5):
+            tasks.append(asyncio.create_task(hold(controller, 'inspect', release, tickets=tickets)))
+            await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        return controller, tickets
+
+    controller, tickets = asyncio.run(scenario())
+
+    # Queue depth on arrival: 0 (runs at once), 0, 1, 2, 3
+    assert [ticket.degraded for ticket in tickets] == [False, False, False, True, True]
+    assert controller.get_stats()['endpoints']['inspect']['degraded'] == 2
+
+
+def test_endpoint_turns_rejection_into_503_with_retry_after(monkeypatch):
+    import main
+
+    controller = AdmissionController(max_inflight=1, max_queue=0)
+    monkeypatch.setattr(main, 'get_admission', lambda: controller)
+
+    async def scenario():
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, 'inspect', release))
+        await asyncio.sleep(0.01)
+        try:
+            async with main.admitted('inspect', 100):
+                pass
+        finally:
+            release.set()
+            await running
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+
+    assert error.value.status_code == 503
+    assert int(error.value.headers['Retry-After']) >= 1
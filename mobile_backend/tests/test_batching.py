@@ -0,0 +1,93 @@
+import threading
+import time
+
+from pipeline.batching import MicroBatcher
+
+
+def recording_handler(batches, delay=0.0):
+    def handler(items):
+        batches.append(list(items))
+        time.sleep(delay)
+        return [item * 10 for item in items]
+    return handler
+
+
+def test_full_batch_is_flushed_without_waiting():
+    batches = []
+    batcher = MicroBatcher(recording_handler(batches), max_batch_size=4, max_wait_ms=5000)
+    try:
+        started = time.perf_counter()
+        futures = [batcher.submit(i) for i in range(4)]
+
+        assert [future.result(timeout=2) for future in futures] == [0, 10, 20, 30]
+        assert time.perf_counter() - started < 1.0  # well before max_wait_ms
+        assert batches == [[0, 1, 2, 3]]
+    finally:
+        batcher.stop()
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    batches = []
+    batcher = MicroBatcher(recording_handler(batches), max_batch_size=8, max_wait_ms=100)
+    try:
+        started = time.perf_counter()
+        futures = [batcher.submit(i) for i in range(3)]
+
+        assert [future.result(timeout=2) for future in futures] == [0, 10, 20]
+        assert time.perf_counter() - started >= 0.09
+        assert batches == [[0, 1, 2]]
+        stats = batcher.get_stats()
+        assert stats["total_batches"] == 1
+        assert stats["batch_size_counts"] == {3: 1}
+    finally:
+        batcher.stop()
+
+
+def test_items_beyond_the_batch_size_go_to_the_next_batch():
+    batches = []
+    batcher = MicroBatcher(recording_handler(batches), max_batch_size=3, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(i) for i in range(7)]
+
+        assert [future.result(timeout=2) for future in futures] == [i * 10 for i in range(7)]
+        assert [len(batch) for batch in batches] == [3, 3, 1]
+    finally:
+        batcher.stop()
+
+
+def test_handler_error_fails_every_item_of_the_batch():
+    def handler(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher(handler, max_batch_size=2, max_wait_ms=5000)
+    try:
+        futures = [batcher.submit(i) for i in range(2)]
+        for future in futures:
+            assert isinstance(future.exception(timeout=2), ValueError)
+        assert batcher.get_stats()["failed_batches"] == 1
+    finally:
+        batcher.stop()
+
+
+def test_batches_keep_filling_while_the_handler_is_busy():
+    batches = []
+    release = threading.Event()
+
+    def handler(items):
+        batches.append(list(items))
+        release.wait(2)
+        return items
+
+    batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=10)
+    try:
+        first = batcher.submit(0)
+        time.sleep(0.1)  # first batch is now running
+        rest = [batcher.submit(i) for i in range(1, 6)]
+        time.sleep(0.1)
+        release.set()
+
+        assert first.result(timeout=2) == 0
+        assert [future.result(timeout=2) for future in rest] == [1, 2, 3, 4, 5]
+        assert batches == [[0], [1, 2, 3, 4, 5]]
+    finally:
+        batcher.stop()
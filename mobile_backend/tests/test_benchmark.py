@@ -0,0 +1,60 @@
+import io
+
+from PIL import Image
+
+from benchmark_pipeline import compare, latency_summary, run_level, synthetic_image, unique_image
+
+
+def test_latency_summary_percentiles():
+    summary = latency_summary([float(v) for v in range(1, 101)])
+
+    assert summary['count'] == 100
+    assert summary['avg'] == 50.5
+    assert (summary['p50'], summary['p95'], summary['p99'], summary['max']) == (51.0, 96.0, 100.0, 100.0)
+    assert latency_summary([])['count'] == 0
+
+
+def test_unique_images_differ_but_decode_to_the_same_pixels():
+    jpeg = synthetic_image(64, 48, seed=0)
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(jpeg)).save(buffer, format='PNG')
+    png = buffer.getvalue()
+
+    for image in (jpeg, png):
+        first, second = unique_image(image, 1), unique_image(image, 2)
+        assert len({image, first, second}) == 3
+        pixels = Image.open(io.BytesIO(image)).tobytes()
+        assert Image.open(io.BytesIO(first)).tobytes() == pixels
+        assert Image.open(io.BytesIO(second)).tobytes() == pixels
+
+
+def test_run_level_keeps_cached_results_and_errors_out_of_the_latency_figures():
+    images = [('synthetic_64x48_0', b'a'), ('synthetic_64x48_1', b'b'), ('synthetic_64x48_2', b'c')]
+
+    def run(image):
+        if image == b'b':
+            return {'cached': True}
+        if image == b'c':
+            raise RuntimeError("model failed")
+        return {'timings': {'detect_ms': 5.0, 'classify_ms': None}}
+
+    level = run_level(run, images, concurrency=2, requests=6)
+
+    assert (level['requests'], level['cached'], level['errors']) == (6, 2, 2)
+    assert level['error_samples'] == ['RuntimeError: model failed']
+    assert level['latency_ms']['count'] == 2
+    assert level['latency_by_workload_ms']['synthetic_64x48']['count'] == 2
+    assert level['stages_ms'] == {'detect_ms': latency_summary([5.0, 5.0])}
+
+
+def test_compare_flags_a_p95_regression_beyond_the_threshold():
+    def report(p95, throughput):
+        return {'levels': [{'concurrency': 1, 'throughput_rps': throughput,
+                            'latency_ms': {'p50': 10.0, 'p95': p95}}]}
+
+    baseline = report(100.0, 10.0)
+
+    assert compare(report(105.0, 10.0), baseline, threshold_pct=10)
+    assert not compare(report(120.0, 10.0), baseline, threshold_pct=10)
+    # Throughput alone is reported but does not fail the comparison
+    assert compare(report(100.0, 5.0), baseline, threshold_pct=10)
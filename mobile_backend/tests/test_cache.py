@@ -0,0 +1,67 @@
+import time
+
+from pipeline.cache import ResultCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.put('inspect', 'a', 'v1', {'result': 'a'})
+    cache.put('inspect', 'b', 'v1', {'result': 'b'})
+    assert cache.get('inspect', 'a', 'v1') == {'result': 'a'}  # 'a' is now the most recent
+
+    cache.put('inspect', 'c', 'v1', {'result': 'c'})
+
+    assert cache.get('inspect', 'b', 'v1') is None
+    assert cache.get('inspect', 'a', 'v1') == {'result': 'a'}
+    assert cache.get('inspect', 'c', 'v1') == {'result': 'c'}
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_memory_budget_evicts_oldest_entries():
+    cache = ResultCache(max_entries=100, ttl_seconds=60, max_bytes=250)
+    for key in 'abc':
+        cache.put('inspect', key, 'v1', {'payload': key * 80})
+
+    assert cache.get('inspect', 'a', 'v1') is None
+    assert cache.get('inspect', 'c', 'v1') is not None
+    assert cache.get_stats()['memory_bytes'] <= 250
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(max_entries=10, ttl_seconds=0.05)
+    cache.put('inspect', 'a', 'v1', {'result': 'a'})
+    assert cache.get('inspect', 'a', 'v1') is not None
+
+    time.sleep(0.1)
+
+    assert cache.get('inspect', 'a', 'v1') is None
+    stats = cache.get_stats()
+    assert stats['expirations'] == 1
+    assert stats['entries'] == 0
+
+
+def test_new_model_version_invalidates_only_its_namespace():
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.put('inspect', 'a', 'v1', {'result': 'inspect'})
+    cache.put('detect', 'a', 'd1', {'result': 'detect'})
+
+    assert cache.get('inspect', 'a', 'v2') is None
+    assert cache.get('inspect', 'a', 'v1') is None  # the old results are gone, not just hidden
+    assert cache.get('detect', 'a', 'd1') == {'result': 'detect'}
+    assert cache.get_stats()['invalidations'] == 2
+
+
+def test_hits_return_copies():
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.put('inspect', 'a', 'v1', {'detections': [1, 2]})
+
+    cache.get('inspect', 'a', 'v1')['detections'].append(3)
+
+    assert cache.get('inspect', 'a', 'v1') == {'detections': [1, 2]}
+
+
+def test_key_covers_image_and_parameters():
+    key = ResultCache.make_key(b'image', conf=0.25, hint='erc')
+    assert key == ResultCache.make_key(b'image', hint='erc', conf=0.25)
+    assert key != ResultCache.make_key(b'image', conf=0.5, hint='erc')
+    assert key != ResultCache.make_key(b'other', conf=0.25, hint='erc')
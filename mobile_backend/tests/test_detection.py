@@ -0,0 +1,113 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from pipeline.detector import FusedComponentDetector, detect_concurrently
+from pipeline.pipeline import InspectionPipeline
+
+IMAGE = np.zeros((32, 32, 3), dtype=np.uint8)
+
+
+class SlowDetector:
+    def __init__(self, component_type, confidence, delay=0.0):
+        self.component_type = component_type
+        self.confidence = confidence
+        self.delay = delay
+        self.calls = 0
+
+    def detect(self, image):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.confidence is None:
+            return {'success': False, 'detect_ms': self.delay * 1000}
+        return {'success': True, 'component_type': self.component_type, 'confidence': self.confidence,
+                'detect_ms': self.delay * 1000}
+
+
+def make_pipeline(mode, **detectors):
+    pipeline = InspectionPipeline(detect_mode=mode, early_exit_confidence=0.8)
+    pipeline.detectors = detectors
+    return pipeline
+
+
+def test_detectors_run_in_parallel():
+    detectors = {'erc': SlowDetector('erc', 0.5, 0.3), 'sleeper': SlowDetector('sleeper', 0.6, 0.3)}
+
+    started = time.perf_counter()
+    results = detect_concurrently(detectors, IMAGE)
+
+    assert time.perf_counter() - started < 0.5
+    assert set(results) == {'erc', 'sleeper'}
+
+
+def test_confident_detector_ends_the_wait_early():
+    detectors = {'erc': SlowDetector('erc', 0.95, 0.0), 'sleeper': SlowDetector('sleeper', 0.6, 0.5)}
+
+    started = time.perf_counter()
+    results = detect_concurrently(detectors, IMAGE, early_exit_confidence=0.8)
+
+    assert time.perf_counter() - started < 0.4
+    assert set(results) == {'erc'}
+
+
+def test_concurrent_mode_keeps_the_most_confident_result():
+    pipeline = make_pipeline('concurrent', erc=SlowDetector('erc', 0.5, 0.05), sleeper=SlowDetector('sleeper', 0.7))
+
+    result = pipeline._detect(IMAGE)
+
+    assert result['component_type'] == 'sleeper'
+    assert set(result['detector_ms']) == {'erc', 'sleeper'}
+    assert pipeline._detect_latency['concurrent'].summary()['count'] == 1
+
+
+def test_sequential_mode_reports_a_miss_of_every_detector():
+    pipeline = make_pipeline('sequential', erc=SlowDetector('erc', None), sleeper=SlowDetector('sleeper', None))
+
+    result = pipeline._detect(IMAGE)
+
+    assert result['success'] is False
+    assert set(result['detector_ms']) == {'erc', 'sleeper'}
+
+
+def test_fused_mode_makes_one_pass():
+    erc, sleeper = SlowDetector('erc', 0.9), SlowDetector('sleeper', 0.9)
+    pipeline = make_pipeline('fused', erc=erc, sleeper=sleeper)
+    pipeline.fused_detector = SlowDetector('sleeper', 0.6)
+
+    result = pipeline._detect(IMAGE)
+
+    assert result['component_type'] == 'sleeper'
+    assert result['detector_ms'] == {'fused': 0.0}
+    assert pipeline.fused_detector.calls == 1
+    assert erc.calls == sleeper.calls == 0
+
+
+def fake_box(class_id, confidence, bbox):
+    return SimpleNamespace(cls=[class_id], conf=[confidence], xyxy=[np.array(bbox, dtype=float)],
+                           xywhn=[np.array([0.5, 0.5, 0.1, 0.1])])
+
+
+def test_fused_classes_map_back_to_component_types():
+    detector = FusedComponentDetector.__new__(FusedComponentDetector)
+    detector.model_type = 'fused'
+    results = [SimpleNamespace(boxes=[fake_box(2, 0.6, [0, 0, 10, 10]), fake_box(0, 0.8, [20, 20, 30, 30]),
+                                      fake_box(7, 0.99, [0, 0, 1, 1])])]
+
+    result = detector._parse_results(results)
+
+    # Sleeper and clip boxes are separate components; the unknown class is ignored
+    assert (result['component_type'], result['component_class'], result['confidence']) == \
+        ('erc', 'elastic_clip_good', 0.8)
+    assert result['bbox'] == [20, 20, 30, 30]
+
+
+def test_fused_clip_classes_together_are_several_components():
+    detector = FusedComponentDetector.__new__(FusedComponentDetector)
+    detector.model_type = 'fused'
+    results = [SimpleNamespace(boxes=[fake_box(0, 0.8, [0, 0, 10, 10]), fake_box(1, 0.7, [20, 20, 30, 30])])]
+
+    result = detector._parse_results(results)
+
+    assert result['success'] is False
+    assert result['component_count'] == 2
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pipeline.executor import InferenceExecutor, InferenceTimeout, _run_task
+
+
+@pytest.fixture
+def executor():
+    # One worker thread stands in for the process pool: same submit/cancel semantics, no model loading
+    executor = InferenceExecutor(workers=1, deadline_ms=5000, worker_threads=1)
+    executor._pool = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_worker_refuses_calls_past_their_deadline():
+    with pytest.raises(InferenceTimeout):
+        _run_task(lambda: "ran", (), time.time() - 1)
+    assert _run_task(lambda: "ran", (), 0)[0] == "ran"
+
+
+def test_completed_call_returns_its_result(executor):
+    assert executor.run(lambda x: x * 2, 21) == 42
+
+    stats = executor.get_stats()
+    assert (stats['submitted'], stats['completed'], stats['timeouts'], stats['in_flight']) == (1, 1, 0, 0)
+    assert stats['queue_wait_ms']['count'] == 1
+
+
+def test_queued_call_is_cancelled_at_its_deadline(executor):
+    release = threading.Event()
+    ran = []
+    busy = executor._submit(release.wait, (5,), deadline_ms=0)
+
+    with pytest.raises(InferenceTimeout, match="queued"):
+        executor.run(ran.append, "late", deadline_ms=100)
+
+    release.set()
+    busy.result(timeout=2)
+    wait_for(lambda: executor.get_stats()['in_flight'] == 0)
+    assert ran == []
+    stats = executor.get_stats()
+    assert (stats['completed'], stats['timeouts']) == (1, 1)
+
+
+def test_running_call_past_its_deadline_is_counted_once(executor):
+    with pytest.raises(InferenceTimeout, match="exceeded"):
+        executor.run(time.sleep, 0.3, deadline_ms=100)
+
+    # The late result arrives and is discarded without counting the call again
+    wait_for(lambda: executor.get_stats()['in_flight'] == 0)
+    stats = executor.get_stats()
+    assert (stats['completed'], stats['failed'], stats['timeouts']) == (0, 0, 1)
+
+
+def test_async_callers_get_the_same_deadline(executor):
+    async def scenario():
+        assert await executor.run_async(lambda: "ok") == "ok"
+        with pytest.raises(InferenceTimeout):
+            await executor.run_async(time.sleep, 0.3, deadline_ms=100)
+
+    asyncio.run(scenario())
+
+    wait_for(lambda: executor.get_stats()['in_flight'] == 0)
+    assert executor.get_stats()['timeouts'] == 1
+
+
+def test_task_errors_reach_the_caller(executor):
+    def fail():
+        raise ValueError("bad image")
+
+    with pytest.raises(ValueError, match="bad image"):
+        executor.run(fail)
+    assert executor.get_stats()['failed'] == 1
@@ -0,0 +1,65 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from pipeline.frame import Frame
+
+RED_BOX = [800, 600, 1200, 900]  # original (4000x3000) coordinates
+
+
+@pytest.fixture
+def photo():
+    """A 4000x3000 JPEG with a red box on grey."""
+    img = Image.new('RGB', (4000, 3000), (128, 128, 128))
+    img.paste((255, 0, 0), tuple(RED_BOX))
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def test_jpeg_is_draft_decoded_near_the_target_size(photo):
+    frame = Frame.from_bytes(photo, target_size=640)
+
+    # Largest 1/2, 1/4, 1/8 reduction that still covers 640 px: 1/4
+    assert (frame.width, frame.height) == (1000, 750)
+    assert frame.original_size == (4000, 3000)
+    assert frame.scale == (4.0, 4.0)
+    assert not frame.array.flags.writeable
+
+
+def test_crop_takes_original_coordinates(photo):
+    frame = Frame.from_bytes(photo, target_size=640)
+
+    crop = frame.crop(RED_BOX)
+
+    assert crop.shape == (75, 100, 3)
+    assert np.shares_memory(crop, frame.array)
+    red = crop[5:-5, 5:-5].reshape(-1, 3).mean(axis=0)
+    assert red[0] > 230 and red[1] < 30 and red[2] < 30
+
+
+def test_crop_padding_is_clipped_to_the_frame(photo):
+    frame = Frame.from_bytes(photo, target_size=640)
+
+    assert frame.crop([0, 0, 400, 300], padding=0.5).shape == (113, 150, 3)
+    assert frame.crop([3600, 2700, 4000, 3000], padding=0.5).shape == (113, 150, 3)
+
+
+def test_boxes_map_between_decoded_and_original(photo):
+    frame = Frame.from_bytes(photo, target_size=640)
+
+    assert frame.to_decoded(RED_BOX) == [200, 150, 300, 225]
+    assert frame.to_original([200, 150, 300, 225]) == RED_BOX
+
+
+def test_png_is_decoded_at_full_size():
+    img = Image.new('RGB', (1200, 900), (0, 0, 255))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+
+    frame = Frame.from_bytes(buffer.getvalue(), target_size=640)
+
+    assert (frame.width, frame.height) == (1200, 900)
+    assert frame.scale == (1.0, 1.0)
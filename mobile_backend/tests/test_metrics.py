@@ -0,0 +1,93 @@
+import pytest
+
+import main
+from pipeline.metrics import (
+    Counter, Histogram, format_timing_header, record_timings, span, start_request_spans
+)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_seconds', 'Test', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, stage='detect')
+
+    lines = histogram.render().splitlines()
+
+    assert 'test_seconds_bucket{stage="detect",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="detect",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="detect",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{stage="detect"} 4.250000' in lines
+    assert 'test_seconds_count{stage="detect"} 4' in lines
+
+
+def test_counter_renders_each_label_combination():
+    counter = Counter('test_total', 'Test', ('reason',))
+    counter.inc(reason='queue_full')
+    counter.inc(2, reason='queue_full')
+    counter.inc(reason='deadline')
+
+    lines = counter.render().splitlines()
+
+    assert 'test_total{reason="deadline"} 1' in lines
+    assert 'test_total{reason="queue_full"} 3' in lines
+
+
+def test_spans_add_up_within_a_request():
+    spans = start_request_spans()
+
+    record_timings({'decode_ms': 2.0, 'detect_erc_ms': 10.0, 'classify_ms': None})
+    record_timings({'decode_ms': 1.5})
+    with span('crop'):
+        pass
+
+    assert spans['decode'] == 3.5
+    assert spans['detect_erc'] == 10.0
+    assert 'classify' not in spans
+    assert 'crop' in spans
+
+
+def test_timing_header_format():
+    assert format_timing_header({'decode': 6.14, 'detect': 380.2}, 412.34) == \
+        "total=412.3, decode=6.1, detect=380.2"
+
+
+@pytest.fixture
+def timing_header(monkeypatch):
+    def set_timing_header(enabled):
+        monkeypatch.setattr(main, 'TIMING_HEADER', enabled)
+    set_timing_header(False)
+    return set_timing_header
+
+
+def test_timing_header_only_when_asked_for(client, timing_header):
+    assert 'X-Timing' not in client.get("/api/items").headers
+
+    response = client.get("/api/items", headers={"x-timing": "1"})
+
+    header = dict(part.split('=') for part in response.headers['X-Timing'].split(', '))
+    assert float(header['total']) > 0
+    # The item query shows up as a database span
+    assert 'db_read' in header
+
+
+def test_timing_header_setting_adds_it_to_every_response(client, timing_header):
+    timing_header(True)
+
+    assert client.get("/api/items").headers['X-Timing'].startswith('total=')
+
+
+def test_metrics_endpoint_reports_requests_by_route(client):
+    client.get("/api/items")
+    client.get("/api/items/does-not-exist")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    body = response.text
+    assert '# TYPE railchinh_http_request_duration_seconds histogram' in body
+    assert 'method="GET",route="/api/items",status="200"' in body
+    # Routes are labelled by their template, not the concrete path
+    assert 'route="/api/items/{uid}",status="404"' in body
+    assert 'does-not-exist' not in body
+    assert 'railchinh_stage_duration_seconds_count{stage="db_read"}' in body
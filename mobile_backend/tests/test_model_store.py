@@ -0,0 +1,118 @@
+import pytest
+
+import main
+from pipeline.model_store import ModelStore, sha256_file
+
+
+@pytest.fixture
+def weights(tmp_path):
+    """Two fake weight files sharing a name, like every detector's best.pt."""
+    paths = {}
+    for name in ('erc', 'sleeper'):
+        path = tmp_path / 'runs' / name / 'best.pt'
+        path.parent.mkdir(parents=True)
+        path.write_bytes(f"{name} weights".encode())
+        paths[f"{name}_detector"] = path
+    return paths
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(tmp_path / 'model_store')
+
+
+def test_publish_copies_weights_under_their_keys(store, weights):
+    entry = store.publish('v1', weights, classes={'erc_detector': ['good', 'missing']})
+
+    assert entry['models']['erc_detector']['file'] == 'v1/erc_detector.pt'
+    assert entry['models']['sleeper_detector']['file'] == 'v1/sleeper_detector.pt'
+    # The first version becomes active on its own
+    assert store.active_version() == 'v1'
+
+    models = store.resolve('v1')
+    assert models['erc_detector']['path'].read_bytes() == b"erc weights"
+    assert models['erc_detector']['classes'] == ['good', 'missing']
+    assert entry['models']['erc_detector']['sha256'] == sha256_file(weights['erc_detector'])
+
+
+def test_publish_rejects_keys_that_are_not_plain_names(store, weights):
+    with pytest.raises(ValueError):
+        store.publish('v1', {'../erc_detector': weights['erc_detector']})
+
+
+def test_activate_switches_versions(store, weights):
+    store.publish('v1', weights)
+    store.publish('v2', weights)
+    assert store.active_version() == 'v1'
+
+    store.activate('v2')
+
+    assert store.active_version() == 'v2'
+    assert store.versions() == ['v1', 'v2']
+    with pytest.raises(ValueError):
+        store.activate('v3')
+
+
+def test_resolve_rejects_a_file_that_does_not_match_its_hash(store, weights):
+    store.publish('v1', weights)
+    (store.root / 'v1' / 'erc_detector.pt').write_bytes(b"tampered")
+
+    with pytest.raises(ValueError, match="Hash mismatch"):
+        store.resolve('v1')
+    # Without verification the files are still returned
+    assert 'erc_detector' in store.resolve('v1', verify=False)
+
+
+@pytest.fixture
+def reload_endpoint(monkeypatch, store, weights):
+    """Reload endpoint with an in-process pipeline and a two-version store."""
+    store.publish('v1', weights)
+    store.publish('v2', weights)
+    reloads = []
+
+    def reload_models(version=None, background=True):
+        reloads.append(version)
+        return {'state': 'loading', 'target': version}
+
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(main, 'PIPELINE_AVAILABLE', True)
+    monkeypatch.setattr(main, 'get_model_store', lambda: store)
+    monkeypatch.setattr(main, 'get_executor', lambda: None)
+    monkeypatch.setattr(main, 'reload_models', reload_models, raising=False)
+    return reloads
+
+
+def test_reload_activates_the_requested_version(client, store, reload_endpoint):
+    response = client.post("/api/admin/models/reload", json={"version": "v2"},
+                           headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.json()['version'] == 'v2'
+    assert response.json()['mode'] == 'in_process'
+    assert reload_endpoint == ['v2']
+    assert store.active_version() == 'v2'
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}])
+def test_reload_rejects_a_missing_or_wrong_token(client, store, reload_endpoint, headers):
+    response = client.post("/api/admin/models/reload", json={"version": "v2"}, headers=headers)
+
+    assert response.status_code == 403
+    assert reload_endpoint == []
+    assert store.active_version() == 'v1'
+
+
+def test_reload_is_disabled_without_an_admin_token(client, reload_endpoint, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN')
+
+    response = client.post("/api/admin/models/reload", json={}, headers={"X-Admin-Token": ""})
+
+    assert response.status_code == 403
+
+
+def test_reload_of_an_unknown_version_is_a_bad_request(client, reload_endpoint):
+    response = client.post("/api/admin/models/reload", json={"version": "v9"},
+                           headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 400
+    assert reload_endpoint == []
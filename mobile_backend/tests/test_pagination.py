@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from main import Inspection, Item, decode_cursor, encode_cursor
+
+
+def add_inspections(db, uid, count, created_at):
+    db.add(Item(uid=uid, component_type="ERC"))
+    for number in range(count):
+        # Pairs share a timestamp, so the id has to break ties
+        db.add(Inspection(item_uid=uid, status="ok", remark=f"#{number}",
+                          inspected_at=created_at + timedelta(minutes=number // 2),
+                          created_at=created_at + timedelta(minutes=number // 2)))
+    db.commit()
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 1, 12, 30, 15, 123456)
+
+    cursor = encode_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(datetime(2026, 1, 1), 1)[:-4]])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_keyset_pages_cover_every_row_once(db):
+    add_inspections(db, "UID-1", 11, datetime(2026, 10, 1))
+    add_inspections(db, "UID-2", 3, datetime(2026, 10, 1))
+    query = db.query(Inspection.id).filter(Inspection.item_uid == "UID-1")
+
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = main.keyset_page(query, Inspection, cursor, 4)
+        pages.append([row[0] for row in rows])
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [4, 4, 3]
+    expected = [row.id for row in db.query(Inspection.id).filter(Inspection.item_uid == "UID-1")
+                .order_by(Inspection.created_at.desc(), Inspection.id.desc())]
+    assert sum(pages, []) == expected
+
+
+def test_inspections_endpoint_pages_with_next_cursor_header(client, db):
+    add_inspections(db, "UID-1", 5, datetime(2026, 10, 1))
+
+    first = client.get("/api/inspections/UID-1", params={"limit": 2, "fields": "id,remark"})
+    assert first.status_code == 200
+    assert [row["remark"] for row in first.json()] == ["#4", "#3"]
+    assert set(first.json()[0]) == {"id", "remark"}
+
+    seen = [row["id"] for row in first.json()]
+    cursor = first.headers["X-Next-Cursor"]
+    while cursor:
+        page = client.get("/api/inspections/UID-1", params={"limit": 2, "cursor": cursor})
+        seen += [row["id"] for row in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+    assert len(seen) == len(set(seen)) == 5
+
+
+def test_inspections_endpoint_pages_by_default(client, db):
+    add_inspections(db, "UID-1", main.DEFAULT_PAGE_SIZE + 10, datetime(2026, 10, 1))
+
+    response = client.get("/api/inspections/UID-1")
+
+    assert len(response.json()) == main.DEFAULT_PAGE_SIZE
+    assert "X-Next-Cursor" in response.headers
+
+
+def test_cursor_round_trip_without_created_at():
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+
+def test_rows_without_created_at_are_paged_too(client, db):
+    add_inspections(db, "UID-1", 3, datetime(2026, 10, 1))
+    for number in range(3):
+        db.add(Inspection(item_uid="UID-1", status="ok", remark=f"undated #{number}"))
+    db.commit()
+    db.query(Inspection).filter(Inspection.remark.like("undated%")).update({Inspection.created_at: None})
+    db.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        page = client.get("/api/inspections/UID-1", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert page.status_code == 200
+        seen += [row["remark"] for row in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Undated rows first (newest id first), then by created_at
+    assert seen == ["undated #2", "undated #1", "undated #0", "#2", "#1", "#0"]
+
+
+def test_items_keep_their_order_without_a_cursor(client, db):
+    for number in range(4):
+        db.add(Item(uid=f"UID-{number}", component_type="ERC", created_at=datetime(2026, 10, 1 + number)))
+    db.commit()
+
+    offset = client.get("/api/items", params={"skip": 1, "limit": 2})
+    keyset = client.get("/api/items", params={"cursor": "", "limit": 2})
+
+    assert [row["uid"] for row in offset.json()] == ["UID-1", "UID-2"]
+    assert "X-Next-Cursor" not in offset.headers
+    assert [row["uid"] for row in keyset.json()] == ["UID-3", "UID-2"]
+    assert "X-Next-Cursor" in keyset.headers
+
+
+def test_page_size_is_clamped():
+    assert main.page_limit(0) == 1
+    assert main.page_limit(10_000) == main.MAX_PAGE_SIZE
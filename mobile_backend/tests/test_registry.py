@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from pipeline.registry import ModelRegistry
+
+
+class Model:
+    def __init__(self, path):
+        self.path = path
+
+
+@pytest.fixture
+def weights(tmp_path):
+    first = tmp_path / "erc" / "best.pt"
+    first.parent.mkdir()
+    first.write_bytes(b"weights-1")
+    # Same bytes under another path, e.g. the legacy endpoint's copy
+    copy = tmp_path / "yolo.pt"
+    copy.write_bytes(b"weights-1")
+    other = tmp_path / "sleeper.pt"
+    other.write_bytes(b"weights-2")
+    return first, copy, other
+
+
+def counting_loader(loads, delay=0.0):
+    def loader(path):
+        loads.append(path)
+        time.sleep(delay)
+        return Model(path)
+    return loader
+
+
+def test_same_weights_under_two_paths_load_once(weights):
+    first, copy, other = weights
+    registry = ModelRegistry()
+    loads = []
+
+    a = registry.load(first, 'yolo', counting_loader(loads))
+    b = registry.load(copy, 'yolo', counting_loader(loads))
+    c = registry.load(other, 'yolo', counting_loader(loads))
+
+    assert a is b
+    assert c is not a
+    assert len(loads) == 2
+    stats = {m['hash']: m for m in registry.get_stats()['models']}
+    shared = stats[registry.file_hash(first)]
+    assert shared['shares'] == 2
+    assert sorted(shared['paths']) == sorted([str(first.resolve()), str(copy.resolve())])
+
+
+def test_kind_separates_models_built_from_the_same_file(weights):
+    first, _, _ = weights
+    registry = ModelRegistry()
+
+    assert registry.load(first, 'yolo', Model) is not registry.load(first, 'classifier', Model)
+
+
+def test_concurrent_first_loads_share_one_instance(weights):
+    first, _, _ = weights
+    registry = ModelRegistry()
+    loads = []
+    models = []
+    start = threading.Barrier(4)
+
+    def load():
+        start.wait()
+        models.append(registry.load(first, 'yolo', counting_loader(loads, delay=0.1)))
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert all(model is models[0] for model in models)
+
+
+def test_evicted_weights_are_loaded_again_only_when_no_path_remains(weights):
+    first, copy, _ = weights
+    registry = ModelRegistry()
+    loads = []
+    registry.load(first, 'yolo', counting_loader(loads))
+    registry.load(copy, 'yolo', counting_loader(loads))
+
+    registry.evict([first])
+    registry.load(copy, 'yolo', counting_loader(loads))
+    assert len(loads) == 1
+
+    registry.evict([copy])
+    registry.load(copy, 'yolo', counting_loader(loads))
+    assert len(loads) == 2
+
+
+def test_predict_lock_is_one_per_model():
+    registry = ModelRegistry()
+    model, other = Model("a"), Model("b")
+
+    assert registry.predict_lock(model) is registry.predict_lock(model)
+    assert registry.predict_lock(model) is not registry.predict_lock(other)
+    # Objects that take no attributes get a lock too
+    frozen = frozenset({"weights"})
+    assert registry.predict_lock(frozen) is registry.predict_lock(frozen)
+
+
+def test_predict_lock_serializes_callers():
+    registry = ModelRegistry()
+    model = Model("a")
+    running = []
+    overlaps = []
+
+    def predict():
+        with registry.predict_lock(model):
+            running.append(1)
+            overlaps.append(len(running) > 1)
+            time.sleep(0.02)
+            running.pop()
+
+    threads = [threading.Thread(target=predict) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == [False] * 5
@@ -0,0 +1,77 @@
+from pipeline.resolution import FULL, ResolutionLadder
+
+
+def fake_model(confidences):
+    """predict(size) -> best confidence at that size (None: nothing found), recording each call."""
+    calls = []
+
+    def predict(size):
+        calls.append(size)
+        return confidences[size]
+    return predict, calls
+
+
+def test_confident_result_stops_at_the_smallest_size():
+    ladder = ResolutionLadder([320, 480], escalate_confidence=0.5)
+    predict, calls = fake_model({320: 0.9, 480: 0.9, None: 0.9})
+
+    output, level = ladder.run(predict, lambda confidence: confidence, (1080, 1920, 3))
+
+    assert (output, level) == (0.9, '320')
+    assert calls == [320]
+
+
+def test_low_confidence_or_no_detection_climbs_to_full_size():
+    ladder = ResolutionLadder([320, 480], escalate_confidence=0.5)
+    predict, calls = fake_model({320: None, 480: 0.3, None: 0.2})
+
+    output, level = ladder.run(predict, lambda confidence: confidence, (1080, 1920, 3))
+
+    # The full size answers even when it is not confident either
+    assert (output, level) == (0.2, FULL)
+    assert calls == [320, 480, None]
+
+
+def test_sizes_not_smaller_than_the_image_are_skipped():
+    ladder = ResolutionLadder([320, 480])
+
+    assert ladder.levels_for((400, 300, 3)) == [320, None]
+    assert ladder.levels_for((200, 300, 3)) == [None]
+
+
+def test_sizes_are_rounded_to_the_stride():
+    assert ResolutionLadder([300, 500, 480]).sizes == [288, 480, 512]
+
+
+def test_batch_runs_each_size_once_over_the_images_still_pending():
+    ladder = ResolutionLadder([320, 480], escalate_confidence=0.5)
+    # Per image: best confidence at each size
+    confidences = [
+        {320: 0.9, 480: 0.9, None: 0.9},
+        {320: 0.1, 480: 0.8, None: 0.8},
+        {320: None, 480: 0.2, None: 0.6},
+        {None: 0.4}  # too small for the reduced sizes
+    ]
+    shapes = [(1080, 1920, 3)] * 3 + [(240, 320, 3)]
+    calls = []
+
+    def predict(indices, size):
+        calls.append((sorted(indices), size))
+        return [confidences[i][size] for i in indices]
+
+    outputs, levels = ladder.run_batch(predict, lambda confidence: confidence, shapes)
+
+    assert outputs == [0.9, 0.8, 0.6, 0.4]
+    assert levels == ['320', '480', FULL, FULL]
+    assert calls == [([0, 1, 2], 320), ([1, 2], 480), ([2, 3], None)]
+
+
+def test_stats_report_the_share_served_at_each_size():
+    ladder = ResolutionLadder([320])
+    for level in ['320', '320', '320', FULL]:
+        ladder.record('erc', level)
+
+    served = ladder.get_stats()['detectors']['erc']['served']
+
+    assert served['320'] == {'requests': 3, 'share': 0.75}
+    assert served[FULL] == {'requests': 1, 'share': 0.25}
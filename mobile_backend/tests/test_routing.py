@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+
+from pipeline.pipeline import InspectionPipeline
+
+
+class FakeDetector:
+    def __init__(self, component_type, confidence):
+        self.component_type = component_type
+        self.confidence = confidence
+        self.calls = 0
+
+    def detect(self, image):
+        self.calls += 1
+        if self.confidence is None:
+            return {'success': False, 'detect_ms': 1.0}
+        return {'success': True, 'component_type': self.component_type,
+                'confidence': self.confidence, 'detect_ms': 1.0}
+
+
+def make_pipeline(**confidences):
+    pipeline = InspectionPipeline(detect_mode='sequential', early_exit_confidence=0.8)
+    pipeline.detectors = {name: FakeDetector(name, confidence) for name, confidence in confidences.items()}
+    return pipeline
+
+
+IMAGE = np.zeros((32, 32, 3), dtype=np.uint8)
+
+
+def test_confident_hinted_detector_skips_the_others():
+    pipeline = make_pipeline(erc=0.9, sleeper=0.95)
+
+    result = pipeline._detect(IMAGE, hint='erc')
+
+    assert result['component_type'] == 'erc'
+    assert pipeline.detectors['sleeper'].calls == 0
+    stats = pipeline.get_routing_stats()['erc']
+    assert (stats['requests'], stats['hits'], stats['fallbacks'], stats['mismatches']) == (1, 1, 0, 0)
+
+
+def test_miss_falls_back_and_counts_the_mismatch():
+    pipeline = make_pipeline(erc=None, sleeper=0.9)
+
+    result = pipeline._detect(IMAGE, hint='erc')
+
+    assert result['component_type'] == 'sleeper'
+    assert pipeline.detectors['sleeper'].calls == 1
+    stats = pipeline.get_routing_stats()['erc']
+    assert (stats['requests'], stats['hits'], stats['fallbacks'], stats['mismatches']) == (1, 0, 1, 1)
+    assert stats['hit_rate'] == 0.0
+
+
+def test_unknown_hint_is_not_routed():
+    pipeline = make_pipeline(erc=0.9, sleeper=0.5)
+
+    pipeline._detect(IMAGE, hint='liner')
+
+    assert pipeline.get_routing_stats() == {}
+    assert pipeline.detectors['sleeper'].calls == 1
+
+
+def test_counts_recorded_from_many_threads_are_not_lost():
+    pipeline = make_pipeline(erc=0.9)
+    start = threading.Barrier(8)
+
+    def record():
+        start.wait()
+        for number in range(500):
+            pipeline._record_routing('erc', number % 2 == 0, {'success': True, 'component_type': 'erc'})
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pipeline.get_routing_stats()['erc']
+    assert stats['requests'] == 4000
+    assert stats['hits'] == stats['fallbacks'] == 2000
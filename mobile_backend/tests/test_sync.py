@@ -0,0 +1,48 @@
+from main import Inspection, InspectionSyncKey, Item
+
+
+def record(key, uid="UID-1", status="ok"):
+    return {"idempotency_key": key, "qr_id": uid, "status": status, "remark": key}
+
+
+def test_replayed_sync_creates_nothing_twice(client, db):
+    db.add(Item(uid="UID-1", component_type="ERC"))
+    db.commit()
+    batch = {"inspections": [record("k1"), record("k2", status="rejected"), record("k3", uid="UID-404")]}
+
+    first = client.post("/api/inspections/sync", json=batch).json()
+    # The app never saw the response and sends the same queue again
+    replay = client.post("/api/inspections/sync", json=batch).json()
+
+    assert (first["created"], first["duplicates"], first["not_found"]) == (2, 0, 1)
+    assert (replay["created"], replay["duplicates"], replay["not_found"]) == (0, 2, 1)
+    assert [r["inspection_id"] for r in replay["results"][:2]] == [r["inspection_id"] for r in first["results"][:2]]
+    assert db.query(Inspection).count() == 2
+    assert db.query(InspectionSyncKey).count() == 2
+
+
+def test_repeated_key_within_a_batch_is_a_duplicate(client, db):
+    db.add(Item(uid="UID-1", component_type="ERC"))
+    db.commit()
+
+    response = client.post("/api/inspections/sync", json={"inspections": [record("k1"), record("k1")]}).json()
+
+    assert [r["status"] for r in response["results"]] == ["created", "duplicate"]
+    assert db.query(Inspection).count() == 1
+
+
+def test_last_record_of_an_item_sets_its_status(client, db):
+    db.add(Item(uid="UID-1", component_type="ERC"))
+    db.commit()
+
+    client.post("/api/inspections/sync", json={"inspections": [record("k1", status="rejected"),
+                                                              record("k2", status="ok")]})
+
+    db.expire_all()
+    assert db.query(Item).filter(Item.uid == "UID-1").one().current_status == "inspected"
+
+
+def test_sync_requires_idempotency_keys(client, db):
+    response = client.post("/api/inspections/sync", json={"inspections": [record("")]})
+
+    assert response.status_code == 400
@@ -0,0 +1,97 @@
+import base64
+
+import pytest
+
+import main
+
+IMAGE = b"\xff\xd8\xff\xe0 not really a jpeg"
+
+
+@pytest.fixture
+def inspections(monkeypatch):
+    """Fake pipeline run: records (image bytes, component_type, hint) of each call."""
+    calls = []
+
+    async def run_inspection(image_data, component_type, hint=None):
+        calls.append((image_data, component_type, hint))
+        return {'success': True, 'component_type': 'erc', 'component_class': 'erc_good',
+                'detection_confidence': 0.9, 'condition': 'Good', 'timings': {'detect_ms': 1.0},
+                'model_version': 'test'}
+
+    monkeypatch.setattr(main, 'run_inspection', run_inspection)
+    monkeypatch.setattr(main, 'get_cache', lambda: None)
+    monkeypatch.setattr(main, 'get_admission', lambda: None)
+    return calls
+
+
+def test_raw_body_upload(client, inspections):
+    response = client.post("/api/inspect-component/upload", content=IMAGE,
+                           params={"expected_component": "ERC"}, headers={"Content-Type": "image/jpeg"})
+
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    assert inspections == [(IMAGE, None, "erc")]
+    assert response.json()["timings"]["receive_ms"] >= 0
+
+
+def test_multipart_upload_takes_form_fields(client, inspections):
+    response = client.post("/api/inspect-component/upload",
+                           files={"file": ("photo.jpg", IMAGE, "image/jpeg")},
+                           data={"component_type": "sleeper"})
+
+    assert response.status_code == 200
+    assert inspections == [(IMAGE, "sleeper", None)]
+
+
+def test_multipart_upload_without_file_is_a_bad_request(client, inspections):
+    response = client.post("/api/inspect-component/upload", data={"component_type": "erc"},
+                           files={"other": ("photo.jpg", IMAGE, "image/jpeg")})
+
+    assert response.status_code == 400
+    assert inspections == []
+
+
+@pytest.mark.parametrize("content_type, body, status", [
+    ("text/plain", IMAGE, 415),
+    ("image/jpeg", b"", 400),
+])
+def test_unusable_raw_bodies_are_rejected(client, inspections, content_type, body, status):
+    response = client.post("/api/inspect-component/upload", content=body, headers={"Content-Type": content_type})
+
+    assert response.status_code == status
+    assert inspections == []
+
+
+def test_oversized_upload_is_rejected_before_inspection(client, inspections, monkeypatch):
+    monkeypatch.setattr(main, 'MAX_UPLOAD_BYTES', 8)
+
+    response = client.post("/api/inspect-component/upload", content=IMAGE, headers={"Content-Type": "image/jpeg"})
+
+    assert response.status_code == 413
+    assert inspections == []
+
+
+def test_transports_are_counted_separately(client, inspections):
+    before = main.get_upload_stats()['transports']
+    client.post("/api/inspect-component", json={"image_base64": base64.b64encode(IMAGE).decode()})
+    client.post("/api/inspect-component/upload", content=IMAGE, headers={"Content-Type": "image/jpeg"})
+
+    after = main.get_upload_stats()['transports']
+    for transport in ("base64", "raw"):
+        previous = before.get(transport, {}).get('requests', 0)
+        assert after[transport]['requests'] == previous + 1
+    assert inspections[0][0] == inspections[1][0] == IMAGE
+
+
+def test_receive_time_starts_when_the_request_reaches_the_app(client, inspections, monkeypatch):
+    # Set by the middleware before FastAPI parses the JSON body, for every transport
+    seen = []
+    request_started = main.request_started
+    monkeypatch.setattr(main, 'request_started', lambda request: seen.append(request.state.started) or
+                        request_started(request))
+
+    client.post("/api/inspect-component", json={"image_base64": base64.b64encode(IMAGE).decode()})
+    client.post("/api/inspect-component/upload", content=IMAGE, headers={"Content-Type": "image/jpeg"})
+
+    assert len(seen) == 2
+    assert seen[0] < seen[1]
@@ -0,0 +1,132 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from pipeline import video
+from pipeline.video import Track, VideoInspector, iou
+
+
+class FakeCapture:
+    """cv2.VideoCapture over a list of frames, counting grabs and decodes."""
+    videos = {}
+
+    def __init__(self, source):
+        self.frames = self.videos[source]
+        self.position = -1
+        self.grabs = self.retrieves = 0
+        FakeCapture.last = self
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return {"fps": 10.0, "count": len(self.frames), "width": 64, "height": 36}[prop]
+
+    def grab(self):
+        self.position += 1
+        self.grabs += 1
+        return self.position < len(self.frames)
+
+    def retrieve(self):
+        self.retrieves += 1
+        return True, self.frames[self.position]
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def fake_cv2(monkeypatch):
+    module = types.SimpleNamespace(
+        VideoCapture=FakeCapture, COLOR_BGR2RGB=None,
+        CAP_PROP_FPS="fps", CAP_PROP_FRAME_COUNT="count", CAP_PROP_FRAME_WIDTH="width", CAP_PROP_FRAME_HEIGHT="height",
+        cvtColor=lambda image, code: image[..., ::-1]
+    )
+    monkeypatch.setitem(sys.modules, "cv2", module)
+    return module
+
+
+def add_video(name, values):
+    FakeCapture.videos[name] = [np.full((36, 64, 3), value, dtype=np.uint8) for value in values]
+
+
+def detected_values(inspector, source):
+    """Run the inspector and return the pixel value of every frame detection ran on."""
+    values = []
+    inspector._detect = lambda rgb: values.append(int(rgb[0, 0, 0])) or []
+    report = inspector.inspect(source)
+    return values, report
+
+
+def detection(bbox, confidence=0.9, class_name="erc_good"):
+    return {"bbox": bbox, "confidence": confidence, "class_name": class_name}
+
+
+def test_iou():
+    assert iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+    assert iou([0, 0, 10, 10], [20, 20, 30, 30]) == 0.0
+    assert iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(1 / 3)
+    assert iou([0, 0, 0, 0], [0, 0, 0, 0]) == 0.0
+
+
+def test_track_predicts_constant_velocity():
+    track = Track(1, "erc", detection([0, 0, 10, 10]), 0, 0.0, None)
+    track.update(detection([4, 0, 14, 10]), 2, 0.2, lambda: None)
+
+    assert track.predict(4) == [8, 0, 18, 10]
+
+
+def test_detections_join_the_track_they_overlap_once_it_has_moved():
+    inspector = VideoInspector(types.SimpleNamespace(crop_padding=0.0), stride=1)
+    rgb = np.zeros((100, 200, 3), dtype=np.uint8)
+    tracks = []
+    next_id = inspector._associate(tracks, [("erc", detection([0, 0, 20, 20])), ("erc", detection([100, 0, 120, 20]))],
+                                   rgb, 0, 0.0, 1)
+    next_id = inspector._associate(tracks, [("erc", detection([110, 0, 130, 20])), ("erc", detection([10, 0, 30, 20]))],
+                                   rgb, 1, 0.1, next_id)
+    # Moving 10 px per frame: at 20 px the boxes no longer overlap the last ones enough, only the predicted ones
+    next_id = inspector._associate(tracks, [("erc", detection([30, 0, 50, 20])), ("erc", detection([130, 0, 150, 20]))],
+                                   rgb, 3, 0.3, next_id)
+
+    assert next_id == 3
+    assert [(track.track_id, track.bbox, track.hits, track.missed) for track in tracks] == [
+        (1, [30, 0, 50, 20], 3, 0), (2, [130, 0, 150, 20], 3, 0)
+    ]
+
+
+def test_detections_of_another_type_open_a_new_track():
+    inspector = VideoInspector(types.SimpleNamespace(crop_padding=0.0), stride=1)
+    rgb = np.zeros((100, 200, 3), dtype=np.uint8)
+    tracks = []
+    next_id = inspector._associate(tracks, [("erc", detection([0, 0, 20, 20]))], rgb, 0, 0.0, 1)
+
+    inspector._associate(tracks, [("sleeper", detection([0, 0, 20, 20]))], rgb, 1, 0.1, next_id)
+
+    assert [(track.component_type, track.missed) for track in tracks] == [("erc", 1), ("sleeper", 0)]
+
+
+def test_frames_between_strides_are_grabbed_without_decoding(fake_cv2):
+    add_video("stride.avi", range(12))
+    inspector = VideoInspector(types.SimpleNamespace(weights_version="test"), stride=4, adaptive=False)
+
+    values, report = detected_values(inspector, "stride.avi")
+
+    assert values == [0, 4, 8]
+    assert (FakeCapture.last.grabs, FakeCapture.last.retrieves) == (13, 3)
+    assert report["processing"]["frames_read"] == 12
+    assert report["processing"]["frames_decoded"] == 3
+
+
+def test_motion_triggers_an_early_detection(fake_cv2):
+    # Small drift every frame, then the picture changes completely at frame 3
+    add_video("motion.avi", [index + (100 if index >= 3 else 0) for index in range(10)])
+    inspector = VideoInspector(types.SimpleNamespace(weights_version="test"), stride=5, adaptive=True,
+                               min_stride=2, motion_threshold=12)
+
+    values, report = detected_values(inspector, "motion.avi")
+
+    assert values == [0, 103, 108]
+    # Frames closer than min_stride to the last detection are not decoded
+    assert report["processing"]["frames_decoded"] == 7
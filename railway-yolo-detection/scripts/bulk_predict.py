@@ -0,0 +1,247 @@
+"""
+Bulk Prediction for Image Archives
+Runs the YOLOv8 detector over large directories of inspection photos using
+several worker processes, each with its own model instance, and batched
+inference.
+
+Results are appended to a JSONL file as they complete (one line per image),
+which doubles as the checkpoint: rerunning the same command skips every
+image already in the file, so an interrupted run resumes where it stopped.
+
+Usage:
+    python scripts/bulk_predict.py /data/inspection_photos --workers 4 --output archive.jsonl
+    python scripts/bulk_predict.py /data/inspection_photos --output archive.jsonl   # resume
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+from collections import Counter
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Paths
+DEFAULT_WEIGHTS = PROJECT_ROOT / "models" / "best.pt"
+RESULTS_DIR = PROJECT_ROOT / "predictions"
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# Worker process state (one model per process)
+_model = None
+_worker_config = {}
+
+
+def list_images(source_dir: Path, recursive: bool = True):
+    """All image files under a directory, as sorted relative paths."""
+    images = []
+    for root, dirs, files in os.walk(source_dir):
+        if not recursive:
+            dirs.clear()
+        dirs.sort()
+        for name in files:
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                images.append(os.path.relpath(os.path.join(root, name), source_dir))
+    return sorted(images)
+
+
+def load_checkpoint(output_path: Path, retry_errors: bool = False) -> set:
+    """
+    Read the images already recorded in the output file.
+    
+    A line cut short by a crash is dropped (and truncated away) so the file
+    stays valid JSONL before new results are appended.
+    """
+    done = set()
+    if not output_path.exists():
+        return done
+    
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                break
+            valid_bytes += len(line)
+            if retry_errors and 'error' in record:
+                continue
+            done.add(record['image'])
+    
+    if valid_bytes < output_path.stat().st_size:
+        print(f"⚠️  Dropping incomplete last line of {output_path}")
+        with open(output_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+def _init_worker(weights: str, conf: float, imgsz: int, threads: int, source_dir: str):
+    """Process initializer: load one model per worker."""
+    global _model, _worker_config
+    import torch
+    from ultralytics import YOLO
+    
+    torch.set_num_threads(threads)
+    _model = YOLO(weights)
+    _worker_config = {'conf': conf, 'imgsz': imgsz, 'source_dir': source_dir}
+
+
+def _parse_result(image: str, result) -> dict:
+    """Detections for one image, in the same format as predict.py."""
+    names = result.names
+    boxes = result.boxes
+    detections = []
+    for i in range(len(boxes)):
+        class_id = int(boxes.cls[i].item())
+        x1, y1, x2, y2 = (float(v) for v in boxes.xyxy[i].tolist())
+        xc, yc, w, h = (float(v) for v in boxes.xywhn[i].tolist())
+        detections.append({
+            'class_id': class_id,
+            'class_name': names.get(class_id, f"class_{class_id}") if isinstance(names, dict) else names[class_id],
+            'confidence': float(boxes.conf[i].item()),
+            'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
+            'bbox_normalized': {'x_center': xc, 'y_center': yc, 'width': w, 'height': h}
+        })
+    height, width = result.orig_shape
+    return {
+        'image': image,
+        'width': width,
+        'height': height,
+        'num_detections': len(detections),
+        'detections': detections
+    }
+
+
+def _predict_batch(images: list) -> list:
+    """Worker task: one batched forward pass over several images."""
+    source_dir = _worker_config['source_dir']
+    paths = [os.path.join(source_dir, image) for image in images]
+    try:
+        results = _model.predict(source=paths, conf=_worker_config['conf'], imgsz=_worker_config['imgsz'],
+                                 save=False, verbose=False)
+        return [_parse_result(image, result) for image, result in zip(images, results)]
+    except Exception:
+        # One unreadable file fails the whole batch; retry one by one to isolate it
+        records = []
+        for image, path in zip(images, paths):
+            try:
+                result = _model.predict(source=path, conf=_worker_config['conf'], imgsz=_worker_config['imgsz'],
+                                        save=False, verbose=False)[0]
+                records.append(_parse_result(image, result))
+            except Exception as e:
+                records.append({'image': image, 'error': f"{type(e).__name__}: {e}"})
+        return records
+
+
+def run_bulk(source_dir: Path, output_path: Path, weights: Path, workers: int, batch_size: int,
+             conf: float, imgsz: int, recursive: bool = True, retry_errors: bool = False):
+    """Shard the archive across worker processes and stream results into the JSONL file."""
+    images = list_images(source_dir, recursive)
+    done = load_checkpoint(output_path, retry_errors)
+    pending = [image for image in images if image not in done]
+    
+    print(f"\n📁 {len(images)} images in {source_dir}")
+    print(f"   {len(images) - len(pending)} already in {output_path}, {len(pending)} to process")
+    if not pending:
+        print("✅ Nothing to do")
+        return
+    
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"🚀 {workers} workers x {threads} threads, batches of {batch_size}")
+    print("=" * 70)
+    
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    class_counts = Counter()
+    processed = errors = 0
+    started = last_report = time.time()
+    window = []  # (time, processed) samples for the recent rate
+    
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    with open(output_path, 'a') as out, context.Pool(
+        processes=workers,
+        initializer=_init_worker,
+        initargs=(str(weights), conf, imgsz, threads, str(source_dir))
+    ) as pool:
+        try:
+            # Batches are handed out dynamically, so slow shards do not hold up the others
+            for records in pool.imap_unordered(_predict_batch, batches):
+                for record in records:
+                    out.write(json.dumps(record) + "\n")
+                    if 'error' in record:
+                        errors += 1
+                    else:
+                        class_counts.update(d['class_name'] for d in record['detections'])
+                out.flush()
+                processed += len(records)
+                
+                now = time.time()
+                window = [(t, n) for t, n in window if now - t < 10] + [(now, processed)]
+                if now - last_report >= 1 or processed == len(pending):
+                    last_report = now
+                    recent = (processed - window[0][1]) / (now - window[0][0]) if now > window[0][0] else 0.0
+                    overall = processed / (now - started)
+                    eta = (len(pending) - processed) / overall if overall else 0
+                    print(f"\r   {processed}/{len(pending)} images  {recent:6.1f} img/s (avg {overall:.1f})  "
+                          f"errors {errors}  ETA {eta / 60:.1f} min   ", end="", flush=True)
+        except KeyboardInterrupt:
+            pool.terminate()
+            print(f"\n⏸️  Interrupted after {processed} images; rerun the same command to resume")
+            return
+    
+    elapsed = time.time() - started
+    print(f"\n\n✅ {processed} images in {elapsed:.1f}s ({processed / elapsed:.1f} img/s), {errors} errors")
+    print(f"   Results: {output_path}")
+    
+    print("\n📊 Detections by class (this run):")
+    for class_name, count in class_counts.most_common():
+        print(f"   {class_name:20s}: {count:6d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk railway component detection over image archives')
+    parser.add_argument('source', type=str,
+                        help='Directory of images (searched recursively)')
+    parser.add_argument('--weights', type=str, default=str(DEFAULT_WEIGHTS),
+                        help='Path to model weights')
+    parser.add_argument('--output', type=str, default=None,
+                        help='JSONL results/checkpoint file (default: predictions/<dir name>.jsonl)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Worker processes, each with its own model')
+    parser.add_argument('--batch-size', type=int, default=16,
+                        help='Images per forward pass')
+    parser.add_argument('--conf', type=float, default=0.25,
+                        help='Confidence threshold')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Inference image size')
+    parser.add_argument('--no-recursive', action='store_true',
+                        help='Only process the top-level directory')
+    parser.add_argument('--retry-errors', action='store_true',
+                        help='Process images that failed in a previous run again (the newer line wins)')
+    
+    args = parser.parse_args()
+    
+    source_dir = Path(args.source).expanduser().resolve()
+    if not source_dir.is_dir():
+        print(f"❌ Source directory not found: {source_dir}")
+        return
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"❌ Model weights not found: {weights}")
+        print("   Train a model first: python scripts/train_yolo.py")
+        return
+    
+    output_path = Path(args.output) if args.output else RESULTS_DIR / f"{source_dir.name}.jsonl"
+    run_bulk(source_dir, output_path, weights, max(1, args.workers), max(1, args.batch_size),
+             args.conf, args.imgsz, recursive=not args.no_recursive, retry_errors=args.retry_errors)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+"""
+ONNX Export and Static INT8 Quantization
+========================================
+Export a trained YOLOv8 detector or ResNet50 component classifier to ONNX,
+calibrate it on a subset of real images and write a static INT8 model that
+the mobile backend loads with PIPELINE_BACKEND=onnx.
+
+For weights `models/best.pt` this writes, next to the weights:
+    best.onnx              FP32 export
+    best.int8.onnx         static INT8 (QDQ, per-channel weights)
+    best.int8_report.json  accuracy vs latency against the PyTorch baseline
+
+Usage:
+    python export_onnx_int8.py --model detector --weights ../models/best.pt \\
+        --calib-dir ../data/valid/images --data ../data/data.yaml
+    python export_onnx_int8.py --model classifier --weights ../models/erc_classifier_best.pt \\
+        --calib-dir ./data/erc_dataset/train --eval-dir ./data/erc_dataset/valid
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Reuse the backend's preprocessing so calibration sees exactly what serving sees
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT.parent / "mobile_backend"))
+
+from pipeline.backends import OnnxClassifier, OnnxYOLO, letterbox  # noqa: E402
+from pipeline.classifiers import ComponentClassifier  # noqa: E402
+
+MODELS_DIR = PROJECT_ROOT / "models"
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def list_images(directory: Path, limit: int = None) -> list:
+    """List image files under a directory (recursively), in a stable order."""
+    images = sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if limit and len(images) > limit:
+        # Spread the subset across the whole directory instead of taking the first N
+        step = len(images) / limit
+        images = [images[int(i * step)] for i in range(limit)]
+    return images
+
+
+def load_rgb(path: Path) -> np.ndarray:
+    """Load an image as an HxWx3 RGB uint8 array."""
+    return np.asarray(Image.open(path).convert('RGB'))
+
+
+def preprocess_classifier(image: np.ndarray) -> np.ndarray:
+    """Classifier input for one image, as a 1x3x224x224 float32 batch."""
+    return ComponentClassifier._preprocess(image).transpose(2, 0, 1)[None]
+
+
+def build_classifier(weights: Path):
+    """Rebuild the ResNet50 from a training checkpoint; returns (model, class_names)."""
+    import torch
+    import torch.nn as nn
+    from torchvision import models
+    
+    checkpoint = torch.load(weights, map_location='cpu', weights_only=False)
+    class_names = checkpoint.get('class_names', [])
+    num_classes = checkpoint.get('num_classes', len(class_names))
+    
+    model = models.resnet50(weights=None)
+    model.fc = nn.Sequential(
+        nn.Dropout(0.5),
+        nn.Linear(model.fc.in_features, 512),
+        nn.ReLU(),
+        nn.Dropout(0.3),
+        nn.Linear(512, num_classes)
+    )
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return model, class_names
+
+
+def export_detector(weights: Path, imgsz: int, opset: int) -> Path:
+    """Export YOLO weights to FP32 ONNX with a fixed input size."""
+    from ultralytics import YOLO
+    
+    exported = YOLO(str(weights)).export(format='onnx', imgsz=imgsz, opset=opset, dynamic=False, simplify=True)
+    return Path(exported)
+
+
+def export_classifier(weights: Path, opset: int) -> Path:
+    """Export a ResNet50 checkpoint to FP32 ONNX with a dynamic batch axis."""
+    import torch
+    
+    model, class_names = build_classifier(weights)
+    onnx_path = weights.with_suffix('.onnx')
+    torch.onnx.export(
+        model, torch.zeros(1, 3, 224, 224), str(onnx_path),
+        input_names=['images'], output_names=['logits'],
+        dynamic_axes={'images': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=opset, dynamo=False
+    )
+    write_sidecar(onnx_path, {'class_names': class_names, 'input_size': 224, 'source': weights.name})
+    return onnx_path
+
+
+def write_sidecar(onnx_path: Path, metadata: dict):
+    """Write the `model.onnx.json` metadata file read by the backend."""
+    with open(onnx_path.with_name(onnx_path.name + '.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+class ImageCalibrationReader:
+    """Feeds preprocessed calibration images to the ONNX Runtime quantizer."""
+    
+    def __init__(self, images: list, input_name: str, preprocess):
+        self.images = images
+        self.input_name = input_name
+        self.preprocess = preprocess
+        self._index = 0
+    
+    def get_next(self):
+        if self._index >= len(self.images):
+            return None
+        tensor = self.preprocess(load_rgb(self.images[self._index]))
+        self._index += 1
+        return {self.input_name: tensor}
+    
+    def rewind(self):
+        self._index = 0
+
+
+def quantize(fp32_path: Path, calib_images: list, preprocess, method: str) -> Path:
+    """
+    Quantize an FP32 ONNX model to static INT8 using calibration images.
+    
+    Args:
+        fp32_path: Exported FP32 model
+        calib_images: Image paths used to collect activation ranges
+        preprocess: Function turning an RGB array into the model's input tensor
+        method: Calibration method ('minmax', 'entropy' or 'percentile')
+    
+    Returns:
+        Path to the INT8 model
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    
+    prepared_path = fp32_path.with_name(fp32_path.stem + '.prep.onnx')
+    int8_path = fp32_path.with_name(fp32_path.stem + '.int8.onnx')
+    
+    quant_pre_process(str(fp32_path), str(prepared_path))
+    
+    input_name = onnx.load(str(prepared_path), load_external_data=False).graph.input[0].name
+    methods = {
+        'minmax': CalibrationMethod.MinMax,
+        'entropy': CalibrationMethod.Entropy,
+        'percentile': CalibrationMethod.Percentile
+    }
+    
+    quantize_static(
+        str(prepared_path), str(int8_path),
+        ImageCalibrationReader(calib_images, input_name, preprocess),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=methods[method]
+    )
+    prepared_path.unlink(missing_ok=True)
+    
+    # Keep exporter metadata (e.g. ultralytics class names, imgsz, stride)
+    source = onnx.load(str(fp32_path), load_external_data=False)
+    quantized = onnx.load(str(int8_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, str(int8_path))
+    
+    sidecar = fp32_path.with_name(fp32_path.name + '.json')
+    if sidecar.exists():
+        shutil.copy(sidecar, int8_path.with_name(int8_path.name + '.json'))
+    
+    return int8_path
+
+
+def measure_latency(run, inputs: list, warmup: int = 3, runs: int = 20) -> dict:
+    """Time a single-image inference callable; returns p50/p95/mean in ms."""
+    for i in range(warmup):
+        run(inputs[i % len(inputs)])
+    
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        run(inputs[i % len(inputs)])
+        samples.append((time.perf_counter() - started) * 1000)
+    
+    samples.sort()
+    return {
+        'mean_ms': round(sum(samples) / len(samples), 2),
+        'p50_ms': round(samples[len(samples) // 2], 2),
+        'p95_ms': round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 2)
+    }
+
+
+def compare_detector(weights: Path, fp32_path: Path, int8_path: Path, samples: list,
+                     data_yaml: Path, imgsz: int, runs: int) -> dict:
+    """Compare mAP (if a data.yaml is given) and latency of PyTorch, FP32 and INT8 detectors."""
+    from ultralytics import YOLO
+    
+    torch_model = YOLO(str(weights))
+    variants = {
+        'pytorch': lambda image: torch_model(image, imgsz=imgsz, verbose=False),
+        'onnx_fp32': OnnxYOLO(fp32_path),
+        'onnx_int8': OnnxYOLO(int8_path)
+    }
+    paths = {'pytorch': weights, 'onnx_fp32': fp32_path, 'onnx_int8': int8_path}
+    
+    report = {}
+    for name, model in variants.items():
+        entry = {'size_mb': round(paths[name].stat().st_size / 1e6, 2)}
+        entry.update(measure_latency(model, samples, runs=runs))
+        
+        if data_yaml:
+            metrics = YOLO(str(paths[name]), task='detect').val(data=str(data_yaml), imgsz=imgsz,
+                                                               batch=1, plots=False, verbose=False)
+            entry['mAP50'] = round(float(metrics.box.map50), 4)
+            entry['mAP50-95'] = round(float(metrics.box.map), 4)
+        report[name] = entry
+    return report
+
+
+def compare_classifier(weights: Path, fp32_path: Path, int8_path: Path, samples: list,
+                       eval_dir: Path, runs: int) -> dict:
+    """
+    Compare top-1 accuracy and latency of PyTorch, FP32 and INT8 classifiers.
+    
+    Accuracy is measured on an ImageFolder-style `eval_dir` when given;
+    agreement with the PyTorch predictions is always reported.
+    """
+    import torch
+    
+    model, class_names = build_classifier(weights)
+    
+    def torch_logits(batch):
+        with torch.inference_mode():
+            return model(torch.from_numpy(batch)).numpy()
+    
+    variants = {
+        'pytorch': torch_logits,
+        'onnx_fp32': OnnxClassifier(fp32_path).run,
+        'onnx_int8': OnnxClassifier(int8_path).run
+    }
+    paths = {'pytorch': weights, 'onnx_fp32': fp32_path, 'onnx_int8': int8_path}
+    
+    labelled = []
+    if eval_dir:
+        for class_dir in sorted(p for p in Path(eval_dir).iterdir() if p.is_dir()):
+            if class_dir.name in class_names:
+                label = class_names.index(class_dir.name)
+                labelled.extend((image, label) for image in list_images(class_dir))
+    agreement_images = [image for image, _ in labelled] or samples
+    inputs = [preprocess_classifier(load_rgb(image)) for image in agreement_images]
+    
+    predictions = {name: np.array([int(run(x).argmax()) for x in inputs]) for name, run in variants.items()}
+    
+    report = {}
+    for name, run in variants.items():
+        entry = {'size_mb': round(paths[name].stat().st_size / 1e6, 2)}
+        entry.update(measure_latency(run, inputs, runs=runs))
+        entry['top1_agreement_with_pytorch'] = round(float((predictions[name] == predictions['pytorch']).mean()), 4)
+        if labelled:
+            labels = np.array([label for _, label in labelled])
+            entry['top1_accuracy'] = round(float((predictions[name] == labels).mean()), 4)
+        report[name] = entry
+    return report
+
+
+def print_report(report: dict):
+    """Print the accuracy vs latency table."""
+    columns = sorted({key for entry in report.values() for key in entry})
+    print("\n" + "=" * 70)
+    print("📊 Accuracy vs Latency")
+    print("=" * 70)
+    widths = [max(len(col), 8) + 2 for col in columns]
+    print(f"{'variant':<12}" + "".join(f"{col:>{width}}" for col, width in zip(columns, widths)))
+    for name, entry in report.items():
+        print(f"{name:<12}" + "".join(f"{str(entry.get(col, '-')):>{width}}" for col, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export to ONNX and build a static INT8 model")
+    parser.add_argument("--model", type=str, required=True, choices=['detector', 'classifier'],
+                        help="Model kind to export")
+    parser.add_argument("--weights", type=str, default=str(MODELS_DIR / "best.pt"),
+                        help="PyTorch weights (.pt) to export")
+    parser.add_argument("--calib-dir", type=str, required=True,
+                        help="Directory of representative images for calibration")
+    parser.add_argument("--calib-size", type=int, default=200,
+                        help="Number of calibration images to use")
+    parser.add_argument("--calib-method", type=str, default='minmax',
+                        choices=['minmax', 'entropy', 'percentile'],
+                        help="Activation range calibration method")
+    parser.add_argument("--data", type=str, default=None,
+                        help="Detector data.yaml for mAP comparison")
+    parser.add_argument("--eval-dir", type=str, default=None,
+                        help="Classifier ImageFolder directory for top-1 comparison")
+    parser.add_argument("--imgsz", type=int, default=640,
+                        help="Detector input size")
+    parser.add_argument("--opset", type=int, default=17,
+                        help="ONNX opset version")
+    parser.add_argument("--runs", type=int, default=20,
+                        help="Timed runs per variant for latency")
+    
+    args = parser.parse_args()
+    
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"❌ Weights not found: {weights}")
+        sys.exit(1)
+    
+    calib_images = list_images(args.calib_dir, args.calib_size)
+    if not calib_images:
+        print(f"❌ No calibration images found in {args.calib_dir}")
+        sys.exit(1)
+    
+    print("=" * 70)
+    print(f"📦 Exporting {args.model}: {weights}")
+    print(f"   Calibration images: {len(calib_images)} ({args.calib_method})")
+    print("=" * 70)
+    
+    if args.model == 'detector':
+        fp32_path = export_detector(weights, args.imgsz, args.opset)
+        preprocess = lambda image: letterbox(image, args.imgsz)[0]  # noqa: E731
+    else:
+        fp32_path = export_classifier(weights, args.opset)
+        preprocess = preprocess_classifier
+    print(f"✅ FP32 model: {fp32_path}")
+    
+    int8_path = quantize(fp32_path, calib_images, preprocess, args.calib_method)
+    print(f"✅ INT8 model: {int8_path}")
+    
+    samples = [load_rgb(image) for image in calib_images[:10]]
+    if args.model == 'detector':
+        report = compare_detector(weights, fp32_path, int8_path, samples,
+                                  Path(args.data) if args.data else None, args.imgsz, args.runs)
+    else:
+        report = compare_classifier(weights, fp32_path, int8_path, calib_images[:50],
+                                    Path(args.eval_dir) if args.eval_dir else None, args.runs)
+    
+    print_report(report)
+    
+    report_path = weights.with_name(weights.stem + '.int8_report.json')
+    with open(report_path, 'w') as f:
+        json.dump({
+            'weights': str(weights),
+            'model': args.model,
+            'calibration_images': len(calib_images),
+            'calibration_method': args.calib_method,
+            'variants': report
+        }, f, indent=2)
+    print(f"\n💾 Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import bulk_predict
+
+
+def write_images(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"image")
+
+
+def test_list_images_returns_sorted_relative_paths(tmp_path):
+    write_images(tmp_path, ["b.jpg", "a.PNG", "notes.txt", "line2/c.jpeg"])
+
+    assert bulk_predict.list_images(tmp_path) == ["a.PNG", "b.jpg", "line2/c.jpeg"]
+    assert bulk_predict.list_images(tmp_path, recursive=False) == ["a.PNG", "b.jpg"]
+
+
+def test_checkpoint_drops_a_line_cut_short_by_a_crash(tmp_path):
+    output = tmp_path / "archive.jsonl"
+    complete = json.dumps({"image": "a.jpg", "detections": []}) + "\n"
+    output.write_text(complete + '{"image": "b.jpg", "detec')
+
+    assert bulk_predict.load_checkpoint(output) == {"a.jpg"}
+    # Truncated back to the last complete line, so appending keeps the file valid
+    assert output.read_text() == complete
+
+
+def test_checkpoint_keeps_or_retries_failed_images(tmp_path):
+    output = tmp_path / "archive.jsonl"
+    output.write_text(
+        json.dumps({"image": "a.jpg", "detections": []}) + "\n"
+        + json.dumps({"image": "b.jpg", "error": "OSError: truncated file"}) + "\n"
+    )
+
+    assert bulk_predict.load_checkpoint(output) == {"a.jpg", "b.jpg"}
+    assert bulk_predict.load_checkpoint(output, retry_errors=True) == {"a.jpg"}
+    assert bulk_predict.load_checkpoint(tmp_path / "missing.jsonl") == set()
+
+
+def test_rerun_with_everything_recorded_does_nothing(tmp_path, capsys):
+    source = tmp_path / "photos"
+    write_images(source, ["a.jpg", "b.jpg"])
+    output = tmp_path / "archive.jsonl"
+    output.write_text("".join(json.dumps({"image": name, "detections": []}) + "\n" for name in ["a.jpg", "b.jpg"]))
+
+    # No worker pool is started, so no model weights are needed
+    bulk_predict.run_bulk(source, output, tmp_path / "missing.pt", workers=2, batch_size=4, conf=0.25, imgsz=640)
+
+    assert "Nothing to do" in capsys.readouterr().out
+
+
+class FakeBoxes:
+    def __init__(self, boxes):
+        self._boxes = boxes
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def _column(self, key):
+        return [Value(box[key]) for box in self._boxes]
+
+    @property
+    def cls(self):
+        return self._column("cls")
+
+    @property
+    def conf(self):
+        return self._column("conf")
+
+    @property
+    def xyxy(self):
+        return self._column("xyxy")
+
+    @property
+    def xywhn(self):
+        return self._column("xywhn")
+
+
+class Value:
+    def __init__(self, value):
+        self.value = value
+
+    def item(self):
+        return self.value
+
+    def tolist(self):
+        return list(self.value)
+
+
+def fake_result(boxes=()):
+    return SimpleNamespace(names={0: "elastic_clip", 1: "sleeper"}, boxes=FakeBoxes(list(boxes)),
+                           orig_shape=(480, 640))
+
+
+class FakeModel:
+    """YOLO stand-in: fails on any call that includes a file named bad.jpg."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, source, **kwargs):
+        sources = source if isinstance(source, list) else [source]
+        self.calls.append([path.rsplit("/", 1)[-1] for path in sources])
+        if any(path.endswith("bad.jpg") for path in sources):
+            raise OSError("cannot identify image file")
+        return [fake_result([{"cls": 1, "conf": 0.8, "xyxy": (10, 20, 110, 220),
+                              "xywhn": (0.1, 0.25, 0.15, 0.4)}]) for _ in sources]
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(bulk_predict, "_model", model)
+    monkeypatch.setattr(bulk_predict, "_worker_config", {"conf": 0.25, "imgsz": 640, "source_dir": "/photos"})
+    return model
+
+
+def test_batch_predicts_all_images_in_one_pass(worker):
+    records = bulk_predict._predict_batch(["a.jpg", "b.jpg"])
+
+    assert worker.calls == [["a.jpg", "b.jpg"]]
+    assert [record["image"] for record in records] == ["a.jpg", "b.jpg"]
+    detection = records[0]["detections"][0]
+    assert (detection["class_name"], detection["confidence"]) == ("sleeper", 0.8)
+    assert detection["bbox"] == {"x1": 10.0, "y1": 20.0, "x2": 110.0, "y2": 220.0}
+    assert (records[0]["width"], records[0]["height"]) == (640, 480)
+
+
+def test_unreadable_image_is_isolated_from_its_batch(worker):
+    records = bulk_predict._predict_batch(["a.jpg", "bad.jpg", "c.jpg"])
+
+    # The failed batch is retried one image at a time
+    assert worker.calls[1:] == [["a.jpg"], ["bad.jpg"], ["c.jpg"]]
+    assert records[0]["num_detections"] == 1
+    assert records[1] == {"image": "bad.jpg", "error": "OSError: cannot identify image file"}
+    assert records[2]["num_detections"] == 1